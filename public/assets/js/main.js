@@ -1,3 +1,4 @@
+// these need to coincide with the active campaign in scraper/Campaign.py
 const deadline = new Date(Date.parse('December 7, 2025 8:00 PM GMT-0500'));
 const startTime = new Date(Date.parse('December 1, 2025 12:00 AM GMT-0500'));
 
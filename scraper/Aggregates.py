@@ -0,0 +1,259 @@
+"""
+The school metrics as mergeable partial aggregates.
+
+Every metric in `CalculateValues` reduces to sums, counts, sets of distinct donor ids (or, when
+counting approximately, HyperLogLog sketches of them) and sums per combination of statuses. Each of
+those can be worked out for any slice of the entries on its own and then merged, so the entries can
+be split into chunks, aggregated in parallel (across a process pool) and combined into exactly what
+`calculate_all()` gives for the whole frame, give or take floating point rounding in the sums.
+"""
+
+import base64
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .CalculateValues import CalculateValues, DONOR_ID, METRIC_CHUNK_ROWS, RECURRING_PAYMENT, TOTAL_AMOUNT
+from .DonorTable import STUDENT_OR_ALUMNI, parse_statuses
+from .GiftStats import GiftStats, gift_stats
+from .HyperLogLog import HyperLogLog
+
+SCHOOLS = ('uva', 'vt')
+CLASS_YEAR = 2025
+
+DistinctKeys = Union[Set[int], HyperLogLog]
+
+
+@dataclass
+class SchoolAggregate:
+    """The partial metrics of one school over some of its gifts."""
+    precision: Optional[int] = None  # None counts donors exactly, with sets; otherwise with sketches of this precision
+    total: float = 0.0
+    gifts_over_1000: int = 0
+    alum_monthly_10_plus: int = 0
+    alum_work_matched: int = 0
+    donors: DistinctKeys = None
+    first_time_donors: DistinctKeys = None
+    class_year_donors: Dict[int, DistinctKeys] = field(default_factory=dict)  # students and alumni, by class
+    status_donors: Dict[str, DistinctKeys] = field(default_factory=dict)
+    money_by_statuses: Dict[Tuple[str, ...], float] = field(default_factory=dict)
+    # each named (not anonymous) donor's first gift: its position in the entries, and the name on it
+    named_donors: Dict[int, Tuple[int, str]] = field(default_factory=dict)
+    gifts: GiftStats = field(default_factory=GiftStats)  # largest gifts, top donors and gift sizes
+
+    def __post_init__(self):
+        self.donors = self.donors if self.donors is not None else self._keys()
+        self.first_time_donors = self.first_time_donors if self.first_time_donors is not None else self._keys()
+
+    # =================== Public Interface ===================
+    def merge(self, other: "SchoolAggregate") -> "SchoolAggregate":
+        """Fold another partial aggregate (of other gifts) into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Can't merge exact and approximate (or differently sized) aggregates")
+        self.total += other.total
+        self.gifts_over_1000 += other.gifts_over_1000
+        self.alum_monthly_10_plus += other.alum_monthly_10_plus
+        self.alum_work_matched += other.alum_work_matched
+        self._merge_keys(self.donors, other.donors)
+        self._merge_keys(self.first_time_donors, other.first_time_donors)
+        for by_key, others in ((self.class_year_donors, other.class_year_donors),
+                               (self.status_donors, other.status_donors)):
+            for key, keys in others.items():
+                self._merge_keys(by_key.setdefault(key, self._keys()), keys)
+        for statuses, money in other.money_by_statuses.items():
+            self.money_by_statuses[statuses] = self.money_by_statuses.get(statuses, 0.0) + money
+        for donor, first in other.named_donors.items():
+            if donor not in self.named_donors or first < self.named_donors[donor]:
+                self.named_donors[donor] = first
+        self.gifts.merge(other.gifts)
+        return self
+
+    def remap(self, resolve: Callable[[int], int]) -> "SchoolAggregate":
+        """
+        Rename the donors by `resolve` (e.g. `DonorIndex.resolve`), folding together any found to be
+        the same donor since their gifts were aggregated. Sketches can't be renamed, so approximate
+        counts may still count such a donor more than once.
+        """
+        if self.precision is None:
+            self.donors = {resolve(donor) for donor in self.donors}
+            self.first_time_donors = {resolve(donor) for donor in self.first_time_donors}
+            for by_key in (self.class_year_donors, self.status_donors):
+                for key, donors in by_key.items():
+                    by_key[key] = {resolve(donor) for donor in donors}
+        named_donors = {}
+        for donor, first in self.named_donors.items():
+            donor = resolve(donor)
+            if donor not in named_donors or first < named_donors[donor]:
+                named_donors[donor] = first
+        self.named_donors = named_donors
+        self.gifts.remap(resolve)
+        return self
+
+    def metrics(self) -> Dict[str, Any]:
+        """The school's metrics, as `CalculateValues.calculate_all()` reports them."""
+        return {
+            "total_amount": self.total,
+            "most_individual_donors": self._count(self.donors),
+            "donor_names": ", ".join(name for _, name in sorted(self.named_donors.values())),
+            "most_first_time_donors": self._count(self.first_time_donors),
+            "most_donors_class_2025": self._count(self.class_year_donors.get(CLASS_YEAR, self._keys())),
+            "most_undergraduates": self._count(self.status_donors.get('Current Student', self._keys())),
+            "most_gifts_over_1000": self.gifts_over_1000,
+            "most_alum_monthly_10_plus": self.alum_monthly_10_plus,
+            "most_alum_work_matched": self.alum_work_matched,
+            "most_money_families": self._money(CalculateValues.FAMILY_STATUSES),
+            "most_money_grandparents_current_students": self._money(CalculateValues.GRANDPARENT_STATUS),
+            **self.gifts.metrics(),
+        }
+
+    def to_json(self) -> Dict[str, Any]:
+        """The aggregate as plain JSON values, for `from_json` to restore."""
+        keys = self._keys_to_json
+        return {
+            "precision": self.precision,
+            "total": self.total,
+            "gifts_over_1000": self.gifts_over_1000,
+            "alum_monthly_10_plus": self.alum_monthly_10_plus,
+            "alum_work_matched": self.alum_work_matched,
+            "donors": keys(self.donors),
+            "first_time_donors": keys(self.first_time_donors),
+            "class_year_donors": [[year, keys(donors)] for year, donors in self.class_year_donors.items()],
+            "status_donors": {status: keys(donors) for status, donors in self.status_donors.items()},
+            "money_by_statuses": [[list(statuses), money] for statuses, money in self.money_by_statuses.items()],
+            "named_donors": [[donor, position, name] for donor, (position, name) in self.named_donors.items()],
+            "gifts": self.gifts.to_json(),
+        }
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> "SchoolAggregate":
+        keys = cls._keys_from_json
+        return cls(
+            precision=data["precision"],
+            total=data["total"],
+            gifts_over_1000=data["gifts_over_1000"],
+            alum_monthly_10_plus=data["alum_monthly_10_plus"],
+            alum_work_matched=data["alum_work_matched"],
+            donors=keys(data["donors"]),
+            first_time_donors=keys(data["first_time_donors"]),
+            class_year_donors={year: keys(donors) for year, donors in data["class_year_donors"]},
+            status_donors={status: keys(donors) for status, donors in data["status_donors"].items()},
+            money_by_statuses={tuple(statuses): money for statuses, money in data["money_by_statuses"]},
+            named_donors={donor: (position, name) for donor, position, name in data["named_donors"]},
+            gifts=GiftStats.from_json(data["gifts"]),
+        )
+
+    # =================== Internal Helpers ===================
+    def _keys(self) -> DistinctKeys:
+        return set() if self.precision is None else HyperLogLog(self.precision)
+
+    def _add_keys(self, keys: DistinctKeys, donor_ids: pd.Series):
+        if isinstance(keys, HyperLogLog):
+            keys.update(donor_ids.to_numpy(dtype='int64'))
+        else:
+            keys.update(donor_ids.tolist())
+
+    @staticmethod
+    def _merge_keys(keys: DistinctKeys, other: DistinctKeys):
+        if isinstance(keys, HyperLogLog):
+            keys.merge(other)
+        else:
+            keys |= other
+
+    @staticmethod
+    def _keys_to_json(keys: DistinctKeys) -> Union[list, str]:
+        # a sketch's registers as base64, or the donor ids themselves
+        return base64.b64encode(keys.to_bytes()).decode() if isinstance(keys, HyperLogLog) else sorted(keys)
+
+    @staticmethod
+    def _keys_from_json(keys: Union[list, str]) -> DistinctKeys:
+        return HyperLogLog.from_bytes(base64.b64decode(keys)) if isinstance(keys, str) else set(keys)
+
+    @staticmethod
+    def _count(keys: DistinctKeys) -> int:
+        return keys.count() if isinstance(keys, HyperLogLog) else len(keys)
+
+    def _money(self, statuses: Iterable[str]) -> float:
+        # a gift counts once however many of the statuses its donor has
+        return sum(money for combination, money in self.money_by_statuses.items()
+                   if any(status in combination for status in statuses))
+
+
+def aggregate_entries(df: pd.DataFrame, start: int = 0, precision: Optional[int] = None) -> Dict[str, SchoolAggregate]:
+    """
+    The partial aggregates of each school over a chunk of the (typed, donor id'd) entries frame.
+
+    `start` is the chunk's position in the whole frame, so the donor names keep the order of the
+    donors' first gifts across chunks.
+    """
+    aggregates = {}
+    in_school = df['source'].astype(str).str
+    positions = np.arange(start, start + len(df))
+    for school in SCHOOLS:
+        mask = in_school.startswith(school).to_numpy(dtype=bool)
+        gifts = df[mask]
+        aggregate = aggregates[school] = SchoolAggregate(precision)
+        if gifts.empty:
+            continue
+
+        amounts = gifts[TOTAL_AMOUNT].where(~gifts[RECURRING_PAYMENT], gifts[TOTAL_AMOUNT] * 12)
+        donor_ids = gifts[DONOR_ID]
+        aggregate.total = float(amounts.sum())
+        aggregate.gifts_over_1000 = int((amounts >= 1000).sum())
+        aggregate._add_keys(aggregate.donors, donor_ids)
+        aggregate._add_keys(aggregate.first_time_donors, donor_ids[gifts['first time giver']])
+
+        # parse each distinct status cell once, rather than every row's
+        cells = gifts['status'].astype(object).fillna('')
+        parsed = {cell: parse_statuses(cell) for cell in cells.unique()}
+
+        def with_any(statuses) -> pd.Series:
+            return cells.map({cell: any(s in p for s in statuses) for cell, p in parsed.items()}).astype(bool)
+
+        alumni = with_any(('Alumni',))
+        aggregate.alum_monthly_10_plus = int((alumni & gifts[RECURRING_PAYMENT] & (gifts[TOTAL_AMOUNT] >= 10)).sum())
+        aggregate.alum_work_matched = int((alumni & gifts['work referral']).sum())
+
+        in_class = with_any(STUDENT_OR_ALUMNI) & gifts['graduation year'].notna()
+        for year, ids in donor_ids[in_class].groupby(gifts['graduation year'][in_class].to_numpy()):
+            aggregate._add_keys(aggregate.class_year_donors.setdefault(int(year), aggregate._keys()), ids)
+        for status in sorted({s for p in parsed.values() for s in p}):
+            aggregate._add_keys(aggregate.status_donors.setdefault(status, aggregate._keys()),
+                                donor_ids[with_any((status,))])
+        for cell, money in amounts.groupby(cells.to_numpy()).sum().items():
+            combination = tuple(sorted(set(parsed[cell])))
+            aggregate.money_by_statuses[combination] = aggregate.money_by_statuses.get(combination, 0.0) + float(money)
+
+        gift_stats(gifts, amounts, donor_ids, positions[mask], aggregate.gifts)
+
+        named = ~gifts['anonymous donation'].to_numpy(dtype=bool)
+        firsts = ~donor_ids[named].duplicated().to_numpy()
+        for donor, position, first, last in zip(donor_ids[named][firsts], positions[mask][named][firsts],
+                                                gifts['first name'][named][firsts], gifts['last name'][named][firsts]):
+            aggregate.named_donors[int(donor)] = (int(position), f"{first} {last}".strip())
+    return aggregates
+
+
+def merge_aggregates(partials: Iterable[Dict[str, SchoolAggregate]],
+                     precision: Optional[int] = None) -> Dict[str, SchoolAggregate]:
+    merged = {school: SchoolAggregate(precision) for school in SCHOOLS}
+    for partial in partials:
+        for school, aggregate in partial.items():
+            merged[school].merge(aggregate)
+    return merged
+
+
+def _aggregate_chunk(args):
+    return aggregate_entries(*args)
+
+
+def reduce_entries(df: pd.DataFrame, workers: int = 1, chunk_rows: int = METRIC_CHUNK_ROWS,
+                   precision: Optional[int] = None) -> Dict[str, SchoolAggregate]:
+    """Aggregate the entries chunk by chunk, across `workers` processes, and merge the chunks' aggregates."""
+    chunks = [(df.iloc[start:start + chunk_rows], start, precision) for start in range(0, len(df), chunk_rows)]
+    if workers <= 1 or len(chunks) <= 1:
+        return merge_aggregates(map(_aggregate_chunk, chunks), precision)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge_aggregates(pool.map(_aggregate_chunk, chunks), precision)
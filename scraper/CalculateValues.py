@@ -1,12 +1,86 @@
-from typing import Dict, Any
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 
 import gspread
+import numpy as np
 import pandas as pd
 
+from .Campaign import Campaign, SNAPSHOT_DIR
+from .DonorIdentity import DonorIndex
+from .DonorTable import DonorTable, donor_table, parse_statuses
+from .EntryShards import EntryShards
+from .GiftStats import GiftStats, gift_stats
+from .HyperLogLog import HyperLogLog, precision_for_error
+from .Instrumentation import run_report
+from .SheetRanges import payload_size
+
 PHONE_NUMBER = 'phone number'
+DONOR_ID = 'donor id'
 TOTAL_AMOUNT = 'total amount'
 RECURRING_PAYMENT = 'recurring payment'
 
+# count distinct donors in the partial aggregates and rollups exactly, or (for large multi-campaign rollups)
+# approximately with HyperLogLog sketches; each school's own counts are exact, from its donor table
+DISTINCT_COUNT = os.getenv("DISTINCT_COUNT", "exact")
+DISTINCT_ERROR = float(os.getenv("DISTINCT_ERROR", "0.01"))  # relative standard error of the approximate counts
+# processes to spread the metrics over, as mergeable partial aggregates of chunks of the entries
+METRIC_WORKERS = int(os.getenv("METRIC_WORKERS", "1"))
+METRIC_CHUNK_ROWS = int(os.getenv("METRIC_CHUNK_ROWS", "100000"))
+# each school's donor table and gift statistics as of the entries read so far, kept between runs
+METRIC_STATE_PATH = os.getenv("METRIC_STATE", str(Path(__file__).resolve().parent / "metric_state.json"))
+
+# the declared type of each column of the entries sheet
+ENTRY_SCHEMA = {
+    'source': 'category',
+    TOTAL_AMOUNT: 'float64',
+    RECURRING_PAYMENT: 'bool',
+    'first name': 'string',
+    'last name': 'string',
+    PHONE_NUMBER: 'string',
+    'email': 'string',
+    'anonymous donation': 'bool',
+    'first time giver': 'bool',
+    'graduation year': 'Int64',
+    'status': 'category',
+    'work referral': 'bool',
+}
+
+
+def _typed_column(name: str, values: Sequence[str]) -> Any:
+    """Convert one column of raw sheet values into its declared type."""
+    dtype = ENTRY_SCHEMA[name]
+    if dtype == 'bool':
+        return np.fromiter((str(v).strip().lower() == 'true' for v in values), dtype=bool, count=len(values))
+    if dtype == 'float64':
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').fillna(0).to_numpy(dtype='float64')
+    if dtype == 'Int64':
+        return pd.to_numeric(pd.Series(values, dtype=object).replace('', None), errors='coerce').astype('Int64').array
+    if name == 'source':
+        # only the (few) categories need lower-casing, not every row
+        return pd.Series(values, dtype='category').map(str.lower).astype('category').array
+    return pd.array(values, dtype=dtype)
+
+
+def entries_frame(columns: List[List[str]]) -> pd.DataFrame:
+    """
+    Build a typed entries DataFrame from column-major sheet values (each column's header first).
+
+    Columns are converted one at a time and released as they go, so no list of per-row dicts or
+    all-object frame is ever built. Columns outside the schema are ignored, and missing ones filled.
+    """
+    by_header = {column[0]: column for column in columns if column}
+    n_rows = max((len(column) - 1 for column in by_header.values()), default=0)
+
+    data = {}
+    for name in ENTRY_SCHEMA:
+        values = by_header.pop(name, [name])[1:]
+        values.extend([''] * (n_rows - len(values)))  # the API trims trailing blank cells
+        data[name] = _typed_column(name, values)
+        del values
+    return pd.DataFrame(data)
+
 
 class CalculateValues:
     """
@@ -17,54 +91,131 @@ class CalculateValues:
     GRANDPARENT_STATUS = ['Current Grandparent']
 
     def __init__(self, spreadsheet_key: str, worksheet_name: str = "entries",
-                 creds_file: str = "spreadsheet_credentials.json"):
+                 creds_file: str = "spreadsheet_credentials.json", gc: Optional[gspread.Client] = None,
+                 donors: Optional[DonorIndex] = None, distinct: str = DISTINCT_COUNT,
+                 distinct_error: float = DISTINCT_ERROR, workers: int = METRIC_WORKERS,
+                 state_path: Optional[str] = None):
+        if distinct not in ("exact", "approximate"):
+            raise ValueError(f"Unknown distinct count mode {distinct!r}")
         self.spreadsheet_key = spreadsheet_key
         self.worksheet_name = worksheet_name
         self.creds_file = creds_file
+        self.gc = gc  # an already authorized client to share, instead of authorizing again
+        self.donors = donors or DonorIndex()  # in memory only, unless given one to keep
+        self.distinct = distinct
+        self.distinct_error = distinct_error
+        self.workers = workers
+        # the school donor tables and gift stats are kept between runs (given a path, and a kept `donors`
+        # index for their ids)
+        self.state_path = state_path
         self.df = self._load_data()
+        self._rows, self._tables, self._gifts = self._load_state()  # the entries they cover, and them
 
     def _load_data(self) -> pd.DataFrame:
-        """Pull normalized data from Google Sheets into a DataFrame."""
-        gc = gspread.service_account(filename=self.creds_file)
-        sh = gc.open_by_key(self.spreadsheet_key)
-        ws = sh.worksheet(self.worksheet_name)
-        data = ws.get_all_records()
-        df = pd.DataFrame(data)
-
-        # If there are no rows, create an empty DataFrame with all expected columns
-        expected_columns = [
-            'source', TOTAL_AMOUNT, RECURRING_PAYMENT, 'first name', 'last name',
-            PHONE_NUMBER, 'anonymous donation', 'first time giver',
-            'graduation year', 'status', 'work referral'
-        ]
-        if df.empty:
-            df = pd.DataFrame(columns=expected_columns)
-
-        # Normalize columns
-        df['source'] = df['source'].str.lower()
-        df[TOTAL_AMOUNT] = pd.to_numeric(df[TOTAL_AMOUNT], errors='coerce').fillna(0)
-        df[RECURRING_PAYMENT] = df[RECURRING_PAYMENT].str.lower().map({'true': True, 'false': False})
-
+        """Pull the columns the metrics use from every shard of the entries into a typed DataFrame."""
+        with run_report.span("load_data", api_calls=1) as stage:
+            gc = self.gc or gspread.service_account(filename=self.creds_file)
+            shards = EntryShards(gc.open_by_key(self.spreadsheet_key), self.worksheet_name)
+            columns = shards.read_columns(ENTRY_SCHEMA)  # not e.g. when it was donated, or the message id
+            stage.add(items=max((len(column) - 1 for column in columns), default=0), nbytes=payload_size(columns),
+                      api_calls=shards.api_calls)
+        df = entries_frame(columns)
+        with run_report.span("donor_identity", items=len(df)):
+            df[DONOR_ID] = self.donors.assign(df)
+            self.donors.save()
         return df
 
     # =================== Public Interface ===================
     def calculate_all(self) -> Dict[str, Dict[str, Any]]:
         """Compute all metrics for UVA and VT."""
-        return {
+        if self.workers > 1:
+            return self.calculate_parallel(self.workers)
+        metrics = {
             'uva': self._calculate_school_metrics('uva'),
             'vt': self._calculate_school_metrics('vt')
         }
+        self._rows = len(self.df)
+        self._save_state()
+        return metrics
+
+    def calculate_parallel(self, workers: int = METRIC_WORKERS, chunk_rows: int = METRIC_CHUNK_ROWS
+                           ) -> Dict[str, Dict[str, Any]]:
+        """
+        Compute all metrics as partial aggregates of chunks of the entries, reduced across a pool of
+        `workers` processes and merged: the same results as one pass over the whole frame.
+        """
+        from .Aggregates import reduce_entries  # imports this module, so can't be imported up top
+        precision = precision_for_error(self.distinct_error) if self.distinct == "approximate" else None
+        with run_report.span("calculate_parallel", items=len(self.df)):
+            aggregates = reduce_entries(self.df, workers, chunk_rows, precision)
+        return {school: aggregate.metrics() for school, aggregate in aggregates.items()}
+
+    def donor_sketches(self) -> Dict[str, HyperLogLog]:
+        """
+        Sketches of the donors of each school, and of each status within it ('uva', 'uva:Alumni', ...), to
+        merge with other campaigns' (or schools') sketches for rollups.
+        """
+        sketches = {}
+        for school in ('uva', 'vt'):
+            school_df = self.df[self.df['source'].astype(str).str.startswith(school)]
+            sketches[school] = self._sketch(school_df[DONOR_ID])
+            statuses = school_df['status'].astype(object).fillna('').str.split(',').explode().str.strip()
+            for status, donor_ids in school_df.loc[statuses.index, DONOR_ID].groupby(statuses.to_numpy()):
+                if status:
+                    sketches[f"{school}:{status}"] = self._sketch(donor_ids)
+        return sketches
 
     # =================== Internal Helpers ===================
+    def _sketch(self, donor_ids) -> HyperLogLog:
+        sketch = HyperLogLog.for_error(self.distinct_error)
+        sketch.update(np.asarray(donor_ids, dtype='int64'))
+        return sketch
+
+    def _donor_table(self, df: pd.DataFrame, school: Optional[str] = None) -> DonorTable:
+        """The donor table of a frame of gifts; a school's is kept, so only the gifts it hasn't seen are added."""
+        positions = self.df.index.get_indexer(df.index)
+        if school is None:
+            return donor_table(df, self._effective_amounts(df), df[DONOR_ID], positions)
+        table = self._tables.setdefault(school, DonorTable())
+        new = positions >= self._rows
+        df = df[new]
+        table.update(df, self._effective_amounts(df), df[DONOR_ID], positions[new])
+        return table
+
+    def _load_state(self) -> Tuple[int, Dict[str, DonorTable], Dict[str, GiftStats]]:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return 0, {}, {}
+        with open(self.state_path, encoding="utf-8") as f:
+            saved = json.load(f)
+        # the entries are only ever appended to, so the kept state holds unless this is another sheet or it shrank
+        if saved["entries"] != [self.spreadsheet_key, self.worksheet_name] or saved["rows"] > len(self.df):
+            return 0, {}, {}
+        # donors found to be the same person since are folded together
+        return (saved["rows"],
+                {school: DonorTable.from_json(table).remap(self.donors.resolve)
+                 for school, table in saved["donors"].items()},
+                {school: GiftStats.from_json(stats).remap(self.donors.resolve)
+                 for school, stats in saved["gifts"].items()})
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": [self.spreadsheet_key, self.worksheet_name], "rows": self._rows,
+                       "donors": {school: table.to_json() for school, table in self._tables.items()},
+                       "gifts": {school: stats.to_json() for school, stats in self._gifts.items()}}, f)
+        os.replace(tmp_path, self.state_path)
+
     def _calculate_school_metrics(self, school_prefix: str) -> Dict[str, Any]:
         """Compute all metrics for a given school prefix ('uva' or 'vt')."""
-        school_df = self.df[self.df['source'].str.startswith(school_prefix)]
+        school_df = self.df[self.df['source'].astype(str).str.startswith(school_prefix)]
 
-        # Normalize status field to be list-like
+        # Normalize status field to be list-like, parsing each distinct status cell once (and sharing its list)
         school_df = school_df.copy()
-        school_df['status_list'] = school_df['status'].fillna('').apply(
-            lambda x: [s.strip() for s in str(x).split(',') if s.strip()]
-        )
+        cells = school_df['status'].astype(object).fillna('')
+        school_df['status_list'] = cells.map({cell: list(parse_statuses(cell)) for cell in cells.unique()})
 
         # If no rows, return zeros for all metrics
         if school_df.empty:
@@ -79,59 +230,58 @@ class CalculateValues:
                 "most_alum_monthly_10_plus": 0,
                 "most_alum_work_matched": 0,
                 "most_money_families": 0,
-                "most_money_grandparents_current_students": 0
+                "most_money_grandparents_current_students": 0,
+                **GiftStats().metrics()
             }
             return zero_metrics
 
-        # Otherwise, calculate metrics normally
+        # Otherwise, calculate metrics normally, counting donors from a table of the school's donors
+        donors = self._donor_table(school_df, school_prefix)
         return {
             "total_amount": self._total_raised(school_df),
-            "most_individual_donors": self._unique_donors_count(school_df),
-            "donor_names": self._donor_names(school_df),
-            "most_first_time_donors": self._first_time_donors_count(school_df),
-            "most_donors_class_2025": self._class_year_donors(school_df, 2025),
-            "most_undergraduates": self._status_count(school_df, 'Current Student'),
+            "most_individual_donors": self._unique_donors_count(donors),
+            "donor_names": self._donor_names(donors),
+            "most_first_time_donors": self._first_time_donors_count(donors),
+            "most_donors_class_2025": self._class_year_donors(donors, 2025),
+            "most_undergraduates": self._status_count(donors, 'Current Student'),
             "most_gifts_over_1000": self._gifts_over_1000_count(school_df),
             "most_alum_monthly_10_plus": self._alumni_monthly_10_plus(school_df),
             "most_alum_work_matched": self._alumni_work_matched(school_df),
             "most_money_families": self._money_by_statuses(school_df, self.FAMILY_STATUSES),
-            "most_money_grandparents_current_students": self._money_by_statuses(school_df, self.GRANDPARENT_STATUS)
+            "most_money_grandparents_current_students": self._money_by_statuses(school_df, self.GRANDPARENT_STATUS),
+            **self._gift_stats(school_df, school_prefix).metrics()
         }
 
     # =================== Individual Metric Functions ===================
+    @staticmethod
+    def _effective_amounts(df: pd.DataFrame) -> pd.Series:
+        # recurring gifts are monthly, so count a year's worth
+        return df[TOTAL_AMOUNT].where(~df[RECURRING_PAYMENT], df[TOTAL_AMOUNT] * 12)
+
     def _total_raised(self, df: pd.DataFrame) -> float:
-        return df.apply(lambda r: r[TOTAL_AMOUNT] * 12 if r[RECURRING_PAYMENT] else r[TOTAL_AMOUNT], axis=1).sum()
+        return self._effective_amounts(df).sum()
 
-    def _unique_donors_count(self, df: pd.DataFrame) -> int:
-        return df[[PHONE_NUMBER]].drop_duplicates().shape[0]
+    def _unique_donors_count(self, donors: DonorTable) -> int:
+        return len(donors)
 
-    def _donor_names(self, df: pd.DataFrame) -> str:
-        # Only include donors who are not anonymous
-        filtered = df[df['anonymous donation'].str.lower() != 'true']
-        unique = filtered[[PHONE_NUMBER, 'first name', 'last name']].drop_duplicates()
-        return ", ".join(unique.apply(lambda x: f"{x['first name']} {x['last name']}".strip(), axis=1))
+    def _donor_names(self, donors: DonorTable) -> str:
+        # Only include donors who are not anonymous, each once (by the name on their first named gift)
+        return donors.names()
 
-    def _first_time_donors_count(self, df: pd.DataFrame) -> int:
+    def _first_time_donors_count(self, donors: DonorTable) -> int:
         # count unique donors who are first-time givers
-        ft_df = df[df['first time giver'].str.lower() == 'true']
-        return ft_df[[PHONE_NUMBER]].drop_duplicates().shape[0]
+        return len(donors.first_time_ids())
 
-    def _class_year_donors(self, df: pd.DataFrame, year: int) -> int:
+    def _class_year_donors(self, donors: DonorTable, year: int) -> int:
         # count unique donors who are Current Student or Alumni of the given class
-        class_df = df[df.apply(
-            lambda r: any(s in r['status_list'] for s in ['Current Student', 'Alumni'])
-                      and r['graduation year'] == year,
-            axis=1
-        )]
-        return class_df[[PHONE_NUMBER]].drop_duplicates().shape[0]
-
-    def _status_count(self, df: pd.DataFrame, status: str) -> int:
+        return len(donors.class_year_ids(year))
+
+    def _status_count(self, donors: DonorTable, status: str) -> int:
         # count unique donors with a given status
-        status_df = df[df['status_list'].apply(lambda lst: status in lst)]
-        return status_df[[PHONE_NUMBER]].drop_duplicates().shape[0]
+        return len(donors.status_ids(status))
 
     def _gifts_over_1000_count(self, df: pd.DataFrame) -> int:
-        amounts = df.apply(lambda r: r[TOTAL_AMOUNT] * 12 if r[RECURRING_PAYMENT] else r[TOTAL_AMOUNT], axis=1)
+        amounts = self._effective_amounts(df)
         return amounts[amounts >= 1000].count()
 
     def _alumni_monthly_10_plus(self, df: pd.DataFrame) -> int:
@@ -141,9 +291,43 @@ class CalculateValues:
     def _alumni_work_matched(self, df: pd.DataFrame) -> int:
         return \
             df[df['status_list'].apply(lambda lst: 'Alumni' in lst) & (
-                    df['work referral'].str.lower() == 'true')].shape[0]
+                df['work referral'])].shape[0]
 
     def _money_by_statuses(self, df: pd.DataFrame, statuses: list) -> float:
         filtered = df[df['status_list'].apply(lambda lst: any(s in lst for s in statuses))]
-        return filtered.apply(lambda r: r[TOTAL_AMOUNT] * 12 if r[RECURRING_PAYMENT] else r[TOTAL_AMOUNT],
-                              axis=1).sum()
+        return self._effective_amounts(filtered).sum()
+
+    def _gift_stats(self, df: pd.DataFrame, school: Optional[str] = None) -> GiftStats:
+        # largest gifts, top named donors and gift size quantiles, with each gift's position in the entries;
+        # a school's are kept, like its donor table, so only the gifts they haven't seen are added
+        positions = self.df.index.get_indexer(df.index)
+        if school is None:
+            return gift_stats(df, self._effective_amounts(df), df[DONOR_ID], positions)
+        new = positions >= self._rows
+        df = df[new]
+        return gift_stats(df, self._effective_amounts(df), df[DONOR_ID], positions[new],
+                          self._gifts.setdefault(school, GiftStats()))
+
+
+# =================== Past Campaigns ===================
+def _snapshot_path(campaign: Campaign, snapshot_dir: str) -> Path:
+    return Path(snapshot_dir) / f"{campaign.id}.json"
+
+
+def precompute_campaign(spreadsheet_key: str, campaign: Campaign, snapshot_dir: str = SNAPSHOT_DIR,
+                        creds_file: str = "spreadsheet_credentials.json") -> Path:
+    """Calculate a closed campaign's metrics from its worksheet once, and store them."""
+    metrics = CalculateValues(spreadsheet_key, campaign.entries_worksheet, creds_file).calculate_all()
+    path = _snapshot_path(campaign, snapshot_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    # numpy scalars don't serialize on their own
+    tmp.write_text(json.dumps(metrics, indent=2, default=lambda value: value.item()))
+    os.replace(tmp, path)
+    return path
+
+
+def load_precomputed(campaign: Campaign, snapshot_dir: str = SNAPSHOT_DIR) -> Optional[Dict[str, Dict[str, Any]]]:
+    """A campaign's stored metrics, if it has been precomputed."""
+    path = _snapshot_path(campaign, snapshot_dir)
+    return json.loads(path.read_text()) if path.exists() else None
@@ -0,0 +1,115 @@
+"""
+The Cup's campaigns, and which one is running.
+
+Each campaign has an id, a start and a deadline (these need to coincide with `main.js`). Donations
+are tagged with the campaign they came in during and stored in that campaign's own entries
+worksheet, so a run only ever reads the active campaign's donations, and past campaigns are left
+alone (and can be precomputed once, see `CalculateValues.precompute_campaign`).
+
+Run as a module to get the active campaign for the workflow (in GITHUB_OUTPUT format):
+    python -m scraper.Campaign >> $GITHUB_OUTPUT
+"""
+
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+EASTERN = timezone(timedelta(hours=-5))  # the times in main.js are all GMT-0500
+
+# how long before the start and after the deadline we still take updates (for early and late entries)
+OPENS_BEFORE = timedelta(days=30)
+CLOSES_AFTER = timedelta(days=3)
+
+ENTRIES_WORKSHEET = "entries"
+SNAPSHOT_DIR = os.getenv("CAMPAIGN_SNAPSHOTS", str(Path(__file__).resolve().parent / "campaigns"))
+
+
+@dataclass(frozen=True)
+class Campaign:
+    """One year's Cup."""
+    id: str
+    start: datetime
+    deadline: datetime
+    worksheet: Optional[str] = None  # defaults to entries-<id>
+
+    @property
+    def entries_worksheet(self) -> str:
+        """The worksheet this campaign's donations are stored in."""
+        return self.worksheet or f"{ENTRIES_WORKSHEET}-{self.id}"
+
+    def opens(self) -> datetime:
+        return self.start - OPENS_BEFORE
+
+    def closes(self) -> datetime:
+        return self.deadline + CLOSES_AFTER
+
+    def accepting(self, now: Optional[datetime] = None) -> bool:
+        """Whether updates for this campaign should still be processed."""
+        now = now or datetime.now(timezone.utc)
+        return self.opens() <= now <= self.closes()
+
+    def closed(self, now: Optional[datetime] = None) -> bool:
+        """Whether this campaign is over, and its donations will no longer change."""
+        return (now or datetime.now(timezone.utc)) > self.closes()
+
+
+# oldest first; 2025 predates partitioning, so it keeps the original worksheet
+CAMPAIGNS = (
+    Campaign("2025", datetime(2025, 12, 1, 0, 0, tzinfo=EASTERN), datetime(2025, 12, 7, 20, 0, tzinfo=EASTERN),
+             worksheet=ENTRIES_WORKSHEET),
+)
+
+
+def get_campaign(campaign_id: str) -> Campaign:
+    for campaign in CAMPAIGNS:
+        if campaign.id == campaign_id:
+            return campaign
+    raise KeyError(f"Unknown campaign: {campaign_id}")
+
+
+def active_campaign(now: Optional[datetime] = None) -> Campaign:
+    """
+    The campaign new donations belong to: the one accepting updates, otherwise the latest one that
+    has opened (or the first, before any have). CAMPAIGN_ID overrides it, e.g. to rerun a past one.
+    """
+    if os.getenv("CAMPAIGN_ID"):
+        return get_campaign(os.getenv("CAMPAIGN_ID"))
+    now = now or datetime.now(timezone.utc)
+    for campaign in reversed(CAMPAIGNS):
+        if campaign.accepting(now):
+            return campaign
+    opened = [campaign for campaign in CAMPAIGNS if campaign.opens() <= now]
+    return opened[-1] if opened else CAMPAIGNS[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the active campaign, or precompute a past one.")
+    parser.add_argument("--precompute", metavar="ID",
+                        help="calculate a closed campaign's metrics once and store them with the campaigns")
+    args = parser.parse_args(argv)
+
+    if args.precompute:
+        from .CalculateValues import precompute_campaign  # only this needs the Sheets dependencies
+        from dotenv import load_dotenv
+        load_dotenv()
+        campaign = get_campaign(args.precompute)
+        if not campaign.closed():
+            print(f"❌ Campaign {campaign.id} is still running, so it can't be precomputed yet.")
+            return 1
+        path = precompute_campaign(os.getenv("SPREADSHEET_KEY"), campaign)
+        print(f"💾 Precomputed campaign {campaign.id} to {path}")
+        return 0
+
+    campaign = active_campaign()
+    print(f"campaign={campaign.id}")
+    print(f"worksheet={campaign.entries_worksheet}")
+    print(f"in_range={str(campaign.accepting()).lower()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+An append-only feed of what changed each time the results were written.
+
+Rather than leaving anyone interested (a scoreboard ticker, a notifier) to download results.csv and
+diff it themselves, every results write diffs the new row against the previous one in memory and
+appends typed events: a new donor name, a school taking the lead in a category, or a milestone
+crossed. Each event is one compact JSON line with a sequence number. Readers keep a cursor (the byte
+offset they've read up to) and resume from it, reading only what's new. A line left half written by
+a crash partway through an append is ignored, and written over by the next append.
+"""
+
+import json
+import math
+import os
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ResultsHistory import HISTORY_DIR, numeric_values
+
+FEED_PATH = os.getenv("CHANGE_FEED", os.path.join(HISTORY_DIR, "changes.jsonl"))
+SCHOOLS = ("uva", "vt")
+# a milestone every this much of a metric (matched on the end of the column name)
+MILESTONES = {
+    "total_amount": 1000.0,
+    "most_individual_donors": 25.0,
+}
+
+# gift size statistics (e.g. uva_median_gift), which nobody is competing to lead
+STATISTICS = ("_gift",)
+
+NEW_DONOR = "new_donor"
+LEAD_CHANGE = "lead_change"
+MILESTONE = "milestone"
+
+
+@dataclass
+class ChangeEvent:
+    """Something that changed between two writes of the results."""
+    type: str
+    metric: str = ""
+    school: str = ""
+    old: Any = None
+    new: Any = None
+    seq: int = 0
+    at: str = ""
+
+
+def _names(value) -> List[str]:
+    if not isinstance(value, str):
+        return []
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def _leader(values: Dict[str, float], metric: str) -> Optional[str]:
+    scores = {school: values.get(f"{school}_{metric}") for school in SCHOOLS}
+    if any(score is None for score in scores.values()):
+        return None
+    best = max(scores.values())
+    leaders = [school for school, score in scores.items() if score == best]
+    return leaders[0] if len(leaders) == 1 else None
+
+
+def diff_results(old_row: Dict[str, Any], new_row: Dict[str, Any]) -> List[ChangeEvent]:
+    """The events that take the results from one row to the next."""
+    events = []
+    for school in SCHOOLS:
+        column = f"{school}_donor_names"
+        known = set(_names(old_row.get(column)))
+        events += [ChangeEvent(NEW_DONOR, metric="donor_names", school=school, new=name)
+                   for name in _names(new_row.get(column)) if name not in known]
+
+    old_values, new_values = numeric_values(old_row), numeric_values(new_row)
+    metrics = sorted({column.split("_", 1)[1] for column in new_values
+                      if column.split("_", 1)[0] in SCHOOLS and not column.endswith(STATISTICS)})
+    for metric in metrics:
+        old_leader, new_leader = _leader(old_values, metric), _leader(new_values, metric)
+        if new_leader and new_leader != old_leader:
+            events.append(ChangeEvent(LEAD_CHANGE, metric=metric, school=new_leader, old=old_leader, new=new_leader))
+
+    for column, new in new_values.items():
+        step = next((step for suffix, step in MILESTONES.items() if column.endswith(suffix)), None)
+        old = old_values.get(column, 0.0)
+        if step and math.floor(new / step) > math.floor(old / step):
+            school = column.split("_", 1)[0]
+            events.append(ChangeEvent(MILESTONE, metric=column, school=school if school in SCHOOLS else "",
+                                      old=old, new=math.floor(new / step) * step))
+    return events
+
+
+class ChangeFeed:
+    """The feed file: append events, or read those after a cursor."""
+
+    def __init__(self, path: str = FEED_PATH):
+        self.path = path
+
+    def append(self, events: List[ChangeEvent]) -> List[ChangeEvent]:
+        """Number, timestamp and append events; returns them as written."""
+        if not events:
+            return []
+        end, seq = self._tail()
+        at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > end:
+            with open(self.path, "r+b") as f:
+                f.truncate(end)  # past a line a crash left half written
+        lines = []
+        for event in events:
+            seq += 1
+            event.seq, event.at = seq, at
+            lines.append(json.dumps({key: value for key, value in asdict(event).items() if value not in ("", None)},
+                                    separators=(",", ":")) + "\n")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))  # one write, so a reader sees all of a diff's events or none
+        return events
+
+    def read(self, cursor: int = 0) -> Tuple[List[ChangeEvent], int]:
+        """The events after a cursor, and the cursor to resume from next time."""
+        if not os.path.exists(self.path):
+            return [], cursor
+        with open(self.path, "rb") as f:
+            f.seek(cursor)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]  # leave any line still being written for next time
+        events = [ChangeEvent(**json.loads(line)) for line in complete.splitlines() if line]
+        return events, cursor + len(complete)
+
+    def last_seq(self) -> int:
+        """The sequence number of the last (completely written) event, read from the end of the file."""
+        return self._tail()[1]
+
+    def _tail(self) -> Tuple[int, int]:
+        """Where the last complete line ends, and its event's sequence number; reads back from the end."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        window = 4096
+        while size:
+            start = max(0, size - window)
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                data = f.read(size - start)
+            end = data.rfind(b"\n") + 1
+            lines = data[:end].splitlines()[1 if start else 0:]  # the first may start before the window
+            if lines or not start:
+                return start + end, json.loads(lines[-1])["seq"] if lines else 0
+            window *= 2
+        return 0, 0
+
+
+def record_changes(old_row: Dict[str, Any], new_row: Dict[str, Any], path: str = FEED_PATH) -> List[ChangeEvent]:
+    """Diff two results rows and append what changed to the feed."""
+    return ChangeFeed(path).append(diff_results(old_row, new_row))
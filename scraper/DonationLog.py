@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+An append-only log of every normalized donation, with snapshots of what it all adds up to.
+
+The entries sheet is the record of the donations, but rebuilding anything from it means reading it
+all again, and it doesn't say which parser version made each row. So each normalized donation is
+also appended here, with the Message-ID of the email it came from and the parser version, as a
+checksummed record in numbered segment files. Every `DONATION_SNAPSHOT_EVERY` records a snapshot
+of the aggregate state (each campaign's per-school partial aggregates, and the donor index) is
+written alongside as versioned JSON, with the position in the log it covers, so a restart or
+recompute loads the latest snapshot and replays only the records after it, rather than starting
+from zero. A snapshot of another `SNAPSHOT_VERSION` is ignored, and the state rebuilt from the log.
+Once loaded, the state is kept, and later records are folded into it as they're read.
+
+A record torn by a crash partway through an append is dropped (and written over by the next
+append); a bad record anywhere else means the log is corrupt, and is an error. Each email counts
+once, by its first record: a later one with the same Message-ID (say the email was fetched again
+after a failed run) is skipped.
+
+Usage:
+    python -m scraper.DonationLog CAMPAIGN
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Set
+
+from .Aggregates import SchoolAggregate, aggregate_entries, merge_aggregates
+from .CalculateValues import DONOR_ID, ENTRY_SCHEMA, entries_frame
+from .DonorIdentity import DonorIndex
+
+DONATION_LOG_DIR = os.getenv("DONATION_LOG", "donation_log")
+SEGMENT_SIZE = int(os.getenv("DONATION_LOG_SEGMENT_BYTES", str(8 * 1024 * 1024)))
+SNAPSHOT_EVERY = int(os.getenv("DONATION_SNAPSHOT_EVERY", "1000"))  # records replayed before a new snapshot
+SNAPSHOTS_KEPT = 2
+REPLAY_CHUNK_ROWS = 10_000  # donations aggregated at a time when replaying
+MAGIC = b"LGLD"
+# each record: magic, the CRC-32 and length of the JSON that follows
+RECORD_HEADER = struct.Struct(">4sII")
+SNAPSHOT_VERSION = 1  # bump when the snapshot's layout (or what it aggregates) changes
+
+
+@dataclass(frozen=True, order=True)
+class LogPosition:
+    """A place in the log: a segment, and a byte offset into it."""
+    segment: int = 1
+    offset: int = 0
+
+
+@dataclass(frozen=True)
+class LoggedDonation:
+    """One record of the log: a normalized donation, and where it came from."""
+    end: LogPosition  # where the next record starts
+    message_id: str
+    parser_version: str
+    logged_at: str
+    row: Dict[str, Any]
+
+
+@dataclass
+class DonationState:
+    """What the log adds up to, as of a position in it."""
+    position: LogPosition = field(default_factory=LogPosition)
+    records: int = 0
+    donors: DonorIndex = field(default_factory=DonorIndex)
+    campaigns: Dict[str, Dict[str, SchoolAggregate]] = field(default_factory=dict)
+    rows: Dict[str, int] = field(default_factory=dict)  # each campaign's gifts so far, for their positions
+    message_ids: Set[str] = field(default_factory=set)
+
+    # =================== Public Interface ===================
+    def apply(self, donations: Iterable[LoggedDonation], chunk_rows: int = REPLAY_CHUNK_ROWS) -> int:
+        """Fold donations (in log order) into the aggregates; returns how many records were read."""
+        read = 0
+        pending: Dict[str, List[Mapping[str, Any]]] = {}
+        for donation in donations:
+            read += 1
+            self.records += 1
+            self.position = donation.end
+            if donation.message_id:
+                if donation.message_id in self.message_ids:
+                    continue  # the same email logged again
+                self.message_ids.add(donation.message_id)
+            pending.setdefault(str(donation.row.get("campaign", "")), []).append(donation.row)
+            if sum(len(rows) for rows in pending.values()) >= chunk_rows:
+                self._aggregate(pending)
+                pending = {}
+        self._aggregate(pending)
+        return read
+
+    def metrics(self, campaign: str) -> Dict[str, Dict[str, Any]]:
+        """A campaign's metrics, as `CalculateValues.calculate_all()` reports them."""
+        aggregates = self.campaigns.get(campaign) or merge_aggregates([])
+        # donors found to be the same person since their gifts were aggregated are folded together
+        return {school: aggregate.remap(self.donors.resolve).metrics() for school, aggregate in aggregates.items()}
+
+    def to_json(self) -> Dict[str, Any]:
+        """The state as plain JSON values, for `from_json` to restore."""
+        return {
+            "position": [self.position.segment, self.position.offset],
+            "records": self.records,
+            "donors": self.donors.to_json(),
+            "campaigns": {campaign: {school: aggregate.to_json() for school, aggregate in aggregates.items()}
+                          for campaign, aggregates in self.campaigns.items()},
+            "rows": self.rows,
+            "message_ids": sorted(self.message_ids),
+        }
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> "DonationState":
+        return cls(
+            position=LogPosition(*data["position"]),
+            records=data["records"],
+            donors=DonorIndex.from_json(data["donors"]),
+            campaigns={campaign: {school: SchoolAggregate.from_json(aggregate) for school, aggregate in schools.items()}
+                       for campaign, schools in data["campaigns"].items()},
+            rows=dict(data["rows"]),
+            message_ids=set(data["message_ids"]),
+        )
+
+    # =================== Internal Helpers ===================
+    def _aggregate(self, pending: Dict[str, List[Mapping[str, Any]]]):
+        for campaign, rows in pending.items():
+            df = entries_frame([[name] + [str(row.get(name, "")) for row in rows] for name in ENTRY_SCHEMA])
+            df[DONOR_ID] = self.donors.assign(df)
+            aggregates = self.campaigns.setdefault(campaign, merge_aggregates([]))
+            for school, aggregate in aggregate_entries(df, self.rows.get(campaign, 0)).items():
+                aggregates[school].merge(aggregate)
+            self.rows[campaign] = self.rows.get(campaign, 0) + len(df)
+
+
+class DonationLog:
+    """Checksummed segments of normalized donations, and snapshots of their aggregate state."""
+
+    def __init__(self, path: str = DONATION_LOG_DIR, segment_size: int = SEGMENT_SIZE,
+                 snapshot_every: int = SNAPSHOT_EVERY):
+        self.path = path
+        self.segment_size = segment_size
+        self.snapshot_every = snapshot_every
+        self._end: Optional[LogPosition] = None  # where the next record goes
+        self._state: Optional[DonationState] = None  # as of the last records read
+        self._snapshot_records = 0  # the records the latest snapshot covers
+
+    # =================== Public Interface ===================
+    def append(self, row: Mapping[str, Any], message_id: str, parser_version: str) -> LogPosition:
+        """Append a normalized donation; returns where its record ends."""
+        payload = json.dumps({
+            "message_id": message_id, "parser_version": parser_version,
+            "logged_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "row": dict(row),
+        }).encode()
+        record = RECORD_HEADER.pack(MAGIC, zlib.crc32(payload), len(payload)) + payload
+        end = self._tail()
+        if end.offset and end.offset + len(record) > self.segment_size:
+            end = LogPosition(end.segment + 1, 0)
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._segment_path(end.segment), "r+b" if end.offset else "wb") as f:
+            f.seek(end.offset)
+            f.write(record)
+            f.truncate()  # past any torn record
+        self._end = LogPosition(end.segment, end.offset + len(record))
+        return self._end
+
+    def records(self, start: LogPosition = LogPosition()) -> Iterator[LoggedDonation]:
+        """Every record from a position on, checking each one's checksum."""
+        segments = self._segments()
+        for segment in (s for s in segments if s >= start.segment):
+            base = start.offset if segment == start.segment else 0
+            with open(self._segment_path(segment), "rb") as f:
+                f.seek(base)  # just what's after the start, not the whole segment again
+                data = f.read()
+            offset = 0
+            while offset < len(data):
+                payload = self._payload(data, offset)
+                if payload is None:
+                    if segment == segments[-1] and self._last_record(data, offset):
+                        return  # torn by a crash partway through an append
+                    raise ValueError(f"Donation log segment {segment} is corrupt at offset {base + offset}")
+                offset += RECORD_HEADER.size + len(payload)
+                record = json.loads(payload)
+                yield LoggedDonation(LogPosition(segment, base + offset), record["message_id"],
+                                     record["parser_version"], record["logged_at"], record["row"])
+
+    def state(self) -> DonationState:
+        """
+        The aggregate state of the whole log. The first call loads the latest snapshot and replays the
+        records after it; later calls just fold in the records appended since.
+        """
+        if self._state is None:
+            self._state = self.load_snapshot() or DonationState()
+            self._snapshot_records = self._state.records
+        self._state.apply(self.records(self._state.position))
+        if self.snapshot_every and self._state.records - self._snapshot_records >= self.snapshot_every:
+            self.snapshot(self._state)
+        return self._state
+
+    def checkpoint(self):
+        """Snapshot the aggregate state, if enough records have been appended since the last snapshot."""
+        self.state()
+
+    def metrics(self, campaign: str) -> Dict[str, Dict[str, Any]]:
+        return self.state().metrics(campaign)
+
+    def snapshot(self, state: DonationState) -> str:
+        """Write a snapshot of the aggregate state, keeping only the latest few."""
+        payload = json.dumps(state.to_json(), separators=(",", ":"))
+        path = os.path.join(self.path, f"snapshot-{state.records:010d}.json")
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"version": SNAPSHOT_VERSION, "sha256": hashlib.sha256(payload.encode()).hexdigest()})
+                    + "\n" + payload)
+        os.replace(tmp_path, path)
+        self._snapshot_records = state.records
+        for old in self._snapshots()[:-SNAPSHOTS_KEPT]:
+            os.remove(old)
+        return path
+
+    def load_snapshot(self) -> Optional[DonationState]:
+        """The latest snapshot that's intact and of this version, if there is one."""
+        for path in reversed(self._snapshots()):
+            with open(path, encoding="utf-8") as f:
+                header, _, payload = f.read().partition("\n")
+            try:
+                header = json.loads(header)
+                if header.get("version") != SNAPSHOT_VERSION:
+                    print(f"⚠️ Ignoring donation log snapshot {path} of version {header.get('version')}")
+                    continue
+                if hashlib.sha256(payload.encode()).hexdigest() == header.get("sha256"):
+                    return DonationState.from_json(json.loads(payload))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                pass
+            print(f"⚠️ Skipping corrupt donation log snapshot {path}")
+        return None
+
+    # =================== Internal Helpers ===================
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:06d}.log")
+
+    def _segments(self) -> List[int]:
+        return sorted(int(os.path.basename(path)[:-4]) for path in glob.glob(os.path.join(self.path, "*.log")))
+
+    def _snapshots(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.path, "snapshot-*.json")))
+
+    def _tail(self) -> LogPosition:
+        """Where the next record goes: after the last intact one."""
+        if self._end is None:
+            self._end = LogPosition()
+            segments = self._segments()
+            if segments:
+                self._end = LogPosition(segments[-1], 0)
+                for donation in self.records(self._end):
+                    self._end = donation.end
+        return self._end
+
+    @classmethod
+    def _last_record(cls, data: bytes, offset: int) -> bool:
+        """
+        Whether the record at an offset is torn, as an append cut short by a crash would be: it runs
+        past the end of the segment, and no intact record follows it. A bad length with good records
+        after it is corruption, not a torn tail, and mustn't be written over.
+        """
+        if offset + RECORD_HEADER.size <= len(data):
+            _, _, length = RECORD_HEADER.unpack_from(data, offset)
+            if offset + RECORD_HEADER.size + length <= len(data):
+                return False
+        following = data.find(MAGIC, offset + 1)
+        while following != -1:
+            if cls._payload(data, following) is not None:
+                return False
+            following = data.find(MAGIC, following + 1)
+        return True
+
+    @staticmethod
+    def _payload(data: bytes, offset: int) -> Optional[bytes]:
+        """The JSON of the record at an offset, or None if it's cut short or fails its checksum."""
+        if offset + RECORD_HEADER.size > len(data):
+            return None
+        magic, checksum, length = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if magic != MAGIC or len(payload) != length or zlib.crc32(payload) != checksum:
+            return None
+        return payload
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print a campaign's metrics from the donation log.")
+    parser.add_argument("campaign", help="the campaign's id, e.g. 2025")
+    parser.add_argument("--log", default=DONATION_LOG_DIR, help="the donation log directory")
+    args = parser.parse_args(argv)
+    print(json.dumps(DonationLog(args.log).metrics(args.campaign), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Working out which gifts came from the same donor.
+
+Gifts used to be deduplicated on the raw phone number string, so "(540) 555-1234" and "5405551234"
+counted as two donors. Here each gift is reduced to a few blocking keys: its normalized phone number
+and email address, which identify a donor on their own, and its name, which only does for gifts
+with neither (e.g. a back end gift keyed in without a phone). Gifts sharing a key are the same
+donor, found with a dict lookup per key and a union-find over donor ids, so matching stays linear in
+the number of gifts. The key to donor id mapping is saved between runs, so ids are stable and a
+returning donor is a lookup away.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Set
+
+from .EmailParser import EmailParser
+
+DONOR_INDEX_PATH = os.getenv("DONOR_INDEX", str(Path(__file__).resolve().parent / "donor_index.json"))
+MIN_PHONE_DIGITS = 7
+
+
+def normalize_phone(phone: str) -> str:
+    """Just the digits of a phone number, without a US country code; blank if it's too short to be one."""
+    digits = re.sub(r"\D", "", str(phone or ""))
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]
+    return digits if len(digits) >= MIN_PHONE_DIGITS else ""
+
+
+def normalize_email(address: str) -> str:
+    address = str(address or "").strip().lower()
+    return address if "@" in address else ""
+
+
+def name_key(first: str, last: str) -> str:
+    """A donor's name, ignoring case, spacing and punctuation."""
+    first, last = (re.sub(r"[^a-z]", "", str(part or "").lower()) for part in (first, last))
+    return f"{last}|{first}" if first or last else ""
+
+
+def blocking_keys(phone: str, email: str, first: str, last: str) -> List[str]:
+    """The keys that identify a gift's donor on their own: its real phone number and email address."""
+    keys = []
+    # a fallback number made up from the donor's name and email doesn't identify them any better than those
+    if phone and str(phone) != EmailParser.generate_fallback_phone(first or "", last or "", email or ""):
+        phone = normalize_phone(phone)
+        if phone:
+            keys.append(f"phone:{phone}")
+    email = normalize_email(email)
+    if email:
+        keys.append(f"email:{email}")
+    return keys
+
+
+class DonorIndex:
+    """Assigns every gift a donor id, remembering the mapping (when given a path) between runs."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._keys: Optional[Dict[str, int]] = None
+        self._parents: Dict[int, int] = {}
+        self._identified: Set[int] = set()  # donors known by a phone or email, not just a name
+        self._next_id = 1
+        self._dirty = False
+
+    # =================== Public Interface ===================
+    def donor_id(self, phone: str = "", email: str = "", first: str = "", last: str = "") -> int:
+        """The id of the donor who made a gift, merging donors this gift shows to be the same person."""
+        keys = self._load()
+        strong = blocking_keys(phone, email, first, last)
+        name = name_key(first, last)
+        name = f"name:{name}" if name else ""
+
+        matches = {self._find(keys[key]) for key in strong if key in keys}
+        if name in keys:
+            by_name = self._find(keys[name])
+            # a name alone only matches donors we don't know any better, or gifts we don't
+            if not strong or by_name not in self._identified:
+                matches.add(by_name)
+
+        if matches:
+            donor = min(matches)
+            for other in matches - {donor}:
+                self._union(other, donor)
+        else:
+            donor = self._new_id()
+
+        for key in strong:
+            if keys.get(key) is None or self._find(keys[key]) != donor:
+                keys[key] = donor
+                self._dirty = True
+        if strong and donor not in self._identified:
+            self._identified.add(donor)
+            self._dirty = True
+        if name and name not in keys:
+            keys[name] = donor
+            self._dirty = True
+        return donor
+
+    def assign(self, df) -> List[int]:
+        """The donor id of every gift (row) in an entries DataFrame."""
+        columns = [df[column] if column in df else [""] * len(df)
+                   for column in ("phone number", "email", "first name", "last name")]
+        # blanks come through as missing (pd.NA) rather than empty strings
+        ids = [self.donor_id(*(value if isinstance(value, str) else "" for value in row)) for row in zip(*columns)]
+        # a later gift may have merged the donors of earlier ones
+        return [self._find(donor) for donor in ids]
+
+    def resolve(self, donor: int) -> int:
+        """The id a donor now goes by, should later gifts have shown them to be the same as another."""
+        return self._find(donor)
+
+    def to_json(self) -> Dict[str, Any]:
+        """The whole index as plain JSON values (its merges included), for `from_json` to restore."""
+        return {
+            "next_id": self._next_id,
+            "keys": dict(self._load()),
+            "parents": [[donor, parent] for donor, parent in self._parents.items()],
+            "identified": sorted(self._identified),
+        }
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any], path: Optional[str] = None) -> "DonorIndex":
+        index = cls(path)
+        index._keys = dict(data["keys"])
+        index._parents = {donor: parent for donor, parent in data["parents"]}
+        index._identified = set(data["identified"])
+        index._next_id = data["next_id"]
+        return index
+
+    def save(self):
+        """Persist the mapping (if it has a path and has changed)."""
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "next_id": self._next_id,
+                "keys": {key: self._find(donor) for key, donor in self._keys.items()},
+                "identified": sorted({self._find(donor) for donor in self._identified}),
+            }, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    # =================== Internal Helpers ===================
+    def _load(self) -> Dict[str, int]:
+        if self._keys is None:
+            self._keys = {}
+            if self.path and os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as f:
+                    saved = json.load(f)
+                self._keys = saved["keys"]
+                self._identified = set(saved["identified"])
+                self._next_id = saved["next_id"]
+        return self._keys
+
+    def _new_id(self) -> int:
+        donor = self._next_id
+        self._next_id += 1
+        self._dirty = True
+        return donor
+
+    def _find(self, donor: int) -> int:
+        root = donor
+        while self._parents.get(root, root) != root:
+            root = self._parents[root]
+        while donor != root:  # path compression
+            self._parents[donor], donor = root, self._parents[donor]
+        return root
+
+    def _union(self, donor: int, into: int):
+        self._parents[self._find(donor)] = self._find(into)
+        if donor in self._identified:
+            self._identified.add(into)
+        self._dirty = True
@@ -0,0 +1,186 @@
+"""
+A table of one school's donors, for the metrics that count donors rather than gifts.
+
+Counting donors from the gifts means filtering every gift and then dropping the duplicate donors,
+so recurring and repeat givers are scanned again and again. Instead each donor is one `Donor` in a
+`DonorTable`, folding together what the metrics ask of their gifts: their name (from their first
+named gift), every status they've given under, whether any gift was their first, whether they've
+only given anonymously, the class years they gave as a student or alumnus, and how many gifts
+for how much. The table is kept up to date a (normalized) gift at a time or a frame at a time,
+merges with another, and round trips through JSON (to be kept between runs), and the donor counts
+and names are then answered in time proportional to the donors, however many gifts they've made.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+STUDENT_OR_ALUMNI = ('Current Student', 'Alumni')
+
+
+def parse_statuses(status) -> Tuple[str, ...]:
+    """The statuses in a (comma separated) status cell, in order."""
+    if not isinstance(status, str):
+        return ()
+    return tuple(s.strip() for s in status.split(',') if s.strip())
+
+
+def _class_years(statuses: Tuple[str, ...], year) -> Set[int]:
+    return {int(year)} if not pd.isna(year) and any(s in statuses for s in STUDENT_OR_ALUMNI) else set()
+
+
+@dataclass
+class Donor:
+    """Everything the donor metrics need to know about one donor's gifts."""
+    first_name: str
+    last_name: str
+    name_position: int  # the gift the name is from: the first named one, or the first one while all are anonymous
+    anonymous: bool  # every gift so far was anonymous
+    first_time: bool = False
+    statuses: Set[str] = field(default_factory=set)
+    class_years: Set[int] = field(default_factory=set)  # graduation years given as a Current Student or Alumni
+    gifts: int = 0
+    total: float = 0.0  # effective: recurring gifts count a year's worth
+
+    @property
+    def name(self) -> str:
+        return f"{self.first_name} {self.last_name}".strip()
+
+    def merge(self, other: "Donor") -> "Donor":
+        if (other.anonymous, other.name_position) < (self.anonymous, self.name_position):
+            self.first_name, self.last_name, self.name_position = other.first_name, other.last_name, other.name_position
+        self.anonymous = self.anonymous and other.anonymous
+        self.first_time = self.first_time or other.first_time
+        self.statuses |= other.statuses
+        self.class_years |= other.class_years
+        self.gifts += other.gifts
+        self.total += other.total
+        return self
+
+
+class DonorTable:
+    """One school's donors, by donor id."""
+
+    def __init__(self):
+        self.donors: Dict[int, Donor] = {}
+
+    def __len__(self) -> int:
+        return len(self.donors)
+
+    # =================== Public Interface ===================
+    def add(self, row: Mapping[str, Any], donor: int, position: int):
+        """Add one normalized gift (as `EmailParser.normalize` gives it), given its donor and position."""
+        amount = float(row.get('total amount') or 0)
+        if str(row.get('recurring payment', '')).lower() == 'true':
+            amount *= 12  # recurring gifts are monthly, so count a year's worth
+        statuses = parse_statuses(row.get('status'))
+        year = str(row.get('graduation year', '')).strip()
+        self._merge(donor, Donor(
+            first_name=str(row.get('first name', '')), last_name=str(row.get('last name', '')),
+            name_position=position, anonymous=str(row.get('anonymous donation', '')).lower() == 'true',
+            first_time=str(row.get('first time giver', '')).lower() == 'true', statuses=set(statuses),
+            class_years=_class_years(statuses, int(year) if year.isdigit() else None), gifts=1, total=amount))
+
+    def update(self, df: pd.DataFrame, amounts: pd.Series, donor_ids: pd.Series, positions: np.ndarray):
+        """Add a (typed) frame of gifts, with their effective amounts, donor ids and positions in the entries."""
+        gifts = pd.DataFrame({
+            "donor": donor_ids.to_numpy(dtype='int64'),
+            "position": np.asarray(positions, dtype='int64'),
+            "amount": np.asarray(amounts, dtype='float64'),
+            "first_time": df['first time giver'].to_numpy(dtype=bool),
+            "anonymous": df['anonymous donation'].to_numpy(dtype=bool),
+            "status": df['status'].astype(object).fillna('').to_numpy(),
+            "year": df['graduation year'].to_numpy(dtype=object, na_value=None),
+            "first": df['first name'].astype(object).fillna('').to_numpy(),
+            "last": df['last name'].astype(object).fillna('').to_numpy(),
+        })
+        if gifts.empty:
+            return
+
+        # each donor's name is from their first named gift, or their first gift if none are named
+        firsts = gifts.sort_values(["anonymous", "position"], kind="stable").drop_duplicates("donor")
+        summary = gifts.groupby("donor", sort=False).agg(
+            gifts=("amount", "size"), total=("amount", "sum"), first_time=("first_time", "any"),
+            anonymous=("anonymous", "all"))
+
+        # parse each distinct status cell once, and fold in each donor's distinct statuses and class years
+        parsed = {cell: parse_statuses(cell) for cell in pd.unique(gifts["status"])}
+        statuses: Dict[int, Set[str]] = {}
+        for donor, cell in gifts[["donor", "status"]].drop_duplicates().itertuples(index=False):
+            donor = int(donor)
+            statuses.setdefault(donor, set()).update(parsed[cell])
+        class_years: Dict[int, Set[int]] = {}
+        for donor, cell, year in gifts[["donor", "status", "year"]].dropna().drop_duplicates().itertuples(index=False):
+            donor = int(donor)
+            class_years.setdefault(donor, set()).update(_class_years(parsed[cell], year))
+
+        summary = summary.reindex(firsts["donor"])
+        for donor, position, first, last, count, total, first_time, anonymous in zip(
+                firsts["donor"].tolist(), firsts["position"].tolist(), firsts["first"], firsts["last"],
+                summary["gifts"].tolist(), summary["total"].tolist(), summary["first_time"].tolist(),
+                summary["anonymous"].tolist()):
+            self._merge(donor, Donor(
+                first_name=first, last_name=last, name_position=position, anonymous=anonymous, first_time=first_time,
+                statuses=statuses.get(donor, set()), class_years=class_years.get(donor, set()), gifts=count,
+                total=total))
+
+    def merge(self, other: "DonorTable") -> "DonorTable":
+        for donor, record in other.donors.items():
+            self._merge(donor, Donor(**{**record.__dict__, "statuses": set(record.statuses),
+                                        "class_years": set(record.class_years)}))
+        return self
+
+    def remap(self, resolve: Callable[[int], int]) -> "DonorTable":
+        """Rename the donors by `resolve` (e.g. `DonorIndex.resolve`), folding together any found to be the same donor."""
+        donors, self.donors = self.donors, {}
+        for donor, record in donors.items():
+            self._merge(resolve(donor), record)
+        return self
+
+    def ids(self) -> List[int]:
+        return list(self.donors)
+
+    def first_time_ids(self) -> List[int]:
+        return [donor for donor, record in self.donors.items() if record.first_time]
+
+    def status_ids(self, status: str) -> List[int]:
+        return [donor for donor, record in self.donors.items() if status in record.statuses]
+
+    def class_year_ids(self, year: int) -> List[int]:
+        """The donors who gave as a Current Student or Alumni of the class."""
+        return [donor for donor, record in self.donors.items() if year in record.class_years]
+
+    def names(self) -> str:
+        """The named (not only anonymous) donors, in the order of their first named gifts."""
+        named = sorted((record.name_position, record.name) for record in self.donors.values() if not record.anonymous)
+        return ", ".join(name for _, name in named)
+
+    def to_json(self) -> Dict[str, Any]:
+        """The table as plain JSON values, for `from_json` to restore."""
+        return {"donors": [[donor, {**record.__dict__, "statuses": sorted(record.statuses),
+                                    "class_years": sorted(record.class_years)}]
+                           for donor, record in self.donors.items()]}
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> "DonorTable":
+        table = cls()
+        for donor, record in data["donors"]:
+            table.donors[donor] = Donor(**{**record, "statuses": set(record["statuses"]),
+                                           "class_years": set(record["class_years"])})
+        return table
+
+    # =================== Internal Helpers ===================
+    def _merge(self, donor: int, record: Donor):
+        if donor in self.donors:
+            self.donors[donor].merge(record)
+        else:
+            self.donors[donor] = record
+
+
+def donor_table(df: pd.DataFrame, amounts: pd.Series, donor_ids: pd.Series, positions: np.ndarray) -> DonorTable:
+    """The donor table of a (typed) frame of gifts, with their effective amounts."""
+    table = DonorTable()
+    table.update(df, amounts, donor_ids, positions)
+    return table
@@ -0,0 +1,201 @@
+"""
+Local archive of every LGL email we've fetched, and what the parser made of each one.
+
+Messages are stored by the SHA-256 of their bytes, so one fetched twice is only kept once, zlib
+compressed and appended one after another to segment files. Segments are read through mmap, so
+reprocessing a season is a sequential read of a few local files rather than a trip back to the
+mail server. A small sqlite index finds messages by IMAP UID, Message-ID or received date, and
+caches each message's parse result against the parser version that produced it, so reprocessing
+only reparses messages when the parser has changed.
+
+Most messages are fetched as just their headers and HTML, so what's archived for them is a message
+rebuilt from those, not the original as sent. Those are marked `derived` in the index (messages
+archived before the mark existed are NULL, unknown), so nobody mistakes them for the originals.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from .Quarantine import QuarantineStore
+
+INDEX_FILE = "index.sqlite"
+SEGMENT_SIZE = int(os.getenv("ARCHIVE_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+MAGIC = b"LGLA"
+# each record: magic, the blob's digest, its compressed and raw lengths; then the compressed blob
+RECORD_HEADER = struct.Struct(">4s32sII")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY, segment INTEGER NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    digest TEXT PRIMARY KEY REFERENCES blobs (digest), uid INTEGER, message_id TEXT, received TEXT,
+    derived INTEGER
+);
+CREATE INDEX IF NOT EXISTS messages_uid ON messages (uid);
+CREATE INDEX IF NOT EXISTS messages_message_id ON messages (message_id);
+CREATE INDEX IF NOT EXISTS messages_received ON messages (received);
+CREATE TABLE IF NOT EXISTS parses (
+    digest TEXT NOT NULL, parser_version TEXT NOT NULL, result TEXT NOT NULL,
+    PRIMARY KEY (digest, parser_version)
+);
+"""
+
+
+@dataclass(frozen=True)
+class ArchivedEmail:
+    """Where an archived email came from; its bytes are found by digest."""
+    digest: str
+    uid: Optional[int]
+    message_id: str
+    received: Optional[str]  # ISO 8601, in UTC
+    derived: Optional[bool] = False  # rebuilt from the fetched headers and HTML, not the original message
+
+
+def _timestamp(when: Optional[datetime]) -> Optional[str]:
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.astimezone()  # IMAPClient hands back naive local times
+    return when.astimezone(timezone.utc).isoformat()
+
+
+class EmailArchive:
+    """Content-addressed, compressed store of LGL emails (as sent, or rebuilt), with a parse cache."""
+
+    def __init__(self, path: str, segment_size: int = SEGMENT_SIZE):
+        self.path = path
+        self.segment_size = segment_size
+        self._db: Optional[sqlite3.Connection] = None
+        self._maps: Dict[int, mmap.mmap] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # =================== Public Interface ===================
+    def put(self, raw_msg: bytes, uid: Optional[int] = None, received: Optional[datetime] = None,
+            derived: bool = False) -> ArchivedEmail:
+        """
+        Archive an email (storing its bytes only if they're new), and index it by UID, Message-ID and
+        date. `derived` marks a message rebuilt from parts of the original, rather than the original.
+        """
+        digest = hashlib.sha256(raw_msg).hexdigest()
+        db = self._connect()
+        with db:
+            if not db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone():
+                segment, offset, length = self._append(digest, raw_msg)
+                db.execute("INSERT INTO blobs VALUES (?, ?, ?, ?)", (digest, segment, offset, length))
+            db.execute(
+                "INSERT INTO messages VALUES (?, ?, ?, ?, ?) ON CONFLICT (digest) DO UPDATE SET "
+                "uid = COALESCE(excluded.uid, uid), received = COALESCE(excluded.received, received), "
+                "derived = COALESCE(derived, excluded.derived)",
+                (digest, uid, QuarantineStore.message_id(raw_msg), _timestamp(received), int(derived)))
+        return self._message("WHERE messages.digest = ?", (digest,))[0]
+
+    def get(self, digest: str) -> bytes:
+        """The raw bytes of an archived email."""
+        row = self._connect().execute("SELECT segment, offset, length FROM blobs WHERE digest = ?",
+                                      (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        return self._read(*row, digest=digest)
+
+    def by_uid(self, uid: int) -> Optional[ArchivedEmail]:
+        found = self._message("WHERE uid = ?", (int(uid),))
+        return found[0] if found else None
+
+    def by_message_id(self, message_id: str) -> Optional[ArchivedEmail]:
+        found = self._message("WHERE message_id = ?", (message_id,))
+        return found[0] if found else None
+
+    def scan(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[ArchivedEmail]:
+        """Archived emails received in [start, end), in storage order so reading them is one pass over each segment."""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("received >= ?")
+            params.append(_timestamp(start))
+        if end is not None:
+            clauses.append("received < ?")
+            params.append(_timestamp(end))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return iter(self._message(where, tuple(params), order="ORDER BY segment, offset"))
+
+    def cached_parse(self, digest: str, parser_version: str) -> Optional[dict]:
+        """What the given parser version made of an email, if it has already parsed it."""
+        row = self._connect().execute("SELECT result FROM parses WHERE digest = ? AND parser_version = ?",
+                                      (digest, parser_version)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def store_parse(self, digest: str, parser_version: str, result: dict):
+        db = self._connect()
+        with db:
+            db.execute("INSERT OR REPLACE INTO parses VALUES (?, ?, ?)", (digest, parser_version, json.dumps(result)))
+
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # =================== Internal Helpers ===================
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.path, INDEX_FILE))
+            self._db.executescript(SCHEMA)
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(messages)")]
+            if "derived" not in columns:  # an index from before messages were marked
+                self._db.execute("ALTER TABLE messages ADD COLUMN derived INTEGER")
+        return self._db
+
+    def _message(self, where: str, params: tuple, order: str = "ORDER BY received, uid") -> List[ArchivedEmail]:
+        rows = self._connect().execute(
+            "SELECT messages.digest, uid, message_id, received, derived FROM messages "
+            f"JOIN blobs ON blobs.digest = messages.digest {where} {order}", params).fetchall()
+        return [ArchivedEmail(*row[:4], derived=None if row[4] is None else bool(row[4])) for row in rows]
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:06d}.seg")
+
+    def _append(self, digest: str, raw_msg: bytes):
+        """Append a compressed blob to the current segment (starting a new one once it's full)."""
+        compressed = zlib.compress(raw_msg)
+        record = RECORD_HEADER.pack(MAGIC, bytes.fromhex(digest), len(compressed), len(raw_msg)) + compressed
+        segment = self._connect().execute("SELECT MAX(segment) FROM blobs").fetchone()[0] or 1
+        path = self._segment_path(segment)
+        if os.path.exists(path) and os.path.getsize(path) and os.path.getsize(path) + len(record) > self.segment_size:
+            segment += 1
+            path = self._segment_path(segment)
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write(record)
+        return segment, offset, len(record)
+
+    def _read(self, segment: int, offset: int, length: int, digest: str) -> bytes:
+        mapped = self._maps.get(segment)
+        if mapped is None or len(mapped) < offset + length:  # not mapped yet, or appended to since
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment), "rb") as f:
+                mapped = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, stored_digest, compressed_length, raw_length = RECORD_HEADER.unpack_from(mapped, offset)
+        if magic != MAGIC or stored_digest.hex() != digest:
+            raise ValueError(f"Archive segment {segment} is corrupt at offset {offset}")
+        start = offset + RECORD_HEADER.size
+        raw_msg = zlib.decompress(mapped[start:start + compressed_length])
+        if len(raw_msg) != raw_length:
+            raise ValueError(f"Archived email {digest} is truncated")
+        return raw_msg
@@ -1,10 +1,13 @@
-import random
+import hashlib
 from typing import Dict, Set
 
 COMMUNITY_MEMBER = 'Community Member'
 GRANDPARENT_OF_ALUMNI = 'Grandparent of Alumni'
 PARENT_OF_ALUMNI = 'Parent of Alumni'
 
+# bump whenever parsing or normalizing changes what a row looks like, so archived emails get reparsed
+PARSER_VERSION = "3"
+
 
 def determine_source(email_from: str, form_title: str) -> str:
     """
@@ -93,10 +96,15 @@ class EmailParser:
         first_name = parsed_email.get("Name - First Name", "").strip()
         last_name = parsed_email.get("Name - Last Name", "").strip()
 
+        # Email
+        donor_email = parsed_email.get("Email", parsed_email.get("Email Address", "")).strip()
+
         # Phone
         phone = parsed_email.get("Phone", "").strip()
         if not phone:
-            phone = self.generate_fallback_phone()
+            identity = (first_name, last_name, donor_email)
+            # with nothing to identify the donor, at least keep the same gift's number stable
+            phone = self.generate_fallback_phone(*(identity if any(identity) else sorted(parsed_email.items())))
 
         # Total amount
         raw_amount = parsed_email.get("Total Amount", parsed_email.get("Gift amount", "0"))
@@ -146,6 +154,7 @@ class EmailParser:
             "total amount": total_amount,
             "first name": first_name,
             "last name": last_name,
+            "email": donor_email,
             "anonymous donation": anonymous_donation,
             "first time giver": first_time_giver,
             "graduation year": grad_year,
@@ -158,9 +167,10 @@ class EmailParser:
         return normalized
 
     @staticmethod
-    def generate_fallback_phone() -> str:
+    def generate_fallback_phone(*identity) -> str:
         """
-        Generate a 10-digit fallback phone number if none was provided.
-        Ensures the first digit is non-zero.
+        Generate a 10-digit fallback phone number if none was provided, from whatever identifies the donor
+        (so the same donor always gets the same number). Ensures the first digit is non-zero.
         """
-        return str(random.randint(10 ** 9, 10 ** 10 - 1))
+        key = "|".join(str(part).strip().lower() for part in identity)
+        return str(10 ** 9 + int(hashlib.sha256(key.encode()).hexdigest(), 16) % (9 * 10 ** 9))
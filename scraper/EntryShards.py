@@ -0,0 +1,281 @@
+"""
+A campaign's entries, spread over numbered shard worksheets.
+
+One worksheet has a cell limit, and reading it gets slower the more it holds. Instead the entries
+are appended to the open shard (`entries-2025`, then `entries-2025-2`, ...) until it holds
+`ENTRIES_SHARD_ROWS` entries or has been open `ENTRIES_SHARD_DAYS` days, when it's sealed and the
+next one opened. A small manifest worksheet (`entries-2025-shards`) lists every shard, when it was
+opened and sealed, and how many entries a sealed one holds.
+
+Sealed shards never change, so once read their columns are cached on disk for good, and only the
+open shard (and any not cached yet, concurrently) has to be read again; reading a campaign takes
+about as long as reading one shard, however many it has. A campaign written before sharding (with
+no manifest) is read as its one worksheet, and becomes the first shard on its next write.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, List, Mapping, Optional, Sequence
+
+import gspread
+
+from .SheetRanges import read_named_columns
+
+SHARD_ROWS = int(os.getenv("ENTRIES_SHARD_ROWS", "5000"))  # entries per shard
+SHARD_DAYS = float(os.getenv("ENTRIES_SHARD_DAYS", "0"))  # days a shard stays open (0 for no limit)
+SHARD_CACHE_DIR = os.getenv("SHARD_CACHE_DIR", "shard_cache")
+SHARD_READERS = int(os.getenv("SHARD_READERS", "4"))  # shards read at once
+MANIFEST_HEADER = ["shard", "opened at", "sealed at", "rows"]
+
+
+def shard_title(base: str, number: int) -> str:
+    """The title of a campaign's numbered shard worksheet; the first keeps the campaign's own title."""
+    return base if number == 1 else f"{base}-{number}"
+
+
+def manifest_title(base: str) -> str:
+    return f"{base}-shards"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _last_row(response) -> Optional[int]:
+    """The last row an append wrote to, from the API's response (e.g. 'entries'!A57:M57)."""
+    try:
+        updated = response["updates"]["updatedRange"]
+    except (KeyError, TypeError):
+        return None
+    digits = "".join(c for c in updated.rsplit(":", 1)[-1] if c.isdigit())
+    return int(digits) if digits else None
+
+
+def concat_columns(parts: Sequence[List[List[str]]]) -> List[List[str]]:
+    """Stack column-major reads (each column headed by its name) of several shards into one."""
+    names: List[str] = []
+    for columns in parts:
+        names += [column[0] for column in columns if column and column[0] not in names]
+    combined = {name: [name] for name in names}
+    for columns in parts:
+        by_name = {column[0]: column[1:] for column in columns if column}
+        height = max((len(values) for values in by_name.values()), default=0)
+        for name in names:
+            values = by_name.get(name, [])
+            combined[name] += list(values) + [""] * (height - len(values))  # the API trims trailing blanks
+    return list(combined.values())
+
+
+@dataclass
+class Shard:
+    """One shard worksheet as the manifest lists it."""
+    title: str
+    opened_at: str
+    sealed_at: str = ""
+    rows: int = 0  # entries (not counting the header), once sealed
+
+    @property
+    def sealed(self) -> bool:
+        return bool(self.sealed_at)
+
+    @classmethod
+    def parse(cls, row: Sequence[str]) -> "Shard":
+        title, opened_at, sealed_at, rows = list(row[:4]) + [""] * (4 - len(row[:4]))
+        return cls(title, opened_at, sealed_at, int(rows or 0))
+
+    def row(self) -> List[str]:
+        return [self.title, self.opened_at, self.sealed_at, str(self.rows) if self.sealed else ""]
+
+
+class EntryShards:
+    """
+    The shards of one campaign's entries in a spreadsheet, to append to and read from.
+
+    The manifest is read once, on first use, so keep one of these for a run's appends rather than
+    making one per entry.
+    """
+
+    def __init__(self, spreadsheet, base: str, shard_rows: int = SHARD_ROWS, shard_days: float = SHARD_DAYS,
+                 cache_dir: Optional[str] = None, readers: int = SHARD_READERS):
+        self.spreadsheet = spreadsheet
+        self.base = base
+        self.shard_rows = shard_rows
+        self.shard_days = shard_days
+        self.cache_dir = Path(cache_dir or SHARD_CACHE_DIR)
+        self.readers = readers
+        self.api_calls = 0
+        self._lock = threading.Lock()
+        self._manifest: Optional[List[Shard]] = None
+        self._manifest_ws = None
+        self._open_ws = None
+        self._headers: List[str] = []
+
+    # =================== Public Interface ===================
+    def shards(self) -> List[Shard]:
+        """Every shard, oldest first; a campaign without a manifest is its one worksheet."""
+        if self._manifest is None:
+            try:
+                self._manifest_ws = self._call(self.spreadsheet.worksheet, manifest_title(self.base))
+                rows = self._call(self._manifest_ws.get_values)[1:]
+            except gspread.WorksheetNotFound:
+                rows = []
+            self._manifest = [Shard.parse(row) for row in rows if row and row[0]]
+        return self._manifest or [Shard(self.base, "")]
+
+    def append(self, row: Mapping[str, str]):
+        """Append a normalized entry to the open shard, rolling over to a new one when it's full or too old."""
+        self.shards()
+        if not self._manifest:
+            self._start_manifest()
+        shard = self._manifest[-1]
+        if self.shard_days and shard.opened_at and (
+                datetime.now(timezone.utc) - datetime.fromisoformat(shard.opened_at) >= timedelta(days=self.shard_days)):
+            ws = self._open_worksheet(shard)
+            self._seal(len(self._call(ws.col_values, 1)) - 1)
+            shard = self._manifest[-1]
+        ws = self._open_worksheet(shard)
+
+        # Ensure the headers exist, and cover every field of the row
+        if not self._headers:
+            self._headers = list(row.keys())
+            self._call(ws.append_row, self._headers)  # add headers if the shard is empty
+        elif any(key not in self._headers for key in row):
+            self._headers += [key for key in row if key not in self._headers]
+            self._call(ws.update, values=[self._headers], range_name="A1")
+
+        # Append the entry, lined up with the headers
+        last_row = _last_row(self._call(ws.append_row, [row.get(header, "") for header in self._headers]))
+        if last_row is not None and last_row - 1 >= self.shard_rows:
+            self._seal(last_row - 1)
+
+    def rewrite(self, rows: Sequence[Mapping[str, str]]):
+        """Replace every entry with the given ones, spread over as many shards as they fill."""
+        headers: List[str] = []
+        for row in rows:
+            headers += [key for key in row if key not in headers]
+        old = {shard.title for shard in self.shards()}
+        chunks = [rows[start:start + self.shard_rows] for start in range(0, len(rows), self.shard_rows)] or [[]]
+        now = _now()
+        shards = []
+        for number, chunk in enumerate(chunks, 1):
+            title = shard_title(self.base, number)
+            ws = self._worksheet(title)
+            self._call(ws.clear)
+            self._call(ws.update, values=[headers] + [[row.get(header, "") for header in headers] for row in chunk],
+                       range_name="A1")
+            sealed = number < len(chunks)
+            shards.append(Shard(title, now, now if sealed else "", len(chunk) if sealed else 0))
+            old.discard(title)
+        for title in old:
+            self._call(self.spreadsheet.worksheet(title).clear)  # shards the entries no longer fill
+        self._manifest = shards
+        self._write_manifest()
+        self._open_ws, self._headers = None, []
+
+    def read_columns(self, names: Iterable[str]) -> List[List[str]]:
+        """The named columns of every shard, stacked in order, reading the shards not cached concurrently."""
+        names = list(names)
+        shards = self.shards()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.readers, len(shards)))) as pool:
+            parts = list(pool.map(lambda shard: self._read_shard(shard, names), shards))
+        return concat_columns(parts)
+
+    def read_chunks(self, names: Iterable[str], chunk_rows: int) -> Iterator[List[List[str]]]:
+        """The named columns of every shard in turn, `chunk_rows` entries at a time, for streaming."""
+        names = list(names)
+        for shard in self.shards():
+            path = self._cache_path(shard, names)
+            if path is not None and path.exists():
+                columns = json.loads(path.read_text(encoding="utf-8"))  # at most a shard's worth
+                height = max((len(column) - 1 for column in columns), default=0)
+                for start in range(1, height + 1, chunk_rows):
+                    yield [[column[0]] + column[start:start + chunk_rows] for column in columns]
+                continue
+            ws = self._call(self.spreadsheet.worksheet, shard.title)
+            header = self._call(ws.row_values, 1)
+            first_row = 2  # after the header
+            while True:
+                self._count(1)
+                columns = read_named_columns(ws, names, header, first_row, first_row + chunk_rows - 1)
+                height = max((len(column) - 1 for column in columns), default=0)
+                if height:
+                    yield columns
+                if height < chunk_rows:
+                    break
+                first_row += chunk_rows
+
+    # =================== Internal Helpers ===================
+    def _call(self, method, *args, **kwargs):
+        self._count(1)
+        return method(*args, **kwargs)
+
+    def _count(self, calls: int):
+        with self._lock:  # shards are read from several threads
+            self.api_calls += calls
+
+    def _read_shard(self, shard: Shard, names: List[str]) -> List[List[str]]:
+        path = self._cache_path(shard, names)
+        if path is not None and path.exists():
+            return json.loads(path.read_text(encoding="utf-8"))
+        ws = self._call(self.spreadsheet.worksheet, shard.title)
+        self._count(2)  # the header, then the columns
+        columns = read_named_columns(ws, names)
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(columns), encoding="utf-8")
+            os.replace(tmp_path, path)
+        return columns
+
+    def _cache_path(self, shard: Shard, names: List[str]) -> Optional[Path]:
+        """Where a sealed shard's columns are cached; a rewrite reopens its shards, so they're cached afresh."""
+        if not shard.sealed:
+            return None
+        key = json.dumps([self.spreadsheet.id, shard.title, shard.opened_at, shard.sealed_at, shard.rows, names])
+        return self.cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.json"
+
+    def _worksheet(self, title: str):
+        try:
+            return self._call(self.spreadsheet.worksheet, title)
+        except gspread.WorksheetNotFound:
+            return self._call(self.spreadsheet.add_worksheet, title=title, rows=str(self.shard_rows + 1), cols="26")
+
+    def _open_worksheet(self, shard: Shard):
+        if self._open_ws is None or self._open_ws.title != shard.title:
+            ws = self._worksheet(shard.title)
+            # only once its headers are known, or a failed read would have them appended again
+            self._headers = list(self._call(ws.row_values, 1))
+            self._open_ws = ws
+        return self._open_ws
+
+    def _start_manifest(self):
+        """Start the manifest, with any worksheet written before sharding as the first shard."""
+        self._manifest = [Shard(self.base, _now())]
+        self._write_manifest()
+
+    def _write_manifest(self):
+        if self._manifest_ws is None:
+            self._manifest_ws = self._worksheet(manifest_title(self.base))
+        self._call(self._manifest_ws.clear)
+        self._call(self._manifest_ws.update, values=[MANIFEST_HEADER] + [shard.row() for shard in self._manifest],
+                   range_name="A1")
+
+    def _seal(self, rows: int):
+        """Seal the open shard at the given number of entries, and open the next (with the same headers)."""
+        sealed = self._manifest[-1]
+        sealed.sealed_at, sealed.rows = _now(), rows
+        headers = self._headers
+        opened = Shard(shard_title(self.base, len(self._manifest) + 1), _now())
+        self._manifest.append(opened)
+        self._call(self._manifest_ws.update, values=[sealed.row(), opened.row()],
+                   range_name=f"A{len(self._manifest)}")
+        ws = self._open_worksheet(opened)
+        if headers and not self._headers:
+            self._headers = list(headers)
+            self._call(ws.append_row, self._headers)
@@ -0,0 +1,102 @@
+"""
+Declarative scoring rules for the Google Form sources.
+
+Each form is described by a `FormRule`: which sheet it lives in, which column says what school a
+submission is for (and the patterns that identify each school), what makes a submission qualify,
+and which results columns its scores go to. `score_batch` compiles the rules into vectorized
+column operations and evaluates every source in one pass, so new competition categories only
+need a new rule, not a new loop.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+# a "name" is any run of characters between commas/newlines that isn't just whitespace
+NAME_PATTERN = r"[^,\r\n]*[^\s,][^,\r\n]*"
+
+
+@dataclass
+class SubmittedData:
+    """Tracks score data for both schools."""
+    hokies: int = 0
+    hoos: int = 0
+
+
+# ---------- Qualification Predicates ---------- #
+
+@dataclass(frozen=True)
+class MinNames:
+    """Qualifies submissions listing at least `minimum` names (split on commas and newlines) in a column."""
+    column: int
+    minimum: int
+
+    def evaluate(self, frame: pd.DataFrame) -> pd.Series:
+        return frame[self.column].str.count(NAME_PATTERN) >= self.minimum
+
+
+@dataclass(frozen=True)
+class Equals:
+    """Qualifies submissions where a column is exactly `value`."""
+    column: int
+    value: str
+
+    def evaluate(self, frame: pd.DataFrame) -> pd.Series:
+        return frame[self.column] == self.value
+
+
+# ---------- Rules ---------- #
+
+@dataclass(frozen=True)
+class FormRule:
+    """How the submissions of one Google Form are scored."""
+    name: str
+    description: str
+    spreadsheet_key: str
+    school_column: int
+    hoos_pattern: str
+    hokies_pattern: str
+    qualifier: object  # MinNames, Equals, or anything with an `evaluate(frame)` and a `column`
+    hoos_csv_column: str
+    hokies_csv_column: str
+    enabled: bool = True
+
+    @property
+    def columns(self) -> Tuple[int, ...]:
+        """The (0-based) columns this rule reads."""
+        return tuple(sorted({self.school_column, self.qualifier.column}))
+
+    @property
+    def width(self) -> int:
+        """How many columns a row needs for this rule to be evaluated."""
+        return max(self.school_column, self.qualifier.column) + 1
+
+
+def _frame(rule: FormRule, rows: Sequence[Sequence[str]]) -> pd.DataFrame:
+    """Build a frame from raw sheet rows, padding short rows with blanks."""
+    frame = pd.DataFrame(list(rows))
+    return frame.reindex(columns=range(max(rule.width, frame.shape[1]))).fillna("").astype(str)
+
+
+def score_batch(batch: List[Tuple[FormRule, Sequence[Sequence[str]]]]) -> Dict[str, SubmittedData]:
+    """Score the rows of several forms at once, returning the counts for each rule by name."""
+    scored = []
+    for rule, rows in batch:
+        frame = _frame(rule, rows)
+        school = frame[rule.school_column]
+        qualified = rule.qualifier.evaluate(frame)
+        scored.append(pd.DataFrame({
+            "rule": rule.name,
+            "hoos": school.str.contains(rule.hoos_pattern, regex=False) & qualified,
+            "hokies": school.str.contains(rule.hokies_pattern, regex=False) & qualified,
+        }))
+    if not scored:
+        return {}
+
+    totals = pd.concat(scored, ignore_index=True).groupby("rule")[["hoos", "hokies"]].sum()
+    return {
+        rule.name: SubmittedData(hokies=int(totals.at[rule.name, "hokies"]), hoos=int(totals.at[rule.name, "hoos"]))
+        if rule.name in totals.index else SubmittedData()
+        for rule, _ in batch
+    }
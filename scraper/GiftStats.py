@@ -0,0 +1,313 @@
+"""
+Bounded memory statistics of gift sizes: the largest gifts, the top donors by total, and quantiles.
+
+Each is kept by a streaming structure that can be updated a (normalized) gift at a time or a column
+at a time, and merged with another of its kind, so they fit in the mergeable aggregates alongside
+the counts and sums:
+
+- the largest gifts in a min-heap of the K largest seen
+- the top donors in a weighted Space-Saving summary of a fixed number of donors: exact while there
+  are no more donors than it has room for, and otherwise never under-counting a donor's total (by
+  more than the smallest total it holds)
+- quantiles in a log-bucketed sketch (as in DDSketch), whose estimates are within a relative
+  accuracy of the true quantile, in a bucket per power of (1 + accuracy) between the smallest and
+  largest gift
+
+Anonymous gifts count towards the sizes and the largest gifts (without the donor's name), but not
+towards the top donors.
+"""
+
+import heapq
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+TOP_K = int(os.getenv("TOP_K", "5"))
+TOP_DONOR_CAPACITY = int(os.getenv("TOP_DONOR_CAPACITY", "5000"))  # donors tracked, to find the top K of
+QUANTILE_ACCURACY = 0.001  # within 10 cents of a $100 gift
+MAX_QUANTILE_BUCKETS = 4096
+# the quantiles reported, as metric names
+GIFT_QUANTILES = {"p25_gift": 0.25, "median_gift": 0.5, "p75_gift": 0.75, "p90_gift": 0.9}
+ANONYMOUS = "Anonymous"
+
+
+def _money(amount: float) -> str:
+    return f"${amount:.2f}"
+
+
+class TopGifts:
+    """The K largest gifts, each with who gave it and its position in the entries (earlier wins ties)."""
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self._heap: List[Tuple[float, int, str]] = []  # (amount, -position, name), smallest first
+
+    def add(self, amount: float, position: int, name: str):
+        item = (amount, -position, name)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+
+    def update(self, amounts, positions, names):
+        # only the chunk's own K largest can make it in, found without sorting the chunk
+        amounts, positions = np.asarray(amounts, dtype='float64'), np.asarray(positions)
+        largest = range(len(amounts))
+        if len(amounts) > self.k:
+            kth = np.partition(amounts, len(amounts) - self.k)[len(amounts) - self.k]
+            above = np.flatnonzero(amounts > kth).tolist()
+            # of the gifts tied with the Kth largest, the earliest make it
+            largest = above + heapq.nsmallest(self.k - len(above), np.flatnonzero(amounts == kth).tolist(),
+                                              key=positions.__getitem__)
+        for i in largest:
+            self.add(float(amounts[i]), int(positions[i]), names[i])
+
+    def merge(self, other: "TopGifts") -> "TopGifts":
+        for amount, negative_position, name in other._heap:
+            self.add(amount, -negative_position, name)
+        return self
+
+    def items(self) -> List[Tuple[str, float]]:
+        return [(name, amount) for amount, _, name in sorted(self._heap, reverse=True)]
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"k": self.k, "heap": [list(item) for item in self._heap]}
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> "TopGifts":
+        top = cls(data["k"])
+        top._heap = [(amount, negative_position, name) for amount, negative_position, name in data["heap"]]
+        heapq.heapify(top._heap)
+        return top
+
+
+class TopDonors:
+    """A weighted Space-Saving summary of donors' totals, keeping at most `capacity` donors."""
+
+    def __init__(self, capacity: int = TOP_DONOR_CAPACITY):
+        self.capacity = capacity
+        self.totals: Dict[int, float] = {}
+        self.names: Dict[int, Tuple[int, str]] = {}  # each donor's name, from the earliest gift seen
+        self._smallest: List[Tuple[float, int]] = []  # (total, donor), some of them out of date
+
+    def add(self, donor: int, amount: float, position: int, name: str):
+        if donor not in self.totals and len(self.totals) >= self.capacity:
+            # make room by taking over the smallest total, which bounds what this donor may have given before
+            smallest = self._pop_smallest()
+            self.totals[donor] = self.totals.pop(smallest)
+            self.names.pop(smallest)
+        self.totals[donor] = self.totals.get(donor, 0.0) + amount
+        heapq.heappush(self._smallest, (self.totals[donor], donor))
+        if len(self._smallest) > 4 * self.capacity:
+            self._rebuild()
+        if donor not in self.names or position < self.names[donor][0]:
+            self.names[donor] = (position, name)
+
+    def update(self, donors, amounts, positions, names):
+        # total each donor's gifts first, so a donor giving many times is one update
+        gifts = pd.DataFrame({"donor": donors, "amount": amounts, "position": positions, "name": names})
+        if gifts.empty:
+            return
+        by_donor = gifts.groupby("donor", sort=False)
+        totals = by_donor["amount"].sum().to_dict()
+        firsts = gifts.loc[by_donor["position"].idxmin()]  # each donor's earliest gift, without sorting them all
+        for donor, position, name in zip(firsts["donor"], firsts["position"], firsts["name"]):
+            self.add(int(donor), float(totals[donor]), int(position), name)
+
+    def merge(self, other: "TopDonors") -> "TopDonors":
+        # a donor missing from a full summary may have given up to its smallest total there
+        floor, other_floor = self._floor(), other._floor()
+        for donor in self.totals.keys() | other.totals.keys():
+            self.totals[donor] = self.totals.get(donor, floor) + other.totals.get(donor, other_floor)
+            if donor not in self.names or (donor in other.names and other.names[donor] < self.names[donor]):
+                self.names[donor] = other.names[donor]
+        if len(self.totals) > self.capacity:
+            keep = heapq.nlargest(self.capacity, self.totals, key=self.totals.get)
+            self.totals = {donor: self.totals[donor] for donor in keep}
+            self.names = {donor: self.names[donor] for donor in keep}
+        self._rebuild()
+        return self
+
+    def remap(self, resolve: Callable[[int], int]) -> "TopDonors":
+        """Rename the donors by `resolve`, adding up the totals of any that turn out to be the same donor."""
+        totals: Dict[int, float] = {}
+        names: Dict[int, Tuple[int, str]] = {}
+        for donor, total in self.totals.items():
+            renamed = resolve(donor)
+            totals[renamed] = totals.get(renamed, 0.0) + total
+            if renamed not in names or self.names[donor] < names[renamed]:
+                names[renamed] = self.names[donor]
+        self.totals, self.names = totals, names
+        self._rebuild()
+        return self
+
+    def top(self, k: int = TOP_K) -> List[Tuple[str, float]]:
+        # ties go to whoever gave first
+        ranked = heapq.nsmallest(k, self.totals, key=lambda donor: (-self.totals[donor], self.names[donor][0]))
+        return [(self.names[donor][1], self.totals[donor]) for donor in ranked]
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity,
+                "donors": [[donor, total, *self.names[donor]] for donor, total in self.totals.items()]}
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> "TopDonors":
+        top = cls(data["capacity"])
+        for donor, total, position, name in data["donors"]:
+            top.totals[donor] = total
+            top.names[donor] = (position, name)
+        top._rebuild()
+        return top
+
+    def _floor(self) -> float:
+        return min(self.totals.values()) if len(self.totals) >= self.capacity else 0.0
+
+    def _rebuild(self):
+        self._smallest = [(total, donor) for donor, total in self.totals.items()]
+        heapq.heapify(self._smallest)
+
+    def _pop_smallest(self) -> int:
+        # a donor's total is pushed every time it grows, so skip entries that are out of date
+        while True:
+            total, donor = heapq.heappop(self._smallest)
+            if donor in self.totals and self.totals[donor] == total:
+                return donor
+
+
+class QuantileSketch:
+    """Gift sizes in logarithmic buckets, for quantiles within a relative accuracy."""
+
+    def __init__(self, accuracy: float = QUANTILE_ACCURACY, max_buckets: int = MAX_QUANTILE_BUCKETS):
+        self.accuracy = accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.update([value])
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64')
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        self.count += len(values)
+        indexes, counts = np.unique(np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64),
+                                    return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self._collapse()
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.accuracy != self.accuracy:
+            raise ValueError("Can't merge quantile sketches of different accuracies")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self._collapse()
+        return self
+
+    def quantile(self, q: float) -> float:
+        """The value at quantile q (0 to 1); 0 when nothing has been added."""
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)  # the middle of the bucket, relatively
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"accuracy": self.accuracy, "max_buckets": self.max_buckets,
+                "buckets": [[index, count] for index, count in self.buckets.items()],
+                "zeros": self.zeros, "count": self.count}
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> "QuantileSketch":
+        sketch = cls(data["accuracy"], data["max_buckets"])
+        sketch.buckets = {index: count for index, count in data["buckets"]}
+        sketch.zeros, sketch.count = data["zeros"], data["count"]
+        return sketch
+
+    def _collapse(self):
+        # past the bucket limit, fold the smallest gifts together (the large ones are what's interesting)
+        while len(self.buckets) > self.max_buckets:
+            lowest, second = sorted(self.buckets)[:2]
+            self.buckets[second] += self.buckets.pop(lowest)
+
+
+@dataclass
+class GiftStats:
+    """The largest gifts, top donors and gift size quantiles of one school."""
+    largest: TopGifts = field(default_factory=TopGifts)
+    donors: TopDonors = field(default_factory=TopDonors)
+    sizes: QuantileSketch = field(default_factory=QuantileSketch)
+
+    # =================== Public Interface ===================
+    def add(self, row: Mapping[str, Any], donor: int, position: int):
+        """Add one normalized gift (as `EmailParser.normalize` gives it), given its donor and position."""
+        amount = float(row.get('total amount') or 0)
+        if str(row.get('recurring payment', '')).lower() == 'true':
+            amount *= 12  # recurring gifts are monthly, so count a year's worth
+        anonymous = str(row.get('anonymous donation', '')).lower() == 'true'
+        name = f"{row.get('first name', '')} {row.get('last name', '')}".strip()
+        self.largest.add(amount, position, ANONYMOUS if anonymous else name)
+        self.sizes.add(amount)
+        if not anonymous:
+            self.donors.add(donor, amount, position, name)
+
+    def update(self, amounts: pd.Series, donors: pd.Series, positions: np.ndarray, names: pd.Series,
+               anonymous: pd.Series):
+        """Add a column of gifts at once: their effective amounts, donor ids, positions, names and anonymity."""
+        anonymous = anonymous.to_numpy(dtype=bool)
+        amounts, names = amounts.to_numpy(dtype='float64'), names.to_numpy(dtype=object)
+        self.largest.update(amounts, positions, np.where(anonymous, ANONYMOUS, names))
+        self.sizes.update(amounts)
+        named = ~anonymous
+        self.donors.update(donors.to_numpy()[named], amounts[named], positions[named], names[named])
+
+    def merge(self, other: "GiftStats") -> "GiftStats":
+        self.largest.merge(other.largest)
+        self.donors.merge(other.donors)
+        self.sizes.merge(other.sizes)
+        return self
+
+    def remap(self, resolve: Callable[[int], int]) -> "GiftStats":
+        self.donors.remap(resolve)
+        return self
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = {
+            "largest_gifts": ", ".join(f"{name} {_money(amount)}" for name, amount in self.largest.items()),
+            "top_donors": ", ".join(f"{name} {_money(total)}" for name, total in self.donors.top(self.largest.k)),
+        }
+        metrics.update({name: round(self.sizes.quantile(q), 2) for name, q in GIFT_QUANTILES.items()})
+        return metrics
+
+    def to_json(self) -> Dict[str, Any]:
+        """The statistics as plain JSON values, for `from_json` to restore."""
+        return {"largest": self.largest.to_json(), "donors": self.donors.to_json(), "sizes": self.sizes.to_json()}
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> "GiftStats":
+        return cls(TopGifts.from_json(data["largest"]), TopDonors.from_json(data["donors"]),
+                   QuantileSketch.from_json(data["sizes"]))
+
+
+def gift_stats(df: pd.DataFrame, amounts: pd.Series, donor_ids: pd.Series, positions: np.ndarray,
+               stats: Optional[GiftStats] = None) -> GiftStats:
+    """Add a (typed) frame of one school's gifts, with their effective amounts, to gift statistics."""
+    stats = stats or GiftStats()
+    names = (df['first name'].astype(object).fillna('') + ' ' + df['last name'].astype(object).fillna('')).str.strip()
+    stats.update(amounts, donor_ids, positions, names, df['anonymous donation'])
+    return stats
@@ -0,0 +1,135 @@
+"""
+Lightweight run instrumentation for the scraper pipeline.
+
+Each stage of a run (IMAP search, fetch, parsing, Sheets writes, metric
+computation, CSV writes, ...) is wrapped in a span which records how long it
+took along with item, byte and API call counters. At the end of a run the
+report is appended to a JSON lines file, and a run can optionally be profiled
+with cProfile.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterator, List, Any
+
+RUN_REPORT_PATH = os.getenv("RUN_REPORT", "run_report.jsonl")
+PROFILE_PATH = os.getenv("RUN_PROFILE", "run_profile.prof")
+HOT_FUNCTION_LIMIT = int(os.getenv("RUN_PROFILE_LIMIT", "25"))
+
+# sources can run concurrently (see updateResults), so counters are only touched under this lock
+_lock = threading.RLock()
+
+
+@dataclass
+class StageStats:
+    """Accumulated timing and counters for a single pipeline stage."""
+    stage: str
+    calls: int = 0
+    seconds: float = 0.0
+    items: int = 0
+    bytes: int = 0
+    api_calls: int = 0
+
+    def add(self, items: int = 0, nbytes: int = 0, api_calls: int = 0):
+        """Add to the counters of this stage."""
+        with _lock:
+            self.items += items
+            self.bytes += nbytes
+            self.api_calls += api_calls
+
+
+class RunReport:
+    """Collects stage statistics for one run of a scraper entry point."""
+
+    def __init__(self, run_name: str = "scraper"):
+        self.reset(run_name)
+
+    def reset(self, run_name: str):
+        """Start a fresh report, discarding anything recorded so far."""
+        self.run_name = run_name
+        self.started_at = time.time()
+        self.stages: Dict[str, StageStats] = {}
+
+    def stage(self, name: str) -> StageStats:
+        """Get (or create) the statistics for a stage."""
+        with _lock:
+            if name not in self.stages:
+                self.stages[name] = StageStats(stage=name)
+            return self.stages[name]
+
+    @contextmanager
+    def span(self, name: str, items: int = 0, nbytes: int = 0, api_calls: int = 0) -> Iterator[StageStats]:
+        """Time the wrapped block, attributing it to the given stage."""
+        stats = self.stage(name)
+        stats.add(items, nbytes, api_calls)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            elapsed = time.perf_counter() - start
+            with _lock:
+                stats.calls += 1
+                stats.seconds += elapsed
+
+    def count(self, name: str, items: int = 0, nbytes: int = 0, api_calls: int = 0):
+        """Record counters for a stage without timing anything."""
+        self.stage(name).add(items, nbytes, api_calls)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Build the JSON-serializable records for this run: one per stage, then a summary."""
+        records = [
+            {"type": "stage", "run": self.run_name, **asdict(stats), "seconds": round(stats.seconds, 6)}
+            for stats in self.stages.values()
+        ]
+        records.append({
+            "type": "run",
+            "run": self.run_name,
+            "started_at": self.started_at,
+            "seconds": round(time.time() - self.started_at, 6),
+            "items": sum(s.items for s in self.stages.values()),
+            "bytes": sum(s.bytes for s in self.stages.values()),
+            "api_calls": sum(s.api_calls for s in self.stages.values()),
+        })
+        return records
+
+    def write(self, path: str = RUN_REPORT_PATH):
+        """Append this run's records to a JSON lines file."""
+        with open(path, "a", encoding="utf-8") as f:
+            for record in self.records():
+                f.write(json.dumps(record) + "\n")
+
+
+# the report shared by every module of the current run
+run_report = RunReport()
+
+
+# ===== COMMAND LINE SUPPORT =====
+def add_arguments(parser):
+    """Add the instrumentation options to an entry point's argument parser."""
+    parser.add_argument("--report", metavar="PATH", default=RUN_REPORT_PATH,
+                        help=f"append the JSON lines run report to PATH (default: {RUN_REPORT_PATH})")
+    parser.add_argument("--profile", metavar="PATH", nargs="?", const=PROFILE_PATH, default=None,
+                        help=f"profile the run with cProfile and dump the stats to PATH (default: {PROFILE_PATH})")
+
+
+def run(run_name: str, func, args):
+    """Run an entry point, writing the run report (and profile, if requested) when it finishes."""
+    run_report.reset(run_name)
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        if profiler:
+            return profiler.runcall(func)
+        return func()
+    finally:
+        run_report.write(args.report)
+        print(f"📝 Run report written to {args.report}")
+        if profiler:
+            profiler.dump_stats(args.profile)
+            print(f"🔥 Profile written to {args.profile}, hottest scraper functions:")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats("scraper", HOT_FUNCTION_LIMIT)
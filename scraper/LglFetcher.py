@@ -0,0 +1,147 @@
+"""
+Structure-aware fetching of LGL emails.
+
+Rather than downloading every message in full (plain text alternative, attachments, inline
+images and all) just to pull the HTML table out of it, the fetcher asks the server for each
+message's BODYSTRUCTURE and sender headers first, then fetches only the `text/html` part and
+decodes it itself. Messages are fetched in batches: one command for every structure, and one
+per distinct HTML section number. Where the original message is wanted too (say, to archive it as
+sent), `fetch(uids, whole=True)` fetches every message whole in one command instead.
+"""
+
+import base64
+import quopri
+from dataclasses import dataclass
+from datetime import datetime
+from email.parser import BytesHeaderParser
+from email.policy import default
+from typing import Dict, List, Optional, Sequence
+
+HEADER_FIELDS = "HEADER.FIELDS (FROM SUBJECT DATE MESSAGE-ID)"
+FULL_BODY = "BODY.PEEK[]"  # rather than using RFC822 we're using BODY.PEEK, which leaves the message unread
+
+
+@dataclass(frozen=True)
+class HtmlPart:
+    """Where a message's HTML body is, and how it's encoded."""
+    section: str
+    encoding: str
+    charset: str
+
+
+@dataclass
+class FetchedEmail:
+    """An LGL email as fetched: just its sender and HTML, or the whole message if it had no HTML part."""
+    uid: int
+    sender: str
+    html: Optional[str]
+    raw: bytes  # enough of the message to reparse it later (e.g. from quarantine)
+    received: Optional[datetime] = None  # when the server received it
+    derived: bool = False  # raw is rebuilt from the fetched headers and HTML, not the message as sent
+
+
+def _text(value) -> str:
+    return value.decode(errors="replace") if isinstance(value, bytes) else str(value or "")
+
+
+def _is_attachment(part) -> bool:
+    # the disposition follows the line count of text parts, and the (unused) MD5 of every part
+    index = 9 if _text(part[0]).lower() == "text" else 8
+    disposition = part[index] if len(part) > index else None
+    return bool(disposition) and _text(disposition[0]).lower() == "attachment"
+
+
+def find_html_part(structure, section: str = "") -> Optional[HtmlPart]:
+    """Find the first (non attachment) text/html part in a BODYSTRUCTURE, depth first."""
+    if structure.is_multipart:
+        for number, child in enumerate(structure[0], start=1):
+            found = find_html_part(child, f"{section}.{number}" if section else str(number))
+            if found:
+                return found
+        return None
+    if (_text(structure[0]).lower(), _text(structure[1]).lower()) != ("text", "html") or _is_attachment(structure):
+        return None
+    params = structure[2] or ()
+    charset = next((_text(value) for name, value in zip(params[::2], params[1::2])
+                    if _text(name).lower() == "charset"), "utf-8")
+    return HtmlPart(section=section or "1", encoding=_text(structure[5] or "7bit").lower(), charset=charset)
+
+
+def decode_part(data: bytes, encoding: str, charset: str) -> str:
+    """Undo a part's content transfer encoding and decode it to text."""
+    if encoding == "base64":
+        data = base64.b64decode(data)
+    elif encoding == "quoted-printable":
+        data = quopri.decodestring(data)
+    try:
+        return data.decode(charset, errors="replace")
+    except LookupError:  # an unknown charset
+        return data.decode("utf-8", errors="replace")
+
+
+def rebuild_message(header_block: bytes, html: str) -> bytes:
+    """A minimal single part message holding just the fetched headers and HTML, for reparsing later."""
+    return (header_block.rstrip(b"\r\n") + b"\r\nMIME-Version: 1.0\r\n"
+            + b"Content-Type: text/html; charset=utf-8\r\nContent-Transfer-Encoding: 8bit\r\n\r\n"
+            + html.encode("utf-8"))
+
+
+class LglFetcher:
+    """Fetches the HTML of LGL emails from a selected IMAPClient mailbox."""
+
+    def __init__(self, server):
+        self.server = server
+        self.commands = 0
+        self.bytes = 0
+
+    def fetch(self, uids: Sequence[int], whole: bool = False) -> Dict[int, FetchedEmail]:
+        """Fetch the sender and HTML body of each message (or, if `whole`, all of it), leaving them all unread."""
+        if not uids:
+            return {}
+        if whole:
+            return {uid: FetchedEmail(uid, self._sender(data[b"BODY[]"]), None, data[b"BODY[]"],
+                                      data.get(b"INTERNALDATE"))
+                    for uid, data in self._fetch(list(uids), ["INTERNALDATE", FULL_BODY]).items()}
+        # one round trip for every message's structure, headers and arrival time
+        overview = self._fetch(uids, ["BODYSTRUCTURE", "INTERNALDATE", f"BODY.PEEK[{HEADER_FIELDS}]"])
+
+        headers, received, parts, by_section, whole = {}, {}, {}, {}, []
+        for uid, data in overview.items():
+            received[uid] = data.get(b"INTERNALDATE")
+            headers[uid] = next((value for key, value in data.items() if key.startswith(b"BODY[HEADER")), b"")
+            part = find_html_part(data[b"BODYSTRUCTURE"])
+            if part is None:
+                whole.append(uid)  # no HTML to find; fetch it all, so parsing fails (and quarantines) as before
+            else:
+                parts[uid] = part
+                by_section.setdefault(part.section, []).append(uid)
+
+        fetched = {}
+        for section, section_uids in by_section.items():
+            key = f"BODY[{section}]".encode()
+            for uid, data in self._fetch(section_uids, [f"BODY.PEEK[{section}]"]).items():
+                part = parts[uid]
+                html = decode_part(data[key], part.encoding, part.charset)
+                fetched[uid] = FetchedEmail(uid, self._sender(headers[uid]), html,
+                                            rebuild_message(headers[uid], html), received[uid], derived=True)
+        if whole:
+            for uid, data in self._fetch(whole, [FULL_BODY]).items():
+                fetched[uid] = FetchedEmail(uid, self._sender(headers[uid]), None, data[b"BODY[]"], received[uid])
+        return fetched
+
+    def fetch_raw(self, uids: Sequence[int]) -> Dict[int, bytes]:
+        """Fetch each message whole, as sent (e.g. to quarantine one that failed to parse), leaving them unread."""
+        if not uids:
+            return {}
+        return {uid: data[b"BODY[]"] for uid, data in self._fetch(list(uids), [FULL_BODY]).items()}
+
+    def _fetch(self, uids: List[int], items: List[str]) -> dict:
+        response = self.server.fetch(uids, items)
+        self.commands += 1
+        self.bytes += sum(len(value) for data in response.values() for value in data.values()
+                          if isinstance(value, bytes))
+        return response
+
+    @staticmethod
+    def _sender(header_block: bytes) -> str:
+        return BytesHeaderParser(policy=default).parsebytes(header_block).get("From", "")
@@ -0,0 +1,72 @@
+"""
+How often to poll for LGL emails, based on where we are in the campaign.
+
+Outside a campaign's window there's nothing to poll for, so the poller goes dormant until the
+window opens. Inside it, polls start slow (the ceiling) and tighten towards the floor as the
+deadline approaches, or sooner if donations are coming in quickly: the arrival rate is tracked as
+an exponentially weighted moving average, and we aim to poll about as often as emails arrive.
+Past the deadline, polls ease back off to the ceiling until the window closes.
+"""
+
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from .Campaign import active_campaign
+
+POLL_FLOOR = float(os.getenv("POLL_FLOOR_SECONDS", "15"))
+POLL_CEILING = float(os.getenv("POLL_CEILING_SECONDS", "300"))
+FINAL_STRETCH = timedelta(hours=float(os.getenv("POLL_FINAL_STRETCH_HOURS", "6")))  # tighten over these last hours
+RATE_HALF_LIFE = float(os.getenv("POLL_RATE_HALF_LIFE_SECONDS", "600"))
+DORMANT_RECHECK = float(os.getenv("POLL_DORMANT_RECHECK_SECONDS", str(24 * 60 * 60)))
+
+
+class PollScheduler:
+    """Picks the interval until the next poll of one mailbox."""
+
+    def __init__(self, floor: float = POLL_FLOOR, ceiling: float = POLL_CEILING,
+                 final_stretch: timedelta = FINAL_STRETCH, half_life: float = RATE_HALF_LIFE,
+                 dormant_recheck: float = DORMANT_RECHECK):
+        self.floor = floor
+        self.ceiling = max(ceiling, floor)
+        self.final_stretch = final_stretch
+        self.half_life = half_life
+        self.dormant_recheck = dormant_recheck
+        self.rate = 0.0  # emails per second
+        self._last_observed: Optional[datetime] = None
+
+    @staticmethod
+    def active(now: Optional[datetime] = None) -> bool:
+        """Whether a campaign is taking donations, and so whether there's any point polling."""
+        now = now or datetime.now(timezone.utc)
+        return active_campaign(now).accepting(now)
+
+    def observe(self, arrivals: int, now: Optional[datetime] = None):
+        """Fold the number of new emails seen by a poll into the arrival rate."""
+        now = now or datetime.now(timezone.utc)
+        if self._last_observed is not None:
+            elapsed = (now - self._last_observed).total_seconds()
+            if elapsed > 0:
+                weight = 1 - math.exp(-math.log(2) * elapsed / self.half_life)
+                self.rate += weight * (arrivals / elapsed - self.rate)
+        self._last_observed = now
+
+    def interval(self, now: Optional[datetime] = None) -> float:
+        """Seconds until the next poll."""
+        now = now or datetime.now(timezone.utc)
+        campaign = active_campaign(now)
+        if not campaign.accepting(now):
+            # dormant: wake when the window opens, but check in now and then in case the campaigns change
+            until_open = (campaign.opens() - now).total_seconds()
+            return until_open if 0 < until_open < self.dormant_recheck else self.dormant_recheck
+
+        interval = self.ceiling
+        remaining = campaign.deadline - now
+        if now >= campaign.start and abs(remaining) <= self.final_stretch:
+            # close in linearly on the floor over the final stretch, and ease off the same way after it
+            fraction = abs(remaining) / self.final_stretch
+            interval = self.floor + (self.ceiling - self.floor) * fraction
+        if self.rate > 0:
+            interval = min(interval, 1 / self.rate)  # about one email per poll
+        return min(max(interval, self.floor), self.ceiling)
@@ -0,0 +1,113 @@
+import json
+import os
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from email.parser import BytesHeaderParser
+from email.policy import default
+from typing import Dict, List, Optional
+
+INDEX_FILE = "index.json"
+# set on a quarantined email in the mailbox, so neither the scraper nor the poller keeps finding it unread
+QUARANTINED_KEYWORD = "$Quarantined"
+
+
+@dataclass
+class QuarantinedEmail:
+    """An LGL email which could not be parsed, and the reason why."""
+    uid: int
+    message_id: str
+    error: str
+    quarantined_at: str
+    attempts: int = 1
+    uid_validity: int = 0  # the mailbox's UIDVALIDITY when it was quarantined (0 if from before it was kept)
+
+
+class QuarantineStore:
+    """
+    Local store for LGL emails that failed to parse, so they aren't refetched and reparsed every run.
+
+    Each email's raw bytes are kept in their own file, alongside a small JSON index keyed by IMAP UID.
+    A UID only identifies an email for as long as the mailbox's UIDVALIDITY stays the same, so each
+    entry is keyed by both: after the mailbox is rebuilt, a new email that reuses a quarantined UID
+    isn't mistaken for the quarantined one. The email itself is flagged with `QUARANTINED_KEYWORD`,
+    and left unread, so searches for new emails can leave it out.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._index: Optional[Dict[str, QuarantinedEmail]] = None
+
+    # =================== Public Interface ===================
+    def add(self, uid: int, raw_msg: bytes, error: str, uid_validity: int = 0) -> QuarantinedEmail:
+        """Quarantine an email (or record another failed attempt for one already quarantined)."""
+        index = self._load_index()
+        existing = index.get(self._key(uid, uid_validity))
+        entry = QuarantinedEmail(
+            uid=int(uid),
+            message_id=self.message_id(raw_msg),
+            error=error,
+            quarantined_at=datetime.now(timezone.utc).isoformat(),
+            attempts=existing.attempts + 1 if existing else 1,
+            uid_validity=int(uid_validity),
+        )
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._raw_path(uid, uid_validity), "wb") as f:
+            f.write(raw_msg)
+        index[self._key(uid, uid_validity)] = entry
+        self._save_index()
+        return entry
+
+    def contains(self, uid: int, uid_validity: int = 0) -> bool:
+        """Check whether an email has been quarantined."""
+        return self._key(uid, uid_validity) in self._load_index()
+
+    def entries(self) -> List[QuarantinedEmail]:
+        """All quarantined emails, oldest UID first."""
+        return sorted(self._load_index().values(), key=lambda e: (e.uid_validity, e.uid))
+
+    def load_raw(self, uid: int, uid_validity: int = 0) -> bytes:
+        """The raw bytes of a quarantined email."""
+        with open(self._raw_path(uid, uid_validity), "rb") as f:
+            return f.read()
+
+    def remove(self, uid: int, uid_validity: int = 0):
+        """Release an email from quarantine, e.g. after it was successfully reprocessed."""
+        index = self._load_index()
+        if index.pop(self._key(uid, uid_validity), None) is not None:
+            if os.path.exists(self._raw_path(uid, uid_validity)):
+                os.remove(self._raw_path(uid, uid_validity))
+            self._save_index()
+
+    @staticmethod
+    def message_id(raw_msg: bytes) -> str:
+        """Pull the Message-ID out of an email's headers, without parsing its body."""
+        headers = BytesHeaderParser(policy=default).parsebytes(raw_msg)
+        return str(headers.get("Message-ID", "")).strip()
+
+    # =================== Internal Helpers ===================
+    @staticmethod
+    def _key(uid: int, uid_validity: int) -> str:
+        # entries from before the UIDVALIDITY was kept are keyed (and named) by their UID alone
+        return f"{int(uid_validity)}:{int(uid)}" if uid_validity else str(int(uid))
+
+    def _raw_path(self, uid: int, uid_validity: int = 0) -> str:
+        name = f"{int(uid_validity)}-{int(uid)}" if uid_validity else str(int(uid))
+        return os.path.join(self.path, f"{name}.eml")
+
+    def _load_index(self) -> Dict[str, QuarantinedEmail]:
+        if self._index is None:
+            index_path = os.path.join(self.path, INDEX_FILE)
+            if os.path.exists(index_path):
+                with open(index_path, encoding="utf-8") as f:
+                    self._index = {uid: QuarantinedEmail(**entry) for uid, entry in json.load(f).items()}
+            else:
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.path, exist_ok=True)
+        index_path = os.path.join(self.path, INDEX_FILE)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({uid: asdict(entry) for uid, entry in self._index.items()}, f, indent=2)
+        os.replace(tmp_path, index_path)
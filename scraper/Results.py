@@ -0,0 +1,65 @@
+"""
+Reading and writing results.csv, the single row of numbers the front end displays.
+
+Each source of results (the Google Form sheets, the LGL donations) produces a dict of column
+updates rather than writing the file itself, so updates from several sources can be merged and
+written together. Writes go to a temporary file that then replaces the CSV, so a reader (or a
+failed run) never sees a half-written file. Each write can also be recorded as a snapshot in the
+results history (see ResultsHistory), and what it changed appended to the change feed (see
+ChangeFeed).
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from .ChangeFeed import record_changes
+from .ResultsHistory import ResultsHistory, numeric_values
+
+
+def metric_columns(metrics: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Flatten per-school metrics ({'uva': {'total_amount': 5}}) into results columns ({'uva_total_amount': 5})."""
+    updates = {}
+    for school_code, school_metrics in metrics.items():
+        for metric_name, value in school_metrics.items():
+            # Flatten any list or set into a comma-separated string
+            if isinstance(value, (list, set)):
+                value = ", ".join(map(str, value))
+            updates[f"{school_code}_{metric_name}"] = value
+    return updates
+
+
+def apply_updates(df: pd.DataFrame, updates: Dict[str, Any]):
+    """Set columns of the results row, creating any that don't exist yet."""
+    for column, value in updates.items():
+        if column in df.columns:
+            df[column] = df[column].astype(object)
+            df.at[0, column] = value
+        else:
+            df[column] = pd.Series([value], dtype=object)
+
+
+def write_results(df: pd.DataFrame, path: str):
+    """Atomically replace the results CSV."""
+    tmp_path = f"{path}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def update_results(path: str, updates: Dict[str, Any], history_dir: Optional[str] = None,
+                   feed_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Read the results CSV, apply the column updates, and write it back in one go; then snapshot it into a
+    history, and append what changed to a change feed, if given them.
+    """
+    df = pd.read_csv(path)
+    previous = df.iloc[0].to_dict() if len(df) else {}
+    apply_updates(df, updates)
+    write_results(df, path)
+    row = df.iloc[0].to_dict()
+    if history_dir:
+        ResultsHistory(history_dir).append(numeric_values(row))
+    if feed_path:
+        record_changes(previous, row, feed_path)
+    return df
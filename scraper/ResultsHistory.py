@@ -0,0 +1,175 @@
+"""
+A compact, append-only history of results.csv, for charting momentum and looking back at the board.
+
+Every time the results are written, the numeric columns are appended as a snapshot. Snapshots are
+packed binary records (a column number and a double per value, with the column names kept once, in
+`columns.txt`), and alongside the raw snapshots are per minute, hour and day rollups holding the
+last snapshot of each bucket, so a chart of a whole campaign reads a few hundred records rather
+than every run. Each series has a fixed width index of (time, offset) pairs, which range queries
+binary search; nothing here touches the entries sheet.
+"""
+
+import bisect
+import math
+import os
+import struct
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .Campaign import EASTERN
+
+HISTORY_DIR = os.getenv("RESULTS_HISTORY", "history")
+RAW = "raw"
+RESOLUTIONS = {"minute": 60, "hour": 60 * 60, "day": 24 * 60 * 60}
+COLUMNS_FILE = "columns.txt"
+INDEX_ENTRY = struct.Struct("<dQ")  # snapshot time (epoch seconds), offset into the data file
+VALUE = struct.Struct("<Hd")  # column number, value
+COUNT = struct.Struct("<H")
+# buckets line up with local (Eastern) midnight rather than UTC's
+BUCKET_OFFSET = EASTERN.utcoffset(None).total_seconds()
+
+Snapshot = Tuple[datetime, Dict[str, float]]
+
+
+def numeric_values(row: Dict[str, object]) -> Dict[str, float]:
+    """The columns of a results row that hold a number (skipping names, lists and blanks)."""
+    values = {}
+    for column, value in row.items():
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            continue
+        if not math.isnan(number):
+            values[column] = number
+    return values
+
+
+def bucket_start(timestamp: float, seconds: int) -> float:
+    return timestamp - (timestamp + BUCKET_OFFSET) % seconds
+
+
+class _Index:
+    """The index of a series as a sequence of times, so the bisect module can search it in place."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // INDEX_ENTRY.size
+
+    def __getitem__(self, i: int) -> float:
+        return INDEX_ENTRY.unpack_from(self.data, i * INDEX_ENTRY.size)[0]
+
+    def offset(self, i: int) -> int:
+        return INDEX_ENTRY.unpack_from(self.data, i * INDEX_ENTRY.size)[1]
+
+
+class ResultsHistory:
+    """Snapshots of the results over time, raw and rolled up."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._columns: Optional[List[str]] = None
+
+    # =================== Public Interface ===================
+    def append(self, values: Dict[str, float], at: Optional[datetime] = None):
+        """Record a snapshot of the results, closing off any rollup buckets it starts a new one of."""
+        timestamp = (at or datetime.now(timezone.utc)).timestamp()
+        os.makedirs(self.path, exist_ok=True)
+        previous = self.latest()
+        if previous is not None:
+            previous_time = previous[0].timestamp()
+            for resolution, seconds in RESOLUTIONS.items():
+                if bucket_start(previous_time, seconds) < bucket_start(timestamp, seconds):
+                    # the previous snapshot was the last of its bucket
+                    self._write(resolution, bucket_start(previous_time, seconds), previous[1])
+        self._write(RAW, timestamp, values)
+
+    def latest(self) -> Optional[Snapshot]:
+        index = self._index(RAW)
+        return self._snapshots(RAW, index, len(index) - 1, len(index))[0] if len(index) else None
+
+    def at(self, when: datetime) -> Optional[Snapshot]:
+        """What the results were at a given time: the last snapshot taken at or before it."""
+        index = self._index(RAW)
+        i = bisect.bisect_right(index, when.timestamp()) - 1
+        return self._snapshots(RAW, index, i, i + 1)[0] if i >= 0 else None
+
+    def range(self, start: datetime, end: datetime, resolution: str = RAW) -> List[Snapshot]:
+        """
+        Snapshots taken in [start, end). At a rollup resolution, one per bucket (stamped with the start of
+        the bucket), the bucket in progress included.
+        """
+        if resolution != RAW and resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution!r}")
+        index = self._index(resolution)
+        first = bisect.bisect_left(index, start.timestamp())
+        last = bisect.bisect_left(index, end.timestamp())
+        snapshots = self._snapshots(resolution, index, first, last)
+        if resolution != RAW:
+            # the current bucket isn't rolled up until it closes; its latest snapshot stands in for it
+            latest = self.latest()
+            if latest is not None:
+                current = bucket_start(latest[0].timestamp(), RESOLUTIONS[resolution])
+                if start.timestamp() <= current < end.timestamp() and (not len(index) or index[len(index) - 1] < current):
+                    snapshots.append((datetime.fromtimestamp(current, timezone.utc), latest[1]))
+        return snapshots
+
+    # =================== Internal Helpers ===================
+    def _file(self, series: str, suffix: str) -> str:
+        return os.path.join(self.path, f"{series}.{suffix}")
+
+    def _load_columns(self) -> List[str]:
+        if self._columns is None:
+            path = os.path.join(self.path, COLUMNS_FILE)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self._columns = f.read().splitlines()
+            else:
+                self._columns = []
+        return self._columns
+
+    def _column_numbers(self, names) -> Dict[str, int]:
+        columns = self._load_columns()
+        new = [name for name in names if name not in columns]
+        if new:
+            with open(os.path.join(self.path, COLUMNS_FILE), "a", encoding="utf-8") as f:
+                f.writelines(f"{name}\n" for name in new)
+            columns.extend(new)
+        return {name: number for number, name in enumerate(columns)}
+
+    def _write(self, series: str, timestamp: float, values: Dict[str, float]):
+        numbers = self._column_numbers(values)
+        record = COUNT.pack(len(values)) + b"".join(VALUE.pack(numbers[name], value) for name, value in values.items())
+        # data first: until the index points at a record, it isn't part of the series
+        with open(self._file(series, "dat"), "ab") as f:
+            offset = f.tell()
+            f.write(record)
+        with open(self._file(series, "idx"), "ab") as f:
+            f.write(INDEX_ENTRY.pack(timestamp, offset))
+
+    def _index(self, series: str) -> _Index:
+        path = self._file(series, "idx")
+        if not os.path.exists(path):
+            return _Index(b"")
+        with open(path, "rb") as f:
+            data = f.read()
+        return _Index(data[:len(data) - len(data) % INDEX_ENTRY.size])  # ignoring any torn last entry
+
+    def _snapshots(self, series: str, index: _Index, first: int, last: int) -> List[Snapshot]:
+        """Read entries [first, last) of a series, which are contiguous in its data file, in one read."""
+        if first >= last:
+            return []
+        columns = self._load_columns()
+        start = index.offset(first)
+        with open(self._file(series, "dat"), "rb") as f:
+            f.seek(start)
+            data = f.read(index.offset(last) - start) if last < len(index) else f.read()
+        snapshots = []
+        for i in range(first, last):
+            position = index.offset(i) - start
+            (count,) = COUNT.unpack_from(data, position)
+            values = (VALUE.unpack_from(data, position + COUNT.size + j * VALUE.size) for j in range(count))
+            snapshots.append((datetime.fromtimestamp(index[i], timezone.utc),
+                              {columns[number]: value for number, value in values}))
+        return snapshots
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+ResultsServer.py
+----------------
+
+An optional HTTP service for the host that runs the scraper, serving the latest results.csv from
+memory so leaderboard tabs don't re-download it in full every few seconds:
+
+- `GET /results.csv` answers with a strong ETag, and with a bodyless 304 when the request's
+  If-None-Match already matches it
+- `GET /results/poll` long-polls: given the ETag the client has (If-None-Match, or `?etag=`), it
+  waits until the results change (answering with them) or until `?timeout=` seconds (default
+  LONG_POLL_SECONDS) pass (answering 304)
+- `GET /stats` reports requests, 304s and bytes sent per endpoint (any other path counts as "other")
+
+The results are reloaded whenever the CSV's modification time changes. It's a single threaded
+asyncio server on the standard library alone: a waiting client is just a suspended coroutine, so
+thousands of them cost little more than their sockets.
+
+Usage (from the root of the repo):
+    python -m scraper.ResultsServer [--host 0.0.0.0] [--port 8080] [--csv public/assets/csv/results.csv]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+CSV_PATH = os.getenv("RESULTS_CSV", "public/assets/csv/results.csv")
+LONG_POLL_SECONDS = float(os.getenv("LONG_POLL_SECONDS", "30"))
+MAX_LONG_POLL_SECONDS = 120.0
+RELOAD_SECONDS = float(os.getenv("RESULTS_RELOAD_SECONDS", "1"))
+MAX_HEADER_BYTES = 16 * 1024
+ENDPOINTS = ("/results.csv", "/results/poll", "/stats")  # counted in the stats by name; anything else is "other"
+
+REASONS = {200: "OK", 204: "No Content", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed"}
+
+
+@dataclass
+class EndpointStats:
+    """Counters for one endpoint."""
+    requests: int = 0
+    not_modified: int = 0
+    bytes: int = 0
+
+
+class ResultsServer:
+    """Holds the latest results in memory and serves them over HTTP."""
+
+    def __init__(self, csv_path: str = CSV_PATH, reload_seconds: float = RELOAD_SECONDS):
+        self.csv_path = csv_path
+        self.reload_seconds = reload_seconds
+        self.body = b""
+        self.etag = ""
+        self.version = 0
+        self.stats: Dict[str, EndpointStats] = {}
+        self.waiting = 0  # long-polling clients parked until the results change
+        self._changed: Optional[asyncio.Event] = None
+        self._mtime: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    # =================== Public Interface ===================
+    def publish(self, body: bytes):
+        """Make new results the latest, waking every long-polling client (if they actually changed)."""
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        if etag == self.etag:
+            return
+        self.body, self.etag = body, etag
+        self.version += 1
+        if self._changed is not None:
+            # wake everyone waiting on the old event; later waiters wait on a fresh one
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def reload(self) -> bool:
+        """Publish the CSV if it has changed on disk since it was last loaded."""
+        try:
+            mtime = os.stat(self.csv_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        with open(self.csv_path, "rb") as f:
+            body = f.read()
+        self._mtime = mtime
+        self.publish(body)
+        return True
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> Tuple[str, int]:
+        """Start serving (and watching the CSV); returns the address actually bound."""
+        self._changed = asyncio.Event()
+        self.reload()
+        self._server = await asyncio.start_server(self._handle, host, port, backlog=4096)
+        self._watcher = asyncio.create_task(self._watch())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        if self._watcher:
+            self._watcher.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # =================== Internal Helpers ===================
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            self.reload()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until the client closes it (or asks to)."""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError:  # a malformed request line or header, after which the stream can't be trusted
+                    self._send(writer, 400, {}, b"", keep_alive=False)
+                    self._count("other", 400, b"")
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, response_headers, body, endpoint = await self._respond(method, target, headers)
+                if method == "HEAD":
+                    response_headers["Content-Length"] = str(len(body))
+                    body = b""
+                self._send(writer, status, response_headers, body, keep_alive)
+                self._count(endpoint, status, body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    def _count(self, endpoint: str, status: int, body: bytes):
+        stats = self.stats.setdefault(endpoint, EndpointStats())
+        stats.requests += 1
+        stats.not_modified += status == 304
+        stats.bytes += len(body)
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        head = await reader.readuntil(b"\r\n\r\n") if not reader.at_eof() else b""
+        if not head:
+            return None
+        if len(head) > MAX_HEADER_BYTES:
+            raise ConnectionError("Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        if len(parts) != 3:
+            raise ValueError("Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0") or 0)
+        if length:
+            await reader.readexactly(length)  # no endpoint takes a body
+        return parts[0], parts[1], headers
+
+    async def _respond(self, method: str, target: str, headers: Dict[str, str]):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        endpoint = url.path if url.path in ENDPOINTS else "other"  # not the client's path, which could be anything
+        if method == "OPTIONS":  # a CORS preflight, for If-None-Match from another origin
+            return 204, {"Access-Control-Allow-Headers": "If-None-Match",
+                         "Access-Control-Allow-Methods": "GET, HEAD"}, b"", endpoint
+        if method not in ("GET", "HEAD"):
+            return 405, {"Allow": "GET, HEAD, OPTIONS"}, b"", endpoint
+
+        if url.path == "/results.csv":
+            return (*self._results(headers.get("if-none-match")), url.path)
+        if url.path == "/results/poll":
+            known = headers.get("if-none-match") or query.get("etag", [None])[0]
+            try:
+                timeout = min(float(query.get("timeout", [LONG_POLL_SECONDS])[0]), MAX_LONG_POLL_SECONDS)
+            except ValueError:
+                return 400, {}, b"", url.path
+            if known == self.etag:
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    self.waiting -= 1
+            return (*self._results(known), url.path)
+        if url.path == "/stats":
+            body = json.dumps({"version": self.version, "etag": self.etag, "waiting": self.waiting,
+                               "endpoints": {name: asdict(stats) for name, stats in self.stats.items()}}).encode()
+            return 200, {"Content-Type": "application/json", "Cache-Control": "no-store"}, body, url.path
+        return 404, {}, b"", endpoint
+
+    def _results(self, if_none_match: Optional[str]):
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", "X-Results-Version": str(self.version)}
+        if if_none_match and self.etag in (tag.strip() for tag in if_none_match.split(",")):
+            return 304, headers, b""
+        return 200, {**headers, "Content-Type": "text/csv; charset=utf-8"}, self.body
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], body: bytes, keep_alive: bool):
+        headers = {"Access-Control-Allow-Origin": "*",
+                   "Access-Control-Expose-Headers": "ETag, X-Results-Version",
+                   "Content-Length": str(len(body)),
+                   "Connection": "keep-alive" if keep_alive else "close",
+                   **headers}
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}"] + [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+
+async def serve(host: str, port: int, csv_path: str):
+    server = ResultsServer(csv_path)
+    host, port = await server.start(host, port)
+    print(f"📡 Serving {csv_path} on http://{host}:{port}/results.csv")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the latest results from memory, with ETags and long-polling.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--csv", default=CSV_PATH, help=f"the results CSV to serve (default: {CSV_PATH})")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.csv))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Reading just the columns a consumer needs from a worksheet.
+
+`get_all_values` and friends transfer every column of every row, including ones nothing reads, like
+the free text answers on the Google Forms. Instead, each consumer declares the columns it needs (by
+header name, or by position), they're resolved to A1 ranges (adjacent columns sharing one), and all
+of the ranges are fetched in one batched values request. What comes back is laid out the way the
+whole sheet would be, so nothing downstream has to change.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def column_letters(number: int) -> str:
+    """Convert a 1-based column number to its letters (1 is A, 27 is AA)."""
+    letters = ""
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def column_ranges(columns: Iterable[int], first_row: int = 1, last_row: Optional[int] = None
+                  ) -> List[Tuple[List[int], str]]:
+    """Group 1-based column numbers into runs of adjacent columns, each with its A1 range over the rows."""
+    runs: List[List[int]] = []
+    for column in sorted(set(columns)):
+        if runs and column == runs[-1][-1] + 1:
+            runs[-1].append(column)
+        else:
+            runs.append([column])
+    end = last_row or ""
+    return [(run, f"{column_letters(run[0])}{first_row}:{column_letters(run[-1])}{end}") for run in runs]
+
+
+def payload_size(values: Sequence[Sequence[str]]) -> int:
+    """Roughly how many bytes of cell values were transferred."""
+    return sum(len(str(cell)) for row in values for cell in row)
+
+
+def read_rows(ws, columns: Iterable[int], first_row: int = 1, last_row: Optional[int] = None) -> List[List[str]]:
+    """
+    Rows of a worksheet with only the given (0-based) columns read, in one batched request, and
+    every other column left blank. Rows past the last one with a value in those columns are left off.
+    """
+    ranges = column_ranges((column + 1 for column in columns), first_row, last_row)
+    if not ranges:
+        return []
+    fetched = ws.batch_get([a1 for _, a1 in ranges])
+    height = max((len(values) for values in fetched), default=0)
+    width = max(run[-1] for run, _ in ranges)
+    rows = [[""] * width for _ in range(height)]
+    for (run, _), values in zip(ranges, fetched):
+        for i, row in enumerate(values):
+            for column, value in zip(run, row):
+                rows[i][column - 1] = value
+    return rows
+
+
+def read_named_columns(ws, names: Iterable[str], header: Optional[Sequence[str]] = None, first_row: int = 1,
+                       last_row: Optional[int] = None) -> List[List[str]]:
+    """
+    The named columns of a worksheet, column-major with each headed by its name (as
+    `get_values(major_dimension='COLUMNS')` gives them), fetched in one batched request once their
+    positions are resolved from the header row. Names missing from the header are left out. Given
+    `first_row` (past the header) and `last_row`, only those rows are read, still headed by the names.
+    """
+    header = list(header) if header is not None else ws.row_values(1)
+    positions: Dict[int, str] = {header.index(name) + 1: name for name in names if name in header}
+    ranges = column_ranges(positions, first_row, last_row)
+    if not ranges:
+        return []
+    fetched = ws.batch_get([a1 for _, a1 in ranges], major_dimension="COLUMNS")
+    skip = 1 if first_row == 1 else 0  # the header row, which the names stand in for
+    columns = []
+    for (run, _), values in zip(ranges, fetched):
+        values = list(values) + [[]] * (len(run) - len(values))  # trailing blank columns are left off
+        columns += [[positions[column]] + list(value[skip:]) for column, value in zip(run, values)]
+    return columns
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+The school metrics, worked out a chunk of entries at a time.
+
+`CalculateValues` loads every entry into one frame before working anything out, so its memory grows
+with the campaign. Streaming instead reads the entries `METRIC_STREAM_ROWS` rows at a time, from the
+sheet's shards or a local CSV export of them, folds each chunk into running per-school partial
+aggregates (`Aggregates.SchoolAggregate`) and drops it. All that's held besides one chunk is what
+the aggregates keep per donor, so memory no longer grows with the number of gifts. Donors that a
+later chunk shows to be the same person are folded together at the end, so the metrics are the
+same as `calculate_all()` gives.
+
+Usage:
+    python -m scraper.StreamingMetrics (--csv PATH | --worksheet NAME) [--chunk-rows 50000]
+"""
+
+import argparse
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import gspread
+import pandas as pd
+
+from .Aggregates import aggregate_entries, merge_aggregates
+from .CalculateValues import DONOR_ID, ENTRY_SCHEMA, entries_frame
+from .DonorIdentity import DonorIndex
+from .EntryShards import EntryShards
+from .Instrumentation import run_report
+
+# rows of entries per chunk when streaming the metrics (0 loads them all at once instead)
+METRIC_STREAM_ROWS = int(os.getenv("METRIC_STREAM_ROWS", "0"))
+
+
+def csv_chunks(path: str, chunk_rows: int) -> Iterator[List[List[str]]]:
+    """The entries columns of a CSV export (with a header row), `chunk_rows` rows at a time."""
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows,
+                             usecols=lambda name: name in ENTRY_SCHEMA):
+        yield [[name] + chunk[name].tolist() for name in chunk.columns]
+
+
+def sheet_chunks(spreadsheet_key: str, worksheet: str, chunk_rows: int, gc: Optional[gspread.Client] = None,
+                 creds_file: str = "spreadsheet_credentials.json") -> Iterator[List[List[str]]]:
+    """The entries columns of every shard of a campaign's worksheet, `chunk_rows` rows at a time."""
+    gc = gc or gspread.service_account(filename=creds_file)
+    yield from EntryShards(gc.open_by_key(spreadsheet_key), worksheet).read_chunks(ENTRY_SCHEMA, chunk_rows)
+
+
+def stream_metrics(chunks: Iterable[List[List[str]]], donors: Optional[DonorIndex] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    The metrics of each school (as `CalculateValues.calculate_all()` reports them) over chunks of
+    entries columns. Donors are always counted exactly: the donor index holds every donor anyway,
+    so sketches would save little, and they couldn't fold together donors a later chunk merges.
+    """
+    donors = donors or DonorIndex()
+    aggregates = merge_aggregates([])
+    rows = 0
+    with run_report.span("stream_metrics") as stage:
+        for columns in chunks:
+            df = entries_frame(columns)
+            del columns
+            df[DONOR_ID] = donors.assign(df)
+            for school, aggregate in aggregate_entries(df, rows).items():
+                aggregates[school].merge(aggregate)
+            rows += len(df)
+            del df
+        stage.add(items=rows)
+    donors.save()
+    return {school: aggregate.remap(donors.resolve).metrics() for school, aggregate in aggregates.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate the school metrics a chunk of entries at a time.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="a CSV export of the entries")
+    source.add_argument("--worksheet", help="the campaign's entries worksheet, e.g. entries-2025")
+    parser.add_argument("--chunk-rows", type=int, default=METRIC_STREAM_ROWS or 50_000)
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        chunks = csv_chunks(args.csv, args.chunk_rows)
+    else:
+        chunks = sheet_chunks(os.getenv("SPREADSHEET_KEY"), args.worksheet, args.chunk_rows)
+    print(json.dumps(stream_metrics(chunks), indent=2))
+
+
+if __name__ == "__main__":
+    main()
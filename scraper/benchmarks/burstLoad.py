@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+burstLoad.py
+------------
+
+Replays a campaign-night burst of donations end-to-end against the fake IMAP server and the fake
+Sheets backend: the poller notices unread LGL emails, the LGL scraper parses them into the entries
+sheet, and the results CSV is recalculated. Reports throughput, donation-to-results latency
+percentiles, and IMAP and Sheets API call counts.
+
+Arrivals, poll intervals and the workflow dispatch delay run on a simulated clock, while the
+scraper's own work (including any injected Sheets latency) takes real time and is added to it, so
+an hour of campaign night replays in seconds.
+
+Usage:
+    python -m scraper.benchmarks.burstLoad [--donations 300] [--window-minutes 60] [--throttle-rate 0.02]
+"""
+
+import argparse
+import math
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+from unittest.mock import patch
+
+import gspread
+
+from scraper import getLglFormData as lgl
+from scraper import pollEmail
+from scraper.Instrumentation import run_report
+from scraper.testing.FakeImapServer import FakeImapServer
+from scraper.testing.FakeSheets import FakeSheetsBackend
+
+RESULTS_CSV = Path(__file__).resolve().parents[2] / "public" / "assets" / "csv" / "results.csv"
+SPREADSHEET_KEY = "burst-load-entries"
+SENDERS = {
+    "vt": "Hillel at VT <lglforms-submissions@littlegreenlight.com>",
+    "uva": "Brody Jewish Center <lglforms-submissions@littlegreenlight.com>",
+}
+
+
+def arrival_offsets(count: int, window: float, steepness: float, seed: int) -> List[float]:
+    """
+    Sample donation arrival times (seconds into the window), denser towards the deadline.
+
+    Arrivals follow a density proportional to exp(steepness * t / window); 0 is uniform.
+    """
+    rng = random.Random(seed)
+    if steepness == 0:
+        return sorted(rng.uniform(0, window) for _ in range(count))
+    scale = math.expm1(steepness)
+    return sorted(window * math.log1p(rng.random() * scale) / steepness for _ in range(count))
+
+
+def synthetic_donation(index: int, rng: random.Random) -> Tuple[str, bytes]:
+    """Build an LGL submission email; returns the donor's (unique) phone number and the raw message."""
+    phone = f"540{index:07d}"
+    school = rng.choice(list(SENDERS))
+    fields = {
+        "Form title": "CWKC Donation Form",
+        "I am a/an": rng.choice(["Alumni", "Current Parent", "Community Member", "Current Student"]),
+        "Name - First Name": f"Donor{index}",
+        "Name - Last Name": "Burst",
+        "Phone": phone,
+        "Total Amount": f"${rng.choice([18, 36, 100, 180, 1000])}.00",
+        "Grad Year": rng.choice(["", "2025", "2010"]),
+        "Is Recurring": rng.choice(["No", "No", "Yes"]),
+    }
+    rows = "".join(f"<tr><td>{key}</td><td>{value}</td></tr>" for key, value in fields.items())
+    msg = EmailMessage()
+    msg["From"] = SENDERS[school]
+    msg["Subject"] = "New form submission"
+    msg["Message-ID"] = f"<burst-{index}@littlegreenlight.com>"
+    msg.set_content("\n".join(f"{key}: {value}" for key, value in fields.items()))
+    msg.add_alternative(f"<html><body><table>{rows}</table></body></html>", subtype="html")
+    return phone, msg.as_bytes()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class BurstRun:
+    """One end-to-end replay of a donation burst."""
+
+    def __init__(self, donations=300, window_minutes=60.0, steepness=3.0, poll_seconds=60.0,
+                 dispatch_seconds=20.0, sheets_latency=0.0, throttle_rate=0.0, seed=26):
+        self.window = window_minutes * 60
+        self.poll_seconds = poll_seconds
+        self.dispatch_seconds = dispatch_seconds
+        self.rng = random.Random(seed)
+        self.arrivals = [(offset, *synthetic_donation(i, self.rng))
+                         for i, offset in enumerate(arrival_offsets(donations, self.window, steepness, seed))]
+        self.backend = FakeSheetsBackend(latency=sheets_latency, throttle_rate=throttle_rate, seed=seed)
+        self.backend.add_spreadsheet(SPREADSHEET_KEY)
+
+        self.now = 0.0  # the simulated clock, in seconds since the window opened
+        self.delivered: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self.counted: Set[str] = set()
+        self.work_seconds = 0.0
+        self.runs = 0
+        self.failed_runs = 0
+        self.triggered = False
+
+    def run(self) -> dict:
+        workdir = tempfile.mkdtemp(prefix="burst-load-")
+        csv_path = Path(workdir) / "results.csv"
+        shutil.copy(RESULTS_CSV, csv_path)
+        run_report.reset("burst-load")
+        try:
+            with FakeImapServer() as imap, ExitStack() as stack:
+                self.imap = imap
+                self._patch(stack, imap, csv_path, workdir)
+                self._replay()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        return self._summary()
+
+    def _patch(self, stack: ExitStack, imap: FakeImapServer, csv_path: Path, workdir: str):
+        """Point the poller and the LGL scraper at the fakes."""
+        for module in (lgl, pollEmail):
+            stack.enter_context(patch.multiple(
+                module, IMAP_SERVER=imap.host, IMAP_PORT=imap.port, IMAP_SSL=False,
+                EMAIL_ACCOUNT="cwkc", EMAIL_PASSWORD="burst"))
+        stack.enter_context(patch.multiple(
+            lgl, SPREADSHEET_KEY=SPREADSHEET_KEY, CSV_PATH=str(csv_path), QUARANTINE_DIR=f"{workdir}/quarantine",
+            ARCHIVE_DIR=f"{workdir}/archive", DONATION_LOG_DIR=f"{workdir}/donation_log", HISTORY_DIR=f"{workdir}/history",
+            DONOR_INDEX_PATH=f"{workdir}/donor_index.json", FEED_PATH=f"{workdir}/changes.jsonl",
+            PENDING_PATH=f"{workdir}/lgl_pending.json"))
+        stack.enter_context(patch("scraper.CalculateValues.METRIC_STATE_PATH", f"{workdir}/metric_state.json"))
+        stack.enter_context(patch.object(gspread, "service_account", self.backend.service_account))
+        stack.enter_context(patch.object(pollEmail, "trigger_github_action", self._trigger))
+        stack.enter_context(patch("builtins.print"))  # the scraper is chatty; keep the report readable
+
+    def _trigger(self, target=None):
+        self.triggered = True
+
+    def _deliver_until(self, now: float):
+        while self.arrivals and self.arrivals[0][0] <= now:
+            offset, phone, raw = self.arrivals.pop(0)
+            self.imap.deliver(raw)
+            self.delivered[phone] = offset
+
+    def _replay(self):
+        next_poll = 0.0
+        give_up = self.window + 60 * self.poll_seconds
+        while (self.arrivals or len(self.latencies) < len(self.delivered)) and self.now < give_up:
+            self.now = max(self.now, next_poll)
+            self._deliver_until(self.now)
+
+            self.triggered = False
+            mail = pollEmail.connect_mailbox()
+            pollEmail.check_for_unread_lgl_emails(mail)
+            mail.logout()
+            next_poll = self.now + self.poll_seconds
+            if not self.triggered:
+                continue
+
+            # the workflow starts a little later, and picks up whatever has arrived by then
+            self.now += self.dispatch_seconds
+            self._deliver_until(self.now)
+            self._run_scraper()
+
+    def _run_scraper(self):
+        self.runs += 1
+        start = time.perf_counter()
+        try:
+            lgl.main()
+            results_updated = True
+        except gspread.exceptions.APIError:
+            results_updated = False  # e.g. rate limited while recalculating; the next run catches up
+            self.failed_runs += 1
+        elapsed = time.perf_counter() - start
+        self.work_seconds += elapsed
+        self.now += elapsed
+        if not results_updated:
+            return
+
+        for phone in self._entered_phones() - self.counted:
+            self.latencies.append(self.now - self.delivered[phone])
+            self.counted.add(phone)
+
+    def _entered_phones(self) -> Set[str]:
+        """The phone numbers of every donation in the entries shards so far."""
+        phones = set()
+        for ws in self.backend.spreadsheets[SPREADSHEET_KEY]._worksheets:
+            if not ws._values or "phone number" not in ws._values[0]:
+                continue  # the shard manifest, or a shard not written to yet
+            header, *rows = ws._values
+            column = header.index("phone number")
+            phones |= {row[column] for row in rows}
+        return phones
+
+    def _summary(self) -> dict:
+        donations = len(self.latencies)
+        return {
+            "donations": donations,
+            "scraper_runs": self.runs,
+            "failed_runs": self.failed_runs,
+            "simulated_seconds": round(self.now, 1),
+            "work_seconds": round(self.work_seconds, 3),
+            "throughput_per_work_second": round(donations / self.work_seconds, 1) if self.work_seconds else 0,
+            "latency_p50": round(percentile(self.latencies, 50), 1),
+            "latency_p90": round(percentile(self.latencies, 90), 1),
+            "latency_p99": round(percentile(self.latencies, 99), 1),
+            "latency_max": round(max(self.latencies, default=float("nan")), 1),
+            "sheets_api_calls": dict(self.backend.api_calls),
+            "sheets_throttled": self.backend.throttled,
+            "imap_commands": dict(self.imap.command_counts),
+            "unread_emails": len(self.imap.unseen()),
+            "imap_bytes_sent": self.imap.bytes_sent,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a campaign-night donation burst end-to-end against fakes.")
+    parser.add_argument("--donations", type=int, default=300)
+    parser.add_argument("--window-minutes", type=float, default=60.0, help="how long the burst lasts")
+    parser.add_argument("--steepness", type=float, default=3.0,
+                        help="how sharply arrivals pile up before the deadline (0 is uniform)")
+    parser.add_argument("--poll-seconds", type=float, default=pollEmail.IDLE_TIMEOUT)
+    parser.add_argument("--dispatch-seconds", type=float, default=20.0,
+                        help="how long the workflow takes to start once triggered")
+    parser.add_argument("--sheets-latency-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="chance of a Sheets call getting a 429")
+    parser.add_argument("--seed", type=int, default=26)
+    args = parser.parse_args(argv)
+
+    burst = BurstRun(
+        donations=args.donations, window_minutes=args.window_minutes, steepness=args.steepness,
+        poll_seconds=args.poll_seconds, dispatch_seconds=args.dispatch_seconds,
+        sheets_latency=args.sheets_latency_ms / 1000, throttle_rate=args.throttle_rate, seed=args.seed,
+    )
+    summary = burst.run()
+
+    print(f"🎯 {summary['donations']} donations over {args.window_minutes:g} simulated minutes, "
+          f"{summary['scraper_runs']} scraper runs ({summary['failed_runs']} failed)")
+    print(f"⚡ throughput: {summary['throughput_per_work_second']} donations per second of scraper work "
+          f"({summary['work_seconds']}s of work)")
+    print(f"⏱️ donation-to-results latency (simulated seconds): p50 {summary['latency_p50']}  "
+          f"p90 {summary['latency_p90']}  p99 {summary['latency_p99']}  max {summary['latency_max']}")
+    print(f"📊 Sheets API calls: {summary['sheets_api_calls']} ({summary['sheets_throttled']} throttled)")
+    print(f"📧 IMAP commands: {summary['imap_commands']} ({summary['imap_bytes_sent']:,} bytes sent)")
+    print("🧩 scraper stages:")
+    for stats in run_report.stages.values():
+        print(f"    {stats.stage:<14} {stats.calls:>6} calls {stats.seconds:8.3f}s {stats.items:>7} items "
+              f"{stats.bytes:>10,} bytes {stats.api_calls:>6} api calls")
+    return 0 if summary["donations"] == args.donations else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
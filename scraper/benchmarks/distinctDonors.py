@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+distinctDonors.py
+-----------------
+
+Compares exact and approximate (HyperLogLog) distinct donor counts on a large synthetic set of gifts:
+the time taken, the memory used and, for the sketches, how far off the estimate is. Fails if any
+sketch is further off than three times its standard error.
+
+Usage:
+    python -m scraper.benchmarks.distinctDonors [--gifts 2000000] [--donors 500000] [--errors 0.02 0.01 0.005]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from scraper.HyperLogLog import HyperLogLog
+
+
+def measure(count):
+    """Time an untraced run, then trace a second one for its peak memory."""
+    start = time.perf_counter()
+    result = count()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    count()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark exact against approximate distinct donor counts.")
+    parser.add_argument("--gifts", type=int, default=2_000_000)
+    parser.add_argument("--donors", type=int, default=500_000)
+    parser.add_argument("--errors", type=float, nargs="+", default=[0.02, 0.01, 0.005],
+                        help="the standard errors of the sketches to try")
+    parser.add_argument("--seed", type=int, default=41)
+    args = parser.parse_args(argv)
+
+    donor_ids = pd.Series(np.random.default_rng(args.seed).integers(0, args.donors, args.gifts))
+    exact, seconds, peak = measure(donor_ids.nunique)
+    print(f"{'exact':>12}: {exact:>10,} donors  {seconds:6.3f}s  peak {peak:8.2f} MB")
+
+    failed = False
+    for error in args.errors:
+        def sketch_count():
+            sketch = HyperLogLog.for_error(error)
+            sketch.update(donor_ids.to_numpy())
+            return sketch.count()
+
+        estimate, seconds, peak = measure(sketch_count)
+        off = estimate / exact - 1
+        size = len(HyperLogLog.for_error(error).registers)
+        print(f"{f'±{error:.1%}':>12}: {estimate:>10,} donors  {seconds:6.3f}s  peak {peak:8.2f} MB  "
+              f"sketch {size / 2 ** 10:6.1f} KB  off by {off:+.2%}")
+        failed |= abs(off) > 3 * error
+
+    if failed:
+        print("❌ A sketch was off by more than three times its standard error")
+        return 1
+    print("✅ Every sketch was within three times its standard error")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+loadEntries.py
+--------------
+
+Measures the memory used to load a large synthetic entries sheet, comparing the typed,
+column-at-a-time loader against the old list-of-dicts approach, and fails if the typed
+loader's peak goes over budget.
+
+Usage:
+    python -m scraper.benchmarks.loadEntries [--rows 1000000] [--max-peak-mb 250] [--legacy]
+"""
+
+import argparse
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from scraper.CalculateValues import ENTRY_SCHEMA, PHONE_NUMBER, TOTAL_AMOUNT, RECURRING_PAYMENT, entries_frame
+
+SAMPLE_VALUES = {
+    'source': ['uva-front', 'uva-back', 'vt-front', 'vt-back'],
+    TOTAL_AMOUNT: ['18.0', '36.0', '100.0', '1000.0', '10.0'],
+    RECURRING_PAYMENT: ['true', 'false', 'false', 'false'],
+    'first name': ['Alex', 'Sam', 'Jordan', 'Becca', 'Chris'],
+    'last name': ['Green', 'Blue', 'Smith', 'Goldberg', 'Doe'],
+    'email': ['', 'alex@example.com', 'sam@example.com', 'jordan@example.com'],
+    'anonymous donation': ['true', 'false', 'false'],
+    'first time giver': ['true', 'false'],
+    'graduation year': ['2025', '2010', '', '1999'],
+    'status': ['Alumni', 'Current Parent', 'Alumni, Parent of Alumni', 'Community Member'],
+    'work referral': ['true', 'false', 'false'],
+}
+
+
+def synthetic_columns(rows: int, seed: int = 18):
+    """Column-major sheet values, shaped like the Sheets API returns them (header first)."""
+    rng = random.Random(seed)
+    columns = []
+    for name in ENTRY_SCHEMA:
+        if name == PHONE_NUMBER:
+            values = [str(5_400_000_000 + rng.randrange(rows)) for _ in range(rows)]
+        else:
+            values = [rng.choice(SAMPLE_VALUES[name]) for _ in range(rows)]
+        columns.append([name] + values)
+    return columns
+
+
+def legacy_frame(columns):
+    """The old loader: a list of per-row dicts, an all-object frame, then column-by-column normalizing."""
+    header = [column[0] for column in columns]
+    records = [dict(zip(header, row)) for row in zip(*(column[1:] for column in columns))]
+    df = pd.DataFrame(records)
+    df['source'] = df['source'].str.lower()
+    df[TOTAL_AMOUNT] = pd.to_numeric(df[TOTAL_AMOUNT], errors='coerce').fillna(0)
+    df[RECURRING_PAYMENT] = df[RECURRING_PAYMENT].str.lower().map({'true': True, 'false': False})
+    return df
+
+
+def rss_mb() -> float:
+    """Current resident set size, where the platform exposes it (else the peak so far)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+def measure(label, loader, columns):
+    # time an untraced run, since tracing every allocation slows things down a lot
+    start = time.perf_counter()
+    loader(columns)
+    seconds = time.perf_counter() - start
+
+    rss_before = rss_mb()
+    tracemalloc.start()
+    df = loader(columns)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    final = df.memory_usage(deep=True).sum()
+    print(f"{label:>8}: {seconds:6.2f}s  peak {peak / 2 ** 20:8.1f} MB  final frame {final / 2 ** 20:8.1f} MB  "
+          f"resident +{rss_mb() - rss_before:8.1f} MB")
+    del df
+    return peak / 2 ** 20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the entries loader's memory use.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--max-peak-mb", type=float, default=250.0,
+                        help="fail if the typed loader's peak allocation is above this")
+    parser.add_argument("--legacy", action="store_true", help="also measure the old list-of-dicts loader")
+    args = parser.parse_args(argv)
+
+    print(f"Generating {args.rows:,} synthetic rows...")
+    columns = synthetic_columns(args.rows)
+
+    peak = measure("typed", entries_frame, columns)
+    if args.legacy:
+        measure("legacy", legacy_frame, columns)
+
+    if peak > args.max_peak_mb:
+        print(f"❌ Typed loader peak {peak:.1f} MB is over the {args.max_peak_mb:.1f} MB budget")
+        return 1
+    print(f"✅ Typed loader peak {peak:.1f} MB is within the {args.max_peak_mb:.1f} MB budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+longPoll.py
+-----------
+
+Parks thousands of long-polling clients on the results server, all in one process on one core,
+then publishes new results and measures how long it takes until every client has them. Also checks
+that a conditional GET of unchanged results costs no body. Fails if waking every client takes longer
+than the budget.
+
+Usage:
+    python -m scraper.benchmarks.longPoll [--clients 2000] [--budget-seconds 2.0]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from scraper.ResultsServer import ResultsServer
+
+
+async def request(host, port, path, headers=""):
+    """One GET on a fresh connection; returns the status and the body."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n{headers}\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), body
+
+
+async def run(clients: int, results: bytes):
+    with tempfile.TemporaryDirectory() as workdir:
+        server = ResultsServer(os.path.join(workdir, "results.csv"), reload_seconds=3600)
+        server.publish(results)
+        host, port = await server.start("127.0.0.1", 0)
+        try:
+            status, body = await request(host, port, "/results.csv", f"If-None-Match: {server.etag}\r\n")
+            assert status == 304 and not body, "an unchanged conditional GET should be a bodyless 304"
+
+            polls = [asyncio.create_task(request(host, port, "/results/poll?timeout=60",
+                                                 f"If-None-Match: {server.etag}\r\n")) for _ in range(clients)]
+            while server.waiting < clients:
+                await asyncio.sleep(0.01)
+
+            start = time.perf_counter()
+            server.publish(results + b"\n")
+            responses = await asyncio.gather(*polls)
+            seconds = time.perf_counter() - start
+        finally:
+            await server.stop()
+    assert all(status == 200 for status, _ in responses), "every waiting client should get the new results"
+    return seconds, server.stats["/results/poll"].bytes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark waking thousands of long-polling results clients.")
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--budget-seconds", type=float, default=2.0,
+                        help="fail if waking every waiting client takes longer than this")
+    args = parser.parse_args(argv)
+
+    # each client holds two sockets here (its own and the server's end)
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = 2 * args.clients + 64
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    results = b"uva_total_amount,vt_total_amount\n" + b"1234.00,5678.00\n" * 4
+    seconds, sent = asyncio.run(run(args.clients, results))
+    print(f"⏱️ Woke {args.clients:,} long-polling clients in {seconds:.3f}s "
+          f"({args.clients / seconds:,.0f}/s, {sent / 2 ** 10:,.1f} KB sent)")
+    if seconds > args.budget_seconds:
+        print(f"❌ Waking every client took {seconds:.3f}s, over the {args.budget_seconds:.2f}s budget")
+        return 1
+    print(f"✅ Waking every client took {seconds:.3f}s, within the {args.budget_seconds:.2f}s budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+noopRun.py
+----------
+
+Measures how long the LGL scraper takes, from process start to exit, when there are no new emails:
+the common case, since the workflow runs on every trigger whether or not anything arrived. Each run
+is a fresh `python -m scraper.getLglFormData` against the fake IMAP server with an empty inbox, so
+interpreter start up and imports are counted too. Fails if the median run is over budget, or if a
+run does anything but search the mailbox (going by its run report): no Sheets calls, no metrics.
+
+Usage:
+    python -m scraper.benchmarks.noopRun [--runs 10] [--budget-seconds 1.0]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from scraper.testing.FakeImapServer import FakeImapServer
+
+
+def timed_run(env) -> float:
+    report = os.path.join(env["WORKDIR"], "report")
+    if os.path.exists(report):
+        os.remove(report)  # just this run's stages
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "scraper.getLglFormData", "--report", report],
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def run_stages(env) -> List[str]:
+    """The stages the latest run went through, from its run report."""
+    with open(os.path.join(env["WORKDIR"], "report"), encoding="utf-8") as f:
+        return [record["stage"] for record in map(json.loads, f) if record["type"] == "stage"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark an LGL scraper run that finds nothing new.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-seconds", type=float, default=1.0,
+                        help="fail if the median start-to-exit time is above this")
+    args = parser.parse_args(argv)
+
+    with FakeImapServer() as imap, tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, IMAP_SERVER=imap.host, IMAP_PORT=str(imap.port), IMAP_SSL="false",
+                   EMAIL_ACCOUNT="cwkc", EMAIL_APP_PASSWORD="noop", WORKDIR=workdir,
+                   QUARANTINE_DIR=os.path.join(workdir, "quarantine"), ARCHIVE_DIR=os.path.join(workdir, "archive"),
+                   DONATION_LOG=os.path.join(workdir, "donation_log"), LGL_PENDING=os.path.join(workdir, "pending.json"))
+        timed_run(env)  # warm the bytecode and file caches
+        seconds = [timed_run(env) for _ in range(args.runs)]
+        stages = run_stages(env)
+
+    median = statistics.median(seconds)
+    extra = [stage for stage in stages if not stage.startswith("imap_")]
+    if extra:
+        print(f"❌ A no-op run did more than search the mailbox: {', '.join(extra)}")
+        return 1
+    print(f"✅ A no-op run only searched the mailbox: {', '.join(stages)}")
+    print(f"⏱️ {args.runs} no-op runs: median {median:.3f}s  min {min(seconds):.3f}s  max {max(seconds):.3f}s")
+    if median > args.budget_seconds:
+        print(f"❌ Median no-op run {median:.3f}s is over the {args.budget_seconds:.2f}s budget")
+        return 1
+    print(f"✅ Median no-op run {median:.3f}s is within the {args.budget_seconds:.2f}s budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+parallelMetrics.py
+------------------
+
+Times the school metrics over a large synthetic entries frame, computed in one pass over the whole
+frame and as partial aggregates of chunks reduced across 1, 2, ... up to one process per core.
+Fails if any reduction's metrics differ from the one pass (beyond floating point rounding, and
+the top donors when there are more donors than its summary holds).
+
+Usage:
+    python -m scraper.benchmarks.parallelMetrics [--rows 1000000] [--chunk-rows 100000] [--workers 1 2 4]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+from scraper.CalculateValues import CalculateValues, DONOR_ID, entries_frame
+from scraper.DonorIdentity import DonorIndex
+from scraper.GiftStats import TOP_DONOR_CAPACITY
+from scraper.benchmarks.loadEntries import synthetic_columns
+
+
+def same_metrics(expected, actual, approximate=()) -> bool:
+    """Whether two sets of metrics agree (floats up to rounding), besides any that are only approximate."""
+    return all(
+        math.isclose(value, actual[school][name], rel_tol=1e-9) if isinstance(value, float) else value == actual[school][name]
+        for school, metrics in expected.items() for name, value in metrics.items() if name not in approximate
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the metrics reduced in parallel from partial aggregates.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, os.cpu_count() or 1}), help="the process pool sizes to try")
+    args = parser.parse_args(argv)
+
+    calc = CalculateValues.__new__(CalculateValues)  # skip the sheet, and time only the metrics
+    calc.df = entries_frame(synthetic_columns(args.rows))
+    calc.df[DONOR_ID] = DonorIndex().assign(calc.df)
+    calc.distinct, calc.distinct_error, calc.workers = "exact", 0.01, 1
+    calc.state_path, calc._rows, calc._tables, calc._gifts = None, 0, {}, {}
+    # past its capacity, the top donors summary is approximate, and depends on how the gifts were chunked
+    approximate = ("top_donors",) if calc.df[DONOR_ID].nunique() > TOP_DONOR_CAPACITY else ()
+
+    start = time.perf_counter()
+    expected = calc.calculate_all()
+    seconds = time.perf_counter() - start
+    print(f"{'one pass':>12}: {seconds:6.3f}s")
+
+    failed = False
+    for workers in args.workers:
+        start = time.perf_counter()
+        metrics = calc.calculate_parallel(workers, args.chunk_rows)
+        reduced = time.perf_counter() - start
+        same = same_metrics(expected, metrics, approximate)
+        print(f"{f'{workers} worker(s)':>12}: {reduced:6.3f}s  {seconds / reduced:5.2f}x  "
+              f"{'same metrics' if same else 'DIFFERENT metrics'}")
+        failed |= not same
+
+    if failed:
+        print("❌ The reduced metrics differ from one pass over the entries")
+        return 1
+    print(f"✅ Every reduction matched one pass over the entries ({os.cpu_count()} cores available)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
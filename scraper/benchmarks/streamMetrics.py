@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+streamMetrics.py
+----------------
+
+Measures the peak memory of the school metrics over a large synthetic CSV export of the entries,
+streamed a chunk at a time, against loading it all into one frame first. Fails if the streamed
+metrics differ from the whole frame's, or if streaming's peak goes over budget.
+
+Usage:
+    python -m scraper.benchmarks.streamMetrics [--rows 200000] [--chunk-rows 20000] [--max-peak-mb 80] [--whole]
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from scraper.CalculateValues import CalculateValues, DONOR_ID, entries_frame
+from scraper.DonorIdentity import DonorIndex
+from scraper.GiftStats import TOP_DONOR_CAPACITY
+from scraper.StreamingMetrics import csv_chunks, stream_metrics
+from scraper.benchmarks.loadEntries import synthetic_columns
+from scraper.benchmarks.parallelMetrics import same_metrics
+
+
+def write_export(path: str, rows: int):
+    columns = synthetic_columns(rows)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(zip(*columns))
+
+
+def whole_metrics(path: str):
+    """The metrics the way CalculateValues works them out, with every entry in one frame."""
+    calc = CalculateValues.__new__(CalculateValues)
+    with open(path, newline="", encoding="utf-8") as f:
+        calc.df = entries_frame([list(column) for column in zip(*csv.reader(f))])
+    calc.df[DONOR_ID] = DonorIndex().assign(calc.df)
+    calc.distinct, calc.distinct_error, calc.workers = "exact", 0.01, 1
+    calc.state_path, calc._rows, calc._tables, calc._gifts = None, 0, {}, {}
+    return calc.calculate_all(), calc.df[DONOR_ID].nunique()
+
+
+def measure(label, work):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = work()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>8}: {seconds:6.2f}s (traced)  peak {peak / 2 ** 20:8.1f} MB")
+    return result, peak / 2 ** 20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the memory of the metrics streamed a chunk at a time.")
+    parser.add_argument("--rows", type=int, default=200_000)  # tracing every allocation is slow
+    parser.add_argument("--chunk-rows", type=int, default=20_000)
+    parser.add_argument("--max-peak-mb", type=float, default=80.0,
+                        help="fail if streaming's peak allocation is above this")
+    parser.add_argument("--whole", action="store_true", help="also measure loading every entry at once")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "entries.csv")
+        print(f"Writing {args.rows:,} synthetic rows...")
+        write_export(path, args.rows)
+
+        streamed, peak = measure("streamed", lambda: stream_metrics(csv_chunks(path, args.chunk_rows)))
+        expected, donors = whole_metrics(path) if not args.whole else measure("whole", lambda: whole_metrics(path))[0]
+
+    # past its capacity, the top donors summary is approximate, and depends on how the gifts were chunked
+    approximate = ("top_donors",) if donors > TOP_DONOR_CAPACITY else ()
+    if not same_metrics(expected, streamed, approximate):
+        print("❌ The streamed metrics differ from the whole frame's")
+        return 1
+    if peak > args.max_peak_mb:
+        print(f"❌ Streaming peak {peak:.1f} MB is over the {args.max_peak_mb:.1f} MB budget")
+        return 1
+    print(f"✅ Streamed metrics match, with a peak of {peak:.1f} MB, within the {args.max_peak_mb:.1f} MB budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
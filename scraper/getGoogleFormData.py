@@ -5,119 +5,211 @@ update_submissions.py
 
 Pulls data from multiple Google Sheets and updates results.csv accordingly.
 
-Usage:
-    python update_submissions.py
+Usage (from anywhere; the results CSV and the form state are found relative to the repo):
+    python -m scraper.getGoogleFormData [--report PATH] [--profile [PATH]]
 """
 
-from dataclasses import dataclass
+import argparse
+import json
+import os
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import gspread
 import pandas as pd
 
+from . import Instrumentation
+from .FormRules import FormRule, MinNames, Equals, SubmittedData, score_batch
+from .Instrumentation import run_report
+from .ChangeFeed import FEED_PATH
+from .Results import update_results
+from .SheetRanges import payload_size, read_rows
+
+SCRAPER_DIR = Path(__file__).resolve().parent
+FORM_STATE_PATH = os.getenv("FORM_STATE", str(SCRAPER_DIR / "form_state.json"))
+RESULTS_CSV_PATH = os.getenv("RESULTS_CSV", str(SCRAPER_DIR.parent / "public" / "assets" / "csv" / "results.csv"))
+FULL_RECONCILE_EVERY = int(os.getenv("FORM_FULL_RECONCILE_EVERY", "24"))  # runs between full re-reads
+NEW_ROWS_PAGE = int(os.getenv("FORM_NEW_ROWS_PAGE", "500"))  # rows read at a time past the last one read
+TIMESTAMP_COLUMN = 0  # every response has its submission time here; the sheet's grid has blank rows to spare
+
+ALUMNI_GATHERINGS = FormRule(
+    name="alumni_gatherings",
+    description="alumni gatherings",
+    spreadsheet_key="1EOURh5B5mKy0AjAgTKMObYtdmvZGI8txVC18DCmlA5o",
+    school_column=2,
+    hoos_pattern="Brody",
+    hokies_pattern="Tech",
+    qualifier=MinNames(column=4, minimum=4),  # enough people came to the gathering
+    hoos_csv_column="uva_alumni_gatherings",
+    hokies_csv_column="vt_alumni_gatherings",
+)
+MITZVAH_MEMORIES = FormRule(
+    name="mitzvah_memories",
+    description="mitzvah memories",
+    spreadsheet_key="1odvHzGY6O6buqlKSuFWx5WMfh0M2PGPCCJOVvXD8pko",
+    school_column=3,
+    hoos_pattern="University",
+    hokies_pattern="Tech",
+    qualifier=Equals(column=4, value="Yes"),  # alumni
+    hoos_csv_column="uva_mitzvah_memories",
+    hokies_csv_column="vt_mitzvah_memories",
+)
+ALUMNI_MEMORIES = FormRule(
+    name="alumni_memories",
+    description="alumni memories",
+    spreadsheet_key="128regkVYg_RqRyZszxBHpIv1z7RkM0_HQlDBr58xkCc",
+    school_column=3,
+    hoos_pattern="University",
+    hokies_pattern="Tech",
+    qualifier=Equals(column=4, value="Yes"),  # young alumni
+    hoos_csv_column="alumniMemoriesUVA",
+    hokies_csv_column="alumniMemoriesTech",
+    enabled=False,  # enable if/when alumni memories are used
+)
+FORM_RULES = [ALUMNI_GATHERINGS, MITZVAH_MEMORIES, ALUMNI_MEMORIES]
+
 
 @dataclass
-class SubmittedData:
-    """Tracks score data for both schools."""
+class SheetProgress:
+    """How far into a form's (append-only) responses sheet we've read, and the counts so far."""
+    last_row: int = 1  # the last row read, starting at the header row
     hokies: int = 0
     hoos: int = 0
+    runs_since_full: int = 0
+
+
+def _responses(rows: List[List[str]]) -> List[List[str]]:
+    """The rows up to the first without a timestamp, past the last response."""
+    end = next((i for i, row in enumerate(rows) if not row[TIMESTAMP_COLUMN]), len(rows))
+    return rows[:end]
 
 
 class SubmissionUpdater:
     """Main class that retrieves, processes, and updates submission data."""
 
-    def __init__(self, credentials_path: str, results_csv_path: str):
-        self.gc = gspread.service_account(filename=credentials_path)
+    def __init__(self, credentials_path: Optional[str], results_csv_path: str, state_path: Optional[str] = None,
+                 full_reconcile_every: int = FULL_RECONCILE_EVERY, gc: Optional[gspread.Client] = None):
+        self.gc = gc or gspread.service_account(filename=credentials_path)
         self.results_csv_path = results_csv_path
-        self.df = pd.read_csv(results_csv_path)
+        self.df: Optional[pd.DataFrame] = None
+        self.state_path = state_path
+        self.full_reconcile_every = full_reconcile_every
+        self.progress = self._load_progress()
 
     # ---------- Data Retrieval Methods ---------- #
 
     def get_alumni_gatherings(self) -> SubmittedData:
         """Gets alumni gathering information."""
-        sh = self.gc.open_by_key("1EOURh5B5mKy0AjAgTKMObYtdmvZGI8txVC18DCmlA5o")
-        rows = sh.sheet1.get_all_values()
-        rows.pop(0)  # remove header
-
-        data = SubmittedData()
-        for row in rows:
-            raw_names = row[4]
-
-            # Normalize separators: treat commas and newlines as equivalent
-            # Replace newlines with commas, then split
-            normalized = raw_names.replace("\r\n", "\n").replace("\r", "\n")
-            normalized = normalized.replace("\n", ",")  # unify separators
-
-            # Split into individual names, strip whitespace, and remove empty entries
-            names = [n.strip() for n in normalized.split(",") if n.strip()]
-
-            # Check if we have at least 4 names
-            enough_people = len(names) >= 4
-
-            if "Brody" in row[2] and enough_people:
-                data.hoos += 1
-            if "Tech" in row[2] and enough_people:
-                data.hokies += 1
-
-        return data
+        return self.count_submissions([ALUMNI_GATHERINGS])[ALUMNI_GATHERINGS.name]
 
     def get_alumni_memories(self) -> SubmittedData:
         """Gets alumni hillel memory information."""
-        sh = self.gc.open_by_key("128regkVYg_RqRyZszxBHpIv1z7RkM0_HQlDBr58xkCc")
-        rows = sh.sheet1.get_all_values()
-        rows.pop(0)
-
-        data = SubmittedData()
-        for row in rows:
-            young_alumni = row[4] == "Yes"
-
-            if "University" in row[3] and young_alumni:
-                data.hoos += 1
-            if "Tech" in row[3] and young_alumni:
-                data.hokies += 1
-
-        return data
+        return self.count_submissions([ALUMNI_MEMORIES])[ALUMNI_MEMORIES.name]
 
     def get_mitzvah_memories(self) -> SubmittedData:
         """Gets mitzvah memory information."""
-        sh = self.gc.open_by_key("1odvHzGY6O6buqlKSuFWx5WMfh0M2PGPCCJOVvXD8pko")
-        rows = sh.sheet1.get_all_values()
-        rows.pop(0)
-
-        data = SubmittedData()
-        for row in rows:
-            alumni = row[4] == "Yes"
-
-            if "University" in row[3] and alumni:
-                data.hoos += 1
-            if "Tech" in row[3] and alumni:
-                data.hokies += 1
-
-        return data
+        return self.count_submissions([MITZVAH_MEMORIES])[MITZVAH_MEMORIES.name]
+
+    def count_submissions(self, rules: List[FormRule]) -> Dict[str, SubmittedData]:
+        """Read the new rows of each rule's sheet, score them all in one batch, and add them to the running counts."""
+        reads = {rule.name: self._read_new_rows(rule) for rule in rules}
+        batch = [(rule, reads[rule.name][0]) for rule in rules]
+        new_scores = score_batch(batch)
+
+        scores = {}
+        for rule in rules:
+            progress = self.progress[rule.spreadsheet_key]
+            progress.last_row = reads[rule.name][1]
+            progress.hoos += new_scores[rule.name].hoos
+            progress.hokies += new_scores[rule.name].hokies
+            scores[rule.name] = SubmittedData(hokies=progress.hokies, hoos=progress.hoos)
+        return scores
+
+    # ---------- Incremental Reads ---------- #
+
+    def _read_new_rows(self, rule: FormRule) -> Tuple[List[List[str]], int]:
+        """
+        Read the rows of a form's sheet added since the last run; returns them, and the last row read.
+
+        Responses are append-only, so the counts from earlier runs are kept and just the rows past
+        the last one read are fetched, a page at a time up to the first without a timestamp. Every
+        `full_reconcile_every` runs (or if rows disappear) the whole sheet is re-read and the counts
+        restarted instead, in case earlier responses were edited. Either way only the timestamps and
+        the columns the rule scores are fetched, not (say) the memories themselves.
+        """
+        spreadsheet_key = rule.spreadsheet_key
+        columns = {TIMESTAMP_COLUMN, *rule.columns}
+        with run_report.span("sheets_read", api_calls=1) as stage:
+            ws = self.gc.open_by_key(spreadsheet_key).sheet1
+            progress = self.progress.get(spreadsheet_key)
+            rows = None
+            if progress is not None and progress.runs_since_full + 1 < self.full_reconcile_every:
+                rows = self._read_rows_after(ws, columns, progress.last_row, stage)
+            if rows is None:
+                stage.add(api_calls=1)
+                rows = _responses(read_rows(ws, columns, first_row=2))  # after the header
+                progress = self.progress[spreadsheet_key] = SheetProgress()
+            else:
+                progress.runs_since_full += 1
+            stage.add(items=len(rows), nbytes=payload_size(rows))
+        return rows, progress.last_row + len(rows)
+
+    @staticmethod
+    def _read_rows_after(ws, columns, last_row: int, stage) -> Optional[List[List[str]]]:
+        """
+        The responses after the last row read, paging from that row (to check it's still there) to
+        the first row without a timestamp; None if that row has gone (responses were removed).
+        """
+        rows, start = [], last_row
+        while True:
+            stage.add(api_calls=1)
+            filled = _responses(read_rows(ws, columns, start, start + NEW_ROWS_PAGE - 1))
+            if start == last_row:
+                if not filled:
+                    return None
+                rows += filled[1:]  # past the row already read
+            else:
+                rows += filled
+            if len(filled) < NEW_ROWS_PAGE:
+                return rows
+            start += NEW_ROWS_PAGE
+
+    def _load_progress(self) -> Dict[str, SheetProgress]:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, encoding="utf-8") as f:
+            return {key: SheetProgress(**progress) for key, progress in json.load(f).items()}
+
+    def save_progress(self):
+        """Persist how far into each sheet we've read, so the next run only reads new rows."""
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({key: asdict(progress) for key, progress in self.progress.items()}, f, indent=2)
+        os.replace(tmp_path, self.state_path)
 
     # ---------- Data Update ---------- #
 
+    def column_updates(self) -> Dict[str, int]:
+        """Fetches all data sources, returning the results columns to update."""
+        rules = [rule for rule in FORM_RULES if rule.enabled]
+        scores = self.count_submissions(rules)
+        updates = {}
+        for rule in rules:
+            print(f"📊 Updating {rule.description}...")
+            print("    ", scores[rule.name])
+            updates[rule.hoos_csv_column] = int(scores[rule.name].hoos)
+            updates[rule.hokies_csv_column] = int(scores[rule.name].hokies)
+        return updates
+
     def update_results(self):
         """Fetches all data sources and updates the results CSV."""
-        print("📊 Updating alumni gatherings...")
-        alumni_gatherings_score = self.get_alumni_gatherings()
-        print("    ", alumni_gatherings_score)
-        self.df.loc[0, "uva_alumni_gatherings"] = int(alumni_gatherings_score.hoos)
-        self.df.loc[0, "vt_alumni_gatherings"] = int(alumni_gatherings_score.hokies)
-
-        print("📸 Updating mitzvah memories...")
-        mitzvah_memories_score = self.get_mitzvah_memories()
-        print("    ", mitzvah_memories_score)
-        self.df.loc[0, "uva_mitzvah_memories"] = int(mitzvah_memories_score.hoos)
-        self.df.loc[0, "vt_mitzvah_memories"] = int(mitzvah_memories_score.hokies)
-
-        # Uncomment if/when alumni memories are used
-        # print("🎞️ Updating alumni memories...")
-        # alumni_memories_score = self.get_alumni_memories()
-        # self.df.loc[0, "alumniMemoriesUVA"] = int(alumni_memories_score.hoos)
-        # self.df.loc[0, "alumniMemoriesTech"] = int(alumni_memories_score.hokies)
-
-        # Save updated CSV
-        self.df.to_csv(self.results_csv_path, index=False)
+        updates = self.column_updates()
+        with run_report.span("csv_write", items=len(updates)):
+            self.df = update_results(self.results_csv_path, updates, feed_path=FEED_PATH)
+        self.save_progress()  # only once the counts it covers are safely written
         print("✅ Results CSV updated successfully!")
 
 
@@ -126,10 +218,13 @@ class SubmissionUpdater:
 def main():
     updater = SubmissionUpdater(
         credentials_path="spreadsheet_credentials.json",
-        results_csv_path="../public/assets/csv/results.csv",
+        results_csv_path=RESULTS_CSV_PATH,
+        state_path=FORM_STATE_PATH,
     )
     updater.update_results()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Update results.csv from the Google Form sheets.")
+    Instrumentation.add_arguments(parser)
+    Instrumentation.run("google-forms", main, parser.parse_args())
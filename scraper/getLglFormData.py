@@ -1,19 +1,32 @@
+import argparse
 import email
+import json
 import os
+from datetime import datetime, timezone
+from email.parser import BytesHeaderParser
 from email.policy import default
 
-import gspread
-import pandas as pd
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from imapclient import IMAPClient
 
-from .CalculateValues import CalculateValues
-from .EmailParser import EmailParser, determine_source
+# Sheets, pandas and BeautifulSoup are only imported once there's something to do: a run that finds
+# no new emails doesn't need them, and importing them takes longer than the rest of the run
+from .Campaign import Campaign, active_campaign, get_campaign
+from .ChangeFeed import FEED_PATH
+from .DonorIdentity import DONOR_INDEX_PATH, DonorIndex
+from .EmailArchive import EmailArchive
+from .EmailParser import PARSER_VERSION, EmailParser, determine_source
+from .LglFetcher import LglFetcher
+from . import Instrumentation
+from .Instrumentation import run_report
+from .Quarantine import QUARANTINED_KEYWORD, QuarantineStore
+from .ResultsHistory import HISTORY_DIR
 
 # ===== CONFIG =====
 load_dotenv()  # assumes .env in same dir
 IMAP_SERVER = os.getenv("IMAP_SERVER", "imap.gmail.com")
+IMAP_PORT = int(os.getenv("IMAP_PORT", "993"))
+IMAP_SSL = os.getenv("IMAP_SSL", "true").lower() == "true"
 EMAIL_ACCOUNT = os.getenv("EMAIL_ACCOUNT")
 EMAIL_PASSWORD = os.getenv("EMAIL_APP_PASSWORD")
 
@@ -21,8 +34,18 @@ MAILBOX = os.getenv("MAILBOX", "INBOX")
 FROM_FILTER = os.getenv("FROM_FILTER", "lglforms-submissions@littlegreenlight.com")
 
 SPREADSHEET_KEY = os.getenv("SPREADSHEET_KEY")
-SPREADSHEET_SHEET = os.getenv("SPREADSHEET_SHEET", "entries")
+SPREADSHEET_SHEET = os.getenv("SPREADSHEET_SHEET")  # overrides the campaign's own entries worksheet
 CSV_PATH = os.getenv("RESULTS_CSV", "public/assets/csv/results.csv")
+QUARANTINE_DIR = os.getenv("QUARANTINE_DIR", "quarantine")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+# archive each email as sent (fetching it whole), or just as rebuilt from its headers and HTML (marked derived)
+ARCHIVE_RAW = os.getenv("ARCHIVE_RAW", "true").lower() == "true"
+DONATION_LOG_DIR = os.getenv("DONATION_LOG", "donation_log")
+METRICS_FROM_LOG = os.getenv("METRICS_FROM_LOG", "false").lower() == "true"  # rebuild metrics from the donation log
+# the emails entered into the sheet whose results haven't been written yet; they're left unread until they are
+PENDING_PATH = os.getenv("LGL_PENDING", "lgl_pending.json")
+# set on an email in the mailbox as soon as it's entered, so it's never entered twice, even if PENDING_PATH is lost
+ENTERED_KEYWORD = "$Entered"
 
 
 # ===== FUNCTIONS =====
@@ -36,7 +59,12 @@ def parse_lgl_email(raw_msg):
     if html_part is None:
         raise ValueError("Email has no HTML part")
 
-    html = html_part.get_content()
+    return email_from, parse_lgl_html(html_part.get_content())
+
+
+def parse_lgl_html(html):
+    """Parse the 2-column HTML table of an LGL email into a dict of form fields."""
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, "html.parser")
 
     data = {}
@@ -53,87 +81,389 @@ def parse_lgl_email(raw_msg):
             val = cells[1].get_text(strip=True)
             data[key] = val
 
-    return email_from, data
+    return data
 
 
-def update_google_sheet(gc, normalized_row):
-    sh = gc.open_by_key(SPREADSHEET_KEY)
-    try:
-        ws = sh.worksheet(SPREADSHEET_SHEET)
-    except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=SPREADSHEET_SHEET, rows="1000", cols=str(len(normalized_row)))
+def entries_worksheet(campaign: Campaign) -> str:
+    return SPREADSHEET_SHEET or campaign.entries_worksheet
 
-    # Ensure the headers exist
-    headers = ws.row_values(1)
-    if not headers:
-        ws.append_row(list(normalized_row.keys()))  # add headers if sheet is empty
 
-    # Append the normalized row
-    ws.append_row(list(normalized_row.values()))
+def sheets_client():
+    import gspread
+    return gspread.service_account(filename='spreadsheet_credentials.json')
 
 
-def update_local_csv():
-    calc = CalculateValues(spreadsheet_key=SPREADSHEET_KEY)
-    metrics = calc.calculate_all()
-    df = pd.read_csv(CSV_PATH)
+def entry_shards(gc, worksheet):
+    """The shards of a campaign's entries worksheet."""
+    from .EntryShards import EntryShards
+    return EntryShards(gc.open_by_key(SPREADSHEET_KEY), worksheet)
 
-    for school_code, school_metrics in metrics.items():
-        for metric_name, value in school_metrics.items():
-            # Flatten any list or set into a comma-separated string
-            if isinstance(value, (list, set)):
-                value = ", ".join(map(str, value))
 
-            # Construct CSV column name
-            csv_col = f"{school_code}_{metric_name}"
+def update_google_sheet(gc, normalized_row, worksheet=None, shards=None):
+    """Append a normalized row to the campaign's open entries shard (pass `shards` to reuse one across a run)."""
+    worksheet = worksheet or entries_worksheet(active_campaign())
+    with run_report.span("sheets_write", items=1) as stage:
+        shards = shards or entry_shards(gc, worksheet)
+        calls = shards.api_calls
+        shards.append(normalized_row)
+        stage.add(api_calls=shards.api_calls - calls)
 
-            # If column exists in CSV, update; else optionally create
-            if csv_col in df.columns:
-                df[csv_col] = df[csv_col].astype(object)
-                df.at[0, csv_col] = value
-            else:
-                # Optionally create the column if it doesn't exist
-                df[csv_col] = pd.Series([value], dtype=object)
 
-        # 5. Write CSV back
-    df.to_csv(CSV_PATH, index=False)
+def metric_updates(campaign=None, gc=None):
+    """Calculate the campaign's donation metrics as results column updates."""
+    from .CalculateValues import METRIC_STATE_PATH, CalculateValues, load_precomputed
+    from .Results import metric_columns
+    from .StreamingMetrics import METRIC_STREAM_ROWS, sheet_chunks, stream_metrics
+    campaign = campaign or active_campaign()
+    metrics = load_precomputed(campaign) if campaign.closed() else None
+    if metrics is None and METRICS_FROM_LOG:
+        # the latest snapshot of the donation log, and the donations logged since
+        from .DonationLog import DonationLog
+        with run_report.span("metrics"):
+            metrics = DonationLog(DONATION_LOG_DIR).metrics(campaign.id)
+    elif metrics is None and METRIC_STREAM_ROWS:
+        # a chunk of entries at a time, rather than all of them at once
+        chunks = sheet_chunks(SPREADSHEET_KEY, entries_worksheet(campaign), METRIC_STREAM_ROWS, gc)
+        metrics = stream_metrics(chunks, DonorIndex(DONOR_INDEX_PATH))
+    elif metrics is None:
+        calc = CalculateValues(spreadsheet_key=SPREADSHEET_KEY, worksheet_name=entries_worksheet(campaign), gc=gc,
+                               donors=DonorIndex(DONOR_INDEX_PATH), state_path=METRIC_STATE_PATH)
+        with run_report.span("metrics"):
+            metrics = calc.calculate_all()
+    return metric_columns(metrics)
+
+
+def update_local_csv(campaign=None):
+    from .Results import update_results
+    updates = metric_updates(campaign)
+    with run_report.span("csv_write", items=len(updates)):
+        update_results(CSV_PATH, updates, HISTORY_DIR, FEED_PATH)
     print("Local CSV updated successfully.")
 
 
 # ===== MAIN SCRIPT =====
-def main():
-    # Connect to Gmail
-    with IMAPClient(IMAP_SERVER, ssl=True) as server:
-        server.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
-        server.select_folder(MAILBOX)
+def connect_imap():
+    """Connect to Gmail IMAP and select the mailbox, noting its UIDVALIDITY (UIDs are only unique within it)."""
+    server = IMAPClient(IMAP_SERVER, port=IMAP_PORT, ssl=IMAP_SSL)
+    server.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
+    selected = server.select_folder(MAILBOX)
+    server.uid_validity = int(selected.get(b"UIDVALIDITY", 0))
+    return server
+
+
+def donated_at(raw_msg, received=None):
+    """When a donation was made: its email's Date, or failing that when the server received it (ISO 8601, UTC)."""
+    date = BytesHeaderParser(policy=default).parsebytes(raw_msg).get("Date")
+    when = getattr(date, "datetime", None) or received
+    if when is None:
+        return ""
+    if when.tzinfo is None:
+        # a Date of "-0000" is in UTC, whereas IMAPClient hands back received times in local time
+        when = when.replace(tzinfo=timezone.utc) if date is not None else when.astimezone()
+    return when.astimezone(timezone.utc).isoformat()
+
+
+def normalize_lgl_email(normalizer, raw_msg, campaign=None, received=None):
+    """Parse a raw LGL email and normalize it into a row for the entries sheet, tagged with its campaign."""
+    with run_report.span("parse", items=1):
+        from_email, data = parse_lgl_email(raw_msg)
+    return _normalize(normalizer, from_email, data, campaign, donated_at(raw_msg, received))
+
+
+def normalize_fetched_email(normalizer, fetched, campaign=None):
+    """Normalize an email from the LglFetcher, parsing just its HTML when that's all that was fetched."""
+    if fetched.html is None:
+        return normalize_lgl_email(normalizer, fetched.raw, campaign, fetched.received)
+    with run_report.span("parse", items=1):
+        data = parse_lgl_html(fetched.html)
+    return _normalize(normalizer, fetched.sender, data, campaign, donated_at(fetched.raw, fetched.received))
+
+
+def _normalize(normalizer, from_email, data, campaign, donated):
+    print(from_email, data)
+    with run_report.span("normalize", items=1):
+        normalized_row = normalizer.normalize(data, determine_source(from_email, data.get("Form title", "")))
+    normalized_row["donated at"] = donated
+    normalized_row["campaign"] = (campaign or active_campaign()).id
+    return normalized_row
+
+
+def _parse_result(normalized_row):
+    """What's worth caching of a normalized row: everything but the campaign, which is tagged on each time."""
+    return {key: value for key, value in normalized_row.items() if key != "campaign"}
+
+
+def pending_emails():
+    """
+    The (UIDVALIDITY, UID) of each email entered into the sheet since the results were last written.
+
+    These are only marked read once results covering them are written (see `publish_pending`), so
+    a run that fails after entering them, say throttled while recalculating, leaves them unread, and
+    the poller triggers another run to catch the results up. Each is also flagged `ENTERED_KEYWORD`
+    in the mailbox, which is what keeps them from being entered again should this file be lost.
+    """
+    try:
+        with open(PENDING_PATH, encoding="utf-8") as f:
+            return [tuple(email) for email in json.load(f)]
+    except FileNotFoundError:
+        return []
+
+
+def _save_pending(pending):
+    tmp_path = PENDING_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pending, f)
+    os.replace(tmp_path, PENDING_PATH)
+
+
+def publish_pending():
+    """Once results covering them are written, mark the pending emails read and clear the marker."""
+    pending = pending_emails()
+    if not pending:
+        return
+    with connect_imap() as server:
+        uids = [uid for uid_validity, uid in pending if uid_validity == server.uid_validity]
+        if uids:  # else the mailbox was rebuilt, and the UIDs may now be other emails'
+            with run_report.span("imap_store", items=len(uids), api_calls=1):
+                server.add_flags(uids, ['\\Seen'])  # mark as read
+    os.remove(PENDING_PATH)
+
+
+def _flag_quarantined(server, uids):
+    with run_report.span("imap_store", items=len(uids), api_calls=1):
+        server.add_flags(uids, [QUARANTINED_KEYWORD])
 
-        # search for unread LGL emails
-        uids = server.search(['UNSEEN', 'FROM', FROM_FILTER])
+
+def _flag_entered(server, uids):
+    with run_report.span("imap_store", items=len(uids), api_calls=1):
+        server.add_flags(uids, [ENTERED_KEYWORD])
+
+
+def process_new_emails(gc=None, campaign=None):
+    """
+    Scrape every unread LGL email into the campaign's entries worksheet, adding each to the pending
+    emails (see `pending_emails`); returns how many were processed.
+    """
+    quarantine = QuarantineStore(QUARANTINE_DIR)
+    campaign = campaign or active_campaign()
+    worksheet = entries_worksheet(campaign)
+    pending = pending_emails()
+    processed = 0
+
+    # Connect to Gmail
+    with connect_imap() as server, EmailArchive(ARCHIVE_DIR) as archive:
+        # search for unread LGL emails, skipping any we already know we can't parse
+        with run_report.span("imap_search", api_calls=1) as stage:
+            uids = server.search(['UNSEEN', 'UNKEYWORD', QUARANTINED_KEYWORD, 'FROM', FROM_FILTER])
+            stage.add(items=len(uids))
+        quarantined = {uid for uid in uids if quarantine.contains(uid, server.uid_validity)}
+        if quarantined:
+            # quarantined before they were flagged; flag them now so they stop turning up
+            print(f"Skipping {len(quarantined)} quarantined LGL emails.")
+            _flag_quarantined(server, sorted(quarantined))
+            uids = [uid for uid in uids if uid not in quarantined]
+        entered = {uid for uid in uids if (server.uid_validity, uid) in pending}
+        if len(entered) < len(uids):
+            # flagged as entered, but missing from the pending emails (say their file was lost with a failed run)
+            with run_report.span("imap_search", api_calls=1):
+                flagged = set(server.search(['UNSEEN', 'KEYWORD', ENTERED_KEYWORD, 'FROM', FROM_FILTER]))
+            lost = sorted(uid for uid in uids if uid in flagged and uid not in entered)
+            if lost:
+                pending += [(server.uid_validity, uid) for uid in lost]
+                _save_pending(pending)
+                entered.update(lost)
+        if entered:
+            print(f"Skipping {len(entered)} LGL emails already entered, waiting on their results.")
+            uids = [uid for uid in uids if uid not in entered]
         if not uids:
             print("No unread LGL emails found.")
         else:
             print(f"Found {len(uids)} unread LGL emails.")
 
             # Connect to Google Sheets
+            from .DonationLog import DonationLog
+            log = DonationLog(DONATION_LOG_DIR)
             normalizer = EmailParser()
-            gc = gspread.service_account(filename='spreadsheet_credentials.json')
+            gc = gc or sheets_client()
+            shards = entry_shards(gc, worksheet)  # read the shard manifest once for the whole run
+
+            # fetch every message whole for the archive, or else just its sender and HTML
+            with run_report.span("imap_fetch", items=len(uids)) as stage:
+                fetcher = LglFetcher(server)
+                emails = fetcher.fetch(uids, whole=ARCHIVE_RAW)
+                stage.add(nbytes=fetcher.bytes, api_calls=fetcher.commands)
 
             for uid in uids:
-                msg_data = server.fetch(uid, ['BODY.PEEK[]'])  # rather than using RFC822 we're using BODY.PEEK
-                raw_msg = msg_data[uid][b'BODY[]']  # because it's more supported and leaves the message as unread
+                if uid not in emails:
+                    continue  # gone from the mailbox since the search
+                with run_report.span("archive", items=1, nbytes=len(emails[uid].raw)):
+                    archived = archive.put(emails[uid].raw, uid=uid, received=emails[uid].received,
+                                           derived=emails[uid].derived)
                 try:
-                    from_email, data = parse_lgl_email(raw_msg)
-                    print(from_email, data)
-                    normalized_row = normalizer.normalize(
-                        data, determine_source(from_email, data.get("Form title", "")))
-                    update_google_sheet(gc, normalized_row)  # data is raw from parse_lgl_email
-                    server.add_flags(uid, ['\\Seen'])  # mark as read
+                    normalized_row = normalize_fetched_email(normalizer, emails[uid], campaign)
+                    archive.store_parse(archived.digest, PARSER_VERSION, _parse_result(normalized_row))
+                except Exception as e:
+                    raw_msg = emails[uid].raw
+                    if emails[uid].derived:  # keep the email as sent, not what was rebuilt from its HTML
+                        with run_report.span("imap_fetch", items=1, api_calls=1) as stage:
+                            raw_msg = fetcher.fetch_raw([uid]).get(uid, raw_msg)
+                            stage.add(nbytes=len(raw_msg))
+                    quarantine.add(uid, raw_msg, str(e), server.uid_validity)
+                    _flag_quarantined(server, [uid])
+                    print(f"Failed to parse email UID {uid}, quarantining it: {e}")
+                    continue
+                try:
+                    update_google_sheet(gc, normalized_row, worksheet, shards)  # data is raw from parse_lgl_email
+                    _flag_entered(server, [uid])  # straight away, so nothing later on can enter it twice
+                    with run_report.span("donation_log", items=1):
+                        log.append(normalized_row, archived.message_id, PARSER_VERSION)
+                    pending.append((server.uid_validity, uid))
+                    _save_pending(pending)
+                    processed += 1
                     print(f"Processed email UID {uid}")
                 except Exception as e:
                     print(f"Failed to process email UID {uid}: {e}")
                     continue
+            log.checkpoint()
+    return processed
+
+
+def collect_updates(gc, campaign=None, force=False):
+    """
+    Process new emails, then return the updated donation metrics (for the combined results runner, which
+    calls `publish_pending` once they're written); with no donations pending there's nothing to update, so
+    the previous metrics stand.
+    """
+    campaign = campaign or active_campaign()
+    process_new_emails(gc, campaign)
+    if not pending_emails() and not force:
+        return {}
+    return metric_updates(campaign, gc)
+
+
+def main(force=False):
+    campaign = active_campaign()
+    process_new_emails(campaign=campaign)
+    if not pending_emails() and not force:
+        print("No new donations, so the results are unchanged.")
+        return
+    update_local_csv(campaign)
+    publish_pending()
+
+
+def retry_quarantine():
+    """Reprocess every quarantined LGL email, e.g. after a parser fix."""
+    quarantine = QuarantineStore(QUARANTINE_DIR)
+    entries = quarantine.entries()
+    if not entries:
+        print("No quarantined LGL emails to retry.")
+        return
+    print(f"Retrying {len(entries)} quarantined LGL emails.")
+
+    normalizer = EmailParser()
+    gc = sheets_client()
+    campaign = active_campaign()
+    shards = entry_shards(gc, entries_worksheet(campaign))
+    from .DonationLog import DonationLog
+    log = DonationLog(DONATION_LOG_DIR)
+    pending = pending_emails()
+    recovered = 0
+    with connect_imap() as server:
+        for entry in entries:
+            raw_msg = quarantine.load_raw(entry.uid, entry.uid_validity)
+            try:
+                normalized_row = normalize_lgl_email(normalizer, raw_msg, campaign)
+            except Exception as e:
+                quarantine.add(entry.uid, raw_msg, str(e), entry.uid_validity)
+                print(f"Email UID {entry.uid} still fails to parse: {e}")
+                continue
+            # the email is still in the mailbox, rather than one from before it was rebuilt
+            in_mailbox = (entry.uid_validity or server.uid_validity) == server.uid_validity
+            try:
+                update_google_sheet(gc, normalized_row, entries_worksheet(campaign), shards)
+                if in_mailbox:
+                    _flag_entered(server, [entry.uid])
+                log.append(normalized_row, QuarantineStore.message_id(raw_msg), PARSER_VERSION)
+                # marked read once the results are written (in the current mailbox, if from before UIDVALIDITY was kept)
+                pending.append((entry.uid_validity or server.uid_validity, entry.uid))
+                _save_pending(pending)
+            except Exception as e:
+                print(f"Failed to process email UID {entry.uid}: {e}")
+                continue
+            quarantine.remove(entry.uid, entry.uid_validity)
+            if in_mailbox:
+                server.remove_flags([entry.uid], [QUARANTINED_KEYWORD])
+            recovered += 1
+            print(f"Recovered quarantined email UID {entry.uid}")
+
+    print(f"Recovered {recovered} of {len(entries)} quarantined LGL emails.")
+    if recovered:
+        log.checkpoint()
+        update_local_csv(campaign)
+        publish_pending()
+
+
+def reprocess_archive(campaign=None, rewrite=False):
+    """
+    Rebuild a campaign's entries from the local archive, without going back to the mail server.
+
+    Emails the current parser version has already parsed come straight from the parse cache; the rest
+    are reparsed (and cached). With rewrite, the campaign's entries worksheet is replaced by the result.
+    """
+    campaign = campaign or active_campaign()
+    normalizer = EmailParser()
+    rows, cached, failed = [], 0, 0
+    with EmailArchive(ARCHIVE_DIR) as archive, run_report.span("reprocess") as stage:
+        for archived in archive.scan(campaign.opens(), campaign.closes()):
+            result = archive.cached_parse(archived.digest, PARSER_VERSION)
+            if result is not None:
+                cached += 1
+            else:
+                try:
+                    received = datetime.fromisoformat(archived.received) if archived.received else None
+                    result = _parse_result(normalize_lgl_email(normalizer, archive.get(archived.digest), campaign,
+                                                               received))
+                except Exception as e:
+                    failed += 1
+                    print(f"Archived email UID {archived.uid} fails to parse: {e}")
+                    continue
+                archive.store_parse(archived.digest, PARSER_VERSION, result)
+            rows.append({**result, "campaign": campaign.id})
+        stage.add(items=len(rows) + failed)
+    print(f"Reprocessed {len(rows)} archived LGL emails for campaign {campaign.id} "
+          f"({cached} from the parse cache, {failed} failed).")
+
+    if rewrite and rows:
+        rewrite_google_sheet(sheets_client(), rows,
+                             entries_worksheet(campaign))
+        update_local_csv(campaign)
+    return rows
+
 
-    update_local_csv()
+def rewrite_google_sheet(gc, normalized_rows, worksheet):
+    """Replace every entry of a campaign's shards with the given rows."""
+    with run_report.span("sheets_write", items=len(normalized_rows)) as stage:
+        shards = entry_shards(gc, worksheet)
+        shards.rewrite(normalized_rows)
+        stage.add(api_calls=shards.api_calls)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Scrape unread LGL emails into the entries sheet and results CSV.")
+    parser.add_argument("--retry-quarantine", action="store_true",
+                        help="reprocess the quarantined emails instead of checking for new ones")
+    parser.add_argument("--reprocess-archive", metavar="CAMPAIGN",
+                        help="reparse a campaign's archived emails instead of checking for new ones")
+    parser.add_argument("--rewrite", action="store_true",
+                        help="with --reprocess-archive, replace the campaign's entries worksheet with the result")
+    parser.add_argument("--force", action="store_true",
+                        help="recalculate the results even if there are no new emails")
+    Instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    if args.reprocess_archive:
+        job = lambda: reprocess_archive(get_campaign(args.reprocess_archive), args.rewrite)
+    elif args.retry_quarantine:
+        job = retry_quarantine
+    else:
+        job = lambda: main(args.force)
+    Instrumentation.run("lgl", job, args)
@@ -1,14 +1,27 @@
+import argparse
 import imaplib
+import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
 
 import requests
 from dotenv import load_dotenv
 
+from . import Instrumentation
+from .Instrumentation import run_report
+from .PollScheduler import PollScheduler
+from .Quarantine import QUARANTINED_KEYWORD
+
 # ====== CONFIGURATION ======
 load_dotenv()  # .env file in same directory
 
 IMAP_SERVER = os.getenv("IMAP_SERVER", "imap.gmail.com")
+IMAP_PORT = int(os.getenv("IMAP_PORT", "993"))
+IMAP_SSL = os.getenv("IMAP_SSL", "true").lower() == "true"
 EMAIL_ACCOUNT = os.getenv("EMAIL_ACCOUNT")
 EMAIL_PASSWORD = os.getenv("EMAIL_APP_PASSWORD")
 
@@ -20,26 +33,96 @@ GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO}/dispatches"
 MAILBOX = os.getenv("MAILBOX", "INBOX")
 FROM_FILTER = os.getenv("FROM_FILTER", "lglforms-submissions@littlegreenlight.com")
 
-IDLE_TIMEOUT = int(os.getenv("IDLE_TIMEOUT_SECONDS", "60"))  # seconds between polls
+# "campaign" adapts the interval to the campaign (see PollScheduler), "fixed" polls every IDLE_TIMEOUT seconds
+POLL_SCHEDULE = os.getenv("POLL_SCHEDULE", "campaign")
+IDLE_TIMEOUT = int(os.getenv("IDLE_TIMEOUT_SECONDS", "60"))  # seconds between fixed polls
+
+WATCH_TARGETS = os.getenv("WATCH_TARGETS")  # a JSON file of mailboxes to watch, instead of the single one above
+POLL_WORKERS = int(os.getenv("POLL_WORKERS", "4"))  # mailboxes polled at once, however many there are
+MAX_BACKOFF = int(os.getenv("POLL_MAX_BACKOFF_SECONDS", "900"))
+RETRIGGER_AFTER = int(os.getenv("RETRIGGER_AFTER_SECONDS", "600"))  # re-dispatch if emails stay unread this long
 
 
 # ===========================
 
 
-def connect_mailbox():
-    """Connect to Gmail IMAP and select the mailbox."""
-    mail = imaplib.IMAP4_SSL(IMAP_SERVER)
-    mail.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
-    mail.select(MAILBOX)
+@dataclass(frozen=True)
+class WatchTarget:
+    """One mailbox to watch, and the workflow event to dispatch when LGL emails arrive in it."""
+    name: str
+    account: str
+    password: str = field(repr=False)
+    mailbox: str = "INBOX"
+    from_filter: str = "lglforms-submissions@littlegreenlight.com"
+    event_type: str = "lgl-form-submission"
+    server: str = "imap.gmail.com"
+    port: int = 993
+    ssl: bool = True
+
+
+@dataclass
+class TargetState:
+    """What the poller knows about one target: its open connection, failures, and the newest email seen."""
+    target: WatchTarget
+    connection: Optional[imaplib.IMAP4] = None
+    failures: int = 0
+    next_poll: float = 0.0
+    last_seen_uid: int = 0
+    last_triggered: float = 0.0
+    arrivals: int = 0  # new emails found by the latest poll
+    scheduler: Optional[PollScheduler] = None
+    dormant: bool = False
+
+
+def default_target() -> WatchTarget:
+    """The single target described by the environment (EMAIL_ACCOUNT, MAILBOX, FROM_FILTER, ...)."""
+    return WatchTarget(name=MAILBOX, account=EMAIL_ACCOUNT, password=EMAIL_PASSWORD, mailbox=MAILBOX,
+                       from_filter=FROM_FILTER, event_type=EVENT_TYPE, server=IMAP_SERVER, port=IMAP_PORT,
+                       ssl=IMAP_SSL)
+
+
+def load_targets(path: Optional[str] = None) -> List[WatchTarget]:
+    """
+    Load the targets to watch from a JSON list, e.g.
+        [{"name": "vt", "account": "vt@example.com", "password_env": "VT_APP_PASSWORD",
+          "mailbox": "LGL/VT", "event_type": "lgl-form-submission"}]
+    Passwords are read from the environment variable named by `password_env`, so they stay out
+    of the file. Without a file, the single target from the environment is watched.
+    """
+    path = path or WATCH_TARGETS
+    if not path:
+        return [default_target()]
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    targets = []
+    for entry in entries:
+        entry = dict(entry)
+        password = os.getenv(entry.pop("password_env", "EMAIL_APP_PASSWORD"))
+        targets.append(WatchTarget(password=password, **entry))
+    return targets
+
+
+def connect_mailbox(target: Optional[WatchTarget] = None):
+    """Connect to the target's IMAP server and select its mailbox."""
+    target = target or default_target()
+    with run_report.span("imap_connect", api_calls=2):
+        if target.ssl:
+            mail = imaplib.IMAP4_SSL(target.server, target.port)
+        else:
+            mail = imaplib.IMAP4(target.server, target.port)
+        mail.login(target.account, target.password)
+        mail.select(target.mailbox)
     return mail
 
 
-def trigger_github_action():
-    """Trigger the GitHub Actions workflow for an LGL form submission."""
+def trigger_github_action(target: Optional[WatchTarget] = None):
+    """Trigger the GitHub Actions workflow for an LGL form submission, with the target's event type."""
+    target = target or default_target()
     payload = {
-        "event_type": EVENT_TYPE,
+        "event_type": target.event_type,
         "client_payload": {
-            "message": f"New unread email from {FROM_FILTER} detected"
+            "message": f"New unread email from {target.from_filter} detected in {target.name}",
+            "target": target.name,
         },
     }
     headers = {
@@ -47,40 +130,137 @@ def trigger_github_action():
         "Accept": "application/vnd.github.v3+json",
     }
 
-    response = requests.post(GITHUB_API_URL, json=payload, headers=headers)
+    with run_report.span("dispatch", items=1, api_calls=1):
+        response = requests.post(GITHUB_API_URL, json=payload, headers=headers)
     if response.status_code == 204:
         print("✅ GitHub Action triggered successfully.")
     else:
         print(f"❌ Failed to trigger GitHub Action: {response.status_code} - {response.text}")
 
 
-def check_for_unread_lgl_emails(mail):
-    """Check for unread emails from the LGL sender."""
-    status, response = mail.search(None, f'(UNSEEN FROM "{FROM_FILTER}")')
-    if status != "OK":
-        print("⚠️ Error searching mailbox.")
-        return False
+def check_for_unread_lgl_emails(mail, target: Optional[WatchTarget] = None, state: Optional[TargetState] = None):
+    """
+    Check for unread emails from the LGL sender, triggering the workflow if there are any.
 
-    unread_ids = response[0].split()
-    if unread_ids:
-        print(f"📧 Found {len(unread_ids)} unread email(s) from {FROM_FILTER}. Triggering GitHub Action...")
-        trigger_github_action()
-        return True
-    else:
-        print("💤 No unread emails from LGL found.")
+    With a target's state, the workflow is only triggered for emails newer than the last ones it
+    was triggered for (or if they've stayed unread for RETRIGGER_AFTER seconds), rather than on
+    every poll while they wait to be processed.
+    """
+    target = target or default_target()
+    with run_report.span("imap_search", api_calls=1) as stage:
+        # quarantined emails stay unread, but there's nothing a run can do with them
+        status, response = mail.uid("search", None,
+                                    f'(UNSEEN UNKEYWORD {QUARANTINED_KEYWORD} FROM "{target.from_filter}")')
+        if status != "OK":
+            print(f"⚠️ Error searching {target.name}.")
+            return False
+
+        unread_uids = [int(uid) for uid in response[0].split()]
+        stage.add(items=len(unread_uids))
+    if not unread_uids:
+        print(f"💤 No unread emails from LGL found in {target.name}.")
         return False
 
+    if state is not None:
+        state.arrivals = sum(uid > state.last_seen_uid for uid in unread_uids)
+        newest = max(unread_uids)
+        if newest <= state.last_seen_uid and time.monotonic() - state.last_triggered < RETRIGGER_AFTER:
+            print(f"⏳ {len(unread_uids)} unread email(s) in {target.name} already dispatched, waiting on them.")
+            return False
+        state.last_seen_uid = max(newest, state.last_seen_uid)
+        state.last_triggered = time.monotonic()
+    print(f"📧 Found {len(unread_uids)} unread email(s) from {target.from_filter} in {target.name}. "
+          f"Triggering GitHub Action...")
+    trigger_github_action(target)
+    return True
 
-def main():
-    while True:
+
+class Poller:
+    """
+    Polls every watch target from one process. Whenever targets are due they're polled by a small,
+    fixed pool of threads, so adding targets adds connections but not threads. Each target keeps
+    its own connection open between polls, backs off on its own when it fails, and (unless a fixed
+    interval is given) has its own schedule, following the campaign and how busy it is.
+    """
+
+    def __init__(self, targets: List[WatchTarget], interval: Optional[float] = None, workers: int = POLL_WORKERS):
+        self.interval = interval
+        self.states = [TargetState(target, scheduler=None if interval is not None else PollScheduler())
+                       for target in targets]
+        self.pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(self.states))))
+
+    def poll(self, state: TargetState) -> bool:
+        """Poll one target, reconnecting if needed; on failure, back off exponentially."""
+        now = datetime.now(timezone.utc)
+        if state.scheduler is not None and not state.scheduler.active(now):
+            self._disconnect(state)  # there's nothing to poll for until the campaign opens
+            state.next_poll = time.monotonic() + state.scheduler.interval(now)
+            if not state.dormant:
+                print(f"😴 No campaign running, {state.target.name} is going dormant.")
+                state.dormant = True
+            return False
+        state.dormant = False
+
+        state.arrivals = 0
         try:
-            mail = connect_mailbox()
-            check_for_unread_lgl_emails(mail)
-            mail.logout()
+            if state.connection is None:
+                state.connection = connect_mailbox(state.target)
+            triggered = check_for_unread_lgl_emails(state.connection, state.target, state)
         except Exception as e:
-            print(f"❌ Error during polling: {e}")
-        time.sleep(IDLE_TIMEOUT)
+            print(f"❌ Error during polling {state.target.name}: {e}")
+            self._disconnect(state)
+            state.failures += 1
+            interval = self._interval(state, now)
+            state.next_poll = time.monotonic() + min(interval * 2 ** state.failures, max(MAX_BACKOFF, interval))
+            return False
+        state.failures = 0
+        if state.scheduler is not None:
+            state.scheduler.observe(state.arrivals, now)
+        state.next_poll = time.monotonic() + self._interval(state, now)
+        return triggered
+
+    def _interval(self, state: TargetState, now: datetime) -> float:
+        return self.interval if state.scheduler is None else state.scheduler.interval(now)
+
+    def poll_due(self) -> List[TargetState]:
+        """Poll (concurrently) every target that's due; returns the ones polled."""
+        now = time.monotonic()
+        due = [state for state in self.states if state.next_poll <= now]
+        list(self.pool.map(self.poll, due))
+        return due
+
+    def run(self):
+        while True:
+            self.poll_due()
+            next_poll = min(state.next_poll for state in self.states)
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+
+    def close(self):
+        for state in self.states:
+            self._disconnect(state)
+        self.pool.shutdown()
+
+    @staticmethod
+    def _disconnect(state: TargetState):
+        if state.connection is not None:
+            try:
+                state.connection.logout()
+            except Exception:
+                pass  # it's already gone
+            state.connection = None
+
+
+def main():
+    targets = load_targets()
+    print(f"👀 Watching {', '.join(target.name for target in targets)}")
+    poller = Poller(targets, interval=IDLE_TIMEOUT if POLL_SCHEDULE == "fixed" else None)
+    try:
+        poller.run()
+    finally:
+        poller.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Poll the mailbox for LGL emails and trigger the update workflow.")
+    Instrumentation.add_arguments(parser)
+    Instrumentation.run("poll", main, parser.parse_args())
@@ -0,0 +1,562 @@
+"""
+An in-process IMAP server stand-in.
+
+It speaks just enough IMAP4rev1 (over plain TCP on localhost) for `IMAPClient` and `imaplib` to
+log in, select a mailbox, SEARCH, FETCH (including BODY.PEEK, BODYSTRUCTURE and body sections),
+STORE flags and IDLE, so the
+scraper can be exercised end-to-end without Gmail. Every command is counted, as are the bytes
+sent back, so tests and load runs can see how much IMAP work the scraper does.
+"""
+
+import email
+import re
+import socket
+import socketserver
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from email import policy
+from email.policy import default
+from typing import Dict, List, Optional, Set
+
+CAPABILITIES = "IMAP4rev1 IDLE UIDPLUS"
+LITERAL = re.compile(rb"\{(\d+)\}\r\n$")
+BODY_SECTION = re.compile(rb"^BODY(\.PEEK)?\[(.*)\]$", re.DOTALL)
+
+
+@dataclass
+class FakeMessage:
+    """A message stored in a fake mailbox."""
+    uid: int
+    raw: bytes
+    flags: Set[str] = field(default_factory=set)
+    internal_date: float = field(default_factory=time.time)
+
+    @property
+    def headers(self):
+        return email.message_from_bytes(self.raw, policy=default)
+
+
+class FakeMailbox:
+    """A single mailbox (folder) of messages, in arrival order."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.messages: List[FakeMessage] = []
+        self.uid_validity = 1
+        self.next_uid = 1
+
+
+# ---------- Protocol Helpers ---------- #
+
+def _tokenize(data: bytes, pos: int = 0, closing: Optional[bytes] = None):
+    """Split IMAP command arguments into atoms, strings, literals and (nested) lists."""
+    tokens = []
+    while pos < len(data):
+        char = data[pos:pos + 1]
+        if char in (b" ", b"\r", b"\n"):
+            pos += 1
+        elif char == closing:
+            return tokens, pos + 1
+        elif char == b"(":
+            inner, pos = _tokenize(data, pos + 1, b")")
+            tokens.append(inner)
+        elif char == b'"':
+            end = pos + 1
+            value = bytearray()
+            while data[end:end + 1] != b'"':
+                if data[end:end + 1] == b"\\":
+                    end += 1
+                value += data[end:end + 1]
+                end += 1
+            tokens.append(bytes(value))
+            pos = end + 1
+        elif char == b"{":
+            end = data.index(b"}", pos)
+            size = int(data[pos + 1:end].rstrip(b"+"))
+            start = data.index(b"\n", end) + 1
+            tokens.append(data[start:start + size])
+            pos = start + size
+        else:
+            end, depth = pos, 0
+            while end < len(data):
+                c = data[end:end + 1]
+                if c in (b"[", b"<"):
+                    depth += 1
+                elif c in (b"]", b">"):
+                    depth -= 1
+                elif depth == 0 and (c in (b" ", b"\r", b"\n", b"(") or c == closing):
+                    break
+                end += 1
+            tokens.append(data[pos:end])
+            pos = end
+    return tokens, pos
+
+
+def _sequence_set(spec: bytes, highest: int) -> Set[int]:
+    """Expand an IMAP sequence set like 1:3,7,9:* into numbers."""
+    numbers = set()
+    for part in spec.split(b","):
+        if b":" in part:
+            low, high = (highest if p == b"*" else int(p) for p in part.split(b":"))
+            numbers.update(range(min(low, high), max(low, high) + 1))
+        else:
+            numbers.add(highest if part == b"*" else int(part))
+    return numbers
+
+
+def _literal(value: bytes) -> bytes:
+    return b"{" + str(len(value)).encode() + b"}\r\n" + value
+
+
+def _quoted(value: Optional[str]) -> bytes:
+    if value is None:
+        return b"NIL"
+    return b'"' + value.replace("\\", "\\\\").replace('"', '\\"').encode() + b'"'
+
+
+def _split_raw(raw: bytes) -> (bytes, bytes):
+    """Split a raw message (or part) into its header block (ending in the blank line) and its body."""
+    for separator in (b"\r\n\r\n", b"\n\n"):
+        index = raw.find(separator)
+        if index != -1:
+            return raw[:index + len(separator)], raw[index + len(separator):]
+    return raw, b""
+
+
+def _part(message: email.message.Message, section: str) -> email.message.Message:
+    """Find a MIME part by its IMAP section number (1, 1.2, ...)."""
+    part = message
+    for number in section.split("."):
+        if part.is_multipart():
+            part = part.get_payload()[int(number) - 1]
+        elif number != "1":
+            raise ValueError(f"no section {section}")
+    return part
+
+
+def _part_body(part: email.message.Message) -> bytes:
+    """A part's body, still in its transfer encoding, as it would go over the wire."""
+    return _split_raw(part.as_bytes())[1]
+
+
+def _bodystructure(part: email.message.Message) -> bytes:
+    """Render a BODYSTRUCTURE for a (compat32 parsed) message or part."""
+    if part.is_multipart():
+        children = b"".join(_bodystructure(child) for child in part.get_payload())
+        return b"(" + children + b" " + _quoted(part.get_content_subtype().upper()) + b")"
+    params = part.get_params()[1:] if part.get_params() else []
+    rendered_params = b"(" + b" ".join(
+        _quoted(name.upper()) + b" " + _quoted(value) for name, value in params) + b")" if params else b"NIL"
+    body = _part_body(part)
+    fields = [
+        _quoted(part.get_content_maintype().upper()), _quoted(part.get_content_subtype().upper()),
+        rendered_params, _quoted(part.get("Content-ID")), _quoted(part.get("Content-Description")),
+        _quoted((part.get("Content-Transfer-Encoding") or "7bit").upper()), str(len(body)).encode(),
+    ]
+    if part.get_content_maintype() == "text":
+        fields.append(str(body.count(b"\n")).encode())
+    disposition = part.get_content_disposition()
+    if disposition:
+        fields += [b"NIL", b"(" + _quoted(disposition.upper()) + b" NIL)"]
+    return b"(" + b" ".join(fields) + b")"
+
+
+def _header_fields(raw: bytes, names: List[bytes], exclude: bool = False) -> bytes:
+    """The header lines (with their continuations) named (or, with exclude, not named), plus the blank line."""
+    wanted = {name.upper() for name in names}
+    lines, keep = [], False
+    for line in _split_raw(raw)[0].splitlines(keepends=True):
+        if line[:1] in (b" ", b"\t"):
+            if keep:
+                lines.append(line)
+            continue
+        name = line.split(b":", 1)[0].strip().upper()
+        keep = bool(line.strip()) and ((name in wanted) != exclude)
+        if keep:
+            lines.append(line)
+    return b"".join(lines) + b"\r\n"
+
+
+# ---------- Connection Handling ---------- #
+
+class _Session(socketserver.StreamRequestHandler):
+    """One client connection."""
+
+    server: "_TCPServer"
+
+    def setup(self):
+        super().setup()
+        # responses go out a line at a time; don't let Nagle hold them back waiting for acks
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.write_lock = threading.Lock()
+        self.mailbox: Optional[FakeMailbox] = None
+        self.readonly = False
+
+    def handle(self):
+        self.fake = self.server.fake
+        self.send(f"* OK [CAPABILITY {CAPABILITIES}] Fake IMAP server ready")
+        try:
+            while True:
+                line = self.read_command()
+                if not line:
+                    break
+                tag, _, rest = line.partition(b" ")
+                if not self.dispatch(tag, rest):
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.fake._stop_idling(self)
+
+    def read_command(self) -> bytes:
+        """Read a whole command line, including any literals it carries."""
+        line = self.rfile.readline()
+        while line and LITERAL.search(line):
+            self.send("+ Ready for literal data")
+            line += self.rfile.read(int(LITERAL.search(line).group(1)))
+            line += self.rfile.readline()
+        return line
+
+    def send(self, line, end=b"\r\n"):
+        data = (line.encode() if isinstance(line, str) else line) + end
+        with self.write_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+        self.fake._count_bytes(len(data))
+
+    def dispatch(self, tag: bytes, rest: bytes) -> bool:
+        args, _ = _tokenize(rest)
+        if not args:
+            self.send(tag + b" BAD Empty command")
+            return True
+        command = args.pop(0).upper().decode()
+        uid = False
+        if command == "UID" and args:
+            uid = True
+            command = args.pop(0).upper().decode()
+        self.fake._count_command(("UID " if uid else "") + command)
+
+        handler = getattr(self, f"cmd_{command.lower()}", None)
+        if handler is None:
+            self.send(tag + f" BAD Unsupported command {command}".encode())
+            return True
+        if command not in ("CAPABILITY", "NOOP", "LOGIN", "LOGOUT") and not getattr(self, "user", None):
+            self.send(tag + b" NO Not logged in")
+            return True
+        try:
+            return handler(tag, args, uid) is not False
+        except Exception as e:  # a malformed command shouldn't bring down the server
+            self.send(tag + f" BAD {command} failed: {e}".encode())
+            return True
+
+    # ---------- Commands ---------- #
+
+    def cmd_capability(self, tag, args, uid):
+        self.send(f"* CAPABILITY {CAPABILITIES}")
+        self.send(tag + b" OK CAPABILITY completed")
+
+    def cmd_noop(self, tag, args, uid):
+        if self.mailbox:
+            self.send(f"* {len(self.mailbox.messages)} EXISTS")
+        self.send(tag + b" OK NOOP completed")
+
+    def cmd_check(self, tag, args, uid):
+        self.send(tag + b" OK CHECK completed")
+
+    def cmd_login(self, tag, args, uid):
+        user, password = (a.decode() for a in args[:2])
+        if not self.fake._check_login(user, password):
+            self.send(tag + b" NO [AUTHENTICATIONFAILED] Invalid credentials")
+            return
+        self.user = user
+        self.send(tag + f" OK [CAPABILITY {CAPABILITIES}] LOGIN completed".encode())
+
+    def cmd_logout(self, tag, args, uid):
+        self.send("* BYE Fake IMAP server logging out")
+        self.send(tag + b" OK LOGOUT completed")
+        return False
+
+    def cmd_select(self, tag, args, uid, readonly=False):
+        mailbox = self.fake.mailbox(args[0].decode(), user=self.user)
+        self.mailbox, self.readonly = mailbox, readonly
+        with self.fake.lock:
+            exists = len(mailbox.messages)
+            unseen = [i for i, m in enumerate(mailbox.messages, 1) if "\\Seen" not in m.flags]
+            self.send(f"* {exists} EXISTS")
+            self.send("* 0 RECENT")
+            self.send("* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)")
+            self.send("* OK [PERMANENTFLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft \\*)] Keywords allowed")
+            if unseen:
+                self.send(f"* OK [UNSEEN {unseen[0]}] First unseen")
+            self.send(f"* OK [UIDVALIDITY {mailbox.uid_validity}] UIDs valid")
+            self.send(f"* OK [UIDNEXT {mailbox.next_uid}] Predicted next UID")
+        mode = "READ-ONLY" if readonly else "READ-WRITE"
+        self.send(tag + f" OK [{mode}] {'EXAMINE' if readonly else 'SELECT'} completed".encode())
+
+    def cmd_examine(self, tag, args, uid):
+        self.cmd_select(tag, args, uid, readonly=True)
+
+    def cmd_close(self, tag, args, uid):
+        self.mailbox = None
+        self.send(tag + b" OK CLOSE completed")
+
+    def cmd_search(self, tag, args, uid):
+        if args and isinstance(args[0], bytes) and args[0].upper() == b"CHARSET":
+            args = args[2:]
+        with self.fake.lock:
+            matches = [
+                (i, m) for i, m in enumerate(self.mailbox.messages, 1)
+                if self.fake._matches(m, args, i, len(self.mailbox.messages))
+            ]
+        found = " ".join(str(m.uid if uid else i) for i, m in matches)
+        self.send(f"* SEARCH {found}".rstrip())
+        self.send(tag + f" OK {'UID ' if uid else ''}SEARCH completed".encode())
+
+    def cmd_fetch(self, tag, args, uid):
+        items = args[1] if isinstance(args[1], list) else args[1:]
+        items = [item.upper() if isinstance(item, bytes) else item for item in items]
+        items = {b"ALL": [b"FLAGS", b"INTERNALDATE", b"RFC822.SIZE"],
+                 b"FAST": [b"FLAGS", b"INTERNALDATE", b"RFC822.SIZE"]}.get(items[0], items) if items else items
+        for seq, message in self._selected(args[0], uid):
+            parts = [b"UID " + str(message.uid).encode()] if uid else []
+            for item in items:
+                parts.append(self.fake._fetch_item(message, item, self.readonly))
+            self.send(f"* {seq} FETCH (".encode() + b" ".join(parts) + b")")
+        self.send(tag + f" OK {'UID ' if uid else ''}FETCH completed".encode())
+
+    def cmd_store(self, tag, args, uid):
+        action, flags = args[1].upper(), args[2] if isinstance(args[2], list) else args[2:]
+        flags = {f.decode() for f in flags}
+        silent = action.endswith(b".SILENT")
+        for seq, message in self._selected(args[0], uid):
+            with self.fake.lock:
+                if action.startswith(b"+"):
+                    message.flags |= flags
+                elif action.startswith(b"-"):
+                    message.flags -= flags
+                else:
+                    message.flags = set(flags)
+            if not silent:
+                listed = " ".join(sorted(message.flags))
+                prefix = f"UID {message.uid} " if uid else ""
+                self.send(f"* {seq} FETCH ({prefix}FLAGS ({listed}))")
+        self.send(tag + f" OK {'UID ' if uid else ''}STORE completed".encode())
+
+    def cmd_expunge(self, tag, args, uid):
+        with self.fake.lock:
+            for seq in range(len(self.mailbox.messages), 0, -1):
+                if "\\Deleted" in self.mailbox.messages[seq - 1].flags:
+                    del self.mailbox.messages[seq - 1]
+                    self.send(f"* {seq} EXPUNGE")
+        self.send(tag + b" OK EXPUNGE completed")
+
+    def cmd_idle(self, tag, args, uid):
+        self.fake._start_idling(self)
+        self.send("+ idling")
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line or line.strip().upper() == b"DONE":
+                    break
+        finally:
+            self.fake._stop_idling(self)
+        self.send(tag + b" OK IDLE terminated")
+
+    def _selected(self, spec: bytes, uid: bool):
+        """The (sequence number, message) pairs a sequence or UID set refers to."""
+        with self.fake.lock:
+            messages = list(enumerate(self.mailbox.messages, 1))
+        if uid:
+            highest = messages[-1][1].uid if messages else 0
+            wanted = _sequence_set(spec, highest)
+            return [(seq, m) for seq, m in messages if m.uid in wanted]
+        wanted = _sequence_set(spec, len(messages))
+        return [(seq, m) for seq, m in messages if seq in wanted]
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeImapServer:
+    """
+    An IMAP server on localhost, backed by in-memory mailboxes.
+
+    Usage::
+
+        with FakeImapServer() as imap:
+            imap.deliver(raw_bytes)
+            client = IMAPClient("127.0.0.1", port=imap.port, ssl=False)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, accounts: Optional[Dict[str, str]] = None):
+        self.accounts = accounts  # user -> password; any login is accepted if not given
+        self.lock = threading.RLock()
+        self.command_counts: Counter = Counter()
+        self.bytes_sent = 0
+        self._mailboxes: Dict[tuple, FakeMailbox] = {}
+        self._idlers: Set[_Session] = set()
+        self._server = _TCPServer((host, port), _Session)
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> "FakeImapServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- Mailbox Access ---------- #
+
+    def mailbox(self, name: str = "INBOX", user: Optional[str] = None) -> FakeMailbox:
+        """Get (or create) a mailbox; mailboxes are per account when accounts are configured."""
+        key = (user if self.accounts else None, name.upper() if name.upper() == "INBOX" else name)
+        with self.lock:
+            if key not in self._mailboxes:
+                self._mailboxes[key] = FakeMailbox(name)
+            return self._mailboxes[key]
+
+    def deliver(self, raw: bytes, mailbox: str = "INBOX", user: Optional[str] = None,
+                internal_date: Optional[float] = None) -> int:
+        """Add a message to a mailbox, notifying idling clients; returns its UID."""
+        with self.lock:
+            box = self.mailbox(mailbox, user)
+            message = FakeMessage(uid=box.next_uid, raw=raw, internal_date=internal_date or time.time())
+            box.next_uid += 1
+            box.messages.append(message)
+            exists = len(box.messages)
+            idlers = [s for s in self._idlers if s.mailbox is box]
+        for session in idlers:
+            try:
+                session.send(f"* {exists} EXISTS")
+            except OSError:
+                pass
+        return message.uid
+
+    def unseen(self, mailbox: str = "INBOX", user: Optional[str] = None) -> List[FakeMessage]:
+        with self.lock:
+            return [m for m in self.mailbox(mailbox, user).messages if "\\Seen" not in m.flags]
+
+    # ---------- Internal Helpers ---------- #
+
+    def _check_login(self, user: str, password: str) -> bool:
+        return self.accounts is None or self.accounts.get(user) == password
+
+    def _count_command(self, command: str):
+        with self.lock:
+            self.command_counts[command] += 1
+
+    def _count_bytes(self, n: int):
+        with self.lock:
+            self.bytes_sent += n
+
+    def _start_idling(self, session: _Session):
+        with self.lock:
+            self._idlers.add(session)
+
+    def _stop_idling(self, session: _Session):
+        with self.lock:
+            self._idlers.discard(session)
+
+    def _matches(self, message: FakeMessage, criteria: list, seq: int, highest: int) -> bool:
+        """Evaluate (ANDed) search criteria against a message."""
+        i = 0
+        while i < len(criteria):
+            key = criteria[i]
+            if isinstance(key, list):
+                if not self._matches(message, key, seq, highest):
+                    return False
+                i += 1
+                continue
+            key = key.upper()
+            if key == b"ALL":
+                i += 1
+            elif key in (b"SEEN", b"UNSEEN"):
+                if (key == b"SEEN") != ("\\Seen" in message.flags):
+                    return False
+                i += 1
+            elif key in (b"KEYWORD", b"UNKEYWORD"):
+                if (key == b"KEYWORD") != (criteria[i + 1].decode() in message.flags):
+                    return False
+                i += 2
+            elif key in (b"FROM", b"SUBJECT", b"TO"):
+                value = str(message.headers.get(key.decode(), "")).lower()
+                if criteria[i + 1].decode().lower() not in value:
+                    return False
+                i += 2
+            elif key == b"UID":
+                if message.uid not in _sequence_set(criteria[i + 1], message.uid):
+                    return False
+                i += 2
+            elif key == b"NOT":
+                if self._matches(message, [criteria[i + 1]], seq, highest):
+                    return False
+                i += 2
+            elif key[:1].isdigit() or key[:1] == b"*":
+                if seq not in _sequence_set(key, highest):
+                    return False
+                i += 1
+            else:
+                raise ValueError(f"unsupported search key {key.decode()}")
+        return True
+
+    @staticmethod
+    def _section(message: FakeMessage, section: bytes) -> bytes:
+        """The content of a BODY[section] fetch: a part number, HEADER, TEXT or HEADER.FIELDS[.NOT] (...)."""
+        spec = section.upper()
+        if spec == b"HEADER":
+            return _split_raw(message.raw)[0]
+        if spec == b"TEXT":
+            return _split_raw(message.raw)[1]
+        if spec.startswith(b"HEADER.FIELDS"):
+            names, _ = _tokenize(spec[spec.index(b"("):])
+            return _header_fields(message.raw, names[0], exclude=spec.startswith(b"HEADER.FIELDS.NOT"))
+        part = _part(email.message_from_bytes(message.raw, policy=policy.compat32), section.decode())
+        return _part_body(part)
+
+    def _fetch_item(self, message: FakeMessage, item, readonly: bool) -> bytes:
+        """Render one FETCH data item for a message."""
+        if item == b"UID":
+            return b"UID " + str(message.uid).encode()
+        if item == b"FLAGS":
+            return b"FLAGS (" + " ".join(sorted(message.flags)).encode() + b")"
+        if item == b"RFC822.SIZE":
+            return b"RFC822.SIZE " + str(len(message.raw)).encode()
+        if item == b"INTERNALDATE":
+            stamp = time.strftime("%d-%b-%Y %H:%M:%S +0000", time.gmtime(message.internal_date))
+            return b'INTERNALDATE "' + stamp.encode() + b'"'
+        if item in (b"RFC822", b"BODY[]", b"BODY.PEEK[]"):
+            if item != b"BODY.PEEK[]" and not readonly:
+                with self.lock:
+                    message.flags.add("\\Seen")
+            name = b"RFC822" if item == b"RFC822" else b"BODY[]"
+            return name + b" " + _literal(message.raw)
+        if item == b"BODYSTRUCTURE":
+            return b"BODYSTRUCTURE " + _bodystructure(email.message_from_bytes(message.raw, policy=policy.compat32))
+        if isinstance(item, bytes) and BODY_SECTION.match(item):
+            peek, section = BODY_SECTION.match(item).groups()
+            if not peek and not readonly:
+                with self.lock:
+                    message.flags.add("\\Seen")
+            return b"BODY[" + section + b"] " + _literal(self._section(message, section))
+        raise ValueError(f"unsupported fetch item {item.decode()}")
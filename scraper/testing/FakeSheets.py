@@ -0,0 +1,263 @@
+"""
+An in-memory stand-in for the parts of gspread the scraper uses.
+
+`FakeSheetsBackend` holds spreadsheets of worksheets of string cells, counts every API call, and
+can add latency to each call and inject 429 (rate limited) errors, so the scraper's Sheets usage
+can be tested and load tested without Google. Patch `gspread.service_account` with
+`backend.service_account` to point the scraper at it.
+"""
+
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from gspread.exceptions import APIError, WorksheetNotFound, SpreadsheetNotFound
+
+A1_CELL = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+class _RateLimitedResponse:
+    """Just enough of a `requests.Response` for gspread's APIError."""
+    status_code = 429
+    text = "Quota exceeded for quota metric 'Read requests'"
+
+    def json(self):
+        return {"error": {"code": 429, "message": self.text, "status": "RESOURCE_EXHAUSTED"}}
+
+
+def column_number(letters: str) -> int:
+    """Convert column letters (A, Z, AA, ...) to a 1-based column number."""
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord("A") + 1
+    return number
+
+
+def _letters(number: int) -> str:
+    letters = ""
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def parse_a1(range_name: str) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
+    """Parse an A1 range (e.g. A2:C, 4:10, B:B, D7) into 1-based (row1, col1, row2, col2); None is unbounded."""
+    range_name = range_name.split("!")[-1].upper()
+    start, _, end = range_name.partition(":")
+    end = end or start
+    cells = []
+    for cell in (start, end):
+        letters, digits = A1_CELL.match(cell).groups()
+        cells.append((int(digits) if digits else None, column_number(letters) if letters else None))
+    (r1, c1), (r2, c2) = cells
+    return r1, c1, r2, c2
+
+
+class FakeWorksheet:
+    """A worksheet of string cells."""
+
+    def __init__(self, backend: "FakeSheetsBackend", title: str, rows: int = 1000, cols: int = 26,
+                 values: Optional[List[List[str]]] = None):
+        self.backend = backend
+        self.title = title
+        self.id = id(self)
+        self.row_count = int(rows)
+        self.col_count = int(cols)
+        self._values: List[List[str]] = [[str(v) for v in row] for row in (values or [])]
+        self.row_count = max(self.row_count, len(self._values))
+
+    # ---------- Reads ---------- #
+
+    def get_values(self, range_name: Optional[str] = None, major_dimension: Optional[str] = None, **kwargs):
+        self.backend._call("values.get")
+        return self._read(range_name, major_dimension)
+
+    get = get_values
+    get_all_values = get_values
+
+    def batch_get(self, ranges, major_dimension: Optional[str] = None, **kwargs):
+        self.backend._call("values.batchGet")
+        return [self._read(range_name, major_dimension) for range_name in ranges]
+
+    def row_values(self, row: int, **kwargs) -> List[str]:
+        self.backend._call("values.get")
+        return list(self._values[row - 1]) if row <= len(self._values) else []
+
+    def col_values(self, col: int, **kwargs) -> List[str]:
+        self.backend._call("values.get")
+        column = [row[col - 1] if col <= len(row) else "" for row in self._values]
+        while column and column[-1] == "":
+            column.pop()
+        return column
+
+    def get_all_records(self, **kwargs) -> List[Dict[str, str]]:
+        self.backend._call("values.get")
+        if not self._values:
+            return []
+        header = self._values[0]
+        return [dict(zip(header, row + [""] * (len(header) - len(row)))) for row in self._values[1:]]
+
+    # ---------- Writes ---------- #
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values])
+
+    def append_rows(self, values, **kwargs):
+        """Append rows after the last one, answering with the range written, as the API does."""
+        self.backend._call("values.append")
+        with self.backend.lock:
+            first = len(self._values) + 1
+            self._values.extend([str(v) for v in row] for row in values)
+            self.row_count = max(self.row_count, len(self._values))
+            last = len(self._values)
+        width = max((len(row) for row in values), default=1)
+        return {"updates": {"updatedRange": f"'{self.title}'!A{first}:{_letters(width)}{last}",
+                            "updatedRows": len(values)}}
+
+    def clear(self):
+        self.backend._call("values.clear")
+        with self.backend.lock:
+            self._values = []
+
+    def update(self, range_name: str, values, **kwargs):
+        self.backend._call("values.update")
+        r1, c1, _, _ = parse_a1(range_name)
+        with self.backend.lock:
+            for i, row in enumerate(values):
+                target = (r1 or 1) + i
+                while len(self._values) < target:
+                    self._values.append([])
+                current = self._values[target - 1]
+                for j, value in enumerate(row):
+                    col = (c1 or 1) + j
+                    current.extend([""] * (col - len(current)))
+                    current[col - 1] = str(value)
+            self.row_count = max(self.row_count, len(self._values))
+
+    # ---------- Internal Helpers ---------- #
+
+    def _read(self, range_name: Optional[str], major_dimension: Optional[str]) -> List[List[str]]:
+        """Read a range the way gspread returns it: trailing blanks trimmed, then padded to a rectangle."""
+        with self.backend.lock:
+            r1, c1, r2, c2 = parse_a1(range_name) if range_name else (None, None, None, None)
+            rows = self._values[(r1 or 1) - 1:r2]
+            rows = [row[(c1 or 1) - 1:c2] for row in rows]
+        rows = [self._trim(row) for row in rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        width = max((len(row) for row in rows), default=0)
+        rows = [row + [""] * (width - len(row)) for row in rows]
+        if major_dimension and major_dimension.upper() == "COLUMNS":
+            columns = [self._trim([row[j] for row in rows]) for j in range(width)]
+            height = max((len(column) for column in columns), default=0)
+            return [column + [""] * (height - len(column)) for column in columns]
+        return rows
+
+    @staticmethod
+    def _trim(values: List[str]) -> List[str]:
+        values = list(values)
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+
+class FakeSpreadsheet:
+    """A spreadsheet of worksheets."""
+
+    def __init__(self, backend: "FakeSheetsBackend", key: str):
+        self.backend = backend
+        self.id = key
+        self._worksheets: List[FakeWorksheet] = []
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.backend._call("spreadsheets.get")
+        for ws in self._worksheets:
+            if ws.title == title:
+                return ws
+        raise WorksheetNotFound(title)
+
+    def worksheets(self, **kwargs) -> List[FakeWorksheet]:
+        self.backend._call("spreadsheets.get")
+        return list(self._worksheets)
+
+    @property
+    def sheet1(self) -> FakeWorksheet:
+        self.backend._call("spreadsheets.get")
+        if not self._worksheets:
+            raise WorksheetNotFound("sheet1")
+        return self._worksheets[0]
+
+    def add_worksheet(self, title: str, rows=1000, cols=26, **kwargs) -> FakeWorksheet:
+        self.backend._call("spreadsheets.batchUpdate")
+        return self.backend.add_worksheet(self.id, title, rows=rows, cols=cols)
+
+
+class FakeClient:
+    """Stands in for an authorized `gspread.Client`."""
+
+    def __init__(self, backend: "FakeSheetsBackend"):
+        self.backend = backend
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self.backend._call("spreadsheets.get")
+        with self.backend.lock:
+            if key not in self.backend.spreadsheets:
+                raise SpreadsheetNotFound(key)
+            return self.backend.spreadsheets[key]
+
+
+class FakeSheetsBackend:
+    """
+    The shared state behind every fake client: spreadsheets, API call counts and failure injection.
+
+    :param latency: seconds added to every API call
+    :param throttle_rate: chance (0-1) of any API call failing with a 429 APIError
+    """
+
+    def __init__(self, latency: float = 0.0, throttle_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.lock = threading.RLock()
+        self.spreadsheets: Dict[str, FakeSpreadsheet] = {}
+        self.api_calls: Counter = Counter()
+        self.throttled = 0
+        self._random = random.Random(seed)
+
+    def service_account(self, filename: Optional[str] = None, **kwargs) -> FakeClient:
+        """Drop-in replacement for `gspread.service_account`."""
+        with self.lock:
+            self.api_calls["auth"] += 1
+        return FakeClient(self)
+
+    def add_spreadsheet(self, key: str) -> FakeSpreadsheet:
+        with self.lock:
+            return self.spreadsheets.setdefault(key, FakeSpreadsheet(self, key))
+
+    def add_worksheet(self, key: str, title: str, values: Optional[List[List[str]]] = None,
+                      rows=1000, cols=26) -> FakeWorksheet:
+        """Create a worksheet directly (without counting an API call), e.g. to seed test data."""
+        spreadsheet = self.add_spreadsheet(key)
+        ws = FakeWorksheet(self, title, rows=rows, cols=cols, values=values)
+        with self.lock:
+            spreadsheet._worksheets.append(ws)
+        return ws
+
+    @property
+    def total_calls(self) -> int:
+        return sum(count for name, count in self.api_calls.items() if name != "auth")
+
+    def _call(self, name: str):
+        """Account for one API call, applying the configured latency and failure injection."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.api_calls[name] += 1
+            throttle = self.throttle_rate and self._random.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+        if throttle:
+            raise APIError(_RateLimitedResponse())
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from scraper.Aggregates import SchoolAggregate, aggregate_entries, merge_aggregates, parse_statuses, reduce_entries
+from scraper.CalculateValues import CalculateValues, DONOR_ID, entries_frame
+from scraper.DonorIdentity import DonorIndex
+from scraper.benchmarks import parallelMetrics
+from scraper.benchmarks.loadEntries import synthetic_columns
+
+
+@pytest.fixture(scope="module")
+def calc():
+    """Metrics over a few thousand synthetic entries, without a sheet."""
+    calc = CalculateValues.__new__(CalculateValues)
+    calc.df = entries_frame(synthetic_columns(3000))
+    calc.df[DONOR_ID] = DonorIndex().assign(calc.df)
+    calc.distinct, calc.distinct_error, calc.workers = "exact", 0.01, 1
+    calc.state_path, calc._rows, calc._tables, calc._gifts = None, 0, {}, {}
+    return calc
+
+
+def gifts(*rows):
+    columns = ["source", "total amount", "recurring payment", "first name", "last name", "phone number",
+               "anonymous donation", "first time giver", "graduation year", "status", "work referral"]
+    df = entries_frame([[name] + [str(row.get(name, "")) for row in rows] for name in columns])
+    df[DONOR_ID] = DonorIndex().assign(df)
+    return df
+
+
+def test_parse_statuses():
+    assert parse_statuses(" Alumni, Current Student ,") == ("Alumni", "Current Student")
+    assert parse_statuses(float("nan")) == ()
+
+
+@pytest.mark.parametrize("chunk_rows", [97, 1000, 5000])
+def test_chunks_reduce_to_the_same_metrics(calc, chunk_rows):
+    assert parallelMetrics.same_metrics(calc.calculate_all(), calc.calculate_parallel(1, chunk_rows))
+
+
+def test_process_pool_reduces_to_the_same_metrics(calc):
+    assert parallelMetrics.same_metrics(calc.calculate_all(), calc.calculate_parallel(2, 500))
+
+
+def test_workers_setting_reduces_in_parallel(calc, monkeypatch):
+    expected = calc.calculate_all()
+    monkeypatch.setattr(calc, "workers", 2)
+
+    assert parallelMetrics.same_metrics(expected, calc.calculate_all())
+
+
+def test_donor_names_follow_first_gifts_across_chunks():
+    df = gifts({"source": "uva-front", "first name": "Ann", "last name": "Lee", "phone number": "5405550001",
+                "anonymous donation": "true"},
+               {"source": "uva-front", "first name": "Bo", "last name": "Ray", "phone number": "5405550002"},
+               {"source": "uva-front", "first name": "Annie", "last name": "Lee", "phone number": "5405550001"},
+               {"source": "uva-front", "first name": "Bobby", "last name": "Ray", "phone number": "5405550002"})
+
+    aggregates = reduce_entries(df, chunk_rows=1)
+
+    # Ann's first gift was anonymous, so she's named by her first named one, after Bo's
+    assert aggregates["uva"].metrics()["donor_names"] == "Bo Ray, Annie Lee"
+
+
+def test_status_money_counts_each_gift_once():
+    df = gifts({"source": "vt-back", "total amount": 10, "status": "Current Parent, Parent of Alumni"},
+               {"source": "vt-back", "total amount": 5, "recurring payment": "true", "status": "Current Grandparent"})
+
+    metrics = aggregate_entries(df)["vt"].metrics()
+
+    assert metrics["most_money_families"] == 70
+    assert metrics["most_money_grandparents_current_students"] == 60
+
+
+def test_merge_is_order_independent(calc):
+    partials = [aggregate_entries(calc.df.iloc[start:start + 400], start) for start in range(0, len(calc.df), 400)]
+
+    forwards = merge_aggregates(partials)
+    backwards = merge_aggregates(reversed(partials))
+
+    assert parallelMetrics.same_metrics({school: a.metrics() for school, a in forwards.items()},
+                                        {school: a.metrics() for school, a in backwards.items()})
+
+
+def test_approximate_aggregates_merge_sketches(calc):
+    exact = reduce_entries(calc.df, chunk_rows=250)
+    approximate = reduce_entries(calc.df, chunk_rows=250, precision=12)
+
+    for school in exact:
+        assert approximate[school].metrics()["most_individual_donors"] == pytest.approx(
+            exact[school].metrics()["most_individual_donors"], rel=0.05)
+
+
+@pytest.mark.parametrize("precision", [None, 12])
+def test_json_round_trip_keeps_the_metrics(calc, precision):
+    aggregates = reduce_entries(calc.df, chunk_rows=1000, precision=precision)
+
+    restored = {school: SchoolAggregate.from_json(json.loads(json.dumps(aggregate.to_json())))
+                for school, aggregate in aggregates.items()}
+
+    assert {school: a.metrics() for school, a in restored.items()} == \
+        {school: a.metrics() for school, a in aggregates.items()}
+    # and a restored aggregate goes on merging like the original
+    more = aggregate_entries(calc.df.iloc[:100], len(calc.df), precision)
+    assert restored["uva"].merge(more["uva"]).metrics() == aggregates["uva"].merge(more["uva"]).metrics()
+
+
+def test_exact_and_approximate_dont_merge():
+    with pytest.raises(ValueError):
+        SchoolAggregate().merge(SchoolAggregate(12))
+
+
+def test_empty_school_is_all_zeros():
+    metrics = aggregate_entries(gifts({"source": "vt-front", "total amount": 5}))["uva"].metrics()
+
+    assert metrics["donor_names"] == ""
+    assert all(value in (0, "") for value in metrics.values())
+
+
+def test_parallel_metrics_benchmark(capsys):
+    assert parallelMetrics.main(["--rows", "2000", "--chunk-rows", "300", "--workers", "1", "2"]) == 0
+    assert "Every reduction matched" in capsys.readouterr().out
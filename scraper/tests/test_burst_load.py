@@ -0,0 +1,65 @@
+import pytest
+from gspread.exceptions import APIError
+
+from scraper import getLglFormData as lgl
+from scraper.benchmarks.burstLoad import BurstRun, arrival_offsets, percentile
+from scraper.testing.FakeSheets import _RateLimitedResponse
+
+
+def test_arrival_offsets_pile_up_before_the_deadline():
+    offsets = arrival_offsets(1000, window=3600, steepness=3.0, seed=1)
+    assert offsets == sorted(offsets)
+    assert 0 <= offsets[0] and offsets[-1] <= 3600
+    assert sum(o > 2700 for o in offsets) > sum(o < 900 for o in offsets) * 3
+
+
+def test_percentile():
+    assert percentile([5, 1, 3, 2, 4], 50) == 3
+    assert percentile([5, 1, 3, 2, 4], 100) == 5
+
+
+def test_burst_run_gets_every_donation_into_the_results():
+    summary = BurstRun(donations=8, window_minutes=5, poll_seconds=60, seed=3).run()
+
+    assert summary["donations"] == 8
+    assert summary["failed_runs"] == 0
+    assert 0 < summary["latency_p50"] <= summary["latency_max"]
+    assert summary["sheets_api_calls"]["values.append"] >= 8
+    assert summary["unread_emails"] == 0
+    # each email is flagged as it's entered, and each run's marked read together once the results are written
+    assert summary["imap_commands"]["UID STORE"] <= summary["scraper_runs"] + summary["donations"]
+
+
+def test_burst_run_recovers_from_throttling():
+    summary = BurstRun(donations=8, window_minutes=5, poll_seconds=60, throttle_rate=0.1, seed=5).run()
+
+    assert summary["donations"] == 8
+    assert summary["sheets_throttled"] > 0
+
+
+@pytest.mark.parametrize("seed", range(1, 11))
+def test_burst_run_catches_up_whichever_run_is_throttled(seed):
+    # the emails of a run throttled after entering them stay unread, so the poller triggers another run
+    summary = BurstRun(donations=8, window_minutes=5, poll_seconds=60, throttle_rate=0.1, seed=seed).run()
+
+    assert summary["donations"] == 8
+    assert summary["unread_emails"] == 0
+
+
+def test_burst_run_catches_up_when_the_last_recalculation_fails(monkeypatch):
+    burst = BurstRun(donations=8, window_minutes=5, poll_seconds=60, seed=3)
+    update_local_csv = lgl.update_local_csv
+    throttled = []
+
+    def throttled_once_everything_has_arrived(campaign=None):
+        if not burst.arrivals and not throttled:
+            throttled.append(campaign)
+            raise APIError(_RateLimitedResponse())
+        return update_local_csv(campaign)
+
+    monkeypatch.setattr(lgl, "update_local_csv", throttled_once_everything_has_arrived)
+    summary = burst.run()
+
+    assert throttled
+    assert summary["failed_runs"] == 1
+    assert summary["donations"] == 8
@@ -1,10 +1,19 @@
 # tests/test_calculate_values_offline.py
+import json
+from datetime import datetime
 from unittest.mock import patch, MagicMock
 
 import pandas as pd
 import pytest
 
-from scraper.CalculateValues import CalculateValues
+from scraper.CalculateValues import (CalculateValues, ENTRY_SCHEMA, entries_frame, load_precomputed,
+                                     precompute_campaign)
+from scraper.Campaign import Campaign, EASTERN
+from scraper.DonorIdentity import DonorIndex
+from scraper.DonorTable import DonorTable
+from scraper.GiftStats import GiftStats
+from scraper.EntryShards import EntryShards
+from scraper.testing.FakeSheets import FakeSheetsBackend
 
 
 # -------------------- Fixtures --------------------
@@ -55,12 +64,20 @@ def sample_df():
     ])
 
 
+def serve_sheet(ws, df):
+    """Have a mocked worksheet read like a sheet holding the frame (as strings, with a header row)."""
+    sheet = FakeSheetsBackend().add_worksheet("key", "entries", values=[list(df.columns)] + [
+        [str(value) for value in row] for row in df.itertuples(index=False)])
+    ws.row_values.side_effect = sheet.row_values
+    ws.batch_get.side_effect = sheet.batch_get
+
+
 @pytest.fixture
 def mock_gspread(sample_df):
     """Patch gspread to return sample data instead of connecting to Google Sheets."""
     with patch("gspread.service_account") as mock_service:
         mock_ws = MagicMock()
-        mock_ws.get_all_records.return_value = sample_df.to_dict(orient="records")
+        serve_sheet(mock_ws, sample_df)
         mock_sh = MagicMock()
         mock_sh.worksheet.return_value = mock_ws
         mock_service.return_value.open_by_key.return_value = mock_sh
@@ -84,11 +101,42 @@ def test_total_raised_includes_recurring(calc):
 
 def test_unique_donors_counts_by_phone(calc):
     """Unique donors should be counted by phone number."""
-    count = calc._unique_donors_count(calc.df)
+    count = calc._unique_donors_count(calc._donor_table(calc.df))
     # Phones: 555, 777, 999
     assert count == 3
 
 
+def test_unique_donors_ignore_phone_formatting(mock_gspread, sample_df):
+    sample_df["phone number"] = ["555", "540.555.1234", "(540) 555-1234"]
+    serve_sheet(mock_gspread.return_value.open_by_key.return_value.worksheet.return_value, sample_df)
+
+    calc = CalculateValues(spreadsheet_key="dummy_key")
+
+    assert calc._unique_donors_count(calc._donor_table(calc.df)) == 2
+    assert calc.df["donor id"].tolist()[1] == calc.df["donor id"].tolist()[2]
+
+
+def test_approximate_distinct_counts(mock_gspread):
+    calc = CalculateValues(spreadsheet_key="dummy_key", distinct="approximate")
+
+    assert calc._unique_donors_count(calc._donor_table(calc.df)) == 3
+    assert calc.calculate_all()["uva"]["most_first_time_donors"] == 2
+
+
+def test_unknown_distinct_mode(mock_gspread):
+    with pytest.raises(ValueError):
+        CalculateValues(spreadsheet_key="dummy_key", distinct="guess")
+
+
+def test_donor_sketches_per_school_and_status(calc):
+    sketches = calc.donor_sketches()
+
+    assert sketches["uva"].count() == 2
+    assert sketches["uva:Alumni"].count() == 1
+    assert sketches["vt:Current Parent"].count() == 1
+    assert (sketches["uva"] | sketches["vt"]).count() == 3
+
+
 def test_status_based_metrics_counts_multi_status(calc):
     """Rows with multiple statuses should count for all relevant metrics."""
     # Convert 'status' strings to list like production code does
@@ -106,7 +154,7 @@ def test_status_based_metrics_counts_multi_status(calc):
     assert grandparent_money == 600
 
     # Check class year donors for 2025
-    class_2025_count = calc._class_year_donors(calc.df, 2025)
+    class_2025_count = calc._class_year_donors(calc._donor_table(calc.df), 2025)
     # Alex is Alumni + Current Student, grad_year 2025 => counts once
     assert class_2025_count == 1
 
@@ -118,7 +166,7 @@ def test_zero_metrics_for_empty_df(calc):
         empty_calc = CalculateValues(spreadsheet_key="dummy")
         metrics = empty_calc._calculate_school_metrics("uva")
         for k, v in metrics.items():
-            if k == 'donor_names':
+            if k in ('donor_names', 'largest_gifts', 'top_donors'):
                 assert v == ''
             else:
                 assert v == 0
@@ -132,3 +180,134 @@ def test_calculate_all_returns_metrics(calc):
     # Basic sanity checks
     assert metrics['uva']['total_amount'] > 0
     assert metrics['vt']['total_amount'] > 0
+
+
+# -------------------- Typed Loader --------------------
+
+def test_entries_frame_uses_declared_types():
+    df = entries_frame([
+        ["source", "UVA-Front", "vt-back"],
+        ["total amount", "18.0", "oops"],
+        ["recurring payment", "TRUE", "false"],
+        ["phone number", "555", "777"],
+        ["graduation year", "2025", ""],
+        ["status", "Alumni", "Current Parent"],
+        ["unexpected column", "a", "b"],
+    ])
+
+    assert list(df.columns) == list(ENTRY_SCHEMA)
+    assert isinstance(df['source'].dtype, pd.CategoricalDtype)
+    assert isinstance(df['status'].dtype, pd.CategoricalDtype)
+    assert df['source'].tolist() == ["uva-front", "vt-back"]
+    assert df['total amount'].tolist() == [18.0, 0.0]
+    assert df['recurring payment'].tolist() == [True, False]
+    assert str(df['graduation year'].dtype) == "Int64"
+    assert df['graduation year'][0] == 2025
+    assert pd.isna(df['graduation year'][1])
+    # columns missing from the sheet are filled in
+    assert df['anonymous donation'].tolist() == [False, False]
+    assert df['first name'].tolist() == ["", ""]
+
+
+def test_entries_frame_pads_trimmed_columns():
+    df = entries_frame([
+        ["source", "uva-front", "uva-back", "vt-front"],
+        ["work referral", "true"],
+    ])
+    assert df['work referral'].tolist() == [True, False, False]
+
+
+def test_entries_frame_for_empty_sheet():
+    df = entries_frame([])
+    assert df.empty
+    assert list(df.columns) == list(ENTRY_SCHEMA)
+    assert df['recurring payment'].dtype == bool
+
+
+def test_class_year_donors_ignores_missing_years(calc):
+    calc.df.loc[0, 'graduation year'] = pd.NA
+    metrics = calc._calculate_school_metrics('uva')
+    assert metrics['most_donors_class_2025'] == 0
+
+
+def test_precompute_campaign_round_trips(mock_gspread, tmp_path):
+    campaign = Campaign("2030", datetime(2030, 12, 1, tzinfo=EASTERN), datetime(2030, 12, 7, tzinfo=EASTERN))
+    assert load_precomputed(campaign, str(tmp_path)) is None
+
+    path = precompute_campaign("dummy_key", campaign, str(tmp_path))
+
+    assert path.name == "2030.json"
+    mock_gspread.return_value.open_by_key.return_value.worksheet.assert_called_with("entries-2030")
+    metrics = load_precomputed(campaign, str(tmp_path))
+    assert metrics == json.loads(json.dumps(CalculateValues("dummy_key").calculate_all(), default=lambda v: v.item()))
+
+
+def test_gift_size_metrics(calc):
+    metrics = calc.calculate_all()
+
+    assert metrics['uva']['largest_gifts'] == "Jordan Smith $600.00, Alex Green $100.00"
+    assert metrics['uva']['top_donors'] == "Jordan Smith $600.00, Alex Green $100.00"
+    assert metrics['vt']['largest_gifts'] == "Anonymous $240.00"
+    assert metrics['vt']['top_donors'] == ""
+    assert metrics['uva']['median_gift'] == pytest.approx(100, rel=0.001)
+
+
+def test_loads_only_the_columns_the_metrics_use(mock_gspread, sample_df):
+    sample_df["message id"] = ["<a@lgl>", "<b@lgl>", "<c@lgl>"]
+    sample_df.insert(0, "donated at", ["2025-12-01T10:00:00-05:00"] * 3)
+    ws = mock_gspread.return_value.open_by_key.return_value.worksheet.return_value
+    serve_sheet(ws, sample_df)
+
+    calc = CalculateValues(spreadsheet_key="dummy_key")
+
+    # one batched request, for the runs of schema columns (B to L), skipping "donated at" and "message id"
+    ws.batch_get.assert_called_once_with(["B1:L"], major_dimension="COLUMNS")
+    assert calc._total_raised(calc.df) == 940
+
+
+def test_loads_every_shard_of_the_entries(sample_df, tmp_path, monkeypatch):
+    monkeypatch.setattr("scraper.EntryShards.SHARD_CACHE_DIR", str(tmp_path))
+    backend = FakeSheetsBackend()
+    backend.add_spreadsheet("key")
+    shards = EntryShards(backend.service_account().open_by_key("key"), "entries-2025", shard_rows=2)
+    for row in sample_df.astype(str).to_dict("records"):
+        shards.append(row)
+
+    calc = CalculateValues("key", "entries-2025", gc=backend.service_account())
+
+    assert len(shards.shards()) == 2
+    assert calc._total_raised(calc.df) == 940
+    assert calc.df["first name"].tolist() == ["Alex", "Sam", "Jordan"]
+
+
+def test_donor_tables_and_gift_stats_are_kept_between_runs(mock_gspread, sample_df, tmp_path):
+    def calculate(df, worksheet="entries"):
+        serve_sheet(mock_gspread.return_value.open_by_key.return_value.worksheet.return_value, df)
+        return CalculateValues("dummy_key", worksheet, donors=DonorIndex(str(tmp_path / "donor_index.json")),
+                               state_path=str(tmp_path / "metric_state.json")).calculate_all()
+
+    calculate(sample_df)
+    more = pd.concat([sample_df, sample_df.iloc[[0]].assign(**{"phone number": "111", "first name": "Max"})],
+                     ignore_index=True)
+    with patch.object(DonorTable, "update", autospec=True, side_effect=DonorTable.update) as update, \
+            patch.object(GiftStats, "update", autospec=True, side_effect=GiftStats.update) as update_stats:
+        metrics = calculate(more)
+
+    # just the new gift is added, to the school it's from
+    assert [len(call.args[1]) for call in update.call_args_list] == [1, 0]
+    assert [len(call.args[1]) for call in update_stats.call_args_list] == [1, 0]
+    assert metrics == calculate(more, "entries-2030")  # another sheet's tables aren't used
+    assert metrics["uva"]["most_individual_donors"] == 3
+    assert metrics["uva"]["donor_names"] == "Alex Green, Jordan Smith, Max Green"
+    assert metrics["uva"]["largest_gifts"] == "Jordan Smith $600.00, Alex Green $100.00, Max Green $100.00"
+
+
+def test_donor_tables_are_rebuilt_when_entries_are_removed(mock_gspread, sample_df, tmp_path):
+    def calculate(df):
+        serve_sheet(mock_gspread.return_value.open_by_key.return_value.worksheet.return_value, df)
+        return CalculateValues("dummy_key", donors=DonorIndex(str(tmp_path / "donor_index.json")),
+                               state_path=str(tmp_path / "metric_state.json")).calculate_all()
+
+    calculate(sample_df)
+
+    assert calculate(sample_df.iloc[[1, 2]])["uva"]["donor_names"] == "Jordan Smith"
@@ -0,0 +1,65 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from scraper import Campaign as campaigns
+from scraper.Campaign import Campaign, EASTERN, active_campaign, get_campaign
+
+OLD = Campaign("2030", datetime(2030, 12, 1, tzinfo=EASTERN), datetime(2030, 12, 7, 20, tzinfo=EASTERN))
+NEW = Campaign("2031", datetime(2031, 12, 1, tzinfo=EASTERN), datetime(2031, 12, 7, 20, tzinfo=EASTERN))
+
+
+@pytest.fixture(autouse=True)
+def two_campaigns(monkeypatch):
+    monkeypatch.delenv("CAMPAIGN_ID", raising=False)
+    monkeypatch.setattr(campaigns, "CAMPAIGNS", (OLD, NEW))
+
+
+def test_entries_worksheet_defaults_to_a_partition_per_campaign():
+    assert NEW.entries_worksheet == "entries-2031"
+    assert Campaign("2025", OLD.start, OLD.deadline, worksheet="entries").entries_worksheet == "entries"
+
+
+def test_accepting_includes_early_and_late_entries():
+    assert NEW.accepting(NEW.start - timedelta(days=1))
+    assert NEW.accepting(NEW.deadline + timedelta(days=1))
+    assert not NEW.accepting(NEW.start - timedelta(days=60))
+    assert not NEW.closed(NEW.deadline + timedelta(days=1))
+    assert NEW.closed(NEW.deadline + timedelta(days=4))
+
+
+@pytest.mark.parametrize("now, expected", [
+    (datetime(2029, 1, 1, tzinfo=EASTERN), OLD),  # before any campaign opens
+    (datetime(2030, 12, 5, tzinfo=EASTERN), OLD),
+    (datetime(2031, 6, 1, tzinfo=EASTERN), OLD),  # between campaigns, the last one stays active
+    (datetime(2031, 11, 15, tzinfo=EASTERN), NEW),
+    (datetime(2040, 1, 1, tzinfo=EASTERN), NEW),
+])
+def test_active_campaign(now, expected):
+    assert active_campaign(now) == expected
+
+
+def test_active_campaign_can_be_overridden(monkeypatch):
+    monkeypatch.setenv("CAMPAIGN_ID", "2030")
+    assert active_campaign(datetime(2031, 12, 5, tzinfo=EASTERN)) == OLD
+
+
+def test_get_unknown_campaign():
+    with pytest.raises(KeyError):
+        get_campaign("1999")
+
+
+def test_main_reports_for_the_workflow(capsys, monkeypatch):
+    monkeypatch.setenv("CAMPAIGN_ID", "2031")
+    assert campaigns.main([]) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == "campaign=2031"
+    assert out[1] == "worksheet=entries-2031"
+    assert out[2] in ("in_range=true", "in_range=false")
+
+
+
+@pytest.mark.skipif("CAMPAIGN_SNAPSHOTS" in os.environ, reason="the snapshot directory is overridden")
+def test_snapshots_default_to_the_package_not_the_working_directory():
+    assert campaigns.SNAPSHOT_DIR == os.path.join(os.path.dirname(os.path.abspath(campaigns.__file__)), "campaigns")
@@ -0,0 +1,120 @@
+import pytest
+
+from scraper.ChangeFeed import LEAD_CHANGE, MILESTONE, NEW_DONOR, ChangeEvent, ChangeFeed, diff_results, record_changes
+
+
+@pytest.fixture
+def feed(tmp_path):
+    return ChangeFeed(str(tmp_path / "changes.jsonl"))
+
+
+def test_new_donor_names():
+    old = {"vt_donor_names": "Ann Lee, Bo Ray", "uva_donor_names": float("nan")}
+    new = {"vt_donor_names": "Ann Lee, Bo Ray, Cy Dee", "uva_donor_names": "Ed Fay"}
+
+    events = diff_results(old, new)
+
+    assert [(e.type, e.school, e.new) for e in events] == [(NEW_DONOR, "uva", "Ed Fay"), (NEW_DONOR, "vt", "Cy Dee")]
+
+
+def test_lead_changes_but_not_ties():
+    old = {"uva_total_amount": 100, "vt_total_amount": 90, "uva_most_gifts_over_1000": 1, "vt_most_gifts_over_1000": 0}
+    new = {"uva_total_amount": 100, "vt_total_amount": 150, "uva_most_gifts_over_1000": 1, "vt_most_gifts_over_1000": 1}
+
+    events = [e for e in diff_results(old, new) if e.type == LEAD_CHANGE]
+
+    assert [(e.metric, e.old, e.new) for e in events] == [("total_amount", "uva", "vt")]
+
+
+def test_milestones_crossed():
+    old = {"vt_total_amount": 950, "uva_total_amount": 2500, "vt_most_individual_donors": 24}
+    new = {"vt_total_amount": 3100, "uva_total_amount": 2900, "vt_most_individual_donors": 25}
+
+    events = [e for e in diff_results(old, new) if e.type == MILESTONE]
+
+    assert [(e.metric, e.new) for e in events] == [("vt_total_amount", 3000.0), ("vt_most_individual_donors", 25.0)]
+
+
+def test_nothing_changed():
+    row = {"vt_total_amount": 950, "uva_total_amount": 10, "vt_donor_names": "Ann Lee"}
+
+    assert diff_results(row, dict(row)) == []
+
+
+def test_append_numbers_events_across_writes(feed):
+    feed.append([ChangeEvent(NEW_DONOR, school="vt", new="Ann Lee")])
+    written = ChangeFeed(feed.path).append([ChangeEvent(NEW_DONOR, school="vt", new="Bo Ray"),
+                                            ChangeEvent(LEAD_CHANGE, metric="total_amount", new="vt")])
+
+    assert [e.seq for e in written] == [2, 3]
+    assert feed.last_seq() == 3
+    assert feed.append([]) == []
+
+
+def test_read_resumes_from_a_cursor(feed):
+    feed.append([ChangeEvent(NEW_DONOR, school="vt", new="Ann Lee")])
+    events, cursor = feed.read()
+    assert [e.new for e in events] == ["Ann Lee"]
+    assert events[0].at
+
+    assert feed.read(cursor) == ([], cursor)
+    feed.append([ChangeEvent(NEW_DONOR, school="uva", new="Ed Fay")])
+    events, _ = feed.read(cursor)
+    assert [(e.seq, e.new) for e in events] == [(2, "Ed Fay")]
+
+
+def test_read_leaves_a_partly_written_line(feed):
+    feed.append([ChangeEvent(NEW_DONOR, school="vt", new="Ann Lee")])
+    with open(feed.path, "a") as f:
+        f.write('{"type":"new_donor"')
+
+    events, cursor = feed.read()
+    assert len(events) == 1
+    assert feed.read(cursor) == ([], cursor)
+
+
+def test_partly_written_line_is_ignored_then_written_over(feed):
+    feed.append([ChangeEvent(NEW_DONOR, school="vt", new="Ann Lee")])
+    with open(feed.path, "a") as f:
+        f.write('{"type":"new_donor","sc')  # a crash partway through the next append
+
+    assert feed.last_seq() == 1
+    written = feed.append([ChangeEvent(NEW_DONOR, school="uva", new="Ed Fay")])
+
+    assert [e.seq for e in written] == [2]
+    assert [(e.seq, e.new) for e in feed.read()[0]] == [(1, "Ann Lee"), (2, "Ed Fay")]
+
+
+def test_last_seq_reads_back_past_a_long_torn_line(feed):
+    feed.append([ChangeEvent(NEW_DONOR, school="vt", new="Ann Lee")])
+    with open(feed.path, "a") as f:
+        f.write('{"type":"new_donor","new":"' + "x" * 10_000)
+
+    assert feed.last_seq() == 1
+    assert [e.seq for e in feed.append([ChangeEvent(NEW_DONOR, school="vt", new="Bo Ray")])] == [2]
+
+
+def test_only_a_torn_line(feed):
+    with open(feed.path, "w") as f:
+        f.write('{"type":"new_do')
+
+    assert feed.last_seq() == 0
+    assert [e.seq for e in feed.append([ChangeEvent(NEW_DONOR, school="vt", new="Bo Ray")])] == [1]
+
+
+def test_read_missing_feed(feed):
+    assert feed.read(0) == ([], 0)
+    assert feed.last_seq() == 0
+
+
+def test_record_changes(feed):
+    events = record_changes({"vt_total_amount": 0}, {"vt_total_amount": 1000}, feed.path)
+
+    assert [e.type for e in feed.read()[0]] == [e.type for e in events] == [MILESTONE]
+
+
+def test_gift_statistics_have_no_leaders():
+    old = {"uva_median_gift": 50, "vt_median_gift": 40}
+    new = {"uva_median_gift": 50, "vt_median_gift": 60}
+
+    assert diff_results(old, new) == []
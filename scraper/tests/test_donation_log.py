@@ -0,0 +1,201 @@
+import os
+
+import pytest
+
+from scraper.CalculateValues import CalculateValues, DONOR_ID, entries_frame
+from scraper import DonationLog as donation_log
+from scraper.DonationLog import DonationLog, LogPosition, RECORD_HEADER, main
+from scraper.DonorIdentity import DonorIndex
+from scraper.benchmarks.loadEntries import synthetic_columns
+
+ROWS = 500
+
+
+def donation(amount, phone="5405550000", campaign="2025", **fields):
+    return {"source": "uva-front", "total amount": str(amount), "recurring payment": "false",
+            "phone number": phone, "first name": "Alex", "last name": "Green", "campaign": campaign, **fields}
+
+
+def synthetic_rows(rows=ROWS):
+    columns = synthetic_columns(rows)
+    return [{**{column[0]: column[i] for column in columns}, "campaign": "2025"} for i in range(1, rows + 1)]
+
+
+@pytest.fixture
+def log(tmp_path):
+    return DonationLog(str(tmp_path / "log"), snapshot_every=100)
+
+
+def test_records_round_trip(log):
+    log.append(donation(18), "<a@lgl>", "3")
+    end = log.append(donation(36, phone="5405550001"), "<b@lgl>", "3")
+
+    records = list(log.records())
+
+    assert [r.message_id for r in records] == ["<a@lgl>", "<b@lgl>"]
+    assert records[1].row["total amount"] == "36"
+    assert records[1].parser_version == "3"
+    assert records[1].end == end
+    # a fresh log (as after a restart) appends after the last record
+    DonationLog(log.path).append(donation(5), "<c@lgl>", "3")
+    assert [r.message_id for r in log.records()] == ["<a@lgl>", "<b@lgl>", "<c@lgl>"]
+
+
+def test_segments_roll_over(tmp_path):
+    log = DonationLog(str(tmp_path), segment_size=400)
+    for i in range(6):
+        log.append(donation(i), f"<{i}@lgl>", "3")
+
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".log")]) > 1
+    assert [r.row["total amount"] for r in log.records()] == [str(i) for i in range(6)]
+    assert [r.message_id for r in log.records(LogPosition(2, 0))][-1] == "<5@lgl>"
+
+
+def test_torn_tail_is_dropped_and_written_over(log):
+    log.append(donation(18), "<a@lgl>", "3")
+    end = log.append(donation(36), "<b@lgl>", "3")
+    segment = os.path.join(log.path, f"{end.segment:06d}.log")
+    with open(segment, "r+b") as f:
+        f.truncate(end.offset - 10)  # a crash partway through the second append
+
+    assert [r.message_id for r in DonationLog(log.path).records()] == ["<a@lgl>"]
+    DonationLog(log.path).append(donation(5), "<c@lgl>", "3")
+    assert [r.message_id for r in log.records()] == ["<a@lgl>", "<c@lgl>"]
+
+
+def test_corrupt_record_midway_is_an_error(log):
+    log.append(donation(18), "<a@lgl>", "3")
+    log.append(donation(36), "<b@lgl>", "3")
+    with open(os.path.join(log.path, "000001.log"), "r+b") as f:
+        f.seek(RECORD_HEADER.size + 5)
+        f.write(b"X")
+
+    with pytest.raises(ValueError, match="corrupt at offset 0"):
+        list(log.records())
+
+
+def test_bad_length_before_good_records_is_an_error_not_a_torn_tail(log):
+    for name in ("a", "b", "c"):
+        end = log.append(donation(18), f"<{name}@lgl>", "3")
+    segment = os.path.join(log.path, f"{end.segment:06d}.log")
+    second = [r.end for r in log.records()][0].offset
+    with open(segment, "r+b") as f:
+        f.seek(second + 8)
+        f.write(RECORD_HEADER.pack(b"LGLD", 0, 10_000_000)[8:])  # the second record's length, now past the end
+    with open(segment, "rb") as f:
+        before = f.read()
+
+    with pytest.raises(ValueError, match=f"corrupt at offset {second}"):
+        list(log.records())
+    with pytest.raises(ValueError):
+        DonationLog(log.path).append(donation(5), "<d@lgl>", "3")
+    with open(segment, "rb") as f:
+        assert f.read() == before  # the records after it weren't written over
+
+
+def test_same_email_counts_once(log):
+    log.append(donation(18), "<a@lgl>", "3")
+    log.append(donation(18), "<a@lgl>", "3")  # fetched again after a failed run
+    log.append(donation(36, phone="5405550001"), "<b@lgl>", "3")
+
+    metrics = log.metrics("2025")
+
+    assert metrics["uva"]["total_amount"] == 54
+    assert metrics["uva"]["most_individual_donors"] == 2
+    assert log.metrics("2030")["uva"]["total_amount"] == 0
+
+
+def test_snapshot_replays_only_later_records(log):
+    rows = synthetic_rows()
+    for i, row in enumerate(rows[:300]):
+        log.append(row, f"<{i}@lgl>", "3")
+    log.checkpoint()
+    assert log.load_snapshot().records == 300
+
+    for i, row in enumerate(rows[300:], 300):
+        log.append(row, f"<{i}@lgl>", "3")
+    snapshot = log.load_snapshot().position
+    replayed = []
+    records = log.records
+    log.records = lambda start=LogPosition(): replayed.append(start) or records(start)
+
+    state = log.state()
+
+    assert state.records == ROWS
+    assert replayed == [snapshot] and snapshot > LogPosition()
+    assert [os.path.basename(path) for path in log._snapshots()] == ["snapshot-0000000300.json",
+                                                                     "snapshot-0000000500.json"]
+
+
+def test_checkpoint_folds_in_only_the_new_records(log):
+    for i in range(150):
+        log.append(donation(i, phone=str(5_405_550_000 + i)), f"<{i}@lgl>", "3")
+    log.checkpoint()
+    position = log.state().position
+    log.append(donation(5, phone="5405559999"), "<new@lgl>", "3")
+    replayed = []
+    records = log.records
+    log.records = lambda start=LogPosition(): replayed.append(start) or records(start)
+
+    log.checkpoint()
+
+    assert replayed == [position]
+    assert log.metrics("2025")["uva"]["most_individual_donors"] == 151
+    assert log.load_snapshot().records == 150  # not enough since the snapshot for another
+
+
+def test_snapshot_of_another_version_is_rebuilt_from_the_log(log, monkeypatch, capsys):
+    for i in range(100):
+        log.append(donation(i, phone=str(5_405_550_000 + i)), f"<{i}@lgl>", "3")
+    log.checkpoint()
+    monkeypatch.setattr(donation_log, "SNAPSHOT_VERSION", donation_log.SNAPSHOT_VERSION + 1)
+
+    state = DonationLog(log.path, snapshot_every=100).state()
+
+    assert "Ignoring donation log snapshot" in capsys.readouterr().out
+    assert state.records == 100
+    assert state.metrics("2025")["uva"]["total_amount"] == sum(range(100))
+    assert log.load_snapshot().records == 100  # written again, at this version
+
+
+def test_metrics_match_calculate_values(log):
+    rows = synthetic_rows()
+    for i, row in enumerate(rows):
+        log.append(row, f"<{i}@lgl>", "3")
+    calc = CalculateValues.__new__(CalculateValues)
+    calc.df = entries_frame([[name] + [row[name] for row in rows] for name in rows[0] if name != "campaign"])
+    calc.df[DONOR_ID] = DonorIndex().assign(calc.df)
+    calc.distinct, calc.distinct_error, calc.workers = "exact", 0.01, 1
+    calc.state_path, calc._rows, calc._tables, calc._gifts = None, 0, {}, {}
+
+    expected = calc.calculate_all()
+
+    assert log.metrics("2025") == expected
+    log.checkpoint()
+    assert DonationLog(log.path).metrics("2025") == expected  # from the snapshot
+
+
+def test_corrupt_snapshot_falls_back(log, capsys):
+    for i in range(100):
+        log.append(donation(i, phone=str(5_405_550_000 + i)), f"<{i}@lgl>", "3")
+    log.checkpoint()
+    for i in range(100, 200):
+        log.append(donation(i, phone=str(5_405_550_000 + i)), f"<{i}@lgl>", "3")
+    log.checkpoint()
+    latest = log._snapshots()[-1]
+    with open(latest, "r+b") as f:
+        f.seek(100)
+        f.write(b"garbage")
+
+    state = DonationLog(log.path).state()
+
+    assert "Skipping corrupt donation log snapshot" in capsys.readouterr().out
+    assert state.records == 200
+    assert state.metrics("2025")["uva"]["most_individual_donors"] == 200
+
+
+def test_main_prints_a_campaigns_metrics(log, capsys):
+    log.append(donation(18), "<a@lgl>", "3")
+
+    assert main(["2025", "--log", log.path]) == 0
+    assert '"total_amount": 18.0' in capsys.readouterr().out
@@ -0,0 +1,95 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from scraper import DonorIdentity
+from scraper.DonorIdentity import DonorIndex, blocking_keys, name_key, normalize_phone
+from scraper.EmailParser import EmailParser
+
+
+@pytest.mark.parametrize("phone, expected", [
+    ("(540) 555-1234", "5405551234"),
+    ("540.555.1234", "5405551234"),
+    ("+1 540 555 1234", "5405551234"),
+    ("555-1234", "5551234"),
+    ("n/a", ""),
+    ("", ""),
+])
+def test_normalize_phone(phone, expected):
+    assert normalize_phone(phone) == expected
+
+
+def test_name_key_ignores_case_and_punctuation():
+    assert name_key("Mary-Beth ", "O'Neil") == name_key("marybeth", "ONEIL") == "oneil|marybeth"
+    assert name_key("", "") == ""
+
+
+def test_fallback_phone_is_not_a_blocking_key():
+    fallback = EmailParser.generate_fallback_phone("Sam", "Smith", "")
+
+    assert blocking_keys(fallback, "", "Sam", "Smith") == []
+    assert blocking_keys("5405551234", "Sam@Example.com ", "Sam", "Smith") == ["phone:5405551234",
+                                                                             "email:sam@example.com"]
+
+
+def test_differently_formatted_phones_are_one_donor():
+    donors = DonorIndex()
+
+    assert donors.donor_id("(540) 555-1234", "", "Ann", "Lee") == donors.donor_id("5405551234", "", "Ann", "Lee")
+
+
+def test_same_name_different_phones_are_different_donors():
+    donors = DonorIndex()
+
+    assert donors.donor_id("5405551234", "", "David", "Cohen") != donors.donor_id("4345550000", "", "David", "Cohen")
+
+
+def test_gifts_without_a_phone_match_on_email_then_name():
+    donors = DonorIndex()
+    ann = donors.donor_id("5405551234", "ann@example.com", "Ann", "Lee")
+
+    assert donors.donor_id("", "ANN@example.com", "Annie", "Lee") == ann
+    fallback = EmailParser.generate_fallback_phone("Bo", "Ray", "")
+    assert donors.donor_id(fallback, "", "Bo", "Ray") == donors.donor_id(fallback, "", "Bo", "Ray")
+
+
+def test_later_gift_merges_donors():
+    donors = DonorIndex()
+    df = pd.DataFrame({
+        "phone number": ["", "5405551234", "5405551234"],
+        "email": ["ann@example.com", "", "ann@example.com"],
+        "first name": ["Ann", "Ann", "Ann"],
+        "last name": ["Lee", "Lee", "Lee"],
+    })
+
+    ids = donors.assign(df)
+
+    assert len(set(ids)) == 1
+
+
+def test_ids_persist_between_runs(tmp_path):
+    path = str(tmp_path / "donors.json")
+    first = DonorIndex(path)
+    ids = [first.donor_id("5405551234"), first.donor_id("4345550000")]
+    first.save()
+
+    second = DonorIndex(path)
+    assert [second.donor_id("540-555-1234"), second.donor_id("434-555-0000")] == ids
+    assert second.donor_id("2025550000") not in ids
+    assert json.loads((tmp_path / "donors.json").read_text())["keys"]["phone:5405551234"] == ids[0]
+
+
+def test_save_without_a_path_or_changes_writes_nothing(tmp_path):
+    DonorIndex().save()
+    donors = DonorIndex(str(tmp_path / "donors.json"))
+    donors.save()
+
+    assert not (tmp_path / "donors.json").exists()
+
+
+@pytest.mark.skipif("DONOR_INDEX" in os.environ, reason="the donor index path is overridden")
+def test_index_defaults_to_the_package_not_the_working_directory():
+    assert DonorIdentity.DONOR_INDEX_PATH == os.path.join(
+        os.path.dirname(os.path.abspath(DonorIdentity.__file__)), "donor_index.json")
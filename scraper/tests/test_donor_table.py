@@ -0,0 +1,103 @@
+import json
+
+import numpy as np
+
+from scraper.CalculateValues import CalculateValues, DONOR_ID, entries_frame
+from scraper.DonorIdentity import DonorIndex
+from scraper.DonorTable import DonorTable, donor_table
+from scraper.benchmarks.loadEntries import synthetic_columns
+
+COLUMNS = ["source", "total amount", "recurring payment", "first name", "last name", "phone number",
+           "anonymous donation", "first time giver", "graduation year", "status", "work referral"]
+
+
+def rows(*gifts):
+    """Gifts as EmailParser.normalize gives them."""
+    return [{name: str(gift.get(name, "")) for name in COLUMNS} for gift in gifts]
+
+
+def table_of(normalized):
+    df = entries_frame([[name] + [row[name] for row in normalized] for name in COLUMNS])
+    df[DONOR_ID] = DonorIndex().assign(df)
+    return df, donor_table(df, CalculateValues._effective_amounts(df), df[DONOR_ID], np.arange(len(df)))
+
+
+GIFTS = rows(
+    {"first name": "Ann", "last name": "Lee", "phone number": "5405550001", "total amount": 10,
+     "anonymous donation": "true", "status": "Current Parent", "graduation year": 2025},
+    {"first name": "Bo", "last name": "Ray", "phone number": "5405550002", "total amount": 25,
+     "first time giver": "true", "status": "Alumni", "graduation year": 2024},
+    {"first name": "Annie", "last name": "Lee", "phone number": "5405550001", "total amount": 5,
+     "recurring payment": "true", "status": "Alumni, Current Student", "graduation year": 2026},
+    {"first name": "Cy", "last name": "Dee", "phone number": "5405550003", "total amount": 50,
+     "anonymous donation": "true"},
+)
+
+
+def test_one_record_per_donor():
+    df, table = table_of(GIFTS)
+    ann = table.donors[int(df[DONOR_ID][0])]
+
+    assert len(table) == 3
+    assert (ann.name, ann.anonymous, ann.gifts, ann.total) == ("Annie Lee", False, 2, 70.0)
+    assert ann.statuses == {"Current Parent", "Alumni", "Current Student"}
+    # a class year only counts when it was given as a student or alumnus
+    assert ann.class_years == {2026}
+
+
+def test_donor_queries():
+    df, table = table_of(GIFTS)
+    bo = int(df[DONOR_ID][1])
+
+    # Cy only gave anonymously, and Ann's first named gift came after Bo's
+    assert table.names() == "Bo Ray, Annie Lee"
+    assert table.first_time_ids() == [bo]
+    assert table.class_year_ids(2024) == [bo]
+    assert table.class_year_ids(2025) == []
+    assert sorted(table.status_ids("Alumni")) == sorted([bo, int(df[DONOR_ID][0])])
+
+
+def test_adding_gifts_one_at_a_time_matches_a_frame():
+    df, expected = table_of(GIFTS)
+    table = DonorTable()
+    for position, (row, donor) in enumerate(zip(GIFTS, df[DONOR_ID])):
+        table.add(row, int(donor), position)
+
+    assert table.donors == expected.donors
+
+
+def test_round_trips_through_json():
+    _, table = table_of(GIFTS)
+
+    assert DonorTable.from_json(json.loads(json.dumps(table.to_json()))).donors == table.donors
+
+
+def test_remap_folds_together_the_same_donor():
+    df, table = table_of(GIFTS)
+    ann, bo = int(df[DONOR_ID][0]), int(df[DONOR_ID][1])
+
+    table.remap(lambda donor: ann if donor == bo else donor)
+
+    assert len(table) == 2
+    assert (table.donors[ann].gifts, table.donors[ann].statuses) == (3, {"Current Parent", "Alumni", "Current Student"})
+    assert table.names() == "Bo Ray"  # the name on the earliest named gift
+
+
+def test_merged_halves_match_the_whole():
+    df = entries_frame(synthetic_columns(2000))
+    df[DONOR_ID] = DonorIndex().assign(df)
+    amounts = CalculateValues._effective_amounts(df)
+    positions = np.arange(len(df))
+
+    whole = donor_table(df, amounts, df[DONOR_ID], positions)
+    first = donor_table(df[:700], amounts[:700], df[DONOR_ID][:700], positions[:700])
+    second = donor_table(df[700:], amounts[700:], df[DONOR_ID][700:], positions[700:])
+    merged = first.merge(second)
+
+    assert merged.donors.keys() == whole.donors.keys()
+    for donor, record in whole.donors.items():
+        other = merged.donors[donor]
+        assert (other.name, other.anonymous, other.statuses, other.class_years, other.gifts) == (
+            record.name, record.anonymous, record.statuses, record.class_years, record.gifts)
+        assert other.total == record.total or abs(other.total - record.total) < 1e-6
+    assert merged.names() == whole.names()
@@ -0,0 +1,121 @@
+import sqlite3
+from datetime import datetime, timezone
+from email.message import EmailMessage
+
+import pytest
+
+from scraper.EmailArchive import EmailArchive
+
+
+def _email(number):
+    msg = EmailMessage()
+    msg['From'] = "Hillel at VT <lglforms-submissions@littlegreenlight.com>"
+    msg['Message-ID'] = f"<{number}@littlegreenlight.com>"
+    msg.set_content(f"<table><tr><td>Total Amount</td><td>${number}.00</td></tr></table>", subtype="html")
+    return msg.as_bytes()
+
+
+def _day(day):
+    return datetime(2025, 12, day, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    with EmailArchive(str(tmp_path / "archive")) as archive:
+        yield archive
+
+
+def test_put_and_get_round_trip(archive):
+    archived = archive.put(_email(18), uid=7, received=_day(1))
+
+    assert archive.get(archived.digest) == _email(18)
+    assert archived.uid == 7
+    assert archived.message_id == "<18@littlegreenlight.com>"
+    assert archived.received == "2025-12-01T12:00:00+00:00"
+    assert archive.by_uid(7) == archived
+    assert archive.by_message_id("<18@littlegreenlight.com>") == archived
+    assert archive.by_uid(8) is None
+
+
+def test_same_email_is_stored_once(archive, tmp_path):
+    first = archive.put(_email(18), uid=7, received=_day(1))
+    size = (tmp_path / "archive" / "000001.seg").stat().st_size
+    second = archive.put(_email(18), uid=9)
+
+    assert second.digest == first.digest
+    assert second.uid == 9
+    assert second.received == first.received  # not forgotten by a put that didn't know it
+    assert (tmp_path / "archive" / "000001.seg").stat().st_size == size
+    assert size < len(_email(18))  # compressed
+
+
+def test_segments_roll_over_and_persist(tmp_path):
+    path = str(tmp_path / "archive")
+    with EmailArchive(path, segment_size=400) as archive:
+        digests = [archive.put(_email(n), uid=n, received=_day(n)).digest for n in range(1, 6)]
+
+    assert len(list((tmp_path / "archive").glob("*.seg"))) > 1
+    with EmailArchive(path) as archive:
+        assert [archive.get(digest) for digest in digests] == [_email(n) for n in range(1, 6)]
+
+
+def test_read_after_append_to_a_mapped_segment(archive):
+    first = archive.put(_email(1))
+    archive.get(first.digest)  # maps the segment
+    second = archive.put(_email(2))
+
+    assert archive.get(second.digest) == _email(2)
+
+
+def test_scan_by_received_date(archive):
+    for day in (3, 1, 5):
+        archive.put(_email(day), uid=day, received=_day(day))
+
+    assert [e.uid for e in archive.scan(_day(1), _day(5))] == [3, 1]  # in storage order
+    assert [e.uid for e in archive.scan()] == [3, 1, 5]
+
+
+def test_parse_cache_is_versioned(archive):
+    digest = archive.put(_email(18)).digest
+    archive.store_parse(digest, "1", {"total amount": "18.0"})
+
+    assert archive.cached_parse(digest, "1") == {"total amount": "18.0"}
+    assert archive.cached_parse(digest, "2") is None
+
+
+def test_corrupt_segment_is_detected(archive, tmp_path):
+    digest = archive.put(_email(18)).digest
+    with open(tmp_path / "archive" / "000001.seg", "r+b") as f:
+        f.write(b"XXXX")
+
+    with pytest.raises(ValueError):
+        archive.get(digest)
+
+
+def test_get_unknown_digest(archive):
+    with pytest.raises(KeyError):
+        archive.get("0" * 64)
+
+
+def test_derived_messages_are_marked(archive):
+    original = archive.put(_email(18), uid=7)
+    rebuilt = archive.put(_email(36), uid=8, derived=True)
+
+    assert original.derived is False
+    assert rebuilt.derived is True
+    assert archive.by_uid(8).derived is True
+
+
+def test_index_from_before_the_mark_is_upgraded(tmp_path):
+    path = tmp_path / "archive"
+    with EmailArchive(str(path)) as archive:
+        digest = archive.put(_email(18), uid=7).digest
+    db = sqlite3.connect(str(path / "index.sqlite"))
+    with db:
+        db.execute("ALTER TABLE messages DROP COLUMN derived")
+    db.close()
+
+    with EmailArchive(str(path)) as archive:
+        assert archive.by_uid(7).derived is None  # not known either way
+        assert archive.put(_email(36), uid=8, derived=True).derived is True
+        assert archive.get(digest) == _email(18)
@@ -145,6 +145,17 @@ def test_phone_number_generated_when_blank(parser):
     assert len(phone) == 10  # Should be 10 digits
 
 
+def test_fallback_phone_is_the_same_for_the_same_donor(parser):
+    email_data = {"Name - First Name": "Sam", "Name - Last Name": "Smith", "Total Amount": "$10.00"}
+
+    first = parser.normalize(email_data, source="vt-front")["phone number"]
+    again = parser.normalize({**email_data, "Total Amount": "$5.00"}, source="vt-front")["phone number"]
+    other = parser.normalize({**email_data, "Name - First Name": "Pat"}, source="vt-front")["phone number"]
+
+    assert first == again
+    assert first != other
+
+
 def test_total_amount_with_commas(parser):
     email_data = {
         "Total Amount": "$1,030.00",
@@ -0,0 +1,162 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from gspread.exceptions import APIError
+
+from scraper import EntryShards as entry_shards
+from scraper.EntryShards import EntryShards, Shard, concat_columns, manifest_title, shard_title
+from scraper.testing.FakeSheets import FakeSheetsBackend, FakeWorksheet, _RateLimitedResponse
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(entry_shards, "SHARD_CACHE_DIR", str(tmp_path / "shard_cache"))
+    return tmp_path / "shard_cache"
+
+
+@pytest.fixture
+def backend():
+    backend = FakeSheetsBackend()
+    backend.add_spreadsheet("key")
+    return backend
+
+
+def spreadsheet(backend):
+    return backend.service_account().open_by_key("key")
+
+
+def entry(i, **extra):
+    return {"phone number": str(i), "total amount": str(i * 10), **extra}
+
+
+def titles(backend):
+    return [ws.title for ws in spreadsheet(backend).worksheets()]
+
+
+def test_shard_titles():
+    assert shard_title("entries-2025", 1) == "entries-2025"
+    assert shard_title("entries-2025", 3) == "entries-2025-3"
+    assert manifest_title("entries-2025") == "entries-2025-shards"
+
+
+def test_appends_roll_over_to_new_shards(backend):
+    shards = EntryShards(spreadsheet(backend), "entries", shard_rows=2)
+    for i in range(5):
+        shards.append(entry(i))
+
+    assert titles(backend) == ["entries-shards", "entries", "entries-2", "entries-3"]
+    assert [(shard.title, shard.sealed, shard.rows) for shard in shards.shards()] == [
+        ("entries", True, 2), ("entries-2", True, 2), ("entries-3", False, 0)]
+    # every shard has the headers, and the manifest is written down for the next run
+    assert spreadsheet(backend).worksheet("entries-3").get_values() == [["phone number", "total amount"], ["4", "40"]]
+    assert EntryShards(spreadsheet(backend), "entries").shards() == shards.shards()
+
+
+def test_appends_roll_over_by_age(backend):
+    opened = (datetime.now(timezone.utc) - timedelta(days=2)).isoformat(timespec="seconds")
+    backend.add_worksheet("key", "entries-shards", [["shard", "opened at", "sealed at", "rows"], ["entries", opened]])
+    backend.add_worksheet("key", "entries", [["phone number"], ["1"], ["2"]])
+
+    shards = EntryShards(spreadsheet(backend), "entries", shard_days=1)
+    shards.append(entry(3))
+
+    assert [(shard.title, shard.rows) for shard in shards.shards()] == [("entries", 2), ("entries-2", 0)]
+    assert spreadsheet(backend).worksheet("entries-2").get_values() == [
+        ["phone number", "total amount"], ["3", "30"]]
+
+
+def test_a_worksheet_from_before_sharding_becomes_the_first_shard(backend):
+    backend.add_worksheet("key", "entries", [["phone number"], ["1"], ["2"], ["3"]])
+    shards = EntryShards(spreadsheet(backend), "entries", shard_rows=3)
+    assert shards.shards() == [Shard("entries", "")]
+    assert shards.read_columns(["phone number"]) == [["phone number", "1", "2", "3"]]
+
+    shards.append(entry(4))
+
+    assert [(shard.title, shard.rows) for shard in shards.shards()] == [("entries", 4), ("entries-2", 0)]
+
+
+def test_a_failed_header_read_is_retried_rather_than_appending_the_headers_again(backend, monkeypatch):
+    EntryShards(spreadsheet(backend), "entries").append(entry(1))
+    shards = EntryShards(spreadsheet(backend), "entries")
+    row_values = FakeWorksheet.row_values
+    calls = []
+
+    def throttled_once(self, row):
+        calls.append(row)
+        if len(calls) == 1:
+            raise APIError(_RateLimitedResponse())
+        return row_values(self, row)
+
+    monkeypatch.setattr(FakeWorksheet, "row_values", throttled_once)
+    with pytest.raises(APIError):
+        shards.append(entry(2))
+    shards.append(entry(2))
+
+    assert spreadsheet(backend).worksheet("entries").get_values() == [
+        ["phone number", "total amount"], ["1", "10"], ["2", "20"]]
+
+
+def test_reads_every_shard_in_order(backend):
+    writer = EntryShards(spreadsheet(backend), "entries", shard_rows=2)
+    for i in range(3):
+        writer.append(entry(i))
+    writer.append(entry(3, email="d@example.com"))  # a new column, partway through
+
+    columns = EntryShards(spreadsheet(backend), "entries").read_columns(["phone number", "email", "status"])
+
+    assert columns == [["phone number", "0", "1", "2", "3"], ["email", "", "", "", "d@example.com"]]
+
+
+def test_sealed_shards_are_read_once(backend, cache_dir):
+    writer = EntryShards(spreadsheet(backend), "entries", shard_rows=2)
+    for i in range(5):
+        writer.append(entry(i))
+    expected = EntryShards(spreadsheet(backend), "entries").read_columns(["phone number"])
+    assert len(list(cache_dir.iterdir())) == 2
+
+    backend.api_calls.clear()
+    reader = EntryShards(spreadsheet(backend), "entries")
+    assert reader.read_columns(["phone number"]) == expected
+    # the manifest, then just the open shard
+    assert backend.api_calls["values.batchGet"] == 1
+    assert reader.api_calls == 5
+
+
+def test_rewrite_spreads_the_entries_over_shards(backend):
+    writer = EntryShards(spreadsheet(backend), "entries", shard_rows=2)
+    for i in range(7):
+        writer.append(entry(i))
+    writer.read_columns(["phone number"])  # caching the sealed shards
+
+    EntryShards(spreadsheet(backend), "entries", shard_rows=3).rewrite([entry(i) for i in range(4)])
+
+    reader = EntryShards(spreadsheet(backend), "entries")
+    assert [(shard.title, shard.rows) for shard in reader.shards()] == [("entries", 3), ("entries-2", 0)]
+    assert reader.read_columns(["phone number"]) == [["phone number", "0", "1", "2", "3"]]
+    assert spreadsheet(backend).worksheet("entries-4").get_values() == []
+
+
+def test_shards_are_read_concurrently():
+    backend = FakeSheetsBackend()
+    backend.add_spreadsheet("key")
+    writer = EntryShards(spreadsheet(backend), "entries", shard_rows=1)
+    for i in range(8):
+        writer.append(entry(i))
+
+    backend.latency = 0.05
+    start = time.perf_counter()
+    columns = EntryShards(spreadsheet(backend), "entries", readers=8).read_columns(["phone number"])
+    elapsed = time.perf_counter() - start
+
+    assert columns == [["phone number"] + [str(i) for i in range(8)]]
+    # 9 shards of 3 calls each would take 1.35s one after another
+    assert elapsed < 0.9
+
+
+def test_concat_columns_pads_each_shard():
+    assert concat_columns([
+        [["a", "1", "2"], ["b", "x"]],
+        [["b", "y"]],
+    ]) == [["a", "1", "2", ""], ["b", "x", "", "y"]]
@@ -0,0 +1,136 @@
+import imaplib
+from email.message import EmailMessage
+
+import gspread
+import pytest
+from imapclient import IMAPClient
+
+from scraper.testing.FakeImapServer import FakeImapServer
+from scraper.testing.FakeSheets import FakeSheetsBackend, parse_a1
+
+
+def _email(sender="lglforms-submissions@littlegreenlight.com", subject="New form submission"):
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["Subject"] = subject
+    msg.set_content("Plain text")
+    return msg.as_bytes()
+
+
+# ---------- FakeImapServer ---------- #
+
+@pytest.fixture
+def imap():
+    with FakeImapServer() as server:
+        yield server
+
+
+def test_imapclient_search_fetch_and_store(imap):
+    first = imap.deliver(_email())
+    imap.deliver(_email(sender="someone@example.com"))
+
+    client = IMAPClient(imap.host, port=imap.port, ssl=False)
+    client.login("user", "password")
+    client.select_folder("INBOX")
+    uids = client.search(["UNSEEN", "FROM", "littlegreenlight.com"])
+    assert uids == [first]
+
+    fetched = client.fetch(uids, ["BODY.PEEK[]"])
+    assert fetched[first][b"BODY[]"] == _email()
+    assert len(imap.unseen()) == 2  # PEEK leaves it unread
+
+    client.add_flags(uids, [b"\\Seen"])
+    assert len(imap.unseen()) == 1
+    client.logout()
+
+    assert imap.command_counts["UID SEARCH"] == 1
+    assert imap.bytes_sent > 0
+
+
+def test_imaplib_unseen_search(imap):
+    imap.deliver(_email())
+    mail = imaplib.IMAP4(imap.host, imap.port)
+    mail.login("user", "password")
+    mail.select("inbox")
+    status, data = mail.search(None, '(UNSEEN FROM "littlegreenlight.com")')
+    assert status == "OK"
+    assert data[0].split() == [b"1"]
+    mail.logout()
+
+
+def test_keywords_are_stored_and_searched(imap):
+    first = imap.deliver(_email())
+    second = imap.deliver(_email())
+    client = IMAPClient(imap.host, port=imap.port, ssl=False)
+    client.login("user", "password")
+    client.select_folder("INBOX")
+
+    client.add_flags([first], ["$Quarantined"])
+
+    assert client.search(["UNSEEN", "UNKEYWORD", "$Quarantined"]) == [second]
+    assert client.search(["KEYWORD", "$Quarantined"]) == [first]
+    client.logout()
+
+
+def test_idle_is_told_about_new_mail(imap):
+    client = IMAPClient(imap.host, port=imap.port, ssl=False)
+    client.login("user", "password")
+    client.select_folder("INBOX")
+    client.idle()
+    imap.deliver(_email())
+    responses = client.idle_check(timeout=5)
+    client.idle_done()
+    client.logout()
+    assert (1, b"EXISTS") in responses
+
+
+def test_rejects_bad_login():
+    with FakeImapServer(accounts={"user": "secret"}) as imap:
+        client = IMAPClient(imap.host, port=imap.port, ssl=False)
+        with pytest.raises(Exception):
+            client.login("user", "wrong")
+
+
+# ---------- FakeSheets ---------- #
+
+def test_parse_a1():
+    assert parse_a1("A2:C") == (2, 1, None, 3)
+    assert parse_a1("Sheet1!4:10") == (4, None, 10, None)
+    assert parse_a1("AA7") == (7, 27, 7, 27)
+
+
+def test_worksheet_reads_like_gspread():
+    backend = FakeSheetsBackend()
+    backend.add_worksheet("key", "Form Responses 1", values=[["a", "b", ""], ["1", "", ""], ["2", "3", "4"]])
+    ws = backend.service_account().open_by_key("key").sheet1
+
+    assert ws.get_all_values() == [["a", "b", ""], ["1", "", ""], ["2", "3", "4"]]
+    assert ws.get_values("2:3") == [["1", "", ""], ["2", "3", "4"]]
+    assert ws.get_values("A1:B2") == [["a", "b"], ["1", ""]]
+    assert ws.get_values(major_dimension="COLUMNS") == [["a", "1", "2"], ["b", "", "3"], ["", "", "4"]]
+    assert ws.col_values(2) == ["b", "", "3"]
+    assert ws.get_all_records() == [{"a": "1", "b": "", "": ""}, {"a": "2", "b": "3", "": "4"}]
+    assert backend.total_calls == 8  # open_by_key, sheet1 and six reads
+
+
+def test_worksheet_writes():
+    backend = FakeSheetsBackend()
+    spreadsheet = backend.add_spreadsheet("key")
+    ws = backend.service_account().open_by_key("key").add_worksheet("Sheet1")
+    ws.append_row(["a", "b"])
+    ws.append_rows([[1, 2], [3, 4]])
+    ws.update("C1", [["c"]])
+
+    assert spreadsheet.worksheet("Sheet1").get_all_values() == [["a", "b", "c"], ["1", "2", ""], ["3", "4", ""]]
+    with pytest.raises(gspread.exceptions.WorksheetNotFound):
+        spreadsheet.worksheet("missing")
+
+
+def test_throttling_raises_rate_limit_errors():
+    backend = FakeSheetsBackend(throttle_rate=1.0)
+    backend.add_worksheet("key", "Sheet1")
+    client = backend.service_account()
+    with pytest.raises(gspread.exceptions.APIError) as error:
+        client.open_by_key("key")
+    assert error.value.code == 429
+    assert backend.throttled == 1
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from scraper.FormRules import FormRule, MinNames, Equals, SubmittedData, score_batch
+
+
+def _rule(name, qualifier, school_column=3, hoos="University", hokies="Tech"):
+    return FormRule(
+        name=name,
+        description=name,
+        spreadsheet_key=f"{name}-key",
+        school_column=school_column,
+        hoos_pattern=hoos,
+        hokies_pattern=hokies,
+        qualifier=qualifier,
+        hoos_csv_column=f"uva_{name}",
+        hokies_csv_column=f"vt_{name}",
+    )
+
+
+@pytest.mark.parametrize("names, expected", [
+    ("a,b,c,d", True),
+    ("a\nb\nc\nd", True),
+    ("a\r\nb\rc,d", True),
+    ("Anne Smith, Bob Jones\nCarl Brown, Dee Green", True),
+    ("a,b, ,c", False),
+    (",,,\n\n", False),
+    ("", False),
+])
+def test_min_names(names, expected):
+    frame = pd.DataFrame([["", names]])
+    assert bool(MinNames(column=1, minimum=4).evaluate(frame)[0]) is expected
+
+
+def test_equals():
+    frame = pd.DataFrame([["Yes"], ["No"], ["yes"]])
+    assert list(Equals(column=0, value="Yes").evaluate(frame)) == [True, False, False]
+
+
+def test_score_batch_evaluates_every_rule():
+    gatherings = _rule("gatherings", MinNames(column=4, minimum=4), school_column=2, hoos="Brody")
+    memories = _rule("memories", Equals(column=4, value="Yes"))
+
+    scores = score_batch([
+        (gatherings, [
+            ["", "", "Tech", "", "a,b,c,d"],
+            ["", "", "Brody", "", "a,b\nc\nd"],
+            ["", "", "Brody", "", "a,b"],
+        ]),
+        (memories, [
+            ["", "", "", "University", "Yes"],
+            ["", "", "", "Tech", "Yes"],
+            ["", "", "", "Tech", "No"],
+        ]),
+    ])
+
+    assert scores["gatherings"] == SubmittedData(hokies=1, hoos=1)
+    assert scores["memories"] == SubmittedData(hokies=1, hoos=1)
+
+
+def test_score_batch_pads_short_rows_and_handles_empty_sources():
+    memories = _rule("memories", Equals(column=4, value="Yes"))
+    empty = _rule("empty", Equals(column=4, value="Yes"))
+
+    scores = score_batch([
+        (memories, [["", "", "", "Tech"], ["", "", "", "Tech", "Yes"]]),
+        (empty, []),
+    ])
+
+    assert scores["memories"] == SubmittedData(hokies=1, hoos=0)
+    assert scores["empty"] == SubmittedData()
+
+
+def test_score_batch_with_no_rules():
+    assert score_batch([]) == {}
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scraper.GiftStats import ANONYMOUS, GiftStats, QuantileSketch, TopDonors, TopGifts
+
+
+def row(first, last, amount, recurring="false", anonymous="false"):
+    """A gift as EmailParser.normalize gives it."""
+    return {"first name": first, "last name": last, "total amount": str(float(amount)),
+            "recurring payment": recurring, "anonymous donation": anonymous}
+
+
+def test_top_gifts_keeps_the_largest_earliest_first():
+    top = TopGifts(k=3)
+    for position, (amount, name) in enumerate([(50, "a"), (500, "b"), (10, "c"), (500, "d"), (75, "e")]):
+        top.add(amount, position, name)
+
+    assert top.items() == [("b", 500), ("d", 500), ("e", 75)]
+
+
+def test_top_gifts_update_and_merge_match_adding_one_at_a_time():
+    amounts = np.random.default_rng(45).integers(1, 1000, 500).astype(float)
+    one_at_a_time, halves, other = TopGifts(), TopGifts(), TopGifts()
+    for position, amount in enumerate(amounts):
+        one_at_a_time.add(amount, position, str(position))
+    halves.update(amounts[:250], np.arange(250), [str(p) for p in range(250)])
+    other.update(amounts[250:], np.arange(250, 500), [str(p) for p in range(250, 500)])
+
+    assert halves.merge(other).items() == one_at_a_time.items()
+
+
+def test_top_gifts_update_keeps_the_earliest_of_those_tied_for_the_last_place():
+    top = TopGifts(k=2)
+    top.update([5.0, 9.0, 5.0, 5.0, 1.0], np.array([10, 11, 3, 7, 0]), ["a", "b", "c", "d", "e"])
+
+    assert top.items() == [("b", 9.0), ("c", 5.0)]
+
+
+def test_top_donors_are_exact_within_capacity():
+    donors = TopDonors(capacity=10)
+    donors.update(donors=[1, 2, 1, 3], amounts=[10.0, 25.0, 30.0, 5.0], positions=[0, 1, 2, 3],
+                  names=["Ann Lee", "Bo Ray", "Annie Lee", "Cy Dee"])
+
+    assert donors.top(2) == [("Ann Lee", 40.0), ("Bo Ray", 25.0)]
+
+
+def test_top_donors_find_heavy_hitters_past_capacity():
+    rng = np.random.default_rng(45)
+    gifts = [(int(donor), 10.0) for donor in rng.integers(100, 10_000, 5000)] + [(1, 900.0)] * 20 + [(2, 500.0)] * 20
+    rng.shuffle(gifts)
+    donors = TopDonors(capacity=50)
+    for position, (donor, amount) in enumerate(gifts):
+        donors.add(donor, amount, position, f"donor {donor}")
+
+    top = donors.top(2)
+
+    assert [name for name, _ in top] == ["donor 1", "donor 2"]
+    # never under-counted, and over-counted by at most the smallest total held
+    assert top[0][1] >= 18_000 and top[1][1] >= 10_000
+
+
+def test_top_donors_merge_like_one_summary():
+    whole, first, second = TopDonors(), TopDonors(), TopDonors()
+    gifts = [(1, 10.0), (2, 20.0), (1, 15.0), (3, 5.0), (2, 1.0)]
+    for position, (donor, amount) in enumerate(gifts):
+        whole.add(donor, amount, position, f"donor {donor}")
+        (first if position < 2 else second).add(donor, amount, position, f"donor {donor}")
+
+    assert first.merge(second).top() == whole.top()
+
+
+def test_quantiles_are_within_their_accuracy():
+    values = np.random.default_rng(45).lognormal(4, 1.5, 20_000)
+    sketch = QuantileSketch(accuracy=0.01)
+    sketch.update(values)
+
+    for q in (0.1, 0.5, 0.9, 0.99):
+        assert sketch.quantile(q) == pytest.approx(np.quantile(values, q, method="lower"), rel=0.02)
+
+
+def test_quantile_sketches_merge_exactly():
+    values = np.random.default_rng(45).integers(0, 5000, 1000)
+    whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    whole.update(values)
+    first.update(values[:300])
+    second.update(values[300:])
+
+    first.merge(second)
+
+    assert (first.buckets, first.zeros, first.count) == (whole.buckets, whole.zeros, whole.count)
+
+
+def test_quantile_sketch_stays_bounded():
+    sketch = QuantileSketch(accuracy=0.01, max_buckets=50)
+    sketch.update(np.geomspace(1, 1e6, 10_000))
+
+    assert len(sketch.buckets) == 50
+    assert sketch.quantile(0.99) == pytest.approx(np.quantile(np.geomspace(1, 1e6, 10_000), 0.99), rel=0.02)
+
+
+def test_empty_quantiles_are_zero():
+    assert QuantileSketch().quantile(0.5) == 0
+
+
+def test_gift_stats_per_normalized_row():
+    stats = GiftStats()
+    stats.add(row("Ann", "Lee", 100), donor=1, position=0)
+    stats.add(row("Bo", "Ray", 25, recurring="true"), donor=2, position=1)
+    stats.add(row("Cy", "Dee", 1000, anonymous="true"), donor=3, position=2)
+    stats.add(row("Ann", "Lee", 150), donor=1, position=3)
+
+    metrics = stats.metrics()
+
+    assert metrics["largest_gifts"] == f"{ANONYMOUS} $1000.00, Bo Ray $300.00, Ann Lee $150.00, Ann Lee $100.00"
+    # the anonymous donor gave the most, but isn't named
+    assert metrics["top_donors"] == "Bo Ray $300.00, Ann Lee $250.00"
+    assert metrics["median_gift"] == pytest.approx(150, rel=0.001)
+    assert metrics["p90_gift"] == pytest.approx(300, rel=0.001)
+
+
+def test_gift_stats_columns_match_rows():
+    gifts = [row("Ann", "Lee", 100), row("Bo", "Ray", 20, anonymous="true"), row("Cy", "Dee", 45)]
+    by_row, by_column = GiftStats(), GiftStats()
+    for position, gift in enumerate(gifts):
+        by_row.add(gift, donor=position, position=position)
+
+    by_column.update(pd.Series([100.0, 20.0, 45.0]), pd.Series([0, 1, 2]), np.arange(3),
+                     pd.Series(["Ann Lee", "Bo Ray", "Cy Dee"]), pd.Series([False, True, False]))
+
+    assert by_column.metrics() == by_row.metrics()
@@ -1,9 +1,12 @@
+import os
 from unittest.mock import MagicMock
 
 import pandas as pd
 import pytest
 
 from scraper import getGoogleFormData
+from scraper.ChangeFeed import ChangeFeed
+from scraper.testing.FakeSheets import FakeSheetsBackend
 
 
 # ---------- Helper Fixtures ---------- #
@@ -20,34 +23,45 @@ def fake_df():
 
 
 @pytest.fixture
-def updater(monkeypatch, fake_df):
+def results_csv(fake_df, tmp_path, monkeypatch):
+    path = tmp_path / "results.csv"
+    fake_df.to_csv(path, index=False)
+    monkeypatch.setattr(getGoogleFormData, "FEED_PATH", str(tmp_path / "changes.jsonl"))
+    return str(path)
+
+
+@pytest.fixture
+def updater(monkeypatch, results_csv):
     # Patch gspread.service_account to return a mock client
     mock_gc = MagicMock()
     monkeypatch.setattr(getGoogleFormData.gspread, "service_account", lambda filename: mock_gc)
 
-    # Patch pandas read_csv to return our fake dataframe
-    monkeypatch.setattr(getGoogleFormData.pd, "read_csv", lambda path: fake_df.copy())
-    # Patch to_csv to just return None
-    monkeypatch.setattr(getGoogleFormData.pd.DataFrame, "to_csv", lambda self, path, index: None)
-
     return getGoogleFormData.SubmissionUpdater(
         credentials_path="fake.json",
-        results_csv_path="fake.csv",
+        results_csv_path=results_csv,
     )
 
 
+def _sheet(values, row_count=1000):
+    """A form's responses sheet (header included), read through a stand-in worksheet."""
+    ws = FakeSheetsBackend().add_worksheet("key", "Form Responses 1", values=values, rows=row_count)
+    sheet_mock = MagicMock()
+    sheet_mock.sheet1 = MagicMock(wraps=ws)
+    sheet_mock.sheet1.row_count = ws.row_count
+    return sheet_mock
+
+
 # ---------- Test Data Retrieval Methods ---------- #
 
 def test_get_alumni_gatherings(monkeypatch, updater):
     # Fake sheet data
-    sheet_mock = MagicMock()
-    sheet_mock.sheet1.get_all_values.return_value = [
+    sheet_mock = _sheet([
         ["Header1", "Header2", "Header3", "Header4", "Header5"],
-        ["", "", "Tech", "", "a,b,c,d"],  # enough people with commas -> VT
-        ["", "", "Tech", "", "a\nb\nc\nd"],  # enough people with newlines -> VT
-        ["", "", "Brody", "", "a,b\nc\nd"],  # enough people with newlines and commas -> UVA
-        ["", "", "Brody", "", "a,b"]  # not enough people
-    ]
+        ["2025-12-01", "", "Tech", "", "a,b,c,d"],  # enough people with commas -> VT
+        ["2025-12-01", "", "Tech", "", "a\nb\nc\nd"],  # enough people with newlines -> VT
+        ["2025-12-01", "", "Brody", "", "a,b\nc\nd"],  # enough people with newlines and commas -> UVA
+        ["2025-12-01", "", "Brody", "", "a,b"]  # not enough people
+    ])
     updater.gc.open_by_key.return_value = sheet_mock
 
     result = updater.get_alumni_gatherings()
@@ -57,14 +71,13 @@ def test_get_alumni_gatherings(monkeypatch, updater):
 
 def test_get_alumni_memories(monkeypatch, updater):
     # Create a fake Google Sheet
-    sheet_mock = MagicMock()
-    sheet_mock.sheet1.get_all_values.return_value = [
+    sheet_mock = _sheet([
         ["Header1", "Header2", "Header3", "Header4", "Header5"],  # header
-        ["", "", "", "University", "Yes"],  # counts as UVA
-        ["", "", "", "Tech", "Yes"],  # counts as VT
-        ["", "", "", "University", "No"],  # should be ignored
-        ["", "", "", "Tech", "No"]  # should be ignored
-    ]
+        ["2025-12-01", "", "", "University", "Yes"],  # counts as UVA
+        ["2025-12-01", "", "", "Tech", "Yes"],  # counts as VT
+        ["2025-12-01", "", "", "University", "No"],  # should be ignored
+        ["2025-12-01", "", "", "Tech", "No"]  # should be ignored
+    ])
 
     # Patch open_by_key to return the fake sheet
     updater.gc.open_by_key.return_value = sheet_mock
@@ -78,13 +91,12 @@ def test_get_alumni_memories(monkeypatch, updater):
 
 
 def test_get_mitzvah_memories(monkeypatch, updater):
-    sheet_mock = MagicMock()
-    sheet_mock.sheet1.get_all_values.return_value = [
+    sheet_mock = _sheet([
         ["Header1", "Header2", "Header3", "Header4", "Header5"],
-        ["", "", "", "University", "Yes"],
-        ["", "", "", "Tech", "Yes"],
-        ["", "", "", "University", "No"]
-    ]
+        ["2025-12-01", "", "", "University", "Yes"],
+        ["2025-12-01", "", "", "Tech", "Yes"],
+        ["2025-12-01", "", "", "University", "No"]
+    ])
     updater.gc.open_by_key.return_value = sheet_mock
 
     result = updater.get_mitzvah_memories()
@@ -93,9 +105,11 @@ def test_get_mitzvah_memories(monkeypatch, updater):
 
 
 def test_update_results(monkeypatch, updater):
-    # Patch the three data methods
-    monkeypatch.setattr(updater, "get_alumni_gatherings", lambda: getGoogleFormData.SubmittedData(hokies=2, hoos=3))
-    monkeypatch.setattr(updater, "get_mitzvah_memories", lambda: getGoogleFormData.SubmittedData(hokies=5, hoos=7))
+    # Patch the batch of data sources
+    monkeypatch.setattr(updater, "count_submissions", lambda rules: {
+        "alumni_gatherings": getGoogleFormData.SubmittedData(hokies=2, hoos=3),
+        "mitzvah_memories": getGoogleFormData.SubmittedData(hokies=5, hoos=7),
+    })
 
     updater.update_results()
 
@@ -104,3 +118,163 @@ def test_update_results(monkeypatch, updater):
     assert df.loc[0, "vt_alumni_gatherings"] == 2
     assert df.loc[0, "uva_mitzvah_memories"] == 7
     assert df.loc[0, "vt_mitzvah_memories"] == 5
+    events, _ = ChangeFeed(getGoogleFormData.FEED_PATH).read()
+    assert {(event.type, event.metric) for event in events} >= {("lead_change", "alumni_gatherings")}
+    assert pd.read_csv(updater.results_csv_path).loc[0, "uva_alumni_gatherings"] == 3
+
+
+def test_shared_client_skips_authorizing(monkeypatch, results_csv):
+    service_account = MagicMock()
+    monkeypatch.setattr(getGoogleFormData.gspread, "service_account", service_account)
+    gc = MagicMock()
+
+    updater = getGoogleFormData.SubmissionUpdater(None, results_csv, gc=gc)
+
+    assert updater.gc is gc
+    service_account.assert_not_called()
+
+
+# ---------- Test Incremental Reads ---------- #
+
+@pytest.fixture
+def incremental_updater(monkeypatch, results_csv, tmp_path):
+    monkeypatch.setattr(getGoogleFormData.gspread, "service_account", lambda filename: MagicMock())
+
+    def make(full_reconcile_every=24):
+        return getGoogleFormData.SubmissionUpdater(
+            credentials_path="fake.json",
+            results_csv_path=results_csv,
+            state_path=str(tmp_path / "form_state.json"),
+            full_reconcile_every=full_reconcile_every,
+        )
+
+    return make
+
+
+def _memory_sheet(rows, row_count=1000):
+    return _sheet([["Header1", "Header2", "Header3", "Header4", "Header5"]] + rows, row_count)
+
+
+def test_incremental_read_only_fetches_new_rows(incremental_updater):
+    first = incremental_updater()
+    first.gc.open_by_key.return_value = _memory_sheet([
+        ["2025-12-01", "", "", "University", "Yes"],
+        ["2025-12-01", "", "", "Tech", "Yes"],
+    ])
+    result = first.get_mitzvah_memories()
+    assert (result.hoos, result.hokies) == (1, 1)
+    first.save_progress()
+
+    second = incremental_updater()
+    sheet_mock = _memory_sheet([
+        ["2025-12-01", "", "", "University", "Yes"],
+        ["2025-12-01", "", "", "Tech", "Yes"],
+        ["2025-12-01", "", "", "Tech", "Yes"],
+        ["2025-12-01", "", "", "Tech", "No"],
+    ])
+    second.gc.open_by_key.return_value = sheet_mock
+    result = second.get_mitzvah_memories()
+
+    # from the last row read on, of just the timestamp, school and alumni columns
+    sheet_mock.sheet1.batch_get.assert_called_once_with(["A3:A502", "D3:E502"])
+    assert (result.hoos, result.hokies) == (1, 2)
+    assert second.progress[getGoogleFormData.MITZVAH_MEMORIES.spreadsheet_key].last_row == 5
+
+
+def test_incremental_read_reconciles_periodically(incremental_updater):
+    updater = incremental_updater(full_reconcile_every=2)
+    updater.gc.open_by_key.return_value = _memory_sheet([["2025-12-01", "", "", "University", "Yes"]])
+    updater.get_mitzvah_memories()
+    updater.get_mitzvah_memories()
+
+    # a response was edited, which only a full read will notice
+    sheet_mock = _memory_sheet([["2025-12-01", "", "", "University", "No"]])
+    updater.gc.open_by_key.return_value = sheet_mock
+    result = updater.get_mitzvah_memories()
+
+    sheet_mock.sheet1.batch_get.assert_called_once_with(["A2:A", "D2:E"])
+    assert (result.hoos, result.hokies) == (0, 0)
+
+
+def test_incremental_read_rereads_when_rows_removed(incremental_updater):
+    updater = incremental_updater()
+    updater.gc.open_by_key.return_value = _memory_sheet([["2025-12-01", "", "", "Tech", "Yes"]] * 5)
+    updater.get_mitzvah_memories()
+
+    sheet_mock = _memory_sheet([["2025-12-01", "", "", "Tech", "Yes"]] * 2)
+    updater.gc.open_by_key.return_value = sheet_mock
+    result = updater.get_mitzvah_memories()
+
+    # the last row read is blank now, so it's all read again
+    assert [c.args[0] for c in sheet_mock.sheet1.batch_get.call_args_list] == [["A6:A505", "D6:E505"],
+                                                                               ["A2:A", "D2:E"]]
+    assert result.hokies == 2
+
+
+def test_incremental_read_follows_the_last_response_not_the_grid(incremental_updater):
+    # the last response left the scored columns blank, and the grid has spare blank rows below it
+    updater = incremental_updater()
+    updater.gc.open_by_key.return_value = _memory_sheet([
+        ["2025-12-01", "", "", "Tech", "Yes"],
+        ["2025-12-02", "", "", "", ""],
+    ])
+    updater.get_mitzvah_memories()
+    assert updater.progress[getGoogleFormData.MITZVAH_MEMORIES.spreadsheet_key].last_row == 3
+
+    sheet_mock = _memory_sheet([
+        ["2025-12-01", "", "", "Tech", "Yes"],
+        ["2025-12-02", "", "", "", ""],
+        ["2025-12-03", "", "", "University", "Yes"],
+    ])
+    updater.gc.open_by_key.return_value = sheet_mock
+    result = updater.get_mitzvah_memories()
+
+    sheet_mock.sheet1.batch_get.assert_called_once_with(["A3:A502", "D3:E502"])
+    assert (result.hoos, result.hokies) == (1, 1)
+
+
+def test_incremental_read_pages_to_the_first_blank_timestamp(incremental_updater, monkeypatch):
+    monkeypatch.setattr(getGoogleFormData, "NEW_ROWS_PAGE", 3)
+    updater = incremental_updater()
+    updater.gc.open_by_key.return_value = _memory_sheet([["2025-12-01", "", "", "Tech", "Yes"]])
+    updater.get_mitzvah_memories()
+
+    sheet_mock = _memory_sheet([["2025-12-01", "", "", "Tech", "Yes"]] * 6)
+    updater.gc.open_by_key.return_value = sheet_mock
+    result = updater.get_mitzvah_memories()
+
+    assert [c.args[0] for c in sheet_mock.sheet1.batch_get.call_args_list] == [
+        ["A2:A4", "D2:E4"], ["A5:A7", "D5:E7"], ["A8:A10", "D8:E10"]]
+    assert result.hokies == 6
+    assert updater.progress[getGoogleFormData.MITZVAH_MEMORIES.spreadsheet_key].last_row == 7
+
+
+def test_update_results_saves_progress(monkeypatch, incremental_updater, tmp_path):
+    updater = incremental_updater()
+    updater.gc.open_by_key.return_value = _memory_sheet([["2025-12-01", "", "Brody", "Yes", "a,b,c,d"]])
+
+    updater.update_results()
+
+    saved = incremental_updater().progress
+    assert saved[getGoogleFormData.ALUMNI_GATHERINGS.spreadsheet_key].hoos == 1
+    assert saved[getGoogleFormData.MITZVAH_MEMORIES.spreadsheet_key].last_row == 2
+
+
+def test_reads_only_the_scored_columns():
+    updater_rows = [["2025-12-01", "Ann", "Brody", "Me", "a,b,c,d", "A very long memory " * 100]]
+    sheet_mock = _sheet([["Timestamp", "Name", "School", "Host", "Guests", "Memory"]] + updater_rows)
+    gc = MagicMock()
+    gc.open_by_key.return_value = sheet_mock
+
+    result = getGoogleFormData.SubmissionUpdater(None, "results.csv", gc=gc).get_alumni_gatherings()
+
+    sheet_mock.sheet1.batch_get.assert_called_once_with(["A2:A", "C2:C", "E2:E"])
+    assert result.hoos == 1
+
+
+def test_paths_resolve_from_the_repo_not_the_working_directory():
+    from scraper import updateResults
+
+    assert updateResults.FORM_STATE_PATH == getGoogleFormData.FORM_STATE_PATH
+    assert os.path.isabs(getGoogleFormData.FORM_STATE_PATH)
+    assert getGoogleFormData.RESULTS_CSV_PATH.endswith(os.path.join("public", "assets", "csv", "results.csv"))
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from scraper.HyperLogLog import HyperLogLog, precision_for_error
+
+
+def test_empty_sketch_counts_zero():
+    assert HyperLogLog().count() == 0
+
+
+def test_small_counts_are_exact_enough():
+    sketch = HyperLogLog()
+    for donor in [1, 2, 3, 2, 1]:
+        sketch.add(donor)
+
+    assert sketch.count() == 3
+
+
+@pytest.mark.parametrize("n", [1_000, 50_000, 500_000])
+def test_estimate_is_within_the_error_bound(n):
+    sketch = HyperLogLog(14)
+    sketch.update(np.arange(n))
+
+    assert abs(sketch.count() / n - 1) < 3 * sketch.error
+
+
+def test_row_by_row_and_column_updates_agree():
+    one_at_a_time, at_once = HyperLogLog(8), HyperLogLog(8)
+    for donor in range(2_000):
+        one_at_a_time.add(donor)
+    at_once.update(np.arange(2_000))
+
+    assert np.array_equal(one_at_a_time.registers, at_once.registers)
+
+
+def test_merge_is_the_sketch_of_the_union():
+    uva, vt, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    uva.update(np.arange(0, 6_000))
+    vt.update(np.arange(4_000, 10_000))
+    both.update(np.arange(10_000))
+
+    assert np.array_equal((uva | vt).registers, both.registers)
+    assert uva.count() < (uva | vt).count()  # the original is left alone
+
+
+def test_merge_needs_the_same_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
+
+
+def test_bytes_round_trip():
+    sketch = HyperLogLog(6)
+    sketch.update(["(540) 555-1234", "ann@example.com"])
+
+    restored = HyperLogLog.from_bytes(sketch.to_bytes())
+    assert restored.precision == 6
+    assert np.array_equal(restored.registers, sketch.registers)
+
+
+def test_precision_for_error():
+    assert precision_for_error(0.01) == 14
+    assert HyperLogLog.for_error(0.02).error <= 0.02
+    assert precision_for_error(1e-9) == 18
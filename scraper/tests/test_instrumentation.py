@@ -0,0 +1,85 @@
+import argparse
+import json
+
+import pytest
+
+from scraper import Instrumentation
+from scraper.Instrumentation import RunReport
+
+
+def test_span_records_time_and_counters():
+    report = RunReport("test")
+    with report.span("imap_fetch", items=1, api_calls=1) as stage:
+        stage.add(nbytes=2048)
+    with report.span("imap_fetch", items=1, api_calls=1) as stage:
+        stage.add(nbytes=1024)
+
+    stats = report.stages["imap_fetch"]
+    assert stats.calls == 2
+    assert stats.items == 2
+    assert stats.bytes == 3072
+    assert stats.api_calls == 2
+    assert stats.seconds >= 0
+
+
+def test_span_records_even_when_block_raises():
+    report = RunReport("test")
+    with pytest.raises(ValueError):
+        with report.span("parse", items=1):
+            raise ValueError("No table found in email")
+
+    assert report.stages["parse"].calls == 1
+
+
+def test_count_does_not_add_a_call():
+    report = RunReport("test")
+    report.count("sheets_write", api_calls=3)
+    assert report.stages["sheets_write"].calls == 0
+    assert report.stages["sheets_write"].api_calls == 3
+
+
+def test_write_appends_json_lines(tmp_path):
+    path = tmp_path / "report.jsonl"
+    report = RunReport("lgl")
+    with report.span("imap_search", items=4, api_calls=1):
+        pass
+    report.count("sheets_write", items=4, api_calls=8)
+    report.write(str(path))
+    report.write(str(path))
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 6
+    assert lines[0]["type"] == "stage"
+    assert lines[0]["stage"] == "imap_search"
+    assert lines[0]["run"] == "lgl"
+    summary = lines[2]
+    assert summary["type"] == "run"
+    assert summary["items"] == 8
+    assert summary["api_calls"] == 9
+
+
+def test_run_writes_report_and_profile(tmp_path, capsys):
+    parser = argparse.ArgumentParser()
+    Instrumentation.add_arguments(parser)
+    report_path = tmp_path / "report.jsonl"
+    profile_path = tmp_path / "run.prof"
+    args = parser.parse_args(["--report", str(report_path), "--profile", str(profile_path)])
+
+    def fake_main():
+        with Instrumentation.run_report.span("metrics"):
+            return 42
+
+    assert Instrumentation.run("test-run", fake_main, args) == 42
+    assert profile_path.exists()
+    records = [json.loads(line) for line in report_path.read_text().splitlines()]
+    assert records[0]["stage"] == "metrics"
+    assert records[-1]["run"] == "test-run"
+    assert "Profile written" in capsys.readouterr().out
+
+
+def test_profile_defaults_to_off():
+    parser = argparse.ArgumentParser()
+    Instrumentation.add_arguments(parser)
+    args = parser.parse_args([])
+    assert args.profile is None
+    assert args.report == Instrumentation.RUN_REPORT_PATH
@@ -0,0 +1,125 @@
+from email.message import EmailMessage
+
+import pytest
+from imapclient import IMAPClient
+
+from scraper import getLglFormData as lgl
+from scraper.LglFetcher import LglFetcher, decode_part
+from scraper.testing.FakeImapServer import FakeImapServer
+
+TABLE = "<table><tr><td>Name - First Name</td><td>Zoë</td></tr><tr><td>Total Amount</td><td>$18.00</td></tr></table>"
+
+
+def _email(html_cte=None, plain=True, attachment=False, html=TABLE):
+    msg = EmailMessage()
+    msg["From"] = "=?utf-8?q?Brody_Jewish_Center?= <lglforms-submissions@littlegreenlight.com>"
+    msg["Subject"] = "New form submission"
+    if plain:
+        msg.set_content("Plain text")
+        msg.add_alternative(html, subtype="html", cte=html_cte)
+    else:
+        msg.set_content(html, subtype="html", cte=html_cte)
+    if attachment:
+        msg.add_attachment(b"\x89PNG" * 1000, maintype="image", subtype="png", filename="logo.png")
+    return msg.as_bytes()
+
+
+@pytest.fixture
+def mailbox():
+    with FakeImapServer() as imap:
+        client = IMAPClient(imap.host, port=imap.port, ssl=False)
+        client.login("user", "password")
+        client.select_folder("INBOX")
+        yield imap, client
+        client.logout()
+
+
+@pytest.mark.parametrize("raw", [
+    _email(),
+    _email(html_cte="quoted-printable"),
+    _email(html_cte="base64"),
+    _email(plain=False),
+    _email(plain=False, html_cte="base64"),
+    _email(attachment=True),
+], ids=["alternative", "quoted-printable", "base64", "html-only", "html-only-base64", "attachment"])
+def test_fetch_parses_the_same_as_the_full_message(mailbox, raw):
+    imap, client = mailbox
+    uid = imap.deliver(raw)
+
+    fetched = LglFetcher(client).fetch([uid])[uid]
+
+    assert (fetched.sender, lgl.parse_lgl_html(fetched.html)) == lgl.parse_lgl_email(raw)
+    assert lgl.parse_lgl_email(fetched.raw) == lgl.parse_lgl_email(raw)  # what quarantine keeps still parses
+    assert fetched.derived and fetched.raw != raw
+    assert len(imap.unseen()) == 1
+
+
+def test_fetch_batches_by_section(mailbox):
+    imap, client = mailbox
+    uids = [imap.deliver(_email()), imap.deliver(_email(attachment=True)), imap.deliver(_email(plain=False)),
+            imap.deliver(_email())]
+
+    fetcher = LglFetcher(client)
+    fetched = fetcher.fetch(uids)
+
+    assert sorted(fetched) == uids
+    assert fetcher.commands == 4  # the structures, then sections 2 (twice over), 1.2 and 1
+    assert fetcher.bytes < sum(len(m.raw) for m in imap.mailbox().messages)
+
+
+def test_fetch_falls_back_to_the_whole_message_without_html(mailbox):
+    imap, client = mailbox
+    msg = EmailMessage()
+    msg["From"] = "lglforms-submissions@littlegreenlight.com"
+    msg.set_content("No html here")
+    uid = imap.deliver(msg.as_bytes())
+
+    fetched = LglFetcher(client).fetch([uid])[uid]
+
+    assert fetched.html is None
+    assert fetched.raw == msg.as_bytes()
+    assert not fetched.derived
+    with pytest.raises(ValueError, match="no HTML part"):
+        lgl.parse_lgl_email(fetched.raw)
+
+
+def test_fetch_whole_keeps_every_message_as_sent(mailbox):
+    imap, client = mailbox
+    raws = [_email(), _email(attachment=True)]
+    uids = [imap.deliver(raw) for raw in raws]
+
+    fetcher = LglFetcher(client)
+    fetched = fetcher.fetch(uids, whole=True)
+
+    assert [fetched[uid].raw for uid in uids] == raws
+    assert not any(email.derived or email.html for email in fetched.values())
+    assert fetched[uids[0]].sender == lgl.parse_lgl_email(raws[0])[0]
+    assert fetched[uids[0]].received is not None
+    assert fetcher.commands == 1
+
+
+def test_fetch_raw_gets_the_message_as_sent(mailbox):
+    imap, client = mailbox
+    raw = _email(attachment=True)
+    uid = imap.deliver(raw)
+
+    fetcher = LglFetcher(client)
+
+    assert fetcher.fetch_raw([uid]) == {uid: raw}
+    assert fetcher.commands == 1
+    assert len(imap.unseen()) == 1
+
+
+def test_fetch_nothing():
+    assert LglFetcher(None).fetch([]) == {}
+    assert LglFetcher(None).fetch_raw([]) == {}
+
+
+@pytest.mark.parametrize("data, encoding, charset, expected", [
+    (b"caf\xc3\xa9", "8bit", "utf-8", "café"),
+    (b"caf=C3=A9=\r\n!", "quoted-printable", "utf-8", "café!"),
+    (b"Y2Fm6Q==", "base64", "iso-8859-1", "café"),
+    (b"plain", "7bit", "x-unknown-charset", "plain"),
+])
+def test_decode_part(data, encoding, charset, expected):
+    assert decode_part(data, encoding, charset) == expected
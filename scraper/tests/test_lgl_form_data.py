@@ -1,11 +1,23 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
 from email.message import EmailMessage
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, call, patch
 
 import gspread
 import pandas as pd
 import pytest
 
+from imapclient import IMAPClient
+
+from scraper import CalculateValues
 from scraper import getLglFormData as lgl
+from scraper.Campaign import Campaign
+from scraper.DonationLog import DonationLog
+from scraper.ResultsHistory import ResultsHistory
+from scraper.testing.FakeImapServer import FakeImapServer
+from scraper.testing.FakeSheets import FakeSheetsBackend
 
 
 # ---------- parse_lgl_email ---------- #
@@ -54,47 +66,88 @@ def test_parse_lgl_email_no_table():
 
 # ---------- update_google_sheet ---------- #
 
-@patch("scraper.getLglFormData.gspread.service_account")
-def test_update_google_sheet_creates_worksheet(mock_gspread):
-    # Mock the sheet
-    ws_mock = MagicMock()
-    sh_mock = MagicMock()
-    sh_mock.worksheet.side_effect = gspread.WorksheetNotFound  # force add_worksheet path
-    sh_mock.add_worksheet.return_value = ws_mock
-    mock_gspread.return_value.open_by_key.return_value = sh_mock
+def test_update_google_sheet_creates_worksheet():
+    backend = FakeSheetsBackend()
+    backend.add_spreadsheet(lgl.SPREADSHEET_KEY)
+
+    lgl.update_google_sheet(backend.service_account(), {"name": "John", "total": "100"}, "entries-2025")
+
+    sh = backend.service_account().open_by_key(lgl.SPREADSHEET_KEY)
+    assert sh.worksheet("entries-2025").get_values() == [["name", "total"], ["John", "100"]]  # headers + row
+    assert sh.worksheet("entries-2025-shards").get_values()[1][0] == "entries-2025"
 
-    # Sample normalized row
-    row = {"name": "John", "total": "100"}
-    lgl.update_google_sheet(mock_gspread.return_value, row)
 
-    sh_mock.add_worksheet.assert_called_once()
-    ws_mock.append_row.assert_called()  # headers + row appended
+def test_update_google_sheet_extends_headers_and_lines_up_rows():
+    backend = FakeSheetsBackend()
+    backend.add_worksheet(lgl.SPREADSHEET_KEY, "entries-2025", [["name", "total"], ["Ann", "5"]])
+
+    lgl.update_google_sheet(backend.service_account(), {"total": "100", "name": "John", "campaign": "2025"},
+                            "entries-2025")
+
+    ws = backend.service_account().open_by_key(lgl.SPREADSHEET_KEY).worksheet("entries-2025")
+    assert ws.get_values() == [["name", "total", "campaign"], ["Ann", "5", ""], ["John", "100", "2025"]]
 
 
 # ---------- update_local_csv ---------- #
 
-@patch("scraper.getLglFormData.CalculateValues")
-@patch("scraper.getLglFormData.pd.read_csv")
-@patch("scraper.getLglFormData.pd.DataFrame.to_csv")
-def test_update_local_csv(mock_to_csv, mock_read_csv, mock_calc):
-    # Mock CSV dataframe
-    df_mock = pd.DataFrame({"vt_total": [0], "uva_total": [0]})
-    mock_read_csv.return_value = df_mock
+@pytest.fixture
+def results_csv(monkeypatch, tmp_path):
+    path = tmp_path / "results.csv"
+    pd.DataFrame({"vt_total": [0], "uva_total": [0]}).to_csv(path, index=False)
+    monkeypatch.setattr(lgl, "CSV_PATH", str(path))
+    monkeypatch.setattr(lgl, "HISTORY_DIR", str(tmp_path / "history"))
+    monkeypatch.setattr(lgl, "FEED_PATH", str(tmp_path / "changes.jsonl"))
+    return path
+
 
+@patch("scraper.CalculateValues.CalculateValues")
+def test_update_local_csv(mock_calc, results_csv):
     # Mock CalculateValues.calculate_all
     calc_instance = MagicMock()
     calc_instance.calculate_all.return_value = {
-        "vt": {"total": 42},
+        "vt": {"total": 42, "donor_names": ["Ann", "Bob"]},
         "uva": {"total": 99}
     }
     mock_calc.return_value = calc_instance
 
     lgl.update_local_csv()
 
-    # Verify DataFrame updated
-    assert df_mock.at[0, "vt_total"] == 42
-    assert df_mock.at[0, "uva_total"] == 99
-    mock_to_csv.assert_called_once()
+    # Verify the CSV was updated, and new columns added
+    df = pd.read_csv(results_csv)
+    assert df.at[0, "vt_total"] == 42
+    assert df.at[0, "uva_total"] == 99
+    assert df.at[0, "vt_donor_names"] == "Ann, Bob"
+    assert not results_csv.with_name("results.csv.tmp").exists()
+    _, snapshot = ResultsHistory(lgl.HISTORY_DIR).latest()
+    assert snapshot == {"vt_total": 42, "uva_total": 99}
+
+
+@patch("scraper.CalculateValues.CalculateValues")
+def test_update_local_csv_uses_precomputed_campaign(mock_calc, results_csv, monkeypatch):
+    monkeypatch.setattr(CalculateValues, "load_precomputed", lambda campaign: {"vt": {"total": 7}})
+    campaign = MagicMock()
+    campaign.closed.return_value = True
+
+    lgl.update_local_csv(campaign)
+
+    mock_calc.assert_not_called()
+    assert pd.read_csv(results_csv).at[0, "vt_total"] == 7
+
+
+# ---------- donated_at ---------- #
+
+def test_donated_at_uses_the_email_date():
+    raw = b"From: lgl@example.com\r\nDate: Mon, 01 Dec 2025 14:30:00 -0500\r\n\r\n"
+    received = datetime(2025, 12, 2, tzinfo=timezone.utc)
+
+    assert lgl.donated_at(raw, received) == "2025-12-01T19:30:00+00:00"
+
+
+def test_donated_at_falls_back_to_when_it_was_received():
+    received = datetime(2025, 12, 2, 9, tzinfo=timezone.utc)
+
+    assert lgl.donated_at(b"From: lgl@example.com\r\n\r\n", received) == "2025-12-02T09:00:00+00:00"
+    assert lgl.donated_at(b"From: lgl@example.com\r\n\r\n") == ""
 
 
 # ---------- determine_source usage ---------- #
@@ -106,3 +159,274 @@ def test_normalize_row_with_source():
     row = parser.normalize(data, lgl.determine_source("hillel at vt", "Front-End Form"))
     assert row["status"] == "Current Student"
     assert row["source"] == "vt-front"
+
+
+# ---------- quarantine ---------- #
+
+def _lgl_email(html):
+    msg = EmailMessage()
+    msg['From'] = "Hillel at VT <lglforms-submissions@littlegreenlight.com>"
+    msg['Message-ID'] = "<test@littlegreenlight.com>"
+    msg.add_alternative(html, subtype='html')
+    return msg.as_bytes()
+
+
+GOOD_EMAIL = _lgl_email("<table><tr><td>Total Amount</td><td>$18.00</td></tr></table>")
+BAD_EMAIL = _lgl_email("<p>No table here</p>")
+
+
+@pytest.fixture
+def imap_server(monkeypatch, tmp_path):
+    monkeypatch.setattr(lgl, "QUARANTINE_DIR", str(tmp_path / "quarantine"))
+    monkeypatch.setattr(lgl, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(lgl, "DONATION_LOG_DIR", str(tmp_path / "donation_log"))
+    monkeypatch.setattr(lgl, "PENDING_PATH", str(tmp_path / "lgl_pending.json"))
+    monkeypatch.setattr(lgl, "update_local_csv", MagicMock())
+    monkeypatch.setattr(lgl, "update_google_sheet", MagicMock())
+    monkeypatch.setattr(gspread, "service_account", MagicMock())
+
+    server = MagicMock()
+    server.__enter__.return_value = server
+    server.select_folder.return_value = {b"UIDVALIDITY": 7}
+    monkeypatch.setattr(lgl, "IMAPClient", MagicMock(return_value=server))
+    return server
+
+
+@pytest.fixture
+def fake_imap(imap_server, monkeypatch):
+    """A real (local) IMAP server in place of the mocked client."""
+    monkeypatch.setattr(lgl, "IMAPClient", IMAPClient)
+    with FakeImapServer() as imap:
+        monkeypatch.setattr(lgl, "IMAP_SERVER", imap.host)
+        monkeypatch.setattr(lgl, "IMAP_PORT", imap.port)
+        monkeypatch.setattr(lgl, "IMAP_SSL", False)
+        monkeypatch.setattr(lgl, "EMAIL_ACCOUNT", "cwkc")
+        monkeypatch.setattr(lgl, "EMAIL_PASSWORD", "password")
+        yield imap
+
+
+@pytest.mark.parametrize("archive_raw", [True, False])
+def test_main_quarantines_unparseable_email(fake_imap, monkeypatch, archive_raw):
+    monkeypatch.setattr(lgl, "ARCHIVE_RAW", archive_raw)
+    bad = fake_imap.deliver(BAD_EMAIL)
+    good = fake_imap.deliver(GOOD_EMAIL)
+
+    lgl.main()
+
+    store = lgl.QuarantineStore(lgl.QUARANTINE_DIR)
+    assert [e.uid for e in store.entries()] == [bad]
+    assert store.entries()[0].error == "No table found in email"
+    assert store.load_raw(bad, fake_imap.mailbox().uid_validity) == BAD_EMAIL  # as sent, not as rebuilt
+    assert [m.uid for m in fake_imap.unseen()] == [bad]
+    assert "$Quarantined" in fake_imap.unseen()[0].flags
+    lgl.update_google_sheet.assert_called_once()
+    row = lgl.update_google_sheet.call_args.args[1]
+    assert row["campaign"] == lgl.active_campaign().id
+    assert datetime.fromisoformat(row["donated at"]).tzinfo is not None
+    assert row["total amount"] == "18.0"
+    assert good not in [m.uid for m in fake_imap.unseen()]
+
+
+def test_main_fetches_only_the_html_part(fake_imap, monkeypatch):
+    monkeypatch.setattr(lgl, "ARCHIVE_RAW", False)
+    msg = EmailMessage()
+    msg['From'] = "Hillel at VT <lglforms-submissions@littlegreenlight.com>"
+    msg.set_content("Plain text alternative " * 50)
+    msg.add_alternative("<table><tr><td>Total Amount</td><td>$36.00</td></tr></table>", subtype='html')
+    msg.add_attachment(b"\x89PNG" * 5000, maintype="image", subtype="png", filename="logo.png")
+    raw = msg.as_bytes()
+    fake_imap.deliver(raw)
+
+    lgl.main()
+
+    row = lgl.update_google_sheet.call_args.args[1]
+    assert row["total amount"] == "36.0"
+    assert row["source"].startswith("vt")  # the sender came from the fetched headers
+    assert fake_imap.bytes_sent < len(raw) / 4
+    assert fake_imap.command_counts["UID FETCH"] == 2  # the structure of everything, then the html
+    with lgl.EmailArchive(lgl.ARCHIVE_DIR) as archive:
+        assert archive.by_uid(1).derived  # rebuilt from the fetched headers and HTML
+
+
+def test_main_archives_fetched_emails(fake_imap):
+    bad = fake_imap.deliver(BAD_EMAIL)
+    good = fake_imap.deliver(GOOD_EMAIL)
+
+    lgl.main()
+
+    with lgl.EmailArchive(lgl.ARCHIVE_DIR) as archive:
+        archived = archive.by_uid(good)
+        assert archived.message_id == "<test@littlegreenlight.com>"
+        assert archived.received is not None
+        assert not archived.derived
+        assert archive.get(archived.digest) == GOOD_EMAIL  # as sent
+        assert archive.cached_parse(archived.digest, lgl.PARSER_VERSION)["total amount"] == "18.0"
+        assert archive.cached_parse(archive.by_uid(bad).digest, lgl.PARSER_VERSION) is None
+    assert fake_imap.command_counts["UID FETCH"] == 1  # every message whole, at once
+
+
+def test_main_logs_normalized_donations(fake_imap):
+    fake_imap.deliver(BAD_EMAIL)
+    fake_imap.deliver(GOOD_EMAIL)
+
+    lgl.main()
+
+    logged = list(DonationLog(lgl.DONATION_LOG_DIR).records())
+    assert len(logged) == 1
+    assert logged[0].message_id == "<test@littlegreenlight.com>"
+    assert logged[0].parser_version == lgl.PARSER_VERSION
+    assert logged[0].row == lgl.update_google_sheet.call_args.args[1]
+
+
+def test_reprocess_archive_uses_the_parse_cache(fake_imap, monkeypatch, capsys):
+    now = datetime.now(timezone.utc)
+    campaign = Campaign("now", start=now - timedelta(days=1), deadline=now + timedelta(days=1))
+    fake_imap.deliver(GOOD_EMAIL)
+    lgl.process_new_emails(campaign=campaign)
+    capsys.readouterr()
+
+    rows = lgl.reprocess_archive(campaign)
+    assert [row["total amount"] for row in rows] == ["18.0"]
+    assert rows[0]["campaign"] == "now"
+    assert "1 from the parse cache" in capsys.readouterr().out
+
+    monkeypatch.setattr(lgl, "PARSER_VERSION", "next")
+    rows = lgl.reprocess_archive(campaign)
+    assert [row["total amount"] for row in rows] == ["18.0"]
+    assert "0 from the parse cache" in capsys.readouterr().out
+    assert lgl.reprocess_archive(campaign) == rows  # and cached for next time
+    assert "1 from the parse cache" in capsys.readouterr().out
+
+
+def test_rewrite_google_sheet_replaces_everything():
+    backend = FakeSheetsBackend()
+    backend.add_worksheet(lgl.SPREADSHEET_KEY, "entries", [["old"], ["stale"]])
+
+    lgl.rewrite_google_sheet(backend.service_account(), [{"a": "1"}, {"a": "2", "b": "3"}], "entries")
+
+    sh = backend.service_account().open_by_key(lgl.SPREADSHEET_KEY)
+    assert sh.worksheet("entries").get_values() == [["a", "b"], ["1", ""], ["2", "3"]]
+    assert [row[0] for row in sh.worksheet("entries-shards").get_values()] == ["shard", "entries"]
+
+
+def test_main_with_nothing_new_leaves_the_results(fake_imap):
+    lgl.main()
+
+    lgl.update_local_csv.assert_not_called()
+    lgl.main(force=True)
+    lgl.update_local_csv.assert_called_once()
+
+
+def test_a_failed_recalculation_is_caught_up_by_the_next_run(fake_imap):
+    fake_imap.deliver(GOOD_EMAIL)
+    lgl.update_local_csv.side_effect = RuntimeError("rate limited")
+
+    with pytest.raises(RuntimeError):
+        lgl.main()
+
+    # the donation's in the sheet, but its email stays unread until results covering it are written
+    lgl.update_google_sheet.assert_called_once()
+    assert len(fake_imap.unseen()) == 1
+    lgl.update_local_csv.side_effect = None
+    lgl.main()
+    lgl.update_google_sheet.assert_called_once()  # not entered twice
+    assert lgl.update_local_csv.call_count == 2
+    assert fake_imap.unseen() == []
+    assert lgl.pending_emails() == []
+
+    lgl.main()
+    assert lgl.update_local_csv.call_count == 2  # nothing pending now
+
+
+def test_an_email_is_not_entered_twice_when_the_pending_file_is_lost(fake_imap):
+    fake_imap.deliver(GOOD_EMAIL)
+    lgl.update_local_csv.side_effect = RuntimeError("rate limited")
+    with pytest.raises(RuntimeError):
+        lgl.main()
+    os.remove(lgl.PENDING_PATH)  # as when a failed job doesn't save its state
+    lgl.update_local_csv.side_effect = None
+
+    lgl.main()
+
+    lgl.update_google_sheet.assert_called_once()  # the mailbox remembers it was entered
+    assert lgl.update_local_csv.call_count == 2
+    assert fake_imap.unseen() == []
+
+
+def test_collect_updates_with_nothing_new(fake_imap, monkeypatch):
+    metric_updates = MagicMock()
+    monkeypatch.setattr(lgl, "metric_updates", metric_updates)
+
+    assert lgl.collect_updates(MagicMock()) == {}
+    metric_updates.assert_not_called()
+
+
+def test_import_leaves_the_heavy_dependencies_until_needed():
+    code = ("import sys, scraper.getLglFormData; "
+            "print(sorted({'pandas', 'gspread', 'bs4', 'numpy'} & set(sys.modules)))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_main_skips_quarantined_email(imap_server):
+    lgl.QuarantineStore(lgl.QUARANTINE_DIR).add(1, BAD_EMAIL, "No table found in email", uid_validity=7)
+    imap_server.search.return_value = [1]  # quarantined before emails were flagged
+
+    lgl.main()
+
+    imap_server.fetch.assert_not_called()
+    imap_server.add_flags.assert_called_once_with([1], ["$Quarantined"])
+    lgl.update_google_sheet.assert_not_called()
+
+
+def test_quarantined_email_is_left_out_of_later_searches(fake_imap):
+    fake_imap.deliver(BAD_EMAIL)
+    lgl.main()
+    fetches = fake_imap.command_counts["UID FETCH"]
+
+    lgl.main()
+
+    assert fake_imap.command_counts["UID FETCH"] == fetches
+    assert lgl.QuarantineStore(lgl.QUARANTINE_DIR).entries()[0].attempts == 1
+
+
+def test_main_fetches_a_new_email_reusing_a_quarantined_uid(fake_imap):
+    bad = fake_imap.deliver(BAD_EMAIL)
+    lgl.main()
+    # the mailbox is rebuilt, and a good email is given the bad one's UID
+    inbox = fake_imap.mailbox()
+    inbox.messages.clear()
+    inbox.uid_validity += 1
+    inbox.next_uid = bad
+    assert fake_imap.deliver(GOOD_EMAIL) == bad
+
+    lgl.main()
+
+    lgl.update_google_sheet.assert_called_once()
+    assert fake_imap.unseen() == []
+
+
+def test_retry_quarantine_recovers_fixed_emails(imap_server):
+    store = lgl.QuarantineStore(lgl.QUARANTINE_DIR)
+    store.add(1, GOOD_EMAIL, "parser bug, since fixed", uid_validity=7)
+    store.add(2, BAD_EMAIL, "No table found in email", uid_validity=7)
+    store.add(1, GOOD_EMAIL, "parser bug, since fixed", uid_validity=6)  # from before the mailbox was rebuilt
+
+    lgl.retry_quarantine()
+
+    store = lgl.QuarantineStore(lgl.QUARANTINE_DIR)
+    assert [e.uid for e in store.entries()] == [2]
+    assert store.entries()[0].attempts == 2
+    # not the UID 1 from the old mailbox
+    assert imap_server.add_flags.call_args_list == [call([1], ["$Entered"]), call([1], ['\\Seen'])]
+    imap_server.remove_flags.assert_called_once_with([1], ["$Quarantined"])
+    assert lgl.update_google_sheet.call_count == 2
+    lgl.update_local_csv.assert_called_once()
+
+
+def test_retry_quarantine_with_nothing_quarantined(imap_server):
+    lgl.retry_quarantine()
+
+    lgl.IMAPClient.assert_not_called()
+    lgl.update_local_csv.assert_not_called()
@@ -0,0 +1,8 @@
+from scraper.benchmarks import noopRun
+
+
+def test_noop_run_only_searches_the_mailbox(capsys):
+    assert noopRun.main(["--runs", "3"]) == 0
+    out = capsys.readouterr().out
+    assert "only searched the mailbox: imap_search" in out
+    assert "within the 1.00s budget" in out
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from scraper import Campaign as campaigns
+from scraper import pollEmail
+from scraper.Campaign import Campaign, EASTERN
+from scraper.PollScheduler import PollScheduler
+
+CUP = Campaign("2030", datetime(2030, 12, 1, tzinfo=EASTERN), datetime(2030, 12, 7, 20, tzinfo=EASTERN))
+
+
+@pytest.fixture(autouse=True)
+def one_campaign(monkeypatch):
+    monkeypatch.delenv("CAMPAIGN_ID", raising=False)
+    monkeypatch.setattr(campaigns, "CAMPAIGNS", (CUP,))
+
+
+@pytest.fixture
+def scheduler():
+    return PollScheduler(floor=15, ceiling=300, final_stretch=timedelta(hours=6), half_life=600,
+                         dormant_recheck=86400)
+
+
+def test_dormant_outside_the_window(scheduler):
+    assert not scheduler.active(CUP.opens() - timedelta(days=10))
+    assert scheduler.interval(CUP.opens() - timedelta(days=10)) == 86400
+    assert scheduler.interval(CUP.opens() - timedelta(hours=2)) == 7200  # wakes right as it opens
+    assert not scheduler.active(CUP.closes() + timedelta(seconds=1))
+
+
+def test_slow_early_on(scheduler):
+    assert scheduler.active(CUP.opens())
+    assert scheduler.interval(CUP.opens()) == 300
+    assert scheduler.interval(CUP.start + timedelta(days=1)) == 300
+
+
+def test_tightens_towards_the_deadline(scheduler):
+    assert scheduler.interval(CUP.deadline - timedelta(hours=6)) == 300
+    assert scheduler.interval(CUP.deadline - timedelta(hours=3)) == pytest.approx(157.5)
+    assert scheduler.interval(CUP.deadline) == 15
+    assert scheduler.interval(CUP.deadline + timedelta(hours=3)) == pytest.approx(157.5)  # then eases off
+    assert scheduler.interval(CUP.deadline + timedelta(days=1)) == 300
+
+
+def test_tightens_as_arrivals_pick_up(scheduler):
+    now = CUP.start + timedelta(days=1)
+    scheduler.observe(0, now)
+    for minute in range(1, 31):  # an email every 30 seconds for half an hour
+        scheduler.observe(2, now + timedelta(minutes=minute))
+    busy = scheduler.interval(now + timedelta(minutes=30))
+    assert 15 <= busy < 60
+
+    for minute in range(31, 180):  # then nothing for a couple of hours
+        scheduler.observe(0, now + timedelta(minutes=minute))
+    assert scheduler.interval(now + timedelta(minutes=180)) > busy * 5
+
+
+def test_never_outside_the_floor_and_ceiling(scheduler):
+    now = CUP.start + timedelta(days=1)
+    scheduler.observe(0, now)
+    scheduler.observe(1000, now + timedelta(seconds=1))
+    assert scheduler.interval(now) == 15
+
+
+def test_a_year_of_polling_is_far_cheaper_than_fixed_polls(scheduler):
+    now, polls = datetime(2030, 1, 1, tzinfo=EASTERN), 0
+    while now < datetime(2031, 1, 1, tzinfo=EASTERN):
+        polls += scheduler.active(now)
+        now += timedelta(seconds=scheduler.interval(now))
+    fixed_polls = 365 * 24 * 60  # once a minute
+    assert polls < fixed_polls / 40
+
+
+def test_poller_goes_dormant_without_touching_imap(monkeypatch):
+    connect = []
+    monkeypatch.setattr(pollEmail, "connect_mailbox", connect.append)
+    monkeypatch.setattr(pollEmail.PollScheduler, "active", staticmethod(lambda now=None: False))
+    poller = pollEmail.Poller([pollEmail.WatchTarget(name="vt", account="vt", password="secret")])
+    state = poller.states[0]
+
+    assert poller.poll(state) is False
+
+    assert connect == []
+    assert state.dormant
+    assert state.next_poll > pollEmail.time.monotonic() + 3600
+    poller.close()
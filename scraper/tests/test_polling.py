@@ -1,17 +1,20 @@
 # tests/test_pollEmail.py
 import io
+import json
 import sys
+import threading
 from unittest.mock import MagicMock
 
 import pytest
 
 from scraper import pollEmail
+from scraper.testing.FakeImapServer import FakeImapServer
 
 
 def test_connect_mailbox(monkeypatch):
     mock_mail = MagicMock()
     # Patch imaplib.IMAP4_SSL to return our mock
-    monkeypatch.setattr(pollEmail.imaplib, "IMAP4_SSL", lambda server: mock_mail)
+    monkeypatch.setattr(pollEmail.imaplib, "IMAP4_SSL", lambda server, port: mock_mail)
     mock_mail.login = MagicMock()
     mock_mail.select = MagicMock()
 
@@ -24,11 +27,11 @@ def test_connect_mailbox(monkeypatch):
 def test_check_for_unread_lgl_emails_triggers(monkeypatch):
     # Setup mock mailbox that returns one unread email
     mock_mail = MagicMock()
-    mock_mail.search.return_value = ("OK", [b"1 2 3"])
+    mock_mail.uid.return_value = ("OK", [b"1 2 3"])
 
     triggered = []
 
-    def fake_trigger():
+    def fake_trigger(target=None):
         triggered.append(True)
 
     monkeypatch.setattr(pollEmail, "trigger_github_action", fake_trigger)
@@ -41,11 +44,11 @@ def test_check_for_unread_lgl_emails_triggers(monkeypatch):
 def test_check_for_unread_lgl_emails_none(monkeypatch):
     # No unread emails
     mock_mail = MagicMock()
-    mock_mail.search.return_value = ("OK", [b""])
+    mock_mail.uid.return_value = ("OK", [b""])
 
     triggered = []
 
-    def fake_trigger():
+    def fake_trigger(target=None):
         triggered.append(True)
 
     monkeypatch.setattr(pollEmail, "trigger_github_action", fake_trigger)
@@ -69,33 +72,35 @@ def test_trigger_github_action(monkeypatch):
 
 def test_main_runs_once(monkeypatch):
     mock_mail = MagicMock()
+    monkeypatch.setattr(pollEmail, "POLL_SCHEDULE", "fixed")
 
     # Patch mailbox connection and email checking
-    monkeypatch.setattr(pollEmail, "connect_mailbox", lambda: mock_mail)
-    monkeypatch.setattr(pollEmail, "check_for_unread_lgl_emails", lambda mail: True)
+    monkeypatch.setattr(pollEmail, "connect_mailbox", lambda target: mock_mail)
+    monkeypatch.setattr(pollEmail, "check_for_unread_lgl_emails", lambda mail, target, state: True)
 
     # Patch time.sleep to break the loop immediately
     def fake_sleep(seconds):
         raise KeyboardInterrupt()  # stops infinite while True
 
-    monkeypatch.setattr(pollEmail, "time", type("time", (), {"sleep": fake_sleep}))
+    monkeypatch.setattr(pollEmail.time, "sleep", fake_sleep)
 
     # Run main and ensure loop executes one iteration
     with pytest.raises(KeyboardInterrupt):
         pollEmail.main()
 
-    mock_mail.logout.assert_called_once()
+    mock_mail.logout.assert_called_once()  # when the poller shuts down
 
 
 def test_check_for_unread_lgl_emails_search_error(monkeypatch):
     mock_mail = MagicMock()
     # Make search return something other than 'OK'
-    mock_mail.search.return_value = ("NO", [])
+    mock_mail.uid.return_value = ("NO", [])
 
     result = pollEmail.check_for_unread_lgl_emails(mock_mail)
 
     assert result is False
-    mock_mail.search.assert_called_once_with(None, f'(UNSEEN FROM "{pollEmail.FROM_FILTER}")')
+    mock_mail.uid.assert_called_once_with(
+        "search", None, f'(UNSEEN UNKEYWORD $Quarantined FROM "{pollEmail.FROM_FILTER}")')
 
 
 def test_trigger_github_action_failure_output(monkeypatch):
@@ -115,8 +120,9 @@ def test_trigger_github_action_failure_output(monkeypatch):
 
 
 def test_main_error_handling(monkeypatch):
+    monkeypatch.setattr(pollEmail, "POLL_SCHEDULE", "fixed")
     # Patch connect_mailbox to raise an exception immediately
-    def mock_connect_mailbox():
+    def mock_connect_mailbox(target):
         raise Exception("Test exception")
 
     monkeypatch.setattr(pollEmail, "connect_mailbox", mock_connect_mailbox)
@@ -139,4 +145,143 @@ def test_main_error_handling(monkeypatch):
 
     sys.stdout = sys.__stdout__
     output = captured.getvalue()
-    assert "Error during polling: Test exception" in output
+    assert "Error during polling INBOX: Test exception" in output
+
+
+# ---------- multiple targets ---------- #
+
+def _target(name, **kwargs):
+    return pollEmail.WatchTarget(name=name, account=f"{name}@example.com", password="secret", **kwargs)
+
+
+def test_load_targets(tmp_path, monkeypatch):
+    monkeypatch.setenv("VT_PASSWORD", "hokies")
+    path = tmp_path / "targets.json"
+    path.write_text(json.dumps([
+        {"name": "vt", "account": "vt@example.com", "password_env": "VT_PASSWORD", "mailbox": "LGL/VT",
+         "event_type": "vt-submission"},
+        {"name": "uva", "account": "uva@example.com", "password_env": "UVA_PASSWORD"},
+    ]))
+
+    vt, uva = pollEmail.load_targets(str(path))
+
+    assert (vt.password, vt.mailbox, vt.event_type) == ("hokies", "LGL/VT", "vt-submission")
+    assert (uva.password, uva.mailbox, uva.event_type) == (None, "INBOX", "lgl-form-submission")
+
+
+def test_load_targets_defaults_to_the_environment():
+    (target,) = pollEmail.load_targets()
+    assert (target.account, target.mailbox, target.from_filter) == (
+        pollEmail.EMAIL_ACCOUNT, pollEmail.MAILBOX, pollEmail.FROM_FILTER)
+
+
+def test_trigger_routes_by_target(monkeypatch):
+    mock_post = MagicMock()
+    mock_post.return_value.status_code = 204
+    monkeypatch.setattr(pollEmail.requests, "post", mock_post)
+
+    pollEmail.trigger_github_action(_target("vt", event_type="vt-submission"))
+
+    payload = mock_post.call_args[1]["json"]
+    assert payload["event_type"] == "vt-submission"
+    assert payload["client_payload"]["target"] == "vt"
+
+
+def test_check_only_triggers_for_new_emails(monkeypatch):
+    triggered = []
+    monkeypatch.setattr(pollEmail, "trigger_github_action", triggered.append)
+    target = _target("vt")
+    state = pollEmail.TargetState(target)
+    mail = MagicMock()
+
+    mail.uid.return_value = ("OK", [b"4 5"])
+    assert pollEmail.check_for_unread_lgl_emails(mail, target, state) is True
+    assert pollEmail.check_for_unread_lgl_emails(mail, target, state) is False  # still waiting on 4 and 5
+    mail.uid.return_value = ("OK", [b"4 5 6"])
+    assert pollEmail.check_for_unread_lgl_emails(mail, target, state) is True
+    assert state.last_seen_uid == 6
+
+    monkeypatch.setattr(pollEmail, "RETRIGGER_AFTER", 0)  # left unread too long
+    assert pollEmail.check_for_unread_lgl_emails(mail, target, state) is True
+    assert triggered == [target, target, target]
+
+
+def test_poller_polls_every_target_concurrently_with_its_own_connection(monkeypatch):
+    barrier = threading.Barrier(3, timeout=5)  # deadlocks unless all three are polled at once
+    connections = {}
+
+    def connect(target):
+        connections[target.name] = MagicMock()
+        return connections[target.name]
+
+    def check(mail, target, state):
+        barrier.wait()
+        return target.name == "vt"
+
+    monkeypatch.setattr(pollEmail, "connect_mailbox", connect)
+    monkeypatch.setattr(pollEmail, "check_for_unread_lgl_emails", check)
+    poller = pollEmail.Poller([_target("vt"), _target("uva"), _target("alumni")], interval=60, workers=3)
+
+    polled = poller.poll_due()
+
+    assert [state.target.name for state in polled] == ["vt", "uva", "alumni"]
+    assert poller.poll_due() == []  # none due again yet
+    assert all(state.connection is connections[state.target.name] for state in poller.states)
+    poller.close()
+    for connection in connections.values():
+        connection.logout.assert_called_once()
+
+
+def test_poller_backs_off_each_target_on_its_own(monkeypatch):
+    def connect(target):
+        if target.name == "broken":
+            raise OSError("connection refused")
+        return MagicMock()
+
+    monkeypatch.setattr(pollEmail, "connect_mailbox", connect)
+    monkeypatch.setattr(pollEmail, "check_for_unread_lgl_emails", lambda mail, target, state: False)
+    monkeypatch.setattr(pollEmail.time, "monotonic", lambda: 1000.0)
+    poller = pollEmail.Poller([_target("broken"), _target("fine")], interval=60)
+    broken, fine = poller.states
+
+    poller.poll(broken)
+    poller.poll(broken)
+    poller.poll(fine)
+
+    assert (broken.failures, broken.next_poll, broken.connection) == (2, 1240.0, None)
+    assert (fine.failures, fine.next_poll) == (0, 1060.0)
+    poller.close()
+
+
+def test_poller_against_separate_accounts(monkeypatch):
+    triggered = []
+    monkeypatch.setattr(pollEmail, "trigger_github_action", lambda target: triggered.append(target.name))
+    with FakeImapServer(accounts={"vt@example.com": "secret", "uva@example.com": "secret"}) as imap:
+        targets = [_target(name, server=imap.host, port=imap.port, ssl=False, from_filter="littlegreenlight.com")
+                   for name in ("vt", "uva")]
+        imap.deliver(b"From: lglforms-submissions@littlegreenlight.com\r\n\r\nhi", user="uva@example.com")
+        poller = pollEmail.Poller(targets, interval=0)
+
+        poller.poll_due()
+        poller.poll_due()
+
+        assert triggered == ["uva"]
+        assert imap.command_counts["LOGIN"] == 2  # connections are kept between polls
+        poller.close()
+
+
+def test_quarantined_emails_dont_trigger(monkeypatch):
+    triggered = []
+    monkeypatch.setattr(pollEmail, "trigger_github_action", lambda target: triggered.append(target.name))
+    monkeypatch.setattr(pollEmail, "RETRIGGER_AFTER", 0)
+    with FakeImapServer(accounts={"vt@example.com": "secret"}) as imap:
+        target = _target("vt", server=imap.host, port=imap.port, ssl=False, from_filter="littlegreenlight.com")
+        imap.deliver(b"From: lglforms-submissions@littlegreenlight.com\r\n\r\nno table", user="vt@example.com")
+        imap.mailbox(user="vt@example.com").messages[0].flags.add("$Quarantined")
+        poller = pollEmail.Poller([target], interval=0)
+
+        poller.poll_due()
+        poller.poll_due()
+
+        assert triggered == []
+        poller.close()
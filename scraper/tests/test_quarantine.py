@@ -0,0 +1,75 @@
+from email.message import EmailMessage
+
+import pytest
+
+from scraper.Quarantine import QuarantineStore
+
+
+@pytest.fixture
+def raw_msg():
+    msg = EmailMessage()
+    msg['From'] = "tester@example.com"
+    msg['Message-ID'] = "<abc123@littlegreenlight.com>"
+    msg.set_content("Just plain text")
+    return msg.as_bytes()
+
+
+def test_add_stores_raw_bytes_and_details(tmp_path, raw_msg):
+    store = QuarantineStore(str(tmp_path))
+    entry = store.add(42, raw_msg, "Email has no HTML part")
+
+    assert entry.uid == 42
+    assert entry.message_id == "<abc123@littlegreenlight.com>"
+    assert entry.error == "Email has no HTML part"
+    assert entry.attempts == 1
+    assert store.contains(42)
+    assert not store.contains(43)
+    assert store.load_raw(42) == raw_msg
+
+
+def test_index_persists_between_instances(tmp_path, raw_msg):
+    QuarantineStore(str(tmp_path)).add(7, raw_msg, "No table found in email")
+
+    store = QuarantineStore(str(tmp_path))
+    assert store.contains(7)
+    assert [e.uid for e in store.entries()] == [7]
+
+
+def test_add_again_counts_attempts(tmp_path, raw_msg):
+    store = QuarantineStore(str(tmp_path))
+    store.add(7, raw_msg, "No table found in email")
+    entry = store.add(7, raw_msg, "could not convert string to float")
+
+    assert entry.attempts == 2
+    assert store.entries()[0].error == "could not convert string to float"
+
+
+def test_remove_releases_email(tmp_path, raw_msg):
+    store = QuarantineStore(str(tmp_path))
+    store.add(3, raw_msg, "boom")
+    store.add(1, raw_msg, "boom")
+    store.remove(3)
+
+    assert not store.contains(3)
+    assert not (tmp_path / "3.eml").exists()
+    assert [e.uid for e in QuarantineStore(str(tmp_path)).entries()] == [1]
+
+
+def test_empty_store(tmp_path):
+    store = QuarantineStore(str(tmp_path / "missing"))
+    assert store.entries() == []
+    assert not store.contains(1)
+    store.remove(1)  # no-op
+
+
+def test_entries_are_keyed_by_uid_validity_too(tmp_path, raw_msg):
+    store = QuarantineStore(str(tmp_path))
+    store.add(5, raw_msg, "boom", uid_validity=1)
+
+    assert store.contains(5, uid_validity=1)
+    assert not store.contains(5, uid_validity=2)  # the mailbox was rebuilt, so UID 5 is another email
+    assert not store.contains(5)
+    assert QuarantineStore(str(tmp_path)).entries()[0].uid_validity == 1
+    assert store.load_raw(5, uid_validity=1) == raw_msg
+    store.remove(5, uid_validity=1)
+    assert store.entries() == []
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from scraper.ResultsHistory import ResultsHistory, numeric_values
+
+START = datetime(2025, 12, 1, 17, 0, tzinfo=timezone.utc)  # noon Eastern
+
+
+@pytest.fixture
+def history(tmp_path):
+    return ResultsHistory(str(tmp_path / "history"))
+
+
+def _fill(history, minutes, step=timedelta(minutes=1)):
+    for n in range(minutes):
+        history.append({"vt_total_amount": float(n), "uva_total_amount": 2.0 * n}, at=START + n * step)
+
+
+def test_numeric_values_skips_names_and_blanks():
+    row = {"vt_total_amount": "36.5", "vt_donors": 3, "vt_donor_names": "Ann, Bob", "uva_total": float("nan")}
+
+    assert numeric_values(row) == {"vt_total_amount": 36.5, "vt_donors": 3.0}
+
+
+def test_empty_history(history):
+    assert history.latest() is None
+    assert history.at(START) is None
+    assert history.range(START, START + timedelta(days=1), "hour") == []
+
+
+def test_latest_and_at(history):
+    _fill(history, 10)
+
+    assert history.latest() == (START + timedelta(minutes=9), {"vt_total_amount": 9.0, "uva_total_amount": 18.0})
+    when, values = history.at(START + timedelta(minutes=4, seconds=30))
+    assert when == START + timedelta(minutes=4)
+    assert values["vt_total_amount"] == 4.0
+    assert history.at(START - timedelta(seconds=1)) is None
+
+
+def test_raw_range(history):
+    _fill(history, 10)
+
+    snapshots = history.range(START + timedelta(minutes=2), START + timedelta(minutes=5))
+    assert [values["vt_total_amount"] for _, values in snapshots] == [2.0, 3.0, 4.0]
+
+
+def test_rollups_keep_the_last_snapshot_of_each_bucket(history):
+    _fill(history, 6 * 60 + 1, step=timedelta(seconds=20))  # two hours, in 20s steps
+
+    minutes = history.range(START, START + timedelta(hours=3), "minute")
+    assert len(minutes) == 121  # the minute in progress included
+    assert minutes[0] == (START, {"vt_total_amount": 2.0, "uva_total_amount": 4.0})
+    hours = history.range(START, START + timedelta(hours=3), "hour")
+    assert [(when, values["vt_total_amount"]) for when, values in hours] == [
+        (START, 179.0), (START + timedelta(hours=1), 359.0), (START + timedelta(hours=2), 360.0)]
+
+
+def test_days_start_at_eastern_midnight(history):
+    history.append({"total": 1.0}, at=datetime(2025, 12, 2, 4, 59, tzinfo=timezone.utc))  # 11:59pm Eastern
+    history.append({"total": 2.0}, at=datetime(2025, 12, 2, 5, 1, tzinfo=timezone.utc))
+
+    days = history.range(datetime(2025, 12, 1, tzinfo=timezone.utc), datetime(2025, 12, 3, tzinfo=timezone.utc), "day")
+    assert [(when.hour, values["total"]) for when, values in days] == [(5, 1.0), (5, 2.0)]
+
+
+def test_new_columns_and_persistence(history, tmp_path):
+    history.append({"a": 1.0}, at=START)
+    history.append({"a": 2.0, "b": 3.0}, at=START + timedelta(seconds=1))
+
+    reopened = ResultsHistory(str(tmp_path / "history"))
+    assert reopened.latest()[1] == {"a": 2.0, "b": 3.0}
+    assert reopened.at(START)[1] == {"a": 1.0}
+
+
+def test_unknown_resolution(history):
+    with pytest.raises(ValueError):
+        history.range(START, START, "week")
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from scraper.ResultsServer import ResultsServer
+from scraper.benchmarks import longPoll
+
+RESULTS = b"uva_total_amount,vt_total_amount\n100.00,200.00\n"
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_bytes(RESULTS)
+    return str(path)
+
+
+def serving(csv_path, scenario):
+    """Run a scenario against a server on an ephemeral port."""
+
+    async def run():
+        server = ResultsServer(csv_path, reload_seconds=0.05)
+        host, port = await server.start("127.0.0.1", 0)
+        try:
+            return await scenario(server, host, port)
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+async def read_response(reader, method="GET"):
+    head = (await reader.readuntil(b"\r\n\r\n")).decode()
+    lines = head.split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:] if line)
+    body = await reader.readexactly(int(headers["Content-Length"])) if method != "HEAD" else b""
+    return int(lines[0].split(" ")[1]), headers, body
+
+
+async def get(host, port, path, method="GET", **headers):
+    reader, writer = await asyncio.open_connection(host, port)
+    extra = "".join(f"{name.replace('_', '-')}: {value}\r\n" for name, value in headers.items())
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\n{extra}\r\n".encode())
+    try:
+        return await read_response(reader, method)
+    finally:
+        writer.close()
+
+
+def test_serves_results_with_a_strong_etag(csv_path):
+    async def scenario(server, host, port):
+        return await get(host, port, "/results.csv")
+
+    status, headers, body = serving(csv_path, scenario)
+
+    assert status == 200
+    assert body == RESULTS
+    assert headers["ETag"].startswith('"') and not headers["ETag"].startswith('W/')
+    assert headers["Cache-Control"] == "no-cache"
+    assert headers["Access-Control-Allow-Origin"] == "*"
+
+
+def test_matching_if_none_match_is_not_modified(csv_path):
+    async def scenario(server, host, port):
+        _, headers, _ = await get(host, port, "/results.csv")
+        return await get(host, port, "/results.csv", If_None_Match=headers["ETag"])
+
+    status, headers, body = serving(csv_path, scenario)
+
+    assert status == 304
+    assert body == b""
+
+
+def test_stale_if_none_match_gets_the_results(csv_path):
+    async def scenario(server, host, port):
+        return await get(host, port, "/results.csv", If_None_Match='"stale"')
+
+    status, _, body = serving(csv_path, scenario)
+
+    assert status == 200
+    assert body == RESULTS
+
+
+def test_long_poll_waits_for_new_results(csv_path):
+    async def scenario(server, host, port):
+        etag = server.etag
+        poll = asyncio.create_task(get(host, port, "/results/poll?timeout=10", If_None_Match=etag))
+        while not server.waiting:
+            await asyncio.sleep(0.01)
+        assert not poll.done()
+        with open(csv_path, "ab") as f:
+            f.write(b"150.00,200.00\n")
+        os.utime(csv_path, ns=(1, 1))  # a different mtime, however coarse the filesystem's clock
+        return etag, await poll, server.version
+
+    etag, (status, headers, body), version = serving(csv_path, scenario)
+
+    assert status == 200
+    assert body.endswith(b"150.00,200.00\n")
+    assert headers["ETag"] != etag
+    assert headers["X-Results-Version"] == str(version) == "2"
+
+
+def test_long_poll_times_out_as_not_modified(csv_path):
+    async def scenario(server, host, port):
+        return await get(host, port, f"/results/poll?timeout=0.05&etag={server.etag}")
+
+    status, _, body = serving(csv_path, scenario)
+
+    assert status == 304
+    assert body == b""
+
+
+def test_long_poll_with_an_old_etag_answers_at_once(csv_path):
+    async def scenario(server, host, port):
+        return await get(host, port, "/results/poll?timeout=10", If_None_Match='"old"')
+
+    status, _, body = serving(csv_path, scenario)
+
+    assert status == 200
+    assert body == RESULTS
+
+
+def test_unchanged_content_keeps_its_version(csv_path):
+    server = ResultsServer(csv_path)
+    server.publish(RESULTS)
+    etag = server.etag
+
+    server.publish(RESULTS)
+
+    assert (server.version, server.etag) == (1, etag)
+
+
+def test_keep_alive_serves_several_requests_per_connection(csv_path):
+    async def scenario(server, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b"GET /results.csv HTTP/1.1\r\nHost: test\r\n\r\n" * 2)
+        responses = [await read_response(reader), await read_response(reader)]
+        writer.close()
+        return responses
+
+    responses = serving(csv_path, scenario)
+
+    assert [status for status, _, _ in responses] == [200, 200]
+    assert all(headers["Connection"] == "keep-alive" for _, headers, _ in responses)
+
+
+def test_unknown_paths_and_methods(csv_path):
+    async def scenario(server, host, port):
+        return [await get(host, port, "/nope"), await get(host, port, "/results.csv", method="POST"),
+                await get(host, port, "/results.csv", method="OPTIONS"),
+                await get(host, port, "/results/poll?timeout=soon")]
+
+    statuses = [status for status, _, _ in serving(csv_path, scenario)]
+
+    assert statuses == [404, 405, 204, 400]
+
+
+def test_unknown_paths_count_as_other(csv_path):
+    async def scenario(server, host, port):
+        for i in range(5):
+            await get(host, port, f"/random-{i}", method="OPTIONS")
+            await get(host, port, f"/random-{i}", method="DELETE")
+            await get(host, port, f"/random-{i}")
+        return await get(host, port, "/stats")
+
+    _, _, body = serving(csv_path, scenario)
+
+    assert set(json.loads(body)["endpoints"]) == {"other"}
+    assert json.loads(body)["endpoints"]["other"]["requests"] == 15
+
+
+def test_malformed_request_line_is_a_bad_request(csv_path):
+    async def scenario(server, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b"GARBAGE\r\nHost: test\r\n\r\n")
+        response = await read_response(reader)
+        closed = await reader.read() == b""
+        writer.close()
+        return response, closed, dict(server.stats)
+
+    (status, headers, _), closed, stats = serving(csv_path, scenario)
+
+    assert status == 400
+    assert headers["Connection"] == "close" and closed
+    assert stats["other"].requests == 1
+
+
+def test_per_endpoint_counters(csv_path):
+    async def scenario(server, host, port):
+        _, headers, _ = await get(host, port, "/results.csv")
+        await get(host, port, "/results.csv", If_None_Match=headers["ETag"])
+        _, head, _ = await get(host, port, "/results.csv", method="HEAD")
+        return head, await get(host, port, "/stats")
+
+    head, (_, _, body) = serving(csv_path, scenario)
+    stats = json.loads(body)
+
+    assert head["Content-Length"] == str(len(RESULTS))
+    assert stats["version"] == 1
+    assert stats["endpoints"]["/results.csv"] == {"requests": 3, "not_modified": 1, "bytes": len(RESULTS)}
+
+
+def test_long_poll_benchmark_wakes_every_client(capsys):
+    assert longPoll.main(["--clients", "200", "--budget-seconds", "30"]) == 0
+    assert "within the 30.00s budget" in capsys.readouterr().out
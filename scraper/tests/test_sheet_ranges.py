@@ -0,0 +1,64 @@
+import pytest
+
+from scraper.SheetRanges import column_letters, column_ranges, payload_size, read_named_columns, read_rows
+from scraper.testing.FakeSheets import FakeSheetsBackend
+
+
+@pytest.fixture
+def backend():
+    return FakeSheetsBackend()
+
+
+@pytest.fixture
+def ws(backend):
+    return backend.add_worksheet("key", "entries", values=[
+        ["when", "name", "notes", "amount", "school", "blank"],
+        ["mon", "Ann", "a long story", "10", "uva"],
+        ["tue", "Bo", "", "20", "vt"],
+        ["wed", "", "another long story"],
+    ])
+
+
+@pytest.mark.parametrize("number, letters", [(1, "A"), (26, "Z"), (27, "AA"), (52, "AZ"), (703, "AAA")])
+def test_column_letters(number, letters):
+    assert column_letters(number) == letters
+
+
+def test_column_ranges_share_adjacent_columns():
+    assert column_ranges([5, 1, 2, 4, 9]) == [([1, 2], "A1:B"), ([4, 5], "D1:E"), ([9], "I1:I")]
+    assert column_ranges([3], first_row=4, last_row=10) == [([3], "C4:C10")]
+    assert column_ranges([]) == []
+
+
+def test_read_named_columns_in_one_request(backend, ws):
+    columns = read_named_columns(ws, ["school", "name", "amount", "blank", "missing"])
+
+    assert backend.api_calls["values.batchGet"] == 1
+    # in sheet order, each headed by its name, like a column-major read of the whole sheet
+    assert columns == [["name", "Ann", "Bo"], ["amount", "10", "20"], ["school", "uva", "vt"], ["blank", "", ""]]
+
+
+def test_read_named_columns_with_a_known_header(backend, ws):
+    columns = read_named_columns(ws, ["name"], header=["when", "name"])
+
+    assert backend.api_calls["values.get"] == 0
+    assert columns == [["name", "Ann", "Bo"]]
+
+
+def test_read_named_columns_of_some_rows(ws):
+    columns = read_named_columns(ws, ["name", "amount"], first_row=3, last_row=4)
+
+    assert columns == [["name", "Bo"], ["amount", "20"]]
+
+
+def test_read_rows_leaves_other_columns_blank(backend, ws):
+    rows = read_rows(ws, [1, 4], first_row=2)
+
+    assert backend.api_calls["values.batchGet"] == 1
+    assert rows == [["", "Ann", "", "", "uva"], ["", "Bo", "", "", "vt"]]
+    assert payload_size(rows) == len("Ann" "uva" "Bo" "vt")
+
+
+def test_read_rows_of_a_range(ws):
+    assert read_rows(ws, [0, 3], first_row=3, last_row=3) == [["tue", "", "", "20"]]
+    assert read_rows(ws, []) == []
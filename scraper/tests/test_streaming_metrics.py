@@ -0,0 +1,92 @@
+import csv
+
+import pytest
+
+from scraper import EntryShards as entry_shards
+from scraper import getLglFormData as lgl
+from scraper.CalculateValues import CalculateValues, DONOR_ID, entries_frame
+from scraper.DonorIdentity import DonorIndex
+from scraper.EntryShards import EntryShards
+from scraper.StreamingMetrics import csv_chunks, sheet_chunks, stream_metrics
+from scraper.benchmarks import streamMetrics
+from scraper.benchmarks.loadEntries import synthetic_columns
+from scraper.benchmarks.parallelMetrics import same_metrics
+from scraper.testing.FakeSheets import FakeSheetsBackend
+
+ROWS = 3000
+
+
+@pytest.fixture(scope="module")
+def columns():
+    return synthetic_columns(ROWS)
+
+
+@pytest.fixture(scope="module")
+def expected(columns):
+    calc = CalculateValues.__new__(CalculateValues)
+    calc.df = entries_frame([list(column) for column in columns])
+    calc.df[DONOR_ID] = DonorIndex().assign(calc.df)
+    calc.distinct, calc.distinct_error, calc.workers = "exact", 0.01, 1
+    calc.state_path, calc._rows, calc._tables, calc._gifts = None, 0, {}, {}
+    return calc.calculate_all()
+
+
+def chunked(columns, chunk_rows):
+    for start in range(1, ROWS + 1, chunk_rows):
+        yield [[column[0]] + column[start:start + chunk_rows] for column in columns]
+
+
+@pytest.mark.parametrize("chunk_rows", [97, 1000, ROWS])
+def test_streamed_chunks_give_the_same_metrics(columns, expected, chunk_rows):
+    # the synthetic donors share emails, so chunks keep finding that earlier donors are the same person
+    assert same_metrics(expected, stream_metrics(chunked(columns, chunk_rows)))
+
+
+def test_streams_a_csv_export(columns, expected, tmp_path):
+    path = tmp_path / "entries.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(zip(*([["message id"] + ["<id>"] * ROWS] + columns)))
+
+    chunks = list(csv_chunks(str(path), 1000))
+
+    assert [len(chunk[0]) - 1 for chunk in chunks] == [1000, 1000, 1000]
+    assert "message id" not in [column[0] for column in chunks[0]]  # only the entries columns
+    assert same_metrics(expected, stream_metrics(chunks))
+
+
+def test_streams_every_shard_of_the_sheet(columns, expected, tmp_path, monkeypatch):
+    monkeypatch.setattr(entry_shards, "SHARD_CACHE_DIR", str(tmp_path))
+    backend = FakeSheetsBackend()
+    backend.add_worksheet("key", "entries-2025-shards", [["shard", "opened at", "sealed at", "rows"]] + [
+        [f"entries-2025{suffix}", "2025-12-01T00:00:00+00:00", "2025-12-02T00:00:00+00:00" if sealed else "", rows]
+        for suffix, sealed, rows in (("", True, "1200"), ("-2", True, "1200"), ("-3", False, ""))])
+    for title, start, end in (("entries-2025", 1, 1201), ("entries-2025-2", 1201, 2401), ("entries-2025-3", 2401, 3001)):
+        backend.add_worksheet("key", title, [list(row) for row in zip(*([column[0]] + column[start:end]
+                                                                         for column in columns))])
+    gc = backend.service_account()
+    EntryShards(gc.open_by_key("key"), "entries-2025").read_columns(["source"])  # caching a sealed shard's column
+
+    chunks = list(sheet_chunks("key", "entries-2025", 500, gc))
+
+    assert [len(chunk[0]) - 1 for chunk in chunks] == [500, 500, 200] * 2 + [500, 100]
+    assert same_metrics(expected, stream_metrics(chunks))
+
+
+def test_metric_updates_stream_when_configured(monkeypatch):
+    monkeypatch.setattr("scraper.StreamingMetrics.METRIC_STREAM_ROWS", 2)
+    backend = FakeSheetsBackend()
+    backend.add_worksheet(lgl.SPREADSHEET_KEY, "entries", [
+        ["source", "total amount", "phone number"], ["uva-front", "10", "1"], ["uva-back", "15", "2"],
+        ["vt-front", "7", "3"]])
+    monkeypatch.setattr(lgl, "SPREADSHEET_SHEET", "entries")
+    monkeypatch.setattr(lgl, "DONOR_INDEX_PATH", None)
+
+    updates = lgl.metric_updates(gc=backend.service_account())
+
+    assert updates["uva_total_amount"] == 25
+    assert updates["vt_total_amount"] == 7
+
+
+def test_stream_metrics_benchmark(capsys):
+    assert streamMetrics.main(["--rows", "3000", "--chunk-rows", "500", "--max-peak-mb", "200"]) == 0
+    assert "Streamed metrics match" in capsys.readouterr().out
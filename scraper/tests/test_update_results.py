@@ -0,0 +1,122 @@
+import threading
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from scraper import updateResults
+from scraper.Results import apply_updates, metric_columns
+from scraper.ResultsHistory import ResultsHistory
+
+
+# ---------- Results ---------- #
+
+def test_metric_columns_flattens_schools():
+    assert metric_columns({"uva": {"total": 5, "names": ["A", "B"]}, "vt": {"total": 1}}) == {
+        "uva_total": 5, "uva_names": "A, B", "vt_total": 1,
+    }
+
+
+def test_apply_updates_creates_missing_columns():
+    df = pd.DataFrame({"a": [1]})
+    apply_updates(df, {"a": "x", "b": 2})
+    assert df.to_dict("records") == [{"a": "x", "b": 2}]
+
+
+# ---------- run_sources ---------- #
+
+def test_run_sources_runs_concurrently_and_merges():
+    barrier = threading.Barrier(2, timeout=5)  # deadlocks unless both sources run at once
+
+    def source(updates):
+        def run():
+            barrier.wait()
+            return updates
+        return run
+
+    updates, failed = updateResults.run_sources({"a": source({"x": 1}), "b": source({"y": 2})})
+
+    assert updates == {"x": 1, "y": 2}
+    assert failed == []
+
+
+def test_run_sources_keeps_going_when_one_fails():
+    def broken():
+        raise RuntimeError("Sheets is down")
+
+    updates, failed = updateResults.run_sources({"a": broken, "b": lambda: {"y": 2}})
+
+    assert updates == {"y": 2}
+    assert failed == ["a"]
+
+
+# ---------- main ---------- #
+
+@pytest.fixture
+def cycle(monkeypatch, tmp_path):
+    csv_path = tmp_path / "results.csv"
+    pd.DataFrame({"uva_mitzvah_memories": [0], "uva_total_amount": [0]}).to_csv(csv_path, index=False)
+    monkeypatch.setattr(updateResults.lgl, "CSV_PATH", str(csv_path))
+    monkeypatch.setattr(updateResults, "HISTORY_DIR", str(tmp_path / "history"))
+    monkeypatch.setattr(updateResults, "FEED_PATH", str(tmp_path / "changes.jsonl"))
+    service_account = MagicMock()
+    monkeypatch.setattr(updateResults.gspread, "service_account", service_account)
+
+    forms = MagicMock()
+    forms.column_updates.return_value = {"uva_mitzvah_memories": 3}
+    monkeypatch.setattr(updateResults, "SubmissionUpdater", MagicMock(return_value=forms))
+    lgl_updates = MagicMock(return_value={"uva_total_amount": 180.0})
+    monkeypatch.setattr(updateResults.lgl, "collect_updates", lgl_updates)
+    monkeypatch.setattr(updateResults.lgl, "publish_pending", MagicMock())
+    return csv_path, service_account, forms, lgl_updates
+
+
+def test_main_writes_every_source_once_with_one_client(cycle):
+    csv_path, service_account, forms, lgl_updates = cycle
+
+    assert updateResults.main() == 0
+
+    service_account.assert_called_once()
+    lgl_updates.assert_called_once_with(service_account.return_value, force=False)
+    assert updateResults.SubmissionUpdater.call_args.kwargs["gc"] is service_account.return_value
+    assert pd.read_csv(csv_path).to_dict("records") == [{"uva_mitzvah_memories": 3, "uva_total_amount": 180.0}]
+    assert ResultsHistory(updateResults.HISTORY_DIR).latest()[1] == {"uva_mitzvah_memories": 3,
+                                                                    "uva_total_amount": 180.0}
+    forms.save_progress.assert_called_once()
+    updateResults.lgl.publish_pending.assert_called_once()
+
+
+def test_main_passes_force_to_the_lgl_source(cycle):
+    _, service_account, _, lgl_updates = cycle
+
+    assert updateResults.main(force=True) == 0
+
+    lgl_updates.assert_called_once_with(service_account.return_value, force=True)
+
+
+def test_main_leaves_lgl_emails_pending_when_lgl_fails(cycle):
+    csv_path, _, _, lgl_updates = cycle
+    lgl_updates.side_effect = RuntimeError("rate limited")
+
+    assert updateResults.main() == 0
+
+    updateResults.lgl.publish_pending.assert_not_called()
+
+
+def test_main_keeps_form_progress_when_forms_fail(cycle):
+    csv_path, _, forms, _ = cycle
+    forms.column_updates.side_effect = RuntimeError("quota")
+
+    assert updateResults.main() == 0
+
+    assert pd.read_csv(csv_path).to_dict("records") == [{"uva_mitzvah_memories": 0, "uva_total_amount": 180.0}]
+    forms.save_progress.assert_not_called()
+
+
+def test_main_fails_when_every_source_fails(cycle):
+    csv_path, _, forms, lgl_updates = cycle
+    forms.column_updates.side_effect = RuntimeError("quota")
+    lgl_updates.side_effect = RuntimeError("imap down")
+
+    assert updateResults.main() == 1
+    assert pd.read_csv(csv_path).to_dict("records") == [{"uva_mitzvah_memories": 0, "uva_total_amount": 0}]
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+updateResults.py
+----------------
+
+Runs every source of results in one process: the Google Form sheets and the LGL donation emails
+are read concurrently, sharing a single authorized Sheets client, and their column updates are
+merged in memory and written to results.csv once, atomically, snapshotted into the results
+history, and diffed into the change feed. A source that fails keeps its previous numbers, without
+holding back the others. LGL emails are only marked read once the results covering them are written,
+so a run that fails before then is caught up by the next.
+
+Usage (from the root of the repo):
+    python -m scraper.updateResults [--force] [--report PATH] [--profile [PATH]]
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+import gspread
+
+from . import Instrumentation
+from . import getLglFormData as lgl
+from .Instrumentation import run_report
+from .ChangeFeed import FEED_PATH
+from .Results import update_results
+from .ResultsHistory import HISTORY_DIR
+from .getGoogleFormData import FORM_STATE_PATH, SubmissionUpdater
+
+CREDENTIALS_PATH = os.getenv("SPREADSHEET_CREDENTIALS", "spreadsheet_credentials.json")
+
+
+def run_sources(sources: Dict[str, Callable[[], Dict[str, Any]]]) -> Tuple[Dict[str, Any], List[str]]:
+    """Run each source concurrently, merging their column updates; returns the updates and the failed sources."""
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        futures = {name: pool.submit(source) for name, source in sources.items()}
+
+    updates, failed = {}, []
+    for name, future in futures.items():
+        try:
+            source_updates = future.result()
+        except Exception as e:
+            print(f"❌ {name} failed, keeping its previous results: {e}")
+            failed.append(name)
+            continue
+        clashes = updates.keys() & source_updates.keys()
+        if clashes:
+            print(f"⚠️ {name} also updates {', '.join(sorted(clashes))}, its values win")
+        updates.update(source_updates)
+    return updates, failed
+
+
+def main(force=False):
+    gc = gspread.service_account(filename=CREDENTIALS_PATH)
+    forms = SubmissionUpdater(None, lgl.CSV_PATH, state_path=FORM_STATE_PATH, gc=gc)
+    sources = {
+        "google forms": forms.column_updates,
+        "lgl": lambda: lgl.collect_updates(gc, force=force),
+    }
+    updates, failed = run_sources(sources)
+    if len(failed) == len(sources):
+        return 1
+
+    with run_report.span("csv_write", items=len(updates)):
+        update_results(lgl.CSV_PATH, updates, HISTORY_DIR, FEED_PATH)
+    if "google forms" not in failed:
+        forms.save_progress()  # only once the counts it covers are safely written
+    if "lgl" not in failed:
+        lgl.publish_pending()  # likewise, only now are the emails the donations came from done with
+    print(f"✅ Results CSV updated with {len(updates)} columns")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update results.csv from every source at once.")
+    parser.add_argument("--force", action="store_true",
+                        help="recalculate the donation results even if there are no new emails")
+    Instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    sys.exit(Instrumentation.run("update-results", lambda: main(args.force), args))